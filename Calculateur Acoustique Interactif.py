@@ -3,23 +3,93 @@
 """
 Calculateur Acoustique Interactif - Version Universelle
 Saisie personnalisée des données via terminal
-Génération de rapport PDF professionnel sur 2 pages
+Génération de rapport PDF professionnel (tableaux, graphiques et carte de bruit)
 """
 
+import argparse
+import hashlib
+import io
 import math
+import os
+import queue
 import sys
-from datetime import datetime
+import time
+import numpy as np
+from xml.sax.saxutils import escape
+from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image
+from reportlab.platypus.flowables import AnchorFlowable
 from reportlab.lib import colors
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
 
+from directivite import FACTEURS_Q, SourcePuissance
+from resultats import LotResultats, calculer_lignes
+from optimisation_attenuation import CATALOGUE_MESURES_TYPE, catalogue_depuis_dicts, optimiser_mesures
+from optimisation_placement import UniteImplantation, grille_positions, optimiser_placement
+from base_etudes import FICHIER_BASE, BaseEtudes
+from configuration import (SCHEMA_CONFIGURATION, charger_configurations, colonnes_configurations,
+                           ecrire_configuration, lire_configuration, valider_configuration)
+from graphe_dependances import GrapheDependances, ajouter_noeuds_calcul, resultats_graphe
+from surveillance_configs import SurveillanceConfigurations
+from mesures_sonometre import blocs_mesures, lire_campagne
+from correction_bruit_fond import agreger_intervalles, corriger_bruit_fond
+from pyramide_niveaux import pyramide_mesures
+from archive_rapports import ArchiveRapports
+from export_rapports import exporter_lot, exporter_resultat
+from rendu_graphiques import diagramme_conformite, graphique_historique, image_carte, legende_carte
+from scenarios import ComparaisonScenarios, comparer_scenarios, lire_scenarios
+from stockage_mmap import FICHIER_ENTETE, StockageCarte
+from modeles_sources import creer_source
+from transmission_local import MATERIAUX_TYPE, lw_exterieur
+from zonage import IndexZonage
+from limites_reglementaires import (ECHELLE_OPB, HEURE_DEBUT_NUIT, HEURE_FIN_NUIT, HORS_ZONAGE, TABLE_LIMITES,
+                                    degres_depuis_zones, zone_sensibilite)
+from surveillance_continue import SurveillanceContinue, flux_fichier, flux_socket
+from file_travaux import PRIORITE_LOT, PRIORITE_ETUDE, EN_ATTENTE, TERMINE, ETATS_FINAUX, FileTravaux
+
+def formater_chf(montant):
+    """Montant en francs suisses avec séparateur de milliers (12'000 CHF)"""
+    return f"{montant:,.0f} CHF".replace(",", "'")
+
+LIBELLES_TYPE_SOURCE = {
+    'ponctuelle': "Ponctuelle",
+    'lineique': "Linéique",
+    'surfacique': "Surfacique",
+}
+
+# Sections du rapport PDF : nœud du graphe, méthode de construction, données utilisées
+SECTIONS_PDF = (
+    ('pdf_entete', '_section_entete',
+     ('nom_projet', 'localisation', 'equipement', 'date_etude', 'zone_sensibilite')),
+    ('pdf_parametres', '_section_parametres',
+     ('lp1', 'distance_ref', 'puissance_sonore', 'puissance_frigorifique', 'distance_cible',
+      'type_source', 'longueur_source', 'largeur_source')),
+    ('pdf_corrections', '_section_corrections', ('k1_jour', 'k1_nuit', 'k2', 'k3', 'reflexion')),
+    ('pdf_calculs', '_section_calculs',
+     ('mode_calcul', 'distance_ref', 'distance_cible', 'facteur_q', 'type_source',
+      'attenuation', 'puissance_sonore', 'lp1', 'lpx')),
+    ('pdf_conformite', '_section_conformite',
+     ('lpx', 'k1_jour', 'k1_nuit', 'k2', 'k3', 'reflexion', 'lr_jour', 'lr_nuit',
+      'limite_jour', 'limite_nuit', 'conforme_jour', 'conforme_nuit')),
+    ('pdf_graphiques', '_section_graphiques',
+     ('lr_jour', 'lr_nuit', 'limite_jour', 'limite_nuit', 'carte_bruit', 'scenario_carte')),
+    ('pdf_historique', '_section_historique', ('campagne_mesures', 'colonne_mesures', 'lp1', 'distance_ref')),
+    ('pdf_conclusion', '_section_conclusion',
+     ('conforme_jour', 'conforme_nuit', 'equipement', 'nom_projet', 'zone_sensibilite',
+      'lr_jour', 'lr_nuit', 'limite_jour', 'limite_nuit', 'mesures')),
+    ('pdf_scenarios', '_section_scenarios', ('comparaison_scenarios',)),
+    ('pdf_references', '_section_references', ()),
+)
+
 class CalculateurAcoustiqueInteractif:
     def __init__(self):
         self.data = {}
         self.date_etude = datetime.now().strftime("%d/%m/%Y")
+        self.graphe = None
+        self._styles = None
         
     def saisir_donnees_projet(self):
         """Saisie interactive des données du projet"""
@@ -55,32 +125,12 @@ class CalculateurAcoustiqueInteractif:
         print("4. DS IV - Zone industrielle")
         
         while True:
-            try:
-                choix_ds = input("\nChoisissez le degré de sensibilité (1-4) : ").strip()
-                if choix_ds == "1":
-                    self.data['zone_sensibilite'] = "DS I (Zone de silence)"
-                    self.data['limite_jour'] = 45.0
-                    self.data['limite_nuit'] = 35.0
-                    break
-                elif choix_ds == "2":
-                    self.data['zone_sensibilite'] = "DS II (Zone d'habitation)"
-                    self.data['limite_jour'] = 55.0
-                    self.data['limite_nuit'] = 45.0
-                    break
-                elif choix_ds == "3":
-                    self.data['zone_sensibilite'] = "DS III (Zone mixte)"
-                    self.data['limite_jour'] = 60.0
-                    self.data['limite_nuit'] = 50.0
-                    break
-                elif choix_ds == "4":
-                    self.data['zone_sensibilite'] = "DS IV (Zone industrielle)"
-                    self.data['limite_jour'] = 65.0
-                    self.data['limite_nuit'] = 55.0
-                    break
-                else:
-                    print("❌ Choix invalide. Veuillez entrer 1, 2, 3 ou 4.")
-            except:
-                print("❌ Erreur de saisie. Veuillez recommencer.")
+            choix_ds = input("\nChoisissez le degré de sensibilité (1-4) : ").strip()
+            if choix_ds in ("1", "2", "3", "4"):
+                # Limites tirées de la table des jeux de limites (limites_reglementaires)
+                self.data['zone_sensibilite'], self.data['limite_jour'], self.data['limite_nuit'] = zone_sensibilite(int(choix_ds))
+                break
+            print("❌ Choix invalide. Veuillez entrer 1, 2, 3 ou 4.")
         
         print(f"✅ Zone sélectionnée : {self.data['zone_sensibilite']}")
         print(f"   Limites : Jour {self.data['limite_jour']:.0f} dB(A) / Nuit {self.data['limite_nuit']:.0f} dB(A)")
@@ -130,12 +180,56 @@ class CalculateurAcoustiqueInteractif:
             except:
                 print("❌ Veuillez entrer une valeur numérique valide.")
         
+        # Géométrie de la source
+        print("\n📐 Type de source")
+        print("1 = Ponctuelle (condenseur isolé)")
+        print("2 = Linéique (batterie de condenseurs, gaine)")
+        print("3 = Surfacique (grille de ventilation, façade)")
+        choix_type = input("Type de source [défaut: 1] : ").strip()
+        self.data['type_source'] = {'2': 'lineique', '3': 'surfacique'}.get(choix_type, 'ponctuelle')
+        self.data['longueur_source'] = None
+        self.data['largeur_source'] = None
+        
+        if self.data['type_source'] != 'ponctuelle':
+            while True:
+                try:
+                    self.data['longueur_source'] = float(input("Longueur de la source (mètres) : "))
+                    if self.data['type_source'] == 'surfacique':
+                        self.data['largeur_source'] = float(input("Hauteur de la source (mètres) : "))
+                    surfacique = self.data['type_source'] == 'surfacique'
+                    if self.data['longueur_source'] > 0 and (not surfacique or self.data['largeur_source'] > 0):
+                        break
+                    else:
+                        print("❌ Les dimensions doivent être positives.")
+                except:
+                    print("❌ Veuillez entrer une valeur numérique valide.")
+        
         # Paramètres optionnels
         try:
             puissance_sonore = input("Niveau de puissance sonore (dB(A)) [Optionnel, Entrée pour ignorer] : ").strip()
             self.data['puissance_sonore'] = float(puissance_sonore) if puissance_sonore else None
         except:
             self.data['puissance_sonore'] = None
+        
+        # Mode de calcul à partir de la puissance sonore
+        self.data['mode_calcul'] = 'pression'
+        self.data['facteur_q'] = None
+        if self.data['puissance_sonore'] is not None:
+            print("\n📡 Mode de calcul")
+            print("1 = À partir de Lp1 mesuré à la distance de référence")
+            print("2 = À partir de la puissance sonore Lw et de la directivité Q")
+            if input("Mode de calcul [défaut: 1] : ").strip() == "2":
+                self.data['mode_calcul'] = 'puissance'
+                for q, description in FACTEURS_Q.items():
+                    print(f"   Q = {q} : {description}")
+                try:
+                    facteur_q = input("Facteur de directivité Q [défaut: 2] : ").strip()
+                    self.data['facteur_q'] = float(facteur_q) if facteur_q else 2.0
+                except:
+                    self.data['facteur_q'] = 2.0
+                if not self.data['facteur_q'] > 0:
+                    print("❌ Le facteur Q doit être positif : Q = 2 retenu")
+                    self.data['facteur_q'] = 2.0
             
         try:
             puissance_frigo = input("Puissance frigorifique (kW) [Optionnel, Entrée pour ignorer] : ").strip()
@@ -210,8 +304,11 @@ class CalculateurAcoustiqueInteractif:
         print(f"\n🔧 Paramètres techniques :")
         print(f"   • Lp1 : {self.data['lp1']:.1f} dB(A) à {self.data['distance_ref']:.0f}m")
         print(f"   • Distance fenêtre : {self.data['distance_cible']:.0f}m")
+        print(f"   • Type de source : {self.description_source()}")
         if self.data['puissance_sonore']:
             print(f"   • Puissance sonore : {self.data['puissance_sonore']:.1f} dB(A)")
+        if self.data.get('mode_calcul') == 'puissance':
+            print(f"   • Calcul depuis Lw, directivité Q = {self.data['facteur_q']:.0f}")
         if self.data['puissance_frigorifique']:
             print(f"   • Puissance frigorifique : {self.data['puissance_frigorifique']:.1f} kW")
         
@@ -245,8 +342,14 @@ class CalculateurAcoustiqueInteractif:
         print("2. Paramètres techniques")
         print("3. Facteurs de correction")
         print("4. Zone de sensibilité")
+        print("5. Emplacement en toiture (recherche de la position optimale)")
+        print("6. Un paramètre précis (recalcul incrémental)")
+        print("7. Lp1 mesuré (import d'un export CSV de sonomètre)")
+        print("8. Machine en local technique (rayonnement par la façade)")
+        print("9. Carte de bruit à joindre au rapport")
+        print("10. Variantes à comparer (fichier de scénarios)")
         
-        choix = input("Votre choix (1-4) : ").strip()
+        choix = input("Votre choix (1-10) : ").strip()
         
         if choix == "1":
             self.saisir_donnees_projet()
@@ -261,58 +364,363 @@ class CalculateurAcoustiqueInteractif:
             print("2. DS II - Zone d'habitation")
             print("3. DS III - Zone mixte")
             print("4. DS IV - Zone industrielle")
+            print("5. Selon le plan de zones (GeoJSON) à la position du récepteur")
             
-            choix_ds = input("Nouveau choix (1-4) : ").strip()
-            if choix_ds == "1":
-                self.data['zone_sensibilite'] = "DS I (Zone de silence)"
-                self.data['limite_jour'] = 45.0
-                self.data['limite_nuit'] = 35.0
-            elif choix_ds == "2":
-                self.data['zone_sensibilite'] = "DS II (Zone d'habitation)"
-                self.data['limite_jour'] = 55.0
-                self.data['limite_nuit'] = 45.0
-            elif choix_ds == "3":
-                self.data['zone_sensibilite'] = "DS III (Zone mixte)"
-                self.data['limite_jour'] = 60.0
-                self.data['limite_nuit'] = 50.0
-            elif choix_ds == "4":
-                self.data['zone_sensibilite'] = "DS IV (Zone industrielle)"
-                self.data['limite_jour'] = 65.0
-                self.data['limite_nuit'] = 55.0
+            choix_ds = input("Nouveau choix (1-5) : ").strip()
+            if choix_ds in ("1", "2", "3", "4"):
+                self.data['zone_sensibilite'], self.data['limite_jour'], self.data['limite_nuit'] = zone_sensibilite(int(choix_ds))
+            elif choix_ds == "5":
+                self.zone_depuis_plan()
+        elif choix == "5":
+            self.rechercher_emplacement()
+        elif choix == "6":
+            self.modifier_champ()
+        elif choix == "7":
+            self.importer_mesures()
+        elif choix == "8":
+            self.saisir_local_technique()
+        elif choix == "9":
+            self.associer_carte_bruit()
+        elif choix == "10":
+            self.choisir_scenarios()
         else:
             print("❌ Choix invalide")
     
+    def modifier_champ(self):
+        """Modifie un seul paramètre et indique les parties du rapport à recalculer"""
+        champs = list(SCHEMA_CONFIGURATION)
+        print("\n✏️ PARAMETRES DE L'ETUDE")
+        for i, champ in enumerate(champs, 1):
+            print(f"{i:2d}. {champ} = {self.data.get(champ)}")
+        
+        try:
+            champ = champs[int(input(f"Paramètre à modifier (1-{len(champs)}) : ")) - 1]
+        except (ValueError, IndexError):
+            print("❌ Choix invalide")
+            return
+        
+        type_champ = SCHEMA_CONFIGURATION[champ][0]
+        saisie = input(f"Nouvelle valeur de {champ} : ").strip()
+        if not saisie and type_champ != 'reel?':
+            print("ℹ️ Valeur inchangée")
+            return
+        try:
+            if type_champ == 'texte':
+                valeur = saisie
+            elif not saisie and type_champ == 'reel?':
+                valeur = None
+            else:
+                valeur = float(saisie)
+            donnees = dict(self.data, **{champ: valeur})
+            valider_configuration(donnees)
+        except ValueError as e:
+            print(f"❌ Valeur refusée : {e}")
+            return
+        
+        self.data[champ] = valeur
+        if self.graphe is not None and champ in self.graphe:
+            sections = sorted(nom for nom in self.graphe.descendants(champ) if nom.startswith('pdf_'))
+            if sections:
+                print(f"🔁 Sections du rapport concernées : {', '.join(sections)}")
+    
+    def charger_plan_zones(self):
+        """Plan de zones DS (GeoJSON, propriété 'ds'), None si aucun fichier n'est indiqué"""
+        chemin = input("Plan des zones DS (GeoJSON) [aucun] : ").strip().strip('"')
+        if not chemin:
+            return None
+        print("⏳ Indexation du plan de zones...")
+        return IndexZonage.depuis_geojson(chemin)
+    
+    def zone_depuis_plan(self):
+        """Zone de sensibilité et limites lues dans un plan de zones à la position du récepteur"""
+        try:
+            plan = self.charger_plan_zones()
+            if plan is None:
+                return
+            x, y = (float(valeur) for valeur in input("Position du récepteur : x y (m) : ").replace(",", " ").split()[:2])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"❌ Plan de zones inutilisable : {e}")
+            return
+        
+        degre = int(plan.degres([(x, y)])[0])
+        if degre == HORS_ZONAGE:
+            print("❌ Récepteur hors du plan de zones : zone inchangée")
+            return
+        self.data['zone_sensibilite'], self.data['limite_jour'], self.data['limite_nuit'] = zone_sensibilite(degre)
+        print(f"✅ {self.data['zone_sensibilite']} : limites {self.data['limite_jour']:.0f} / {self.data['limite_nuit']:.0f} dB(A)")
+    
+    def rechercher_emplacement(self):
+        """Recherche la position en toiture qui minimise la pire marge aux limites"""
+        print("\n🏗️ EMPLACEMENT EN TOITURE")
+        print("-" * 50)
+        print("Coordonnées en mètres, origine à un angle de la toiture")
+        
+        try:
+            longueur = float(input("Longueur de la zone disponible en toiture (m) : "))
+            largeur = float(input("Largeur de la zone disponible en toiture (m) : "))
+            hauteur = float(input("Hauteur de l'équipement au-dessus du sol (m) : "))
+            pas = input("Pas de la grille de positions (m) [défaut: 1] : ").strip()
+            pas = float(pas) if pas else 1.0
+            nombre_fenetres = int(input("Nombre de fenêtres à considérer : "))
+            fenetres = []
+            for i in range(nombre_fenetres):
+                coordonnees = input(f"Fenêtre {i + 1} : x y z (m) : ").replace(",", " ").split()
+                fenetres.append([float(valeur) for valeur in coordonnees[:3]])
+            
+            # Fenêtres dans des zones différentes : limites propres à chaque fenêtre
+            plan = self.charger_plan_zones()
+            degres = plan.degres(fenetres) if plan is not None else None
+            if plan is not None:
+                limites_jour, limites_nuit = plan.limites(fenetres)
+                # Hors du plan : limites de l'étude
+                limites_jour = np.where(np.isnan(limites_jour), self.data['limite_jour'], limites_jour)
+                limites_nuit = np.where(np.isnan(limites_nuit), self.data['limite_nuit'], limites_nuit)
+                for i, degre in enumerate(degres):
+                    zone = zone_sensibilite(degre)[0] if degre != HORS_ZONAGE else f"hors plan, {self.data['zone_sensibilite']}"
+                    print(f"   Fenêtre {i + 1} : {zone}")
+            else:
+                limites_jour, limites_nuit = self.data['limite_jour'], self.data['limite_nuit']
+            
+            if self.data.get('mode_calcul') == 'puissance':
+                unite = UniteImplantation.depuis_puissance(
+                    self.data['equipement'], self.data['puissance_sonore'], self.data['facteur_q']
+                )
+            else:
+                unite = UniteImplantation.depuis_pression(
+                    self.data['equipement'], self.data['lp1'], self.data['distance_ref']
+                )
+            corrections = self.data['k2'] + self.data['k3'] + self.data['reflexion']
+            positions = grille_positions([(0, 0), (longueur, 0), (longueur, largeur), (0, largeur)], pas, hauteur)
+            implantations = optimiser_placement(
+                [unite], positions, fenetres,
+                limites_jour, limites_nuit,
+                self.data['k1_jour'] + corrections, self.data['k1_nuit'] + corrections,
+                nombre=3
+            )
+        except Exception as e:
+            print(f"❌ Recherche impossible : {e}")
+            return
+        
+        print(f"\n📍 MEILLEURS EMPLACEMENTS ({len(positions)} positions évaluées) :")
+        for implantation in implantations:
+            x, y, _ = implantation.positions[0]
+            statut = "✅" if implantation.conforme else "❌"
+            print(f"   {statut} x = {x:.1f} m, y = {y:.1f} m : écart à la limite {implantation.marge:+.1f} dB(A) "
+                  f"(jour {implantation.lr_jour.max():.1f} / nuit {implantation.lr_nuit.max():.1f} dB(A))")
+        
+        meilleure = implantations[0]
+        # La fenêtre la plus exposée fixe la distance cible du calcul
+        fenetre = int(np.argmax(np.maximum(meilleure.lr_jour - limites_jour,
+                                           meilleure.lr_nuit - limites_nuit)))
+        self.data['position_equipement'] = [round(float(v), 2) for v in meilleure.positions[0]]
+        self.data['distance_cible'] = round(float(meilleure.distances(fenetres)[0, fenetre]), 1)
+        print(f"✅ Distance à la fenêtre la plus exposée retenue : {self.data['distance_cible']:.1f} m")
+        if degres is not None and degres[fenetre] != HORS_ZONAGE:
+            self.data['zone_sensibilite'], self.data['limite_jour'], self.data['limite_nuit'] = zone_sensibilite(degres[fenetre])
+            print(f"✅ Zone de la fenêtre retenue : {self.data['zone_sensibilite']}")
+    
+    def importer_mesures(self):
+        """Lp1 tiré d'une campagne de mesures (export CSV LAeq 1 s ou 100 ms du sonomètre)"""
+        print("\n🎙️ IMPORT D'UNE CAMPAGNE DE MESURES")
+        print("-" * 50)
+        
+        try:
+            chemin = input("Fichier CSV exporté par le sonomètre : ").strip().strip('"')
+            colonne = input("Colonne des niveaux [défaut: LAeq] : ").strip() or "LAeq"
+            print("⏳ Lecture des mesures...")
+            campagne = lire_campagne(chemin, colonne)
+            # Pyramide des niveaux pour l'historique du rapport (réutilisée tant que l'export est inchangé)
+            pyramide_mesures(chemin, colonne)
+        except (OSError, ValueError) as e:
+            print(f"❌ Import impossible : {e}")
+            return
+        
+        print(f"\n📅 {len(campagne.jours)} journée(s), échantillons de {campagne.intervalle_ms} ms"
+              f" ({campagne.lignes_rejetees} ligne(s) ignorée(s))")
+        leq_jour, leq_nuit = campagne.leq('jour'), campagne.leq('nuit')
+        couverture_jour, couverture_nuit = campagne.couverture('jour'), campagne.couverture('nuit')
+        for i, jour in enumerate(campagne.jours):
+            texte_jour = f"{leq_jour[i]:5.1f} dB(A) ({couverture_jour[i]:4.0%})" if couverture_jour[i] else "      -"
+            texte_nuit = f"{leq_nuit[i]:5.1f} dB(A) ({couverture_nuit[i]:4.0%})" if couverture_nuit[i] else "      -"
+            print(f"   {jour} : jour {texte_jour:<22} nuit {texte_nuit}")
+        
+        leq = {'j': campagne.leq_global('jour'), 'n': campagne.leq_global('nuit')}
+        incertitude = {}
+        print(f"\n   Leq jour (07h-22h) : {leq['j']:.1f} dB(A)")
+        print(f"   Leq nuit (22h-07h) : {leq['n']:.1f} dB(A)")
+        
+        fond = input("Fichier du bruit de fond (source arrêtée) [aucun] : ").strip().strip('"')
+        if fond:
+            try:
+                print("⏳ Correction du bruit de fond...")
+                correction = corriger_bruit_fond(agreger_intervalles(blocs_mesures(chemin, colonne)),
+                                                 agreger_intervalles(blocs_mesures(fond, colonne)))
+            except (OSError, ValueError) as e:
+                print(f"❌ Correction impossible : {e}")
+                return
+            marges = correction.marge[correction.valides]
+            print(f"   Intervalles exploitables : {correction.taux_valide:.0%}"
+                  f" (marge médiane {np.median(marges) if len(marges) else float('nan'):.1f} dB,"
+                  f" minimum {correction.marge_minimale:.0f} dB)")
+            for cle, periode in (('j', 'jour'), ('n', 'nuit')):
+                leq[cle], incertitude[cle] = correction.leq_source(periode)
+            print(f"   Leq jour corrigé : {leq['j']:.1f} ± {incertitude['j']:.1f} dB(A)")
+            print(f"   Leq nuit corrigé : {leq['n']:.1f} ± {incertitude['n']:.1f} dB(A)")
+        
+        # Une période sans mesure (ou sans intervalle exploitable après correction) a un Leq NaN
+        disponibles = [cle for cle in ('j', 'n') if not math.isnan(leq[cle])]
+        if not disponibles:
+            print("❌ Bruit de fond trop proche du niveau mesuré ou mesuré trop loin dans le temps : "
+                  "aucune période exploitable" if fond
+                  else "❌ Aucune mesure exploitable ni de jour ni de nuit")
+            return
+        choix = input("Leq retenu comme Lp1, (j)our ou (n)uit [défaut: le plus élevé] : ").strip().lower()[:1]
+        if choix not in disponibles:
+            if choix in leq:
+                print(f"ℹ️ Aucune mesure exploitable {'de jour' if choix == 'j' else 'de nuit'}")
+            choix = max(disponibles, key=leq.get)
+        try:
+            distance = input(f"Distance de mesure (m) [défaut: {self.data.get('distance_ref', 1.0)}] : ").strip()
+            distance = float(distance) if distance else float(self.data.get('distance_ref', 1.0))
+        except ValueError:
+            print("❌ Distance invalide")
+            return
+        
+        self.data['lp1'] = round(leq[choix], 1)
+        self.data['distance_ref'] = distance
+        self.data['mode_calcul'] = 'pression'
+        self.data['campagne_mesures'] = chemin
+        self.data['colonne_mesures'] = colonne
+        if choix in incertitude:
+            self.data['bruit_fond_mesures'] = fond
+            self.data['incertitude_lp1'] = round(incertitude[choix], 1)
+        else:
+            self.data.pop('bruit_fond_mesures', None)
+            self.data.pop('incertitude_lp1', None)
+        print(f"✅ Lp1 = {self.data['lp1']:.1f} dB(A) à {distance:.1f} m (mesuré)")
+    
+    def saisir_local_technique(self):
+        """Lw extérieur d'une machine installée dans un local technique, rayonné par une ouverture"""
+        print("\n🏭 MACHINE EN LOCAL TECHNIQUE")
+        print("-" * 50)
+        materiaux = list(MATERIAUX_TYPE)
+        for i, nom in enumerate(materiaux, 1):
+            print(f"{i:2d}. {nom}")
+        
+        def choisir_materiau(question, defaut):
+            while True:
+                saisie = input(f"{question} (1-{len(materiaux)}) [défaut: {defaut}] : ").strip()
+                if not saisie:
+                    return defaut
+                if saisie.isdigit() and 1 <= int(saisie) <= len(materiaux):
+                    return materiaux[int(saisie) - 1]
+                print(f"❌ Choix invalide. Veuillez entrer un numéro entre 1 et {len(materiaux)}.")
+        
+        try:
+            defaut_lw = self.data.get('puissance_sonore')
+            saisie = input("Puissance sonore de la machine Lw (dB(A))"
+                           + (f" [défaut: {defaut_lw}]" if defaut_lw is not None else "") + " : ").strip()
+            lw_machine = float(saisie) if saisie else float(defaut_lw)
+            longueur, largeur, hauteur = (float(x) for x in input("Dimensions du local L x l x h (m), ex. 6 4 3 : ").replace('x', ' ').split())
+            materiau_murs = choisir_materiau("Matériau des murs et du plafond", 'beton_20cm')
+            materiau_ouverture = choisir_materiau("Ouverture vers l'extérieur", 'grille_pare_pluie')
+            surface = float(input("Surface de l'ouverture (m²) : "))
+            lw, lp_local = lw_exterieur(lw_machine, longueur, largeur, hauteur, materiau_ouverture, surface, materiau_murs)
+        except (TypeError, ValueError, IndexError, KeyError) as e:
+            print(f"❌ Saisie invalide : {e}")
+            return
+        
+        print(f"   Niveau réverbéré dans le local : {lp_local:.1f} dB(A)")
+        print(f"   Puissance rayonnée par l'ouverture : {lw:.1f} dB(A) (Lw machine {lw_machine:.1f} dB(A))")
+        self.data['puissance_sonore'] = round(lw, 1)
+        self.data['mode_calcul'] = 'puissance'
+        self.data['facteur_q'] = 2.0
+        self.data['local_technique'] = {
+            'lw_machine': lw_machine, 'dimensions': [longueur, largeur, hauteur],
+            'materiau_murs': materiau_murs, 'ouverture': materiau_ouverture, 'surface_ouverture': surface,
+        }
+        print(f"✅ Source extérieure : Lw = {self.data['puissance_sonore']:.1f} dB(A), Q = 2 (façade)")
+    
+    def associer_carte_bruit(self):
+        """Carte de bruit enregistrée (dossier StockageCarte) reproduite dans le rapport"""
+        chemin = input("Dossier de la carte de bruit [aucune] : ").strip().strip('"')
+        if not chemin:
+            self.data.pop('carte_bruit', None)
+            self.data.pop('scenario_carte', None)
+            print("ℹ️ Aucune carte de bruit dans le rapport")
+            return
+        try:
+            stockage = StockageCarte.ouvrir(chemin)
+        except (OSError, ValueError) as e:
+            print(f"❌ Carte de bruit illisible : {e}")
+            return
+        
+        scenarios = stockage.entete['scenarios']
+        scenario = scenarios[0]
+        if len(scenarios) > 1:
+            saisie = input(f"Scénario ({', '.join(scenarios)}) [défaut: {scenario}] : ").strip()
+            if saisie and saisie not in scenarios:
+                print(f"❌ Scénario inconnu : {saisie}")
+                return
+            scenario = saisie or scenario
+        self.data['carte_bruit'] = chemin
+        self.data['scenario_carte'] = scenario
+        print(f"✅ Carte {stockage.entete['nx']} x {stockage.entete['ny']} cellules "
+              f"({stockage.entete['resolution']:g} m), scénario {scenario}")
+    
+    def choisir_scenarios(self):
+        """Fichier de variantes (JSON) comparées à l'étude dans les résultats et le rapport"""
+        chemin = input("Fichier de scénarios [aucun] : ").strip().strip('"')
+        if not chemin:
+            self.data.pop('scenarios', None)
+            print("ℹ️ Aucune comparaison de variantes")
+            return
+        try:
+            variantes = lire_scenarios(chemin)
+        except (OSError, ValueError) as e:
+            print(f"❌ Fichier de scénarios illisible : {e}")
+            return
+        self.data['scenarios'] = chemin
+        print(f"✅ {len(variantes)} variante(s) à comparer")
+    
+    def description_source(self):
+        """Description courte du type de source et de ses dimensions"""
+        type_source = self.data.get('type_source', 'ponctuelle')
+        description = LIBELLES_TYPE_SOURCE[type_source]
+        if type_source == 'lineique':
+            description += f" ({self.data['longueur_source']:.1f} m)"
+        elif type_source == 'surfacique':
+            description += f" ({self.data['longueur_source']:.1f} x {self.data['largeur_source']:.1f} m)"
+        return description
+    
     def effectuer_calculs(self):
         """Effectue les calculs acoustiques avec les données saisies"""
         print("\n🧮 CALCULS EN COURS...")
         
-        # Calcul de l'atténuation
-        attenuation = 20 * math.log10(self.data['distance_ref'] / self.data['distance_cible'])
-        
-        # Calcul du niveau de pression sonore à la distance cible
-        lpx = self.data['lp1'] + attenuation
-        
-        # Calcul des niveaux d'évaluation
-        lr_jour = lpx + self.data['k1_jour'] + self.data['k2'] + self.data['k3'] + self.data['reflexion']
-        lr_nuit = lpx + self.data['k1_nuit'] + self.data['k2'] + self.data['k3'] + self.data['reflexion']
-        
-        # Évaluation de conformité
-        conforme_jour = lr_jour <= self.data['limite_jour']
-        conforme_nuit = lr_nuit <= self.data['limite_nuit']
-        
-        resultats = {
-            'attenuation': attenuation,
-            'lpx': lpx,
-            'lr_jour': lr_jour,
-            'lr_nuit': lr_nuit,
-            'limite_jour': self.data['limite_jour'],
-            'limite_nuit': self.data['limite_nuit'],
-            'conforme_jour': conforme_jour,
-            'conforme_nuit': conforme_nuit,
-            'parametres': self.data.copy()
-        }
+        # Seuls les nœuds dont une donnée a changé depuis le dernier calcul sont réévalués
+        self.synchroniser_graphe()
+        return resultats_graphe(self.graphe, self.data)
+    
+    def synchroniser_graphe(self):
+        """Crée le graphe de calcul si nécessaire et y reporte les données saisies"""
+        if self.graphe is None:
+            self.graphe = GrapheDependances()
+            ajouter_noeuds_calcul(self.graphe)
+            self.graphe.ajouter_noeud('mesures', self._mesures, (
+                'conforme_jour', 'conforme_nuit', 'lpx', 'k1_jour', 'k1_nuit', 'corrections',
+                'limite_jour', 'limite_nuit', 'catalogue_mesures'
+            ))
+            self.graphe.ajouter_noeud('comparaison_scenarios', self._comparaison_scenarios,
+                                      tuple(SCHEMA_CONFIGURATION) + ('scenarios',))
+            for nom, methode, dependances in SECTIONS_PDF:
+                construire = getattr(self, methode)
+                self.graphe.ajouter_noeud(
+                    nom, lambda v, construire=construire: construire(v, self._styles_pdf()), dependances
+                )
         
-        return resultats
+        for cle, valeur in self.data.items():
+            self.graphe.definir_entree(cle, valeur)
+        self.graphe.definir_entree('date_etude', self.date_etude)
     
     def afficher_resultats(self, resultats):
         """Affiche les résultats des calculs"""
@@ -340,272 +748,571 @@ class CalculateurAcoustiqueInteractif:
             print("🎉 CONCLUSION : Installation conforme aux normes OPB")
         else:
             print("⚠️  CONCLUSION : Mesures d'atténuation nécessaires")
+            solution = self.proposer_mesures(resultats)
+            if solution.trouvee and solution.optimale:
+                print(f"\n🛠️ MESURES PROPOSEES (coût minimal : {formater_chf(solution.cout)}) :")
+            elif solution.trouvee:
+                # Recherche interrompue (NOEUDS_MAX, DUREE_MAX) : meilleure solution trouvée, optimum non prouvé
+                print(f"\n🛠️ MESURES PROPOSEES (meilleure solution trouvée : {formater_chf(solution.cout)}, "
+                      f"au plus {solution.ecart:.1%} au-dessus du coût minimal) :")
+            if solution.trouvee:
+                for mesure in solution.mesures:
+                    print(f"   • {mesure.nom} : -{float(mesure.perte_insertion.max()):.0f} dB(A), {formater_chf(mesure.cout)}")
+                print(f"   → Lr jour {solution.lr_jour[0]:.1f} dB(A) / Lr nuit {solution.lr_nuit[0]:.1f} dB(A)")
+            else:
+                print("\n🛠️ Aucune combinaison du catalogue ne permet de respecter les limites")
         print("="*70)
+        if self.data.get('scenarios'):
+            self.afficher_scenarios()
     
-    def generer_pdf_interactif(self, resultats):
-        """Génère le rapport PDF avec les données personnalisées"""
-        nom_fichier = f"rapport_acoustique_{self.data['nom_projet'].replace(' ', '_').lower()}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+    def afficher_scenarios(self):
+        """Tableau comparatif des variantes : Lr, écart à l'étude de base, limites et conformité"""
+        self.synchroniser_graphe()
+        comparaison = self.graphe.valeur('comparaison_scenarios')
+        if isinstance(comparaison, str):
+            print(f"\n❌ Comparaison des variantes impossible : {comparaison}")
+            return
         
+        print(f"\n🔀 COMPARAISON DE {len(comparaison) - 1} VARIANTE(S) :")
+        entete, *lignes = comparaison.tableau()
+        print(f"   {entete[0]:<24} {entete[2]:>7} {entete[3]:>6} {entete[4]:>7} {entete[5]:>6}  {entete[6]:<11} {entete[7]}")
+        for ligne in lignes:
+            print(f"   {ligne[0][:24]:<24} {ligne[2]:>7} {ligne[3]:>6} {ligne[4]:>7} {ligne[5]:>6}  {ligne[6]:<11} "
+                  f"{'✅' if ligne[7] == 'CONFORME' else '❌'}")
+        meilleure = comparaison.meilleure()
+        if meilleure is None:
+            print("   ⚠️ Aucune variante ne respecte les limites")
+        else:
+            print(f"   → Plus grande marge : {comparaison.noms[meilleure]} "
+                  f"({min(comparaison.marge_jour[meilleure], comparaison.marge_nuit[meilleure]):.1f} dB(A))")
+        print("="*70)
+    
+    def _comparaison_scenarios(self, v):
+        """Nœud 'comparaison_scenarios' : base et variantes calculées en un seul appel vectorisé
+        
+        Retourne le message d'erreur si le fichier de scénarios est illisible,
+        afin que le rapport reste complet sans la comparaison.
+        """
+        if not v['scenarios']:
+            return None
+        base = {champ: v[champ] for champ in SCHEMA_CONFIGURATION if v[champ] is not None}
         try:
-            doc = SimpleDocTemplate(
-                nom_fichier, pagesize=A4,
-                rightMargin=2*cm, leftMargin=2*cm,
-                topMargin=2.5*cm, bottomMargin=2*cm
-            )
-            
-            styles = getSampleStyleSheet()
-            
-            # Styles
-            style_titre = ParagraphStyle(
-                'TitrePrincipal', fontSize=16, spaceAfter=20, spaceBefore=10,
-                alignment=TA_CENTER, textColor=colors.HexColor('#1f4e79'), fontName='Helvetica-Bold'
-            )
-            
-            style_sous_titre = ParagraphStyle(
-                'SousTitre', fontSize=13, spaceAfter=15, spaceBefore=8,
-                alignment=TA_CENTER, textColor=colors.HexColor('#2f5f8f'), fontName='Helvetica-Bold'
-            )
-            
-            style_section = ParagraphStyle(
-                'Section', fontSize=12, spaceAfter=10, spaceBefore=15,
-                textColor=colors.HexColor('#1f4e79'), fontName='Helvetica-Bold',
-                borderWidth=1, borderColor=colors.HexColor('#1f4e79'),
-                borderPadding=4, backColor=colors.HexColor('#f0f4f8')
-            )
-            
-            style_normal = ParagraphStyle(
-                'Normal', fontSize=10, spaceAfter=6, spaceBefore=3,
-                alignment=TA_JUSTIFY, fontName='Helvetica'
-            )
-            
-            style_formule = ParagraphStyle(
-                'Formule', fontSize=10, spaceAfter=8, spaceBefore=8,
-                alignment=TA_CENTER, fontName='Helvetica-Bold',
-                backColor=colors.HexColor('#f8f9fa'), borderWidth=1,
-                borderColor=colors.HexColor('#dee2e6'), borderPadding=6
-            )
-            
-            story = []
-            
-            # Page 1
-            story.append(Paragraph("ETUDE ACOUSTIQUE ENVIRONNEMENTALE", style_titre))
-            story.append(Paragraph(self.data['nom_projet'], style_sous_titre))
-            story.append(Paragraph(self.data['localisation'], style_sous_titre))
-            story.append(Spacer(1, 20))
-            
-            # Informations du projet
-            info_data = [
-                ['Projet :', self.data['nom_projet']],
-                ['Localisation :', self.data['localisation']],
-                ['Equipement etudie :', self.data['equipement']],
-                ['Date de l\'etude :', self.date_etude],
-                ['Reglementation :', 'Ordonnance sur la Protection contre le Bruit (OPB)'],
-                ['Degre de sensibilite :', self.data['zone_sensibilite']]
-            ]
-            
-            info_table = Table(info_data, colWidths=[5*cm, 10*cm])
-            info_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e8f0fe')),
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#1f4e79')),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
-            
-            story.append(info_table)
-            story.append(Spacer(1, 20))
-            
-            # Paramètres techniques
-            story.append(Paragraph("1. PARAMETRES TECHNIQUES DE L'EQUIPEMENT", style_section))
-            story.append(Spacer(1, 8))
-            
-            tech_data = [
-                ['Parametre', 'Valeur', 'Unite'],
-                ['Niveau de pression sonore (Lp1)', f"{self.data['lp1']:.1f}", f"dB(A) a {self.data['distance_ref']:.0f}m"],
-            ]
-            
-            if self.data['puissance_sonore']:
-                tech_data.append(['Niveau de puissance sonore', f"{self.data['puissance_sonore']:.1f}", 'dB(A)'])
-            if self.data['puissance_frigorifique']:
-                tech_data.append(['Puissance frigorifique', f"{self.data['puissance_frigorifique']:.1f}", 'kW'])
-                
-            tech_data.extend([
-                ['Distance de reference', f"{self.data['distance_ref']:.0f}", 'm'],
-                ['Distance a la fenetre', f"{self.data['distance_cible']:.0f}", 'm'],
-            ])
-            
-            tech_table = Table(tech_data, colWidths=[7*cm, 4*cm, 4*cm])
-            tech_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 5),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            
-            story.append(tech_table)
-            story.append(Spacer(1, 20))
-            
-            # Facteurs de correction
-            story.append(Paragraph("2. FACTEURS DE CORRECTION SELON L'OPB", style_section))
-            story.append(Spacer(1, 8))
-            
-            correction_data = [
-                ['Facteur', 'Periode', 'Valeur', 'Description'],
-                ['K1', 'Jour (07h-22h)', f"{self.data['k1_jour']:.0f} dB(A)", 'Correction temporelle'],
-                ['K1', 'Nuit (22h-07h)', f"{self.data['k1_nuit']:.0f} dB(A)", 'Correction temporelle'],
-                ['K2', 'Jour/Nuit', f"{self.data['k2']:.0f} dB(A)", 'Composante tonale'],
-                ['K3', 'Jour/Nuit', f"{self.data['k3']:.0f} dB(A)", 'Composante impulsive'],
-                ['Reflexion', 'Jour/Nuit', f"{self.data['reflexion']:.0f} dB(A)", 'Correction de reflexion'],
-            ]
-            
-            correction_table = Table(correction_data, colWidths=[2.5*cm, 4*cm, 3*cm, 5.5*cm])
-            correction_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 5),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            
-            story.append(correction_table)
-            story.append(PageBreak())
-            
-            # Page 2
-            story.append(Paragraph("3. CALCULS ACOUSTIQUES", style_section))
-            story.append(Spacer(1, 10))
-            
-            story.append(Paragraph("3.1 Attenuation due a la distance", 
-                                 ParagraphStyle('Heading3', parent=styles['Heading2'], fontSize=11, spaceAfter=6)))
+            return comparer_scenarios(base, lire_scenarios(v['scenarios']))
+        except (OSError, ValueError) as e:
+            return str(e)
+    
+    def proposer_mesures(self, resultats):
+        """Recherche la combinaison de mesures d'atténuation la moins coûteuse"""
+        self.synchroniser_graphe()
+        return self.graphe.valeur('mesures')
+    
+    def _mesures(self, v):
+        """Nœud 'mesures' : optimisation relancée seulement si Lpx, K ou limites changent"""
+        if v['conforme_jour'] and v['conforme_nuit']:
+            return None
+        catalogue = catalogue_depuis_dicts(v['catalogue_mesures'] or CATALOGUE_MESURES_TYPE)
+        return optimiser_mesures(
+            [[v['lpx']]],
+            v['k1_jour'] + v['corrections'], v['k1_nuit'] + v['corrections'],
+            v['limite_jour'], v['limite_nuit'],
+            catalogue
+        )
+    
+    def _styles_pdf(self):
+        """Styles du rapport, créés une seule fois et partagés par toutes les sections"""
+        if self._styles is not None:
+            return self._styles
+        
+        styles = getSampleStyleSheet()
+        
+        style_titre = ParagraphStyle(
+            'TitrePrincipal', fontSize=16, spaceAfter=20, spaceBefore=10,
+            alignment=TA_CENTER, textColor=colors.HexColor('#1f4e79'), fontName='Helvetica-Bold'
+        )
+        
+        style_sous_titre = ParagraphStyle(
+            'SousTitre', fontSize=13, spaceAfter=15, spaceBefore=8,
+            alignment=TA_CENTER, textColor=colors.HexColor('#2f5f8f'), fontName='Helvetica-Bold'
+        )
+        
+        style_section = ParagraphStyle(
+            'Section', fontSize=12, spaceAfter=10, spaceBefore=15,
+            textColor=colors.HexColor('#1f4e79'), fontName='Helvetica-Bold',
+            borderWidth=1, borderColor=colors.HexColor('#1f4e79'),
+            borderPadding=4, backColor=colors.HexColor('#f0f4f8')
+        )
+        
+        style_normal = ParagraphStyle(
+            'Normal', fontSize=10, spaceAfter=6, spaceBefore=3,
+            alignment=TA_JUSTIFY, fontName='Helvetica'
+        )
+        
+        style_formule = ParagraphStyle(
+            'Formule', fontSize=10, spaceAfter=8, spaceBefore=8,
+            alignment=TA_CENTER, fontName='Helvetica-Bold',
+            backColor=colors.HexColor('#f8f9fa'), borderWidth=1,
+            borderColor=colors.HexColor('#dee2e6'), borderPadding=6
+        )
+        
+        style_heading3 = ParagraphStyle('Heading3', parent=styles['Heading2'], fontSize=11, spaceAfter=6)
+        
+        self._styles = {
+            'titre': style_titre, 'sous_titre': style_sous_titre, 'section': style_section,
+            'normal': style_normal, 'formule': style_formule, 'heading3': style_heading3,
+        }
+        return self._styles
+    
+    def _section_entete(self, v, styles):
+        """Page de garde : titre et informations du projet"""
+        section = []
+        
+        section.append(Paragraph("ETUDE ACOUSTIQUE ENVIRONNEMENTALE", styles['titre']))
+        section.append(Paragraph(v['nom_projet'], styles['sous_titre']))
+        section.append(Paragraph(v['localisation'], styles['sous_titre']))
+        section.append(Spacer(1, 20))
+        
+        # Informations du projet
+        info_data = [
+            ['Projet :', v['nom_projet']],
+            ['Localisation :', v['localisation']],
+            ['Equipement etudie :', v['equipement']],
+            ['Date de l\'etude :', v['date_etude']],
+            ['Reglementation :', 'Ordonnance sur la Protection contre le Bruit (OPB)'],
+            ['Degre de sensibilite :', v['zone_sensibilite']]
+        ]
+        
+        info_table = Table(info_data, colWidths=[5*cm, 10*cm])
+        info_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e8f0fe')),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#1f4e79')),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]))
+        
+        section.append(info_table)
+        section.append(Spacer(1, 20))
+        
+        return section
+    
+    def _section_parametres(self, v, styles):
+        """1. Paramètres techniques de l'équipement"""
+        section = []
+        
+        section.append(Paragraph("1. PARAMETRES TECHNIQUES DE L'EQUIPEMENT", styles['section']))
+        section.append(Spacer(1, 8))
+        
+        tech_data = [
+            ['Parametre', 'Valeur', 'Unite'],
+            ['Niveau de pression sonore (Lp1)', f"{v['lp1']:.1f}", f"dB(A) a {v['distance_ref']:.0f}m"],
+        ]
+        
+        if v['puissance_sonore']:
+            tech_data.append(['Niveau de puissance sonore', f"{v['puissance_sonore']:.1f}", 'dB(A)'])
+        if v['puissance_frigorifique']:
+            tech_data.append(['Puissance frigorifique', f"{v['puissance_frigorifique']:.1f}", 'kW'])
             
+        tech_data.extend([
+            ['Distance de reference', f"{v['distance_ref']:.0f}", 'm'],
+            ['Distance a la fenetre', f"{v['distance_cible']:.0f}", 'm'],
+        ])
+        
+        if (v['type_source'] or 'ponctuelle') != 'ponctuelle':
+            tech_data.append(['Longueur de la source', f"{v['longueur_source']:.1f}", 'm'])
+            if v['type_source'] == 'surfacique':
+                tech_data.append(['Hauteur de la source', f"{v['largeur_source']:.1f}", 'm'])
+        
+        tech_table = Table(tech_data, colWidths=[7*cm, 4*cm, 4*cm])
+        tech_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        
+        section.append(tech_table)
+        section.append(Spacer(1, 20))
+        
+        return section
+    
+    def _section_corrections(self, v, styles):
+        """2. Facteurs de correction (fin de la première page)"""
+        section = []
+        
+        section.append(Paragraph("2. FACTEURS DE CORRECTION SELON L'OPB", styles['section']))
+        section.append(Spacer(1, 8))
+        
+        correction_data = [
+            ['Facteur', 'Periode', 'Valeur', 'Description'],
+            ['K1', 'Jour (07h-22h)', f"{v['k1_jour']:.0f} dB(A)", 'Correction temporelle'],
+            ['K1', 'Nuit (22h-07h)', f"{v['k1_nuit']:.0f} dB(A)", 'Correction temporelle'],
+            ['K2', 'Jour/Nuit', f"{v['k2']:.0f} dB(A)", 'Composante tonale'],
+            ['K3', 'Jour/Nuit', f"{v['k3']:.0f} dB(A)", 'Composante impulsive'],
+            ['Reflexion', 'Jour/Nuit', f"{v['reflexion']:.0f} dB(A)", 'Correction de reflexion'],
+        ]
+        
+        correction_table = Table(correction_data, colWidths=[2.5*cm, 4*cm, 3*cm, 5.5*cm])
+        correction_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        
+        section.append(correction_table)
+        section.append(PageBreak())
+        
+        return section
+    
+    def _section_calculs(self, v, styles):
+        """3. Calculs acoustiques"""
+        section = []
+        
+        section.append(Paragraph("3. CALCULS ACOUSTIQUES", styles['section']))
+        section.append(Spacer(1, 10))
+        
+        section.append(Paragraph("3.1 Attenuation due a la distance", 
+                             styles['heading3']))
+        
+        if v['mode_calcul'] == 'puissance':
+            formule_text = f"Lpx - Lw = -20 x log10(d2) - 11 + 10 x log10(Q)"
+            calcul_text = f"Calcul : -20 x log10({v['distance_cible']:.0f}) - 11 + 10 x log10({v['facteur_q']:.0f}) = {v['attenuation']:.2f} dB(A)"
+        elif (v['type_source'] or 'ponctuelle') == 'ponctuelle':
             formule_text = f"Attenuation = 20 x log10(d1/d2)"
-            story.append(Paragraph(f"Formule : {formule_text}", style_formule))
-            
-            calcul_text = f"Calcul : 20 x log10({self.data['distance_ref']:.0f}/{self.data['distance_cible']:.0f}) = {resultats['attenuation']:.2f} dB(A)"
-            story.append(Paragraph(calcul_text, style_normal))
-            story.append(Spacer(1, 12))
-            
-            story.append(Paragraph("3.2 Niveau de pression sonore a la distance cible", 
-                                 ParagraphStyle('Heading3', parent=styles['Heading2'], fontSize=11, spaceAfter=6)))
-            
-            lpx_text = f"Lpx = Lp1 + Attenuation = {self.data['lp1']:.1f} + ({resultats['attenuation']:.2f}) = {resultats['lpx']:.2f} dB(A)"
-            story.append(Paragraph(lpx_text, style_formule))
-            story.append(Spacer(1, 20))
-            
-            # Résultats
-            story.append(Paragraph("4. NIVEAUX D'EVALUATION ET CONFORMITE", style_section))
-            story.append(Spacer(1, 10))
-            
-            statut_jour = "CONFORME" if resultats['conforme_jour'] else "NON CONFORME"
-            statut_nuit = "CONFORME" if resultats['conforme_nuit'] else "NON CONFORME"
-            
-            resultats_data = [
-                ['Periode', 'Formule de Calcul', 'Niveau Lr', 'Limite OPB', 'Conformite'],
-                [
-                    'Jour\n(07h-22h)', 
-                    f"Lpx + K1 + K2 + K3 + Refl.\n{resultats['lpx']:.1f} + {self.data['k1_jour']:.0f} + {self.data['k2']:.0f} + {self.data['k3']:.0f} + {self.data['reflexion']:.0f}",
-                    f"{resultats['lr_jour']:.1f} dB(A)",
-                    f"{resultats['limite_jour']:.0f} dB(A)",
-                    statut_jour
-                ],
-                [
-                    'Nuit\n(22h-07h)', 
-                    f"Lpx + K1 + K2 + K3 + Refl.\n{resultats['lpx']:.1f} + {self.data['k1_nuit']:.0f} + {self.data['k2']:.0f} + {self.data['k3']:.0f} + {self.data['reflexion']:.0f}",
-                    f"{resultats['lr_nuit']:.1f} dB(A)",
-                    f"{resultats['limite_nuit']:.0f} dB(A)",
-                    statut_nuit
-                ]
+            calcul_text = f"Calcul : 20 x log10({v['distance_ref']:.0f}/{v['distance_cible']:.0f}) = {v['attenuation']:.2f} dB(A)"
+        else:
+            formule_text = f"Attenuation = L(d2) - L(d1), source {v['type_source']} subdivisee en sources ponctuelles"
+            calcul_text = f"Calcul : integration numerique entre {v['distance_ref']:.0f} m et {v['distance_cible']:.0f} m = {v['attenuation']:.2f} dB(A)"
+        section.append(Paragraph(f"Formule : {formule_text}", styles['formule']))
+        
+        section.append(Paragraph(calcul_text, styles['normal']))
+        section.append(Spacer(1, 12))
+        
+        section.append(Paragraph("3.2 Niveau de pression sonore a la distance cible", 
+                             styles['heading3']))
+        
+        if v['mode_calcul'] == 'puissance':
+            lpx_text = f"Lpx = Lw + Attenuation = {v['puissance_sonore']:.1f} + ({v['attenuation']:.2f}) = {v['lpx']:.2f} dB(A)"
+        else:
+            lpx_text = f"Lpx = Lp1 + Attenuation = {v['lp1']:.1f} + ({v['attenuation']:.2f}) = {v['lpx']:.2f} dB(A)"
+        section.append(Paragraph(lpx_text, styles['formule']))
+        section.append(Spacer(1, 20))
+        
+        return section
+    
+    def _section_conformite(self, v, styles):
+        """4. Niveaux d'évaluation et conformité"""
+        section = []
+        
+        section.append(Paragraph("4. NIVEAUX D'EVALUATION ET CONFORMITE", styles['section']))
+        section.append(Spacer(1, 10))
+        
+        statut_jour = "CONFORME" if v['conforme_jour'] else "NON CONFORME"
+        statut_nuit = "CONFORME" if v['conforme_nuit'] else "NON CONFORME"
+        
+        resultats_data = [
+            ['Periode', 'Formule de Calcul', 'Niveau Lr', 'Limite OPB', 'Conformite'],
+            [
+                'Jour\n(07h-22h)', 
+                f"Lpx + K1 + K2 + K3 + Refl.\n{v['lpx']:.1f} + {v['k1_jour']:.0f} + {v['k2']:.0f} + {v['k3']:.0f} + {v['reflexion']:.0f}",
+                f"{v['lr_jour']:.1f} dB(A)",
+                f"{v['limite_jour']:.0f} dB(A)",
+                statut_jour
+            ],
+            [
+                'Nuit\n(22h-07h)', 
+                f"Lpx + K1 + K2 + K3 + Refl.\n{v['lpx']:.1f} + {v['k1_nuit']:.0f} + {v['k2']:.0f} + {v['k3']:.0f} + {v['reflexion']:.0f}",
+                f"{v['lr_nuit']:.1f} dB(A)",
+                f"{v['limite_nuit']:.0f} dB(A)",
+                statut_nuit
             ]
+        ]
+        
+        resultats_table = Table(resultats_data, colWidths=[2.5*cm, 5*cm, 2.5*cm, 2.5*cm, 2.5*cm])
+        resultats_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+            ('BACKGROUND', (4, 1), (4, 1), colors.HexColor('#d4edda') if v['conforme_jour'] else colors.HexColor('#f8d7da')),
+            ('BACKGROUND', (4, 2), (4, 2), colors.HexColor('#d4edda') if v['conforme_nuit'] else colors.HexColor('#f8d7da')),
+            ('LEFTPADDING', (0, 0), (-1, -1), 5),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ]))
+        
+        section.append(resultats_table)
+        section.append(Spacer(1, 20))
+        
+        return section
+    
+    def _section_graphiques(self, v, styles):
+        """4 (suite). Diagramme Lr / valeurs limites et carte de bruit éventuelle"""
+        section = []
+        
+        section.append(Paragraph("Niveaux d'evaluation et valeurs limites", styles['heading3']))
+        section.append(diagramme_conformite(v['lr_jour'], v['lr_nuit'], v['limite_jour'], v['limite_nuit'], 9*cm, 4*cm))
+        section.append(Spacer(1, 10))
+        if not v['carte_bruit']:
+            return section
+        
+        try:
+            stockage = StockageCarte.ouvrir(v['carte_bruit'])
+            scenario = v['scenario_carte'] or stockage.entete['scenarios'][0]
+            images = []
+            for periode in ('jour', 'nuit'):
+                chemin, (largeur, hauteur) = image_carte(stockage.grille(scenario, periode))
+                images.append(Image(chemin, width=8*cm, height=8*cm * hauteur / largeur))
+        except (OSError, ValueError, KeyError):
+            # Carte déplacée ou sans la période : le rapport reste complet sans la carte
+            return section
+        
+        section.append(Paragraph(f"Carte de bruit - scenario {scenario}", styles['heading3']))
+        cartes = Table([images, ['Lr jour', 'Lr nuit']], colWidths=[8.5*cm, 8.5*cm])
+        cartes.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 1), (-1, 1), 9),
+        ]))
+        section.append(cartes)
+        section.append(legende_carte(17*cm))
+        section.append(Paragraph(
+            f"Niveaux d'evaluation Lr en dB(A), grille de {stockage.entete['resolution']:g} m, "
+            "isophones tous les 5 dB.", styles['normal']))
+        section.append(Spacer(1, 20))
+        
+        return section
+    
+    def _section_historique(self, v, styles):
+        """4 (suite). Historique des niveaux de la campagne de mesures, si Lp1 est mesuré"""
+        if not v['campagne_mesures']:
+            return []
+        try:
+            pyramide = pyramide_mesures(v['campagne_mesures'], v['colonne_mesures'] or 'laeq')
+            graphique = graphique_historique(pyramide, 17*cm, 6*cm, v['lp1'])
+        except (OSError, ValueError, KeyError):
+            # Export de mesures déplacé ou illisible : le rapport reste complet sans le graphique
+            return []
+        
+        section = []
+        section.append(Paragraph("Historique des niveaux mesures", styles['heading3']))
+        section.append(graphique)
+        debut = datetime(1970, 1, 1) + timedelta(milliseconds=pyramide.debut_ms)
+        fin = datetime(1970, 1, 1) + timedelta(milliseconds=pyramide.fin_ms)
+        section.append(Paragraph(
+            f"Campagne du {debut.strftime('%d.%m.%Y %H:%M')} au {fin.strftime('%d.%m.%Y %H:%M')}, "
+            f"mesure a {v['distance_ref']:.1f} m : Leq (trait bleu) et plage min-max par intervalle, "
+            f"nuits ({HEURE_DEBUT_NUIT}h-{HEURE_FIN_NUIT:02d}h) grisees.", styles['normal']))
+        section.append(Spacer(1, 20))
+        
+        return section
+    
+    def _section_conclusion(self, v, styles):
+        """5. Conclusion et mesures d'atténuation proposées"""
+        section = []
+        
+        section.append(Paragraph("5. CONCLUSION", styles['section']))
+        section.append(Spacer(1, 10))
+        
+        if v['conforme_jour'] and v['conforme_nuit']:
+            conclusion_text = f"""
+            INSTALLATION CONFORME aux normes OPB
             
-            resultats_table = Table(resultats_data, colWidths=[2.5*cm, 5*cm, 2.5*cm, 2.5*cm, 2.5*cm])
-            resultats_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
-                ('BACKGROUND', (4, 1), (4, 1), colors.HexColor('#d4edda') if resultats['conforme_jour'] else colors.HexColor('#f8d7da')),
-                ('BACKGROUND', (4, 2), (4, 2), colors.HexColor('#d4edda') if resultats['conforme_nuit'] else colors.HexColor('#f8d7da')),
-                ('LEFTPADDING', (0, 0), (-1, -1), 5),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ]))
+            L'etude acoustique de l'equipement {v['equipement']} du projet {v['nom_projet']} demontre que les niveaux d'evaluation 
+            respectent les valeurs limites d'immission fixees par l'Ordonnance sur la Protection contre le Bruit (OPB) 
+            pour une {v['zone_sensibilite']}.
             
-            story.append(resultats_table)
-            story.append(Spacer(1, 20))
+            Niveaux calcules :
+            • Periode diurne : {v['lr_jour']:.1f} dB(A) < {v['limite_jour']:.0f} dB(A)
+            • Periode nocturne : {v['lr_nuit']:.1f} dB(A) < {v['limite_nuit']:.0f} dB(A)
             
-            # Conclusion
-            story.append(Paragraph("5. CONCLUSION", style_section))
-            story.append(Spacer(1, 10))
+            Recommandations :
+            • Aucune mesure d'attenuation supplementaire n'est requise
+            • Validation recommandee par mesures in-situ apres installation
+            • Controle periodique du bon fonctionnement de l'equipement
+            """
+        else:
+            conclusion_text = f"""
+            MESURES D'ATTENUATION NECESSAIRES
             
-            if resultats['conforme_jour'] and resultats['conforme_nuit']:
-                conclusion_text = f"""
-                INSTALLATION CONFORME aux normes OPB
-                
-                L'etude acoustique de l'equipement {self.data['equipement']} du projet {self.data['nom_projet']} demontre que les niveaux d'evaluation 
-                respectent les valeurs limites d'immission fixees par l'Ordonnance sur la Protection contre le Bruit (OPB) 
-                pour une {self.data['zone_sensibilite']}.
-                
-                Niveaux calcules :
-                • Periode diurne : {resultats['lr_jour']:.1f} dB(A) < {resultats['limite_jour']:.0f} dB(A)
-                • Periode nocturne : {resultats['lr_nuit']:.1f} dB(A) < {resultats['limite_nuit']:.0f} dB(A)
+            L'etude acoustique revele un depassement des valeurs limites d'immission pour la {v['zone_sensibilite']}. 
+            Des mesures d'attenuation doivent etre mises en place avant la mise en service de l'installation.
+            """
+        
+        section.append(Paragraph(conclusion_text, styles['normal']))
+        
+        if not (v['conforme_jour'] and v['conforme_nuit']):
+            solution = v['mesures']
+            if solution is not None and solution.trouvee:
+                section.append(Spacer(1, 8))
+                if solution.optimale:
+                    intitule = "Combinaison de mesures de cout minimal (catalogue indicatif) :"
+                else:
+                    intitule = (f"Meilleure combinaison de mesures trouvee (catalogue indicatif), au plus "
+                                f"{solution.ecart:.1%} au-dessus du cout minimal :")
+                section.append(Paragraph(intitule, styles['normal']))
                 
-                Recommandations :
-                • Aucune mesure d'attenuation supplementaire n'est requise
-                • Validation recommandee par mesures in-situ apres installation
-                • Controle periodique du bon fonctionnement de l'equipement
-                """
-            else:
-                conclusion_text = f"""
-                MESURES D'ATTENUATION NECESSAIRES
+                mesures_data = [['Mesure', 'Perte d\'insertion', 'Cout']]
+                for mesure in solution.mesures:
+                    mesures_data.append([
+                        mesure.nom,
+                        f"{float(mesure.perte_insertion.max()):.0f} dB(A)",
+                        formater_chf(mesure.cout)
+                    ])
+                mesures_data.append([
+                    f"Lr apres mesures : jour {solution.lr_jour[0]:.1f} / nuit {solution.lr_nuit[0]:.1f} dB(A)",
+                    'Total',
+                    formater_chf(solution.cout)
+                ])
                 
-                L'etude acoustique revele un depassement des valeurs limites d'immission pour la {self.data['zone_sensibilite']}. 
-                Des mesures d'attenuation doivent etre mises en place avant la mise en service de l'installation.
-                """
-            
-            story.append(Paragraph(conclusion_text, style_normal))
-            story.append(Spacer(1, 15))
-            
-            # Références
-            story.append(Paragraph("6. REFERENCES REGLEMENTAIRES", style_section))
-            story.append(Spacer(1, 8))
-            
-            references_text = """
-            • Ordonnance sur la Protection contre le Bruit (OPB) du 15 decembre 1986 (Etat le 1er juillet 2016)
-            • Annexe 6 de l'OPB : Methodes de calcul et de mesure
-            • Articles 33.1 a 33.3 : Facteurs de correction
-            • Loi federale sur la protection de l'environnement (LPE)
-            """
+                mesures_table = Table(mesures_data, colWidths=[9*cm, 3*cm, 3*cm])
+                mesures_table.setStyle(TableStyle([
+                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                    ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+                    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+                    ('FONTSIZE', (0, 0), (-1, -1), 9),
+                    ('GRID', (0, 0), (-1, -1), 1, colors.black),
+                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                    ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, colors.HexColor('#f8f9fa')]),
+                    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#e8f0fe')),
+                    ('LEFTPADDING', (0, 0), (-1, -1), 5),
+                    ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+                    ('TOPPADDING', (0, 0), (-1, -1), 4),
+                    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+                ]))
+                section.append(mesures_table)
+        
+        section.append(Spacer(1, 15))
+        
+        return section
+    
+    def _section_scenarios(self, v, styles):
+        """5 (suite). Comparaison des variantes étudiées, si un fichier de scénarios est associé"""
+        comparaison = v['comparaison_scenarios']
+        if not isinstance(comparaison, ComparaisonScenarios):
+            return []
+        
+        style_cellule = ParagraphStyle('CelluleScenario', parent=styles['normal'], fontSize=7, leading=9,
+                                       spaceBefore=0, spaceAfter=0, alignment=TA_LEFT)
+        donnees_table = comparaison.tableau()
+        for ligne in donnees_table[1:]:
+            ligne[0] = Paragraph(escape(ligne[0]), style_cellule)
+            ligne[1] = Paragraph(escape(ligne[1]), style_cellule)
+        
+        table = Table(donnees_table, colWidths=[3.4*cm, 4.4*cm, 1.4*cm, 1.3*cm, 1.4*cm, 1.3*cm, 1.8*cm, 2*cm],
+                      repeatRows=1)
+        style_table = [
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 7),
+            ('ALIGN', (2, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#1f4e79')),
+            ('BACKGROUND', (0, 1), (-1, 1), colors.HexColor('#e8f0fe')),
+            ('ROWBACKGROUNDS', (0, 2), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+        ]
+        for i in np.nonzero(~comparaison.conformes)[0]:
+            style_table.append(('BACKGROUND', (7, i + 1), (7, i + 1), colors.HexColor('#f8d7da')))
+        table.setStyle(TableStyle(style_table))
+        
+        section = []
+        section.append(Paragraph("Comparaison des variantes", styles['heading3']))
+        section.append(table)
+        meilleure = comparaison.meilleure()
+        if meilleure is None:
+            conclusion = "Aucune des variantes etudiees ne respecte les valeurs limites."
+        else:
+            conclusion = (f"Plus grande marge sous les valeurs limites : {escape(comparaison.noms[meilleure])} "
+                          f"({min(comparaison.marge_jour[meilleure], comparaison.marge_nuit[meilleure]):.1f} dB(A)).")
+        section.append(Paragraph(
+            f"Ecarts en dB(A) par rapport a l'etude de base (premiere ligne). {conclusion}", styles['normal']))
+        section.append(Spacer(1, 15))
+        
+        return section
+    
+    def _section_references(self, v, styles):
+        """6. Références réglementaires"""
+        section = []
+        
+        section.append(Paragraph("6. REFERENCES REGLEMENTAIRES", styles['section']))
+        section.append(Spacer(1, 8))
+        
+        references_text = """
+        • Ordonnance sur la Protection contre le Bruit (OPB) du 15 decembre 1986 (Etat le 1er juillet 2016)
+        • Annexe 6 de l'OPB : Methodes de calcul et de mesure
+        • Articles 33.1 a 33.3 : Facteurs de correction
+        • Loi federale sur la protection de l'environnement (LPE)
+        """
+        
+        section.append(Paragraph(references_text, styles['normal']))
+        
+        return section
+    
+    
+    def nom_rapport(self):
+        """Nom horodaté du fichier PDF du rapport"""
+        return f"rapport_acoustique_{self.data['nom_projet'].replace(' ', '_').lower()}_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
+    
+    def generer_pdf_interactif(self, resultats, nom_fichier=None, invariant=False):
+        """Génère le rapport PDF avec les données personnalisées
+        
+        Les sections sont des nœuds du graphe de dépendances : seules celles
+        dont une donnée a changé depuis le dernier rapport sont reconstruites.
+        nom_fichier peut être un fichier ouvert (io.BytesIO) ; avec invariant,
+        le PDF ne dépend que des données (ni date de création ni identifiant
+        aléatoire), de sorte que deux rendus identiques ont la même empreinte.
+        """
+        nom_fichier = nom_fichier or self.nom_rapport()
+        
+        try:
+            doc = SimpleDocTemplate(
+                nom_fichier, pagesize=A4,
+                rightMargin=2*cm, leftMargin=2*cm,
+                topMargin=2.5*cm, bottomMargin=2*cm,
+                invariant=int(invariant)
+            )
             
-            story.append(Paragraph(references_text, style_normal))
+            self.synchroniser_graphe()
+            story = []
+            for nom, _, _ in SECTIONS_PDF:
+                story.extend(self.graphe.valeur(nom))
             
             doc.build(story)
             
@@ -614,46 +1321,661 @@ class CalculateurAcoustiqueInteractif:
         except Exception as e:
             return False, f"Erreur : {str(e)}"
     
+    def enregistrer_dans_base(self, resultats):
+        """Propose d'enregistrer l'étude dans la base locale des études"""
+        enregistrer = input(f"\n🗄️ Souhaitez-vous enregistrer l'étude dans la base des études ({FICHIER_BASE}) ? (o/n) : ").strip().lower()
+        
+        if enregistrer in ['o', 'oui', 'y', 'yes']:
+            try:
+                with BaseEtudes() as base:
+                    identifiant = base.enregistrer(resultats, self.date_etude)
+                    print(f"✅ Étude n° {identifiant} enregistrée ({len(base)} étude(s) dans la base)")
+            except Exception as e:
+                print(f"❌ Erreur lors de l'enregistrement : {e}")
+    
+    def charger_configuration(self, chemin):
+        """Charge une configuration enregistrée (JSON, TOML, binaire ou ancien texte) dans self.data"""
+        self.data, date_creation = lire_configuration(chemin)
+        print(f"✅ Configuration chargée : {chemin}")
+        if date_creation:
+            print(f"   Créée le {date_creation}")
+    
     def sauvegarder_configuration(self):
         """Propose de sauvegarder la configuration pour réutilisation"""
         sauvegarder = input("\n💾 Souhaitez-vous sauvegarder cette configuration pour un usage futur ? (o/n) : ").strip().lower()
         
         if sauvegarder in ['o', 'oui', 'y', 'yes']:
             try:
-                nom_config = input("Nom du fichier de configuration (sans extension) : ").strip()
+                nom_config = input("Nom du fichier de configuration (.json, .toml ou .cac) : ").strip()
                 if not nom_config:
                     nom_config = f"config_{self.data['nom_projet'].replace(' ', '_').lower()}"
                 
-                nom_fichier_config = f"{nom_config}.txt"
-                
-                with open(nom_fichier_config, 'w', encoding='utf-8') as f:
-                    f.write("# Configuration Calculateur Acoustique\n")
-                    f.write(f"# Créée le {self.date_etude}\n\n")
-                    
-                    for cle, valeur in self.data.items():
-                        f.write(f"{cle} = {valeur}\n")
+                nom_fichier_config = ecrire_configuration(nom_config, self.data, self.date_etude)
                 
                 print(f"✅ Configuration sauvegardée dans : {nom_fichier_config}")
-                print("💡 Vous pourrez modifier ce fichier texte et le charger lors d'une prochaine utilisation")
+                print(f"💡 Pour la réutiliser sans ressaisie : --config \"{nom_fichier_config}\"")
                 
             except Exception as e:
                 print(f"❌ Erreur lors de la sauvegarde : {e}")
 
+def executer_lot(chemins):
+    """Calcule en une passe toutes les configurations des fichiers et dossiers donnés"""
+    configurations, erreurs = charger_configurations(chemins, ignorer_erreurs=True)
+    for chemin, message in erreurs:
+        print(f"❌ {chemin} : {message}")
+    if not configurations:
+        print("❌ Aucune configuration valide")
+        return
+    
+    lot = LotResultats.depuis_colonnes(colonnes_configurations(configurations), len(configurations))
+    lr_jour, lr_nuit = lot.colonne('lr_jour'), lot.colonne('lr_nuit')
+    conformes = lot.colonne('conforme_jour') & lot.colonne('conforme_nuit')
+    print(f"\n📊 {len(lot)} études calculées")
+    print(f"{'Projet':<30} {'Zone':<10} {'Lr jour':>8} {'Lr nuit':>8}  Conformité")
+    for projet, zone, jour, nuit, conforme in zip(lot.colonne('nom_projet'), lot.colonne('zone_sensibilite'),
+                                                   lr_jour, lr_nuit, conformes):
+        print(f"{projet[:30]:<30} {zone.split('(')[0].strip():<10} "
+              f"{jour:>8.1f} {nuit:>8.1f}  {'✅' if conforme else '❌'}")
+    non_conformes = int(len(lot) - conformes.sum())
+    print(f"\n⚠️ {non_conformes} étude(s) non conforme(s) sur {len(lot)}")
+    
+    # Classement de toutes les études vis-à-vis des seuils de l'OPB en une passe,
+    # le degré étant lu une fois par zone distincte du lot
+    degres = degres_depuis_zones(lot.vocabulaires['zone_sensibilite'])[lot.codes['zone_sensibilite'][:len(lot)]]
+    classes = TABLE_LIMITES.classer(lr_jour, lr_nuit, degres)
+    print("\n📏 Seuils OPB (annexe 6) :")
+    libelles = ["Sous les valeurs de planification"] + [
+        f"Au-delà des {TABLE_LIMITES.jeu(jeu)['libelle'].lower()}" for jeu in ECHELLE_OPB]
+    for classe, libelle in enumerate(libelles):
+        print(f"   {libelle:<45} : {np.count_nonzero(classes == classe)}")
+    if np.any(classes < 0):
+        print(f"   {'Zone non reconnue':<45} : {np.count_nonzero(classes < 0)}")
+
+def exporter_etudes(chemins, chemin_export):
+    """Export JSON ou HTML des résultats, sans rapport PDF (une configuration ou un lot)"""
+    debut = time.perf_counter()
+    configurations, erreurs = charger_configurations(chemins, ignorer_erreurs=True)
+    for chemin, message in erreurs:
+        print(f"❌ {chemin} : {message}")
+    if not configurations:
+        print("❌ Aucune configuration valide")
+        return
+    
+    try:
+        if len(configurations) == 1:
+            donnees, date_etude = configurations[0]
+            calculateur = CalculateurAcoustiqueInteractif()
+            calculateur.data = donnees
+            calculateur.synchroniser_graphe()
+            exporter_resultat(chemin_export, resultats_graphe(calculateur.graphe, donnees), date_etude)
+        else:
+            lot = LotResultats.depuis_colonnes(colonnes_configurations(configurations), len(configurations))
+            exporter_lot(chemin_export, lot, [date_etude for _, date_etude in configurations])
+    except (OSError, ValueError) as e:
+        print(f"❌ Export impossible : {e}")
+        return
+    duree = time.perf_counter() - debut
+    print(f"✅ {len(configurations)} étude(s) exportée(s) dans {chemin_export} en {duree:.2f} s")
+
+def rendre_pdf_archive(donnees, date_etude):
+    """Calcul et PDF reproductible (octets) d'une configuration : (résultats, PDF, nom du fichier, date d'étude)"""
+    calculateur = CalculateurAcoustiqueInteractif()
+    calculateur.data = donnees
+    if date_etude:
+        calculateur.date_etude = date_etude
+    calculateur.synchroniser_graphe()
+    resultats = resultats_graphe(calculateur.graphe, donnees)
+    tampon = io.BytesIO()
+    succes, message = calculateur.generer_pdf_interactif(resultats, tampon, invariant=True)
+    if not succes:
+        raise RuntimeError(message)
+    return resultats, tampon.getvalue(), calculateur.nom_rapport(), calculateur.date_etude
+
+def archiver_etudes(chemins):
+    """Rend et archive les rapports des configurations ; les rendus déjà archivés ne sont pas dupliqués"""
+    configurations, erreurs = charger_configurations(chemins, ignorer_erreurs=True)
+    for chemin, message in erreurs:
+        print(f"❌ {chemin} : {message}")
+    if not configurations:
+        print("❌ Aucune configuration valide")
+        return
+    
+    nouveaux = echecs = 0
+    with ArchiveRapports() as archive:
+        for donnees, date_etude in configurations:
+            # Une étude dont le rendu ou les fichiers échouent n'interrompt pas le lot
+            try:
+                resultats, pdf, fichier, date_etude = rendre_pdf_archive(donnees, date_etude)
+                nouveaux += archive.archiver(resultats, pdf, date_etude, fichier)[1]
+            except (RuntimeError, OSError, ValueError) as e:
+                echecs += 1
+                print(f"❌ {donnees.get('nom_projet')} : {e}")
+        stats = archive.statistiques()
+    print(f"🗄️ {nouveaux} rapport(s) archivé(s), {len(configurations) - nouveaux - echecs} déjà présent(s)"
+          + (f", {echecs} en échec" if echecs else ""))
+    print(f"   {stats['rapports']} rapports, {stats['pdf_distincts']} PDF distincts : "
+          f"{stats['taille'] / 1024:.0f} ko stockés en {stats['taille_compressee'] / 1024:.0f} ko")
+
+def afficher_archives(texte=None):
+    """Liste les rapports archivés (recherche sur le projet, la localisation ou l'équipement)"""
+    with ArchiveRapports() as archive:
+        rapports = archive.rechercher(texte or None)
+        for rapport in rapports:
+            print(f"{rapport['id']:>5}  {rapport['date_etude'] or '':<10}  {(rapport['nom_projet'] or '')[:30]:<30} "
+                  f"{rapport['zone'] or '':<7} Lr {rapport['lr_jour']:.1f} / {rapport['lr_nuit']:.1f}  "
+                  f"{'✅' if rapport['conforme'] else '❌'}  {rapport['empreinte_pdf'][:12]}")
+        if not rapports:
+            print("ℹ️ Aucun rapport archivé" + (f" pour « {texte} »" if texte else ""))
+
+def restaurer_archive(identifiant, re_rendre=False):
+    """Extrait le PDF archivé, ou le refait à partir des données archivées et le compare"""
+    try:
+        with ArchiveRapports() as archive:
+            rapport = archive.rapport(identifiant)
+            if not re_rendre:
+                nom_fichier = rapport['fichier'] or f"rapport_archive_{identifiant}.pdf"
+                with open(nom_fichier, 'wb') as f:
+                    f.write(archive.pdf(identifiant))
+                print(f"✅ Rapport n° {identifiant} extrait : {nom_fichier}")
+                return
+            # Fichiers externes (mesures, scénarios, carte) tels qu'ils étaient à l'archivage
+            dossier_fichiers = f"rapport_archive_{identifiant}_fichiers"
+            donnees, date_etude = archive.donnees(identifiant, dossier_fichiers)
+    except (KeyError, ValueError, OSError) as e:
+        print(f"❌ {e.args[0] if isinstance(e, KeyError) else e}")
+        return
+    
+    try:
+        _, pdf, nom_fichier, _ = rendre_pdf_archive(donnees, date_etude)
+    except RuntimeError as e:
+        print(f"❌ Rapport n° {identifiant} : {e}")
+        return
+    with open(nom_fichier, 'wb') as f:
+        f.write(pdf)
+    if hashlib.sha256(pdf).hexdigest() == rapport['empreinte_pdf']:
+        print(f"✅ Rapport n° {identifiant} refait à l'identique : {nom_fichier}")
+    else:
+        print(f"⚠️ Rapport n° {identifiant} refait : {nom_fichier} (diffère de l'archive : "
+              "catalogue de mesures ou version du calculateur modifiés depuis)")
+    if os.path.isdir(dossier_fichiers):
+        print(f"📁 Fichiers archivés de l'étude extraits dans {dossier_fichiers}")
+
+def rendre_rapport(chemin, donnees, date_etude):
+    """Calcul et rapport PDF d'une configuration (exécuté dans un processus de travail)"""
+    calculateur = CalculateurAcoustiqueInteractif()
+    calculateur.data = donnees
+    if date_etude:
+        calculateur.date_etude = date_etude
+    calculateur.synchroniser_graphe()
+    resultats = resultats_graphe(calculateur.graphe, donnees)
+    succes, nom_fichier = calculateur.generer_pdf_interactif(resultats)
+    if not succes:
+        raise RuntimeError(nom_fichier)
+    return nom_fichier, resultats['lr_jour'], resultats['lr_nuit'], resultats['conforme_jour'] and resultats['conforme_nuit']
+
+class RecitDiffere(list):
+    """Story reportlab alimentée à la demande par un générateur de flowables
+    
+    doc.build ne consomme la story que par l'avant (flowables[0], del
+    flowables[0], réinsertions en tête) : seuls quelques flowables d'avance
+    sont matérialisés, de sorte que la mémoire ne croît pas avec le nombre
+    d'études du portefeuille.
+    """
+    
+    def __init__(self, flowables, avance=16):
+        super().__init__()
+        self._source = iter(flowables)
+        self._avance = avance
+    
+    def _remplir(self):
+        while self._source is not None and list.__len__(self) < self._avance:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+    
+    def __len__(self):
+        self._remplir()
+        return list.__len__(self)
+    
+    def __getitem__(self, indice):
+        self._remplir()
+        return list.__getitem__(self, indice)
+
+def _index_portefeuille(configurations, lignes, styles):
+    """Tableau récapitulatif du portefeuille, chaque projet renvoyant à sa section"""
+    style_cellule = ParagraphStyle('CelluleIndex', parent=styles['normal'], fontSize=8, leading=10,
+                                   spaceBefore=0, spaceAfter=0, alignment=TA_LEFT)
+    donnees_table = [['N°', 'Projet', 'Localisation', 'DS', 'Lr jour', 'Lr nuit', 'Conformite']]
+    non_conformes = []
+    for i, ((donnees, _), ligne) in enumerate(zip(configurations, lignes), start=1):
+        conforme = bool(ligne['conforme_jour'] and ligne['conforme_nuit'])
+        if not conforme:
+            non_conformes.append(i)
+        donnees_table.append([
+            str(i),
+            Paragraph(f'<a href="#site{i}" color="#1f4e79">{escape(str(donnees["nom_projet"]))}</a>', style_cellule),
+            Paragraph(escape(str(donnees['localisation'])), style_cellule),
+            donnees['zone_sensibilite'].split('(')[0].replace('DS', '').strip(),
+            f"{ligne['lr_jour']:.1f}",
+            f"{ligne['lr_nuit']:.1f}",
+            "CONFORME" if conforme else "NON CONFORME",
+        ])
+    
+    table = Table(donnees_table, colWidths=[1*cm, 5*cm, 4*cm, 1.2*cm, 1.6*cm, 1.6*cm, 2.6*cm], repeatRows=1)
+    style_table = [
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1f4e79')),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('ALIGN', (3, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#1f4e79')),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor('#f8f9fa')]),
+    ]
+    for i in non_conformes:
+        style_table.append(('BACKGROUND', (6, i), (6, i), colors.HexColor('#f8d7da')))
+    table.setStyle(TableStyle(style_table))
+    return table, len(non_conformes)
+
+def flux_portefeuille(configurations, lignes, styles):
+    """Flowables du portefeuille : page de synthèse et index, puis les sections de chaque site
+    
+    Un seul calculateur est actif à la fois ; tous partagent le même jeu de
+    styles, enregistré une fois dans le document.
+    """
+    table, non_conformes = _index_portefeuille(configurations, lignes, styles)
+    yield Paragraph("PORTEFEUILLE D'ETUDES ACOUSTIQUES", styles['titre'])
+    yield Paragraph(f"{len(configurations)} sites - {datetime.now().strftime('%d/%m/%Y')}", styles['sous_titre'])
+    yield Paragraph(
+        f"{len(configurations) - non_conformes} site(s) conforme(s), {non_conformes} site(s) non conforme(s) "
+        "vis-a-vis des valeurs limites de leur degre de sensibilite. Les niveaux Lr sont en dB(A) ; "
+        "chaque projet renvoie a sa section detaillee.", styles['normal'])
+    yield Spacer(1, 10)
+    yield table
+    
+    for i, (donnees, date_etude) in enumerate(configurations, start=1):
+        calculateur = CalculateurAcoustiqueInteractif()
+        calculateur._styles = styles
+        calculateur.data = donnees
+        if date_etude:
+            calculateur.date_etude = date_etude
+        calculateur.synchroniser_graphe()
+        yield PageBreak()
+        yield AnchorFlowable(f"site{i}")
+        for nom, _, _ in SECTIONS_PDF:
+            yield from calculateur.graphe.valeur(nom)
+
+def generer_portefeuille(chemins, nom_fichier):
+    """Rapport PDF unique réunissant toutes les configurations des fichiers et dossiers donnés"""
+    configurations, erreurs = charger_configurations(chemins, ignorer_erreurs=True)
+    for chemin, message in erreurs:
+        print(f"❌ {chemin} : {message}")
+    if not configurations:
+        print("❌ Aucune configuration valide")
+        return
+    
+    lignes = calculer_lignes(colonnes_configurations(configurations), len(configurations))
+    doc = SimpleDocTemplate(
+        nom_fichier, pagesize=A4,
+        rightMargin=2*cm, leftMargin=2*cm,
+        topMargin=2.5*cm, bottomMargin=2*cm,
+        pageCompression=1, title="Portefeuille d'etudes acoustiques"
+    )
+    print(f"📄 Portefeuille de {len(configurations)} études en cours de génération...")
+    doc.build(RecitDiffere(flux_portefeuille(configurations, lignes, CalculateurAcoustiqueInteractif()._styles_pdf())))
+    print(f"✅ Portefeuille généré : {nom_fichier} ({doc.page} pages, {os.path.getsize(nom_fichier) / 1024:.0f} ko)")
+
+def signaler_rapport(chemin, resultat, erreur):
+    """Affiche l'issue du traitement d'une configuration surveillée"""
+    heure = datetime.now().strftime("%H:%M:%S")
+    if erreur is not None:
+        print(f"[{heure}] ❌ {os.path.basename(chemin)} : {erreur}")
+        return
+    nom_fichier, lr_jour, lr_nuit, conforme = resultat
+    print(f"[{heure}] {'✅' if conforme else '⚠️'} {os.path.basename(chemin)} : "
+          f"Lr jour {lr_jour:.1f} / nuit {lr_nuit:.1f} dB(A) → {nom_fichier}")
+
+def surveiller_dossier(dossier):
+    """Recalcule les rapports des configurations du dossier à chaque modification"""
+    surveillance = SurveillanceConfigurations(dossier, rendre_rapport, signaler_rapport)
+    print(f"👀 Surveillance de {dossier} (Ctrl+C pour arrêter)")
+    try:
+        surveillance.executer()
+    except KeyboardInterrupt:
+        print("\n🛑 Surveillance arrêtée")
+
+def travail_rapport(parametres, progression):
+    """Travail 'rapport' : calcul et PDF d'une étude ({'donnees', 'date_etude'})"""
+    progression(0.0, parametres['donnees'].get('nom_projet'))
+    nom_fichier, lr_jour, lr_nuit, conforme = rendre_rapport(None, parametres['donnees'], parametres.get('date_etude'))
+    progression(1.0, nom_fichier)
+    return {'fichier': nom_fichier, 'lr_jour': lr_jour, 'lr_nuit': lr_nuit, 'conforme': conforme}
+
+def travail_calcul(parametres, progression):
+    """Travail 'calcul' : calcul vectorisé des configurations ({'chemins'}), sans rapport"""
+    progression(0.0, "Chargement des configurations")
+    configurations, erreurs = charger_configurations(parametres['chemins'], ignorer_erreurs=True)
+    progression(0.5, f"{len(configurations)} configurations")
+    lot = LotResultats.depuis_colonnes(colonnes_configurations(configurations), len(configurations))
+    conformes = lot.colonne('conforme_jour') & lot.colonne('conforme_nuit')
+    non_conformes = lot.colonne('nom_projet')[~conformes].tolist()
+    return {'etudes': len(configurations), 'non_conformes': non_conformes, 'erreurs': erreurs}
+
+def travail_rapports_lot(parametres, progression):
+    """Travail 'rapports' : un rapport PDF par configuration ({'chemins'}), annulable entre deux rapports"""
+    configurations, erreurs = charger_configurations(parametres['chemins'], ignorer_erreurs=True)
+    fichiers = []
+    for i, (donnees, date_etude) in enumerate(configurations):
+        progression(i / len(configurations), donnees['nom_projet'])
+        fichiers.append(rendre_rapport(None, donnees, date_etude)[0])
+    progression(1.0, f"{len(fichiers)} rapports")
+    return {'fichiers': fichiers, 'erreurs': erreurs}
+
+def creer_file_travaux(fils=2, evenements=True):
+    """File de travaux du calculateur avec ses types de travaux"""
+    file_travaux = FileTravaux(fils=fils, evenements=evenements)
+    file_travaux.enregistrer_type('rapport', travail_rapport)
+    file_travaux.enregistrer_type('calcul', travail_calcul)
+    file_travaux.enregistrer_type('rapports', travail_rapports_lot)
+    return file_travaux
+
+def suivre_travail(file_travaux, identifiant):
+    """Affiche la progression d'un travail jusqu'à sa fin ; Ctrl+C l'annule"""
+    try:
+        while True:
+            try:
+                numero, etat, progression, message = file_travaux.evenements.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if numero != identifiant:
+                continue
+            if progression is not None and etat not in ETATS_FINAUX:
+                print(f"\r⏳ [{'#' * int(progression * 30):<30}] {progression:4.0%} {(message or '')[:40]:<40}",
+                      end="", flush=True)
+            if etat in ETATS_FINAUX:
+                print()
+                return file_travaux.travail(identifiant)
+    except KeyboardInterrupt:
+        print("\n🛑 Annulation demandée...")
+        file_travaux.annuler(identifiant)
+        return file_travaux.attendre(identifiant)
+
+def executer_travaux_lot(chemins, type_travail):
+    """Exécute un lot (calcul ou rapports) dans la file de travaux en suivant sa progression"""
+    with creer_file_travaux() as file_travaux:
+        identifiant = file_travaux.soumettre(type_travail, {'chemins': chemins}, priorite=PRIORITE_LOT)
+        print(f"📥 Travail n° {identifiant} ({type_travail}) ajouté à la file")
+        travail = suivre_travail(file_travaux, identifiant)
+    if travail['etat'] != TERMINE:
+        print(f"❌ Travail n° {identifiant} : {travail['etat']} {travail['erreur'] or ''}")
+        return
+    resultat = travail['resultat']
+    for chemin, message in resultat['erreurs']:
+        print(f"❌ {chemin} : {message}")
+    if type_travail == 'rapports':
+        print(f"✅ {len(resultat['fichiers'])} rapport(s) généré(s)")
+    else:
+        print(f"✅ {resultat['etudes']} études calculées, {len(resultat['non_conformes'])} non conforme(s)")
+        for nom in resultat['non_conformes'][:20]:
+            print(f"   ❌ {nom}")
+        if len(resultat['non_conformes']) > 20:
+            print(f"   ... et {len(resultat['non_conformes']) - 20} autre(s)")
+
+def afficher_travaux(relancer=None):
+    """Liste les travaux de la file ; relance éventuellement un travail en échec ou annulé"""
+    with creer_file_travaux() as file_travaux:
+        if relancer is not None:
+            if file_travaux.relancer(relancer):
+                print(f"🔁 Travail n° {relancer} relancé")
+                suivre_travail(file_travaux, relancer)
+            else:
+                print(f"❌ Le travail n° {relancer} n'est ni en échec ni annulé")
+        for travail in file_travaux.lister():
+            print(f"{travail['id']:>5}  {travail['type']:<9} priorité {travail['priorite']:>3}  {travail['etat']:<10} "
+                  f"{travail['progression']:4.0%}  {travail['message'] or ''}")
+
+def description_source_carte(donnees, nom, position):
+    """Entrée de l'en-tête d'une carte : source de l'étude placée à une position (x, y, z)"""
+    description = {'nom': nom, 'position': [float(v) for v in position]}
+    if donnees.get('mode_calcul') == 'puissance':
+        description.update(puissance_sonore=donnees['puissance_sonore'], facteur_q=donnees['facteur_q'])
+    else:
+        description.update(type_source=donnees.get('type_source', 'ponctuelle'), lp1=donnees['lp1'],
+                           distance_ref=donnees['distance_ref'], longueur_source=donnees.get('longueur_source'),
+                           largeur_source=donnees.get('largeur_source'))
+    return description
+
+def source_carte(description):
+    """Source (modeles_sources ou directivite) d'une entrée de l'en-tête d'une carte"""
+    if description.get('puissance_sonore') is not None:
+        return SourcePuissance(description['position'], description['puissance_sonore'], description['facteur_q'])
+    return creer_source(description['type_source'], description['lp1'], description['distance_ref'],
+                        description.get('longueur_source'), description.get('largeur_source'),
+                        description['position'])
+
+def saisir_position(invite):
+    """Position x y [z] (m) saisie sur une ligne, z = 0 par défaut"""
+    valeurs = [float(valeur) for valeur in input(invite).replace(",", " ").split()[:3]]
+    if len(valeurs) < 2:
+        raise ValueError("au moins x et y sont nécessaires")
+    return valeurs + [0.0] * (3 - len(valeurs))
+
+def ouvrir_carte(dossier):
+    """Ouvre la carte du dossier, ou la crée après saisie de son emprise et de sa résolution"""
+    if os.path.exists(os.path.join(dossier, FICHIER_ENTETE)):
+        return StockageCarte.ouvrir(dossier, 'r+')
+    
+    print(f"🆕 Nouvelle carte dans {dossier}")
+    emprise = input("Côté de la carte, centrée sur l'origine (m) [défaut: 200] : ").strip()
+    emprise = float(emprise) if emprise else 200.0
+    resolution = input("Résolution (m) [défaut: 1] : ").strip()
+    resolution = float(resolution) if resolution else 1.0
+    hauteur = input("Hauteur des récepteurs (m) [défaut: 1.5] : ").strip()
+    hauteur = float(hauteur) if hauteur else 1.5
+    if not (emprise > 0 and resolution > 0):
+        raise ValueError("le côté et la résolution doivent être positifs")
+    n = int(math.ceil(emprise / resolution)) + 1
+    stockage = StockageCarte.creer(dossier, (-emprise / 2, -emprise / 2), resolution, n, n, avec_energie=True)
+    stockage.entete['hauteur'] = hauteur
+    stockage.entete['sources'] = {scenario: [] for scenario in stockage.entete['scenarios']}
+    stockage.enregistrer_entete()
+    return stockage
+
+def editer_carte(dossier, donnees):
+    """Place, déplace ou retire les sources de l'étude sur une carte de bruit enregistrée"""
+    try:
+        stockage = ouvrir_carte(dossier)
+        scenario = stockage.entete['scenarios'][0]
+        # Contributions non conservées sur disque : la somme est refaite à l'ouverture
+        stockage.energie(scenario)[:] = 0.0
+    except (OSError, ValueError, KeyError) as e:
+        print(f"❌ Carte de bruit inutilisable : {e}")
+        return
+    
+    carte = stockage.carte_bruit(scenario, hauteur=stockage.entete.get('hauteur', 0.0),
+                                 limite=min(donnees['limite_jour'], donnees['limite_nuit']))
+    descriptions = stockage.entete.setdefault('sources', {}).setdefault(scenario, [])
+    for description in descriptions:
+        carte.ajouter_source(description['nom'], source_carte(description))
+    if descriptions:
+        print(f"🔄 {len(descriptions)} source(s) de la carte recalculée(s)")
+    corrections = donnees['k2'] + donnees['k3'] + donnees['reflexion']
+    corrections = {'jour': donnees['k1_jour'] + corrections, 'nuit': donnees['k1_nuit'] + corrections}
+    # Corrections K de l'étude éventuellement changées : réécriture complète à l'ouverture
+    stockage.ecrire_carte(carte, scenario, corrections)
+    carte.tuiles_modifiees()
+    
+    while True:
+        print(f"\n🗺️ Carte {stockage.entete['nx']} x {stockage.entete['ny']} cellules, "
+              f"{len(descriptions)} source(s) : {', '.join(d['nom'] for d in descriptions) or 'aucune'}")
+        print("1 = Ajouter une source   2 = Déplacer   3 = Modifier le niveau   4 = Retirer   5 = Terminer")
+        choix = input("Choix : ").strip()
+        if choix not in ['1', '2', '3', '4']:
+            break
+        try:
+            if choix == '1':
+                nom = input("Nom de la source : ").strip() or f"S{len(descriptions) + 1}"
+                if nom in carte.sources:
+                    raise KeyError(f"Source déjà présente sur la carte : {nom}")
+                description = description_source_carte(donnees, nom, saisir_position("Position x y [z] (m) : "))
+                carte.ajouter_source(nom, source_carte(description))
+                descriptions.append(description)
+            else:
+                nom = input("Nom de la source : ").strip()
+                description = next((d for d in descriptions if d['nom'] == nom), None)
+                if description is None:
+                    raise KeyError(f"Source inconnue : {nom}")
+                if choix == '4':
+                    carte.supprimer_source(nom)
+                    descriptions.remove(description)
+                else:
+                    if choix == '2':
+                        description['position'] = saisir_position("Nouvelle position x y [z] (m) : ")
+                    else:
+                        champ = 'puissance_sonore' if description.get('puissance_sonore') is not None else 'lp1'
+                        description[champ] = float(input(f"Nouveau niveau {'Lw' if champ == 'puissance_sonore' else 'Lp1'} (dB(A)) : "))
+                    carte.modifier_source(nom, source_carte(description))
+        except (ValueError, KeyError) as e:
+            print(f"❌ {e.args[0] if isinstance(e, KeyError) else e}")
+            continue
+        # Seules les tuiles dans le rayon d'influence de la source sont réécrites
+        tuiles = carte.tuiles_modifiees()
+        stockage.ecrire_carte(carte, scenario, corrections, tuiles)
+        stockage.enregistrer_entete()
+        print(f"✅ Carte mise à jour ({len(tuiles)} tuile(s)) : "
+              f"Lr nuit max {float(stockage.grille(scenario, 'nuit').max()):.1f} dB(A)")
+    
+    stockage.enregistrer_entete()
+    print(f"💾 Carte enregistrée dans {dossier}")
+    print("ℹ️ Indiquez ce dossier comme carte de bruit de l'étude pour la reproduire dans le rapport")
+
+def surveiller_en_continu(source, donnees, depuis_debut=False):
+    """Suit les niveaux d'un sonomètre (fichier ou socket) et signale les dépassements prévus"""
+    dernier_affichage = [0.0]
+    
+    def afficher_etat(surveillance):
+        etat = surveillance.etat()
+        if etat is None or time.monotonic() - dernier_affichage[0] < 60:
+            return
+        dernier_affichage[0] = time.monotonic()
+        print(f"📈 {etat['periode']} du {etat['jour']} ({etat['avancement']:.0%}) : Leq {etat['leq']:.1f}, "
+              f"Lr projeté {etat['lr_projete']:.1f} / limite {etat['limite']:.0f} dB(A)")
+    
+    def alerter(alerte):
+        print(f"🚨 {alerte}")
+    
+    surveillance = SurveillanceContinue(donnees, alerter=alerter)
+    if os.path.isfile(source):
+        flux = flux_fichier(source, depuis_debut=depuis_debut)
+    else:
+        flux = flux_socket(source)
+    print(f"👂 Surveillance continue de {source} (Ctrl+C pour arrêter)")
+    try:
+        surveillance.consommer(flux, rapporter=afficher_etat)
+    except KeyboardInterrupt:
+        surveillance.consommer(())
+    except OSError as e:
+        print(f"❌ Source inaccessible : {e}")
+    for bilan in surveillance.bilans:
+        statut = "✅" if bilan.conforme else "❌"
+        print(f"{statut} {bilan.periode} du {bilan.jour} : Lr {bilan.lr:.1f} / {bilan.limite:.0f} dB(A) "
+              f"(mesuré sur {bilan.couverture:.0%} de la période)")
+
 def main():
     """Fonction principale interactive"""
+    parser = argparse.ArgumentParser(description="Calculateur acoustique interactif (OPB)")
+    parser.add_argument("--config", help="configuration à charger (.json, .toml, .cac ou ancien .txt) sans ressaisie")
+    parser.add_argument("--lot", nargs="+", metavar="CHEMIN",
+                        help="calcule toutes les configurations des fichiers ou dossiers donnés")
+    parser.add_argument("--surveiller", metavar="DOSSIER",
+                        help="régénère les rapports des configurations du dossier à chaque modification")
+    parser.add_argument("--rapports", action="store_true",
+                        help="avec --lot : génère un rapport PDF par configuration dans la file de travaux")
+    parser.add_argument("--portefeuille", metavar="FICHIER",
+                        help="avec --lot : réunit toutes les études dans un seul rapport PDF avec index")
+    parser.add_argument("--export", metavar="FICHIER",
+                        help="avec --lot ou --config : exporte les résultats en JSON (.json, .jsonl) ou HTML, sans PDF")
+    parser.add_argument("--archiver", action="store_true",
+                        help="avec --lot ou --config : archive les rapports (dédupliqués et compressés)")
+    parser.add_argument("--archives", nargs="?", const="", metavar="TEXTE",
+                        help="liste les rapports archivés, éventuellement filtrés par projet ou localisation")
+    parser.add_argument("--restaurer", type=int, metavar="ID", help="extrait un rapport archivé")
+    parser.add_argument("--re-rendre", action="store_true",
+                        help="avec --restaurer : refait le rapport à partir des données archivées")
+    parser.add_argument("--scenarios", metavar="FICHIER",
+                        help="variantes (JSON) comparées à l'étude dans les résultats et le rapport PDF")
+    parser.add_argument("--file", action="store_true",
+                        help="avec --lot : calcule le lot dans la file de travaux (progression, annulation)")
+    parser.add_argument("--travaux", action="store_true", help="liste les travaux de la file")
+    parser.add_argument("--continu", metavar="SOURCE",
+                        help="avec --config : surveillance continue d'un fichier de mesures ou d'un socket (hote:port)")
+    parser.add_argument("--depuis-debut", action="store_true",
+                        help="avec --continu : relit le fichier de mesures depuis le début")
+    parser.add_argument("--relancer", type=int, metavar="ID", help="relance un travail en échec ou annulé")
+    parser.add_argument("--carte", metavar="DOSSIER",
+                        help="avec --config : crée ou modifie la carte de bruit des sources de l'étude")
+    arguments = parser.parse_args()
+    
+    if arguments.archiver and (arguments.lot or arguments.config):
+        archiver_etudes(arguments.lot or [arguments.config])
+        return
+    if arguments.archives is not None:
+        afficher_archives(arguments.archives)
+        return
+    if arguments.restaurer is not None:
+        restaurer_archive(arguments.restaurer, arguments.re_rendre)
+        return
+    if arguments.export and (arguments.lot or arguments.config):
+        exporter_etudes(arguments.lot or [arguments.config], arguments.export)
+        return
+    if arguments.lot and arguments.portefeuille:
+        generer_portefeuille(arguments.lot, arguments.portefeuille)
+        return
+    if arguments.lot and (arguments.rapports or arguments.file):
+        executer_travaux_lot(arguments.lot, 'rapports' if arguments.rapports else 'calcul')
+        return
+    if arguments.lot:
+        executer_lot(arguments.lot)
+        return
+    if arguments.travaux or arguments.relancer is not None:
+        afficher_travaux(arguments.relancer)
+        return
+    if arguments.continu:
+        if not arguments.config:
+            parser.error("--continu nécessite --config (corrections K et valeurs limites de l'étude)")
+        donnees, _ = lire_configuration(arguments.config)
+        surveiller_en_continu(arguments.continu, donnees, arguments.depuis_debut)
+        return
+    if arguments.carte:
+        if not arguments.config:
+            parser.error("--carte nécessite --config (source, corrections K et valeurs limites de l'étude)")
+        donnees, _ = lire_configuration(arguments.config)
+        editer_carte(arguments.carte, donnees)
+        return
+    if arguments.surveiller:
+        surveiller_dossier(arguments.surveiller)
+        return
+    
     calculateur = CalculateurAcoustiqueInteractif()
     
     print("🚀 Bienvenue dans le Calculateur Acoustique Interactif")
     print("📋 Cet outil va vous guider pour réaliser votre étude acoustique")
     
     try:
-        # Processus de saisie des données
-        calculateur.saisir_donnees_projet()
-        calculateur.saisir_parametres_techniques()
-        calculateur.saisir_facteurs_correction()
+        # Processus de saisie des données (ou chargement d'une configuration)
+        if arguments.config:
+            calculateur.charger_configuration(arguments.config)
+        else:
+            calculateur.saisir_donnees_projet()
+            calculateur.saisir_parametres_techniques()
+            calculateur.saisir_facteurs_correction()
+        if arguments.scenarios:
+            calculateur.data['scenarios'] = arguments.scenarios
         
         # Validation des données
-        while not calculateur.afficher_resume_donnees():
+        while not arguments.config and not calculateur.afficher_resume_donnees():
             print("\n🔄 Reprise de la saisie des données...")
             calculateur.saisir_donnees_projet()
             calculateur.saisir_parametres_techniques()
@@ -663,21 +1985,55 @@ def main():
         resultats = calculateur.effectuer_calculs()
         calculateur.afficher_resultats(resultats)
         
-        # Génération du PDF
+        # Génération du PDF en arrière-plan : la saisie continue pendant doc.build
+        file_travaux = None
+        travail_pdf = None
         generer_pdf = input("\n📄 Souhaitez-vous générer le rapport PDF ? (o/n) : ").strip().lower()
         if generer_pdf in ['o', 'oui', 'y', 'yes']:
-            print("\n📄 Génération du rapport PDF en cours...")
-            succes, nom_fichier = calculateur.generer_pdf_interactif(resultats)
-            
-            if succes:
-                print(f"✅ Rapport PDF généré avec succès : {nom_fichier}")
-                print("📏 Format professionnel sur 2 pages")
-            else:
-                print(f"❌ {nom_fichier}")
+            # Seul le rapport de cette étude est exécuté, les autres travaux en
+            # attente restent dans la file persistante
+            file_travaux = creer_file_travaux(fils=1, evenements=False)
+            travail_pdf = file_travaux.soumettre(
+                'rapport', {'donnees': calculateur.data, 'date_etude': calculateur.date_etude},
+                priorite=PRIORITE_ETUDE
+            )
+            file_travaux.demarrer(identifiants=[travail_pdf])
+            print(f"\n📄 Génération du rapport PDF en arrière-plan (travail n° {travail_pdf})...")
+        
+        # Ajustements successifs : seuls les calculs et sections concernés sont refaits
+        while input("\n🔁 Souhaitez-vous modifier un paramètre et recalculer ? (o/n) : ").strip().lower() in ['o', 'oui', 'y', 'yes']:
+            calculateur.modifier_champ()
+            calculateur.graphe.recalculs = []
+            resultats = calculateur.effectuer_calculs()
+            calculateur.afficher_resultats(resultats)
+            if travail_pdf is not None:
+                # Le rapport précédent pas encore commencé est remplacé par celui des nouvelles données
+                if file_travaux.travail(travail_pdf)['etat'] == EN_ATTENTE:
+                    file_travaux.annuler(travail_pdf)
+                travail_pdf = file_travaux.soumettre(
+                    'rapport', {'donnees': calculateur.data, 'date_etude': calculateur.date_etude},
+                    priorite=PRIORITE_ETUDE
+                )
+                print(f"📄 Mise à jour du rapport PDF en arrière-plan (travail n° {travail_pdf})")
+            recalculs = calculateur.graphe.recalculs
+            print(f"♻️ Éléments recalculés : {', '.join(recalculs) if recalculs else 'aucun'}")
+        
+        # Enregistrement dans la base des études
+        calculateur.enregistrer_dans_base(resultats)
         
         # Sauvegarde de la configuration
         calculateur.sauvegarder_configuration()
         
+        if travail_pdf is not None:
+            travail = file_travaux.attendre(travail_pdf)
+            file_travaux.arreter()
+            # Dernier rapport soumis : celui des données finales de l'étude
+            if travail['etat'] == TERMINE:
+                print(f"\n✅ Rapport PDF généré avec succès : {travail['resultat']['fichier']}")
+                print("📏 Format professionnel avec graphiques")
+            else:
+                print(f"\n❌ Rapport PDF : {travail['erreur'] or travail['etat']}")
+        
     except KeyboardInterrupt:
         print("\n\n🛑 Processus interrompu par l'utilisateur")
         sys.exit(0)
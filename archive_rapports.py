@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Archive des rapports : données d'entrée, résultats et PDF de chaque étude
+Objets compressés (lzma) adressés par leur empreinte SHA-256 et index SQLite ;
+un rendu identique n'est stocké qu'une fois et tout rapport peut être refait
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import sqlite3
+from datetime import datetime
+
+from base_etudes import canton_depuis_localisation, code_zone
+from configuration import date_iso
+from resultats import CHAMPS_RESULTAT
+
+DOSSIER_ARCHIVES = "archives_rapports"
+FICHIER_INDEX = "index.db"
+DOSSIER_OBJETS = "objets"
+
+FORMAT_PAQUET = "calculateur-acoustique-archive"
+# Version 2 : fichiers externes des données archivés comme objets (paquet['fichiers'])
+VERSION_PAQUET = 2
+VERSION_SCHEMA = 1
+
+# Champs de self.data désignant un fichier ou un dossier lu pour le rendu du rapport ;
+# la pyramide des mesures est un cache reconstruit depuis le CSV, elle n'est pas archivée
+CHAMPS_FICHIERS = ('campagne_mesures', 'bruit_fond_mesures', 'scenarios', 'carte_bruit')
+
+# Taille des morceaux lus pour l'empreinte et la compression des fichiers externes
+TAILLE_MORCEAU = 1 << 20
+
+# Préréglage lzma (0-9) : flux des pages déjà compressés, le gain porte sur la structure du PDF et les paquets JSON
+PRESET_COMPRESSION = 6
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objets (
+    empreinte TEXT PRIMARY KEY,
+    genre TEXT,
+    taille INTEGER,
+    taille_compressee INTEGER
+);
+CREATE TABLE IF NOT EXISTS rapports (
+    id INTEGER PRIMARY KEY,
+    date_archivage TEXT,
+    date_etude TEXT,
+    nom_projet TEXT COLLATE NOCASE,
+    localisation TEXT COLLATE NOCASE,
+    canton TEXT COLLATE NOCASE,
+    equipement TEXT COLLATE NOCASE,
+    zone TEXT COLLATE NOCASE,
+    lr_jour REAL,
+    lr_nuit REAL,
+    conforme INTEGER,
+    fichier TEXT,
+    empreinte_paquet TEXT UNIQUE,
+    empreinte_pdf TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_rapports_projet ON rapports (nom_projet, date_etude);
+CREATE INDEX IF NOT EXISTS idx_rapports_zone ON rapports (zone, canton, conforme);
+CREATE INDEX IF NOT EXISTS idx_rapports_pdf ON rapports (empreinte_pdf);
+"""
+
+
+def empreinte_contenu(contenu):
+    return hashlib.sha256(contenu).hexdigest()
+
+
+def empreinte_fichier(chemin):
+    """Empreinte SHA-256 d'un fichier lu par morceaux"""
+    empreinte = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for morceau in iter(lambda: f.read(TAILLE_MORCEAU), b''):
+            empreinte.update(morceau)
+    return empreinte.hexdigest()
+
+
+def _fichiers_references(chemin):
+    """{chemin relatif: chemin} des fichiers d'un fichier ou d'un dossier (carte de bruit)"""
+    if os.path.isfile(chemin):
+        return {os.path.basename(chemin): chemin}
+    fichiers = {}
+    for racine, _, noms in os.walk(chemin):
+        for nom in noms:
+            complet = os.path.join(racine, nom)
+            fichiers[os.path.relpath(complet, chemin).replace(os.sep, '/')] = complet
+    return fichiers
+
+
+def _valeur(valeur):
+    """Valeur JSON d'un résultat (types NumPy convertis)"""
+    return valeur.item() if hasattr(valeur, 'item') else valeur
+
+
+class ArchiveRapports:
+    """Archive de rapports dans un dossier : objets compressés et index SQLite
+
+    Un paquet réunit les données d'entrée, les résultats, l'empreinte du
+    PDF et celles des fichiers externes (mesures, scénarios, carte de bruit) ;
+    il est lui-même un objet, adressé par l'empreinte de son JSON canonique.
+    Archiver deux fois le même rendu ne crée ni objet ni ligne, et un fichier
+    externe partagé par plusieurs études n'est stocké qu'une fois.
+    """
+
+    def __init__(self, dossier=DOSSIER_ARCHIVES):
+        self.dossier = dossier
+        os.makedirs(os.path.join(dossier, DOSSIER_OBJETS), exist_ok=True)
+        self.connexion = sqlite3.connect(os.path.join(dossier, FICHIER_INDEX))
+        self.connexion.row_factory = sqlite3.Row
+        self.connexion.execute("PRAGMA journal_mode = WAL")
+        version = self.connexion.execute("PRAGMA user_version").fetchone()[0]
+        if version > VERSION_SCHEMA:
+            raise ValueError(f"Archive trop récente : schéma version {version}")
+        with self.connexion:
+            self.connexion.executescript(SCHEMA)
+            self.connexion.execute(f"PRAGMA user_version = {VERSION_SCHEMA}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def fermer(self):
+        self.connexion.close()
+
+    def __len__(self):
+        return self.connexion.execute("SELECT COUNT(*) FROM rapports").fetchone()[0]
+
+    def _chemin_objet(self, empreinte):
+        return os.path.join(self.dossier, DOSSIER_OBJETS, empreinte[:2], f"{empreinte}.xz")
+
+    def _ecrire_objet(self, contenu, genre):
+        """Stocke un contenu s'il est absent ; retourne son empreinte"""
+        empreinte = empreinte_contenu(contenu)
+        chemin = self._chemin_objet(empreinte)
+        if os.path.exists(chemin):
+            return empreinte
+        compresse = lzma.compress(contenu, preset=PRESET_COMPRESSION)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        temporaire = f"{chemin}.{os.getpid()}.tmp"
+        with open(temporaire, 'wb') as f:
+            f.write(compresse)
+        os.replace(temporaire, chemin)
+        self.connexion.execute("INSERT OR REPLACE INTO objets VALUES (?, ?, ?, ?)",
+                               (empreinte, genre, len(contenu), len(compresse)))
+        return empreinte
+
+    def _ecrire_fichier(self, chemin, empreinte, genre):
+        """Stocke un fichier externe d'empreinte connue s'il est absent, compressé en flux"""
+        destination = self._chemin_objet(empreinte)
+        if os.path.exists(destination):
+            return
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        compresseur = lzma.LZMACompressor(preset=PRESET_COMPRESSION)
+        verification = hashlib.sha256()
+        taille = taille_compressee = 0
+        temporaire = f"{destination}.{os.getpid()}.tmp"
+        with open(chemin, 'rb') as source, open(temporaire, 'wb') as f:
+            for morceau in iter(lambda: source.read(TAILLE_MORCEAU), b''):
+                verification.update(morceau)
+                taille += len(morceau)
+                taille_compressee += f.write(compresseur.compress(morceau))
+            taille_compressee += f.write(compresseur.flush())
+        if verification.hexdigest() != empreinte:
+            os.remove(temporaire)
+            raise ValueError(f"Fichier modifié pendant l'archivage : {chemin}")
+        os.replace(temporaire, destination)
+        self.connexion.execute("INSERT OR REPLACE INTO objets VALUES (?, ?, ?, ?)",
+                               (empreinte, genre, taille, taille_compressee))
+
+    def _lire_objet(self, empreinte):
+        """Contenu d'un objet, vérifié contre son empreinte"""
+        try:
+            with open(self._chemin_objet(empreinte), 'rb') as f:
+                contenu = lzma.decompress(f.read())
+        except FileNotFoundError:
+            raise KeyError(f"Objet absent de l'archive : {empreinte}")
+        if empreinte_contenu(contenu) != empreinte:
+            raise ValueError(f"Objet corrompu dans l'archive : {empreinte}")
+        return contenu
+
+    def archiver(self, resultats, pdf, date_etude=None, fichier=None):
+        """Archive une étude (ResultatEtude), son PDF (octets) et le nom du fichier rendu
+
+        Retourne (identifiant, nouveau) ; nouveau est faux si ce même rendu
+        (mêmes entrées, mêmes résultats, même PDF) était déjà archivé.
+        """
+        donnees = resultats['parametres']
+        # Fichiers externes : {champ: {'dossier', 'objets': {chemin relatif: empreinte}}} ;
+        # un fichier absent n'est pas archivé
+        references = {champ: _fichiers_references(donnees[champ]) for champ in CHAMPS_FICHIERS
+                      if donnees.get(champ) and os.path.exists(donnees[champ])}
+        empreintes = {
+            champ: {'dossier': os.path.isdir(donnees[champ]),
+                    'objets': {relatif: empreinte_fichier(chemin) for relatif, chemin in fichiers.items()}}
+            for champ, fichiers in references.items()
+        }
+        paquet = {
+            'format': FORMAT_PAQUET, 'version': VERSION_PAQUET, 'date_etude': date_etude,
+            'donnees': dict(donnees),
+            'resultats': {champ: _valeur(resultats[champ]) for champ in CHAMPS_RESULTAT},
+            'pdf': empreinte_contenu(pdf),
+            'fichiers': empreintes,
+        }
+        texte = json.dumps(paquet, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        empreinte_paquet = empreinte_contenu(texte)
+        existant = self.connexion.execute(
+            "SELECT id FROM rapports WHERE empreinte_paquet = ?", (empreinte_paquet,)).fetchone()
+        if existant is not None:
+            return existant['id'], False
+
+        with self.connexion:
+            self._ecrire_objet(pdf, 'pdf')
+            for champ, fichiers in references.items():
+                for relatif, chemin in fichiers.items():
+                    self._ecrire_fichier(chemin, empreintes[champ]['objets'][relatif], champ)
+            self._ecrire_objet(texte, 'paquet')
+            curseur = self.connexion.execute(
+                "INSERT INTO rapports (date_archivage, date_etude, nom_projet, localisation, canton, equipement, zone, "
+                "lr_jour, lr_nuit, conforme, fichier, empreinte_paquet, empreinte_pdf) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (datetime.now().isoformat(timespec='seconds'), date_iso(date_etude),
+                 donnees.get('nom_projet'), donnees.get('localisation'),
+                 canton_depuis_localisation(donnees.get('localisation')), donnees.get('equipement'),
+                 code_zone(donnees.get('zone_sensibilite')),
+                 paquet['resultats']['lr_jour'], paquet['resultats']['lr_nuit'],
+                 int(bool(paquet['resultats']['conforme_jour'] and paquet['resultats']['conforme_nuit'])),
+                 fichier, empreinte_paquet, paquet['pdf'])
+            )
+        return curseur.lastrowid, True
+
+    def rapport(self, identifiant):
+        """Ligne d'index d'un rapport archivé"""
+        ligne = self.connexion.execute("SELECT * FROM rapports WHERE id = ?", (identifiant,)).fetchone()
+        if ligne is None:
+            raise KeyError(f"Rapport archivé inconnu : {identifiant}")
+        return ligne
+
+    def paquet(self, identifiant):
+        """Paquet d'un rapport : {'date_etude', 'donnees', 'resultats', 'pdf', 'fichiers'}"""
+        paquet = json.loads(self._lire_objet(self.rapport(identifiant)['empreinte_paquet']))
+        if paquet.get('format') != FORMAT_PAQUET or paquet.get('version', 0) > VERSION_PAQUET:
+            raise ValueError(f"Paquet d'archive non reconnu : rapport {identifiant}")
+        return paquet
+
+    def donnees(self, identifiant, dossier_fichiers=None):
+        """(données, date d'étude) pour refaire le rapport
+
+        Avec dossier_fichiers, les fichiers externes archivés y sont extraits
+        et les données pointent sur ces copies plutôt que sur les chemins d'origine.
+        """
+        paquet = self.paquet(identifiant)
+        donnees = paquet['donnees']
+        if dossier_fichiers is not None:
+            for champ, fichiers in paquet.get('fichiers', {}).items():
+                donnees[champ] = self._extraire_fichiers(champ, donnees[champ], fichiers, dossier_fichiers)
+        return donnees, paquet['date_etude']
+
+    def _extraire_fichiers(self, champ, origine, fichiers, dossier):
+        """Extrait un fichier ou un dossier externe archivé ; retourne son nouveau chemin"""
+        restaure = os.path.join(dossier, champ, os.path.basename(os.path.normpath(origine)))
+        for relatif, empreinte in fichiers['objets'].items():
+            chemin = os.path.join(restaure, *relatif.split('/')) if fichiers['dossier'] else restaure
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            with open(chemin, 'wb') as f:
+                f.write(self._lire_objet(empreinte))
+        return restaure
+
+    def pdf(self, identifiant):
+        """Octets du PDF archivé"""
+        return self._lire_objet(self.rapport(identifiant)['empreinte_pdf'])
+
+    def rechercher(self, texte=None, zone=None, conforme=None, limite=50):
+        """Rapports archivés, les plus récents en premier
+
+        texte : fragment du nom de projet, de la localisation ou de l'équipement ;
+        zone : « DS II » ; conforme : bool.
+        """
+        conditions, valeurs = [], []
+        if texte:
+            conditions.append("(nom_projet LIKE ? OR localisation LIKE ? OR equipement LIKE ?)")
+            valeurs += [f"%{texte}%"] * 3
+        if zone is not None:
+            conditions.append("zone = ?")
+            valeurs.append(code_zone(zone))
+        if conforme is not None:
+            conditions.append("conforme = ?")
+            valeurs.append(int(conforme))
+        clause = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        requete = f"SELECT * FROM rapports{clause} ORDER BY date_archivage DESC, id DESC"
+        if limite is not None:
+            requete += " LIMIT ?"
+            valeurs.append(int(limite))
+        return self.connexion.execute(requete, valeurs).fetchall()
+
+    def statistiques(self):
+        """Nombre de rapports et d'objets, tailles brute et compressée des objets stockés"""
+        objets, taille, compressee = self.connexion.execute(
+            "SELECT COUNT(*), COALESCE(SUM(taille), 0), COALESCE(SUM(taille_compressee), 0) FROM objets").fetchone()
+        pdf_distincts = self.connexion.execute("SELECT COUNT(DISTINCT empreinte_pdf) FROM rapports").fetchone()[0]
+        return {'rapports': len(self), 'pdf_distincts': pdf_distincts, 'objets': objets,
+                'taille': taille, 'taille_compressee': compressee}
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Base locale des études acoustiques (SQLite)
+Paramètres et résultats de chaque étude, index sur la zone, la localisation,
+la conformité et la date pour les requêtes sur l'ensemble du portefeuille
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+from configuration import CHAMPS_TEXTE, charger_configurations, colonnes_configurations, date_iso
+from resultats import CHAMPS_PARAMETRES, CHAMPS_RESULTAT, VALEURS_DEFAUT, LotResultats, ResultatEtude
+
+FICHIER_BASE = "etudes_acoustiques.db"
+
+VERSION_SCHEMA = 1
+
+# Mentions de pays ignorées pour retrouver le canton dans « ville, canton, pays »
+PAYS = ('suisse', 'switzerland', 'schweiz', 'svizzera', 'ch')
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS etudes (
+    id INTEGER PRIMARY KEY,
+    date_etude TEXT,
+    zone TEXT COLLATE NOCASE,
+    canton TEXT COLLATE NOCASE,
+    {', '.join(f'{champ} TEXT' for champ in CHAMPS_TEXTE)},
+    {', '.join(f'{champ} REAL' for champ in CHAMPS_PARAMETRES)},
+    {', '.join(f'{champ} REAL' for champ in CHAMPS_RESULTAT if not champ.startswith('conforme'))},
+    conforme_jour INTEGER,
+    conforme_nuit INTEGER,
+    autres_donnees TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_etudes_zone ON etudes (zone, canton, conforme_nuit, date_etude);
+CREATE INDEX IF NOT EXISTS idx_etudes_localisation ON etudes (canton, localisation);
+CREATE INDEX IF NOT EXISTS idx_etudes_conformite ON etudes (conforme_nuit, conforme_jour);
+CREATE INDEX IF NOT EXISTS idx_etudes_date ON etudes (date_etude);
+"""
+
+COLONNES = (('date_etude', 'zone', 'canton') + CHAMPS_TEXTE + CHAMPS_PARAMETRES + CHAMPS_RESULTAT
+            + ('autres_donnees',))
+
+
+def code_zone(zone_sensibilite):
+    """« DS II (Zone d'habitation) » -> « DS II »"""
+    return zone_sensibilite.split('(')[0].strip() if zone_sensibilite else None
+
+
+def canton_depuis_localisation(localisation):
+    """« Sion, Valais » ou « Crans-Montana, Valais, Suisse » -> « Valais »"""
+    parties = [partie.strip() for partie in (localisation or '').split(',') if partie.strip()]
+    while len(parties) > 1 and parties[-1].lower() in PAYS:
+        parties.pop()
+    return parties[-1] if parties else None
+
+
+def _autres_donnees(donnees):
+    """Données de l'étude hors colonnes de la table (carte, mesures...), en JSON ou None"""
+    autres = {cle: valeur for cle, valeur in donnees.items() if cle not in COLONNES}
+    return json.dumps(autres, ensure_ascii=False) if autres else None
+
+
+class BaseEtudes:
+    """Études enregistrées dans un fichier SQLite local"""
+
+    def __init__(self, chemin=FICHIER_BASE):
+        self.chemin = chemin
+        self.connexion = sqlite3.connect(chemin)
+        self.connexion.row_factory = sqlite3.Row
+        self.connexion.execute("PRAGMA journal_mode = WAL")
+        self.connexion.execute("PRAGMA synchronous = NORMAL")
+        version = self.connexion.execute("PRAGMA user_version").fetchone()[0]
+        if version > VERSION_SCHEMA:
+            raise ValueError(f"Base d'études trop récente : schéma version {version}")
+        with self.connexion:
+            self.connexion.executescript(SCHEMA)
+            self.connexion.execute(f"PRAGMA user_version = {VERSION_SCHEMA}")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.fermer()
+
+    def fermer(self):
+        self.connexion.close()
+
+    def __len__(self):
+        return self.connexion.execute("SELECT COUNT(*) FROM etudes").fetchone()[0]
+
+    def _ligne(self, resultats, date_etude):
+        parametres = resultats['parametres']
+        valeurs = [date_iso(date_etude or datetime.now().strftime("%d/%m/%Y")),
+                   code_zone(parametres.get('zone_sensibilite')),
+                   canton_depuis_localisation(parametres.get('localisation'))]
+        valeurs += [parametres.get(champ, VALEURS_DEFAUT.get(champ)) for champ in CHAMPS_TEXTE]
+        valeurs += [parametres.get(champ) for champ in CHAMPS_PARAMETRES]
+        valeurs += [resultats[champ] for champ in CHAMPS_RESULTAT]
+        valeurs.append(_autres_donnees(parametres))
+        # Types NumPy (lots vectorisés) convertis en types Python pour SQLite
+        return [valeur.item() if isinstance(valeur, np.generic) else valeur for valeur in valeurs]
+
+    def enregistrer(self, resultats, date_etude=None):
+        """Enregistre une étude (résultat de effectuer_calculs), retourne son identifiant"""
+        with self.connexion:
+            curseur = self.connexion.execute(
+                f"INSERT INTO etudes ({', '.join(COLONNES)}) VALUES ({', '.join('?' * len(COLONNES))})",
+                self._ligne(resultats, date_etude)
+            )
+        return curseur.lastrowid
+
+    def _lignes_lot(self, lot, date_etude, autres_donnees=None):
+        """Lignes d'un LotResultats construites colonne par colonne (sans ResultatEtude)"""
+        nombre = len(lot)
+        aujourd_hui = datetime.now().strftime("%d/%m/%Y")
+        if isinstance(date_etude, (list, tuple)):
+            colonnes = [[date_iso(date or aujourd_hui) for date in date_etude]]
+        else:
+            colonnes = [[date_iso(date_etude or aujourd_hui)] * nombre]
+        # Zone et canton déduits une fois par entrée du vocabulaire
+        zones = [code_zone(zone) for zone in lot.vocabulaires['zone_sensibilite']]
+        cantons = [canton_depuis_localisation(lieu) for lieu in lot.vocabulaires['localisation']]
+        colonnes.append([zones[code] for code in lot.codes['zone_sensibilite'][:nombre].tolist()])
+        colonnes.append([cantons[code] for code in lot.codes['localisation'][:nombre].tolist()])
+        for champ in CHAMPS_TEXTE:
+            colonnes.append(lot.colonne(champ).tolist())
+        for champ in CHAMPS_PARAMETRES + CHAMPS_RESULTAT:
+            valeurs = lot.colonne(champ)
+            if valeurs.dtype.kind == 'f':
+                # NaN (paramètre absent) -> NULL
+                valeurs = np.where(np.isnan(valeurs), None, valeurs.astype(float))
+            colonnes.append(valeurs.tolist())
+        colonnes.append(autres_donnees if autres_donnees is not None else [None] * nombre)
+        return zip(*colonnes)
+
+    def enregistrer_lot(self, resultats, date_etude=None, autres_donnees=None):
+        """Enregistre un ensemble d'études en une seule transaction
+
+        resultats : LotResultats, ou itérable de ResultatEtude ou de couples (résultat, date JJ/MM/AAAA)
+        Pour un LotResultats, date_etude peut être une liste (une date par étude) et
+        autres_donnees la liste des données hors colonnes (JSON, voir _autres_donnees).
+        """
+        if isinstance(resultats, LotResultats):
+            lignes = self._lignes_lot(resultats, date_etude, autres_donnees)
+        else:
+            lignes = (
+                self._ligne(*resultat) if isinstance(resultat, tuple) else self._ligne(resultat, date_etude)
+                for resultat in resultats
+            )
+        with self.connexion:
+            curseur = self.connexion.executemany(
+                f"INSERT INTO etudes ({', '.join(COLONNES)}) VALUES ({', '.join('?' * len(COLONNES))})",
+                lignes
+            )
+        return curseur.rowcount
+
+    def _filtres(self, zone=None, canton=None, localisation=None, conforme_jour=None,
+                 conforme_nuit=None, date_debut=None, date_fin=None):
+        conditions, valeurs = [], []
+        if zone is not None:
+            conditions.append("zone = ?")
+            valeurs.append(code_zone(zone))
+        if canton is not None:
+            conditions.append("canton = ?")
+            valeurs.append(canton)
+        if localisation is not None:
+            conditions.append("localisation = ?")
+            valeurs.append(localisation)
+        if conforme_jour is not None:
+            conditions.append("conforme_jour = ?")
+            valeurs.append(int(conforme_jour))
+        if conforme_nuit is not None:
+            conditions.append("conforme_nuit = ?")
+            valeurs.append(int(conforme_nuit))
+        if date_debut is not None:
+            conditions.append("date_etude >= ?")
+            valeurs.append(date_iso(date_debut))
+        if date_fin is not None:
+            conditions.append("date_etude <= ?")
+            valeurs.append(date_iso(date_fin))
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", valeurs
+
+    def compter(self, **filtres):
+        """Nombre d'études répondant aux filtres (voir rechercher)"""
+        clause, valeurs = self._filtres(**filtres)
+        return self.connexion.execute(f"SELECT COUNT(*) FROM etudes{clause}", valeurs).fetchone()[0]
+
+    def rechercher(self, limite=None, **filtres):
+        """Études répondant aux filtres, les plus récentes en premier
+
+        Filtres : zone (« DS II »), canton (« Valais »), localisation exacte,
+        conforme_jour / conforme_nuit (bool), date_debut / date_fin (JJ/MM/AAAA).
+        Exemple : rechercher(zone="DS II", canton="Valais", conforme_nuit=False)
+        """
+        clause, valeurs = self._filtres(**filtres)
+        requete = f"SELECT * FROM etudes{clause} ORDER BY date_etude DESC, id DESC"
+        if limite is not None:
+            requete += " LIMIT ?"
+            valeurs.append(int(limite))
+        return [self._resultat(ligne) for ligne in self.connexion.execute(requete, valeurs)]
+
+    def _resultat(self, ligne):
+        """ResultatEtude reconstruit depuis une ligne de la table"""
+        parametres = {champ: ligne[champ] for champ in CHAMPS_TEXTE + CHAMPS_PARAMETRES}
+        parametres['limite_jour'] = ligne['limite_jour']
+        parametres['limite_nuit'] = ligne['limite_nuit']
+        if ligne['autres_donnees']:
+            parametres.update(json.loads(ligne['autres_donnees']))
+        parametres['id_etude'] = ligne['id']
+        date = ligne['date_etude']
+        parametres['date_etude'] = f"{date[8:10]}/{date[5:7]}/{date[:4]}" if date else None
+        return ResultatEtude(
+            ligne['attenuation'], ligne['lpx'], ligne['lr_jour'], ligne['lr_nuit'],
+            ligne['limite_jour'], ligne['limite_nuit'],
+            bool(ligne['conforme_jour']), bool(ligne['conforme_nuit']),
+            parametres
+        )
+
+    def importer_configurations(self, chemins):
+        """Importe des fichiers ou dossiers de configurations (JSON, TOML, binaire, ancien texte)
+
+        Les résultats sont recalculés en une passe vectorisée (LotResultats.depuis_colonnes)
+        puis insérés en une seule transaction. Retourne le nombre d'études importées.
+        """
+        configurations, _ = charger_configurations(chemins)
+        if not configurations:
+            return 0
+        lot = LotResultats.depuis_colonnes(colonnes_configurations(configurations), len(configurations))
+        return self.enregistrer_lot(lot, [date_etude for _, date_etude in configurations],
+                                    [_autres_donnees(donnees) for donnees, _ in configurations])
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Carte de bruit par tuiles avec mise à jour incrémentale
+Les contributions énergétiques de chaque source sont conservées par tuile :
+déplacer ou modifier une source ne recalcule que les tuiles dans son rayon d'influence
+"""
+
+import numpy as np
+
+from limites_reglementaires import LIBELLES_DEGRES, TABLE_LIMITES
+from modeles_sources import en_niveau
+
+# Valeur limite de référence : la plus basse de la table par défaut (DS I, nuit)
+LIMITE_REFERENCE = float(TABLE_LIMITES.limites(list(LIBELLES_DEGRES))[1].min())
+
+# Contributions négligées à plus de MARGE_INFLUENCE dB sous la valeur limite (corrections K
+# de la nuit comprises, la marge reste d'une dizaine de dB sur le niveau d'évaluation)
+MARGE_INFLUENCE = 25.0
+SEUIL_INFLUENCE = LIMITE_REFERENCE - MARGE_INFLUENCE
+
+# Précision des contributions conservées par tuile (la somme reste en double précision)
+TYPE_CONTRIBUTION = np.float32
+
+# Taille par défaut des tuiles (cellules par côté)
+TAILLE_TUILE = 128
+
+# Si une source retirée représentait plus que cette part de l'énergie d'une tuile,
+# la somme de la tuile est reconstruite pour éviter les erreurs d'arrondi
+PART_RECONSTRUCTION = 0.999
+
+
+class CarteBruit:
+    """Grille régulière de récepteurs découpée en tuiles
+
+    origine : coordonnées (x, y) du centre de la première cellule
+    resolution : pas de la grille en mètres
+    nx, ny : nombre de cellules en x et en y
+    hauteur : hauteur des récepteurs (m)
+    seuil : niveau (dB(A)) sous lequel une contribution est négligée ; par
+            défaut MARGE_INFLUENCE dB sous la limite (la plus basse de l'étude)
+    energie : tableau (ny, nx) existant à utiliser comme somme énergétique,
+              par exemple StockageCarte.energie(scenario) projeté sur disque
+    """
+
+    def __init__(self, origine, resolution, nx, ny, hauteur=0.0, taille_tuile=TAILLE_TUILE,
+                 seuil=None, memoriser_contributions=True, energie=None, limite=None):
+        self.origine = (float(origine[0]), float(origine[1]))
+        self.resolution = float(resolution)
+        self.nx = nx
+        self.ny = ny
+        self.hauteur = hauteur
+        self.taille_tuile = taille_tuile
+        if seuil is None:
+            seuil = SEUIL_INFLUENCE if limite is None else limite - MARGE_INFLUENCE
+        self.seuil = seuil
+        self.memoriser_contributions = memoriser_contributions
+
+        # Sommes énergétiques de toutes les sources, découpées en tuiles par vues
+        if energie is None:
+            energie = np.zeros((ny, nx))
+        elif energie.shape != (ny, nx):
+            raise ValueError(f"Tableau d'énergie de forme {energie.shape}, attendu {(ny, nx)}")
+        self.energie = energie
+        self.sources = {}
+        # identifiant -> {(ty, tx): contribution énergétique de la source sur la tuile}
+        self.contributions = {}
+        # Tuiles dont la somme a changé depuis le dernier appel à tuiles_modifiees()
+        self._modifiees = set()
+
+    @property
+    def nombre_tuiles(self):
+        return (-(-self.ny // self.taille_tuile), -(-self.nx // self.taille_tuile))
+
+    def _bornes_tuile(self, ty, tx):
+        y0, x0 = ty * self.taille_tuile, tx * self.taille_tuile
+        return y0, min(y0 + self.taille_tuile, self.ny), x0, min(x0 + self.taille_tuile, self.nx)
+
+    def _recepteurs_tuile(self, ty, tx):
+        """Coordonnées (n, 3) des centres de cellules d'une tuile"""
+        y0, y1, x0, x1 = self._bornes_tuile(ty, tx)
+        xs = self.origine[0] + self.resolution * np.arange(x0, x1)
+        ys = self.origine[1] + self.resolution * np.arange(y0, y1)
+        grille_x, grille_y = np.meshgrid(xs, ys)
+        return np.column_stack([grille_x.ravel(), grille_y.ravel(), np.full(grille_x.size, self.hauteur)])
+
+    def tuiles_influencees(self, source):
+        """Tuiles dont le rectangle intersecte le disque d'influence de la source"""
+        centre = source.centre
+        rayon = source.rayon_influence(self.seuil)
+        nty, ntx = self.nombre_tuiles
+        cote = self.taille_tuile * self.resolution
+        demi = self.resolution / 2
+
+        # Rectangles des tuiles en coordonnées réelles
+        x_min = self.origine[0] - demi + cote * np.arange(ntx)
+        y_min = self.origine[1] - demi + cote * np.arange(nty)
+        dx = np.maximum(0.0, np.maximum(x_min - centre[0], centre[0] - (x_min + cote)))
+        dy = np.maximum(0.0, np.maximum(y_min - centre[1], centre[1] - (y_min + cote)))
+
+        dedans = dy[:, np.newaxis] ** 2 + dx[np.newaxis, :] ** 2 <= rayon ** 2
+        return list(zip(*np.nonzero(dedans)))
+
+    def tuiles_modifiees(self):
+        """Tuiles (ty, tx) modifiées depuis l'appel précédent, par exemple pour n'écrire qu'elles"""
+        tuiles = sorted(self._modifiees)
+        self._modifiees.clear()
+        return tuiles
+
+    def _contribution(self, source, ty, tx):
+        y0, y1, x0, x1 = self._bornes_tuile(ty, tx)
+        return source.energie_recepteurs(self._recepteurs_tuile(ty, tx)).reshape(y1 - y0, x1 - x0)
+
+    def ajouter_source(self, identifiant, source):
+        """Ajoute l'énergie d'une source sur les tuiles de son rayon d'influence"""
+        if identifiant in self.sources:
+            raise KeyError(f"Source déjà présente sur la carte : {identifiant}")
+
+        contributions = {}
+        for ty, tx in self.tuiles_influencees(source):
+            y0, y1, x0, x1 = self._bornes_tuile(ty, tx)
+            contribution = self._contribution(source, ty, tx)
+            self.energie[y0:y1, x0:x1] += contribution
+            self._modifiees.add((ty, tx))
+            if self.memoriser_contributions:
+                contributions[(ty, tx)] = contribution.astype(TYPE_CONTRIBUTION)
+
+        self.sources[identifiant] = source
+        self.contributions[identifiant] = contributions
+        return len(contributions)
+
+    def supprimer_source(self, identifiant):
+        """Soustrait l'ancienne contribution d'une source des tuiles concernées"""
+        source = self.sources.pop(identifiant)
+        contributions = self.contributions.pop(identifiant)
+        tuiles = contributions.keys() if self.memoriser_contributions else self.tuiles_influencees(source)
+
+        a_reconstruire = []
+        for ty, tx in tuiles:
+            y0, y1, x0, x1 = self._bornes_tuile(ty, tx)
+            contribution = contributions[(ty, tx)] if self.memoriser_contributions else self._contribution(source, ty, tx)
+            tuile = self.energie[y0:y1, x0:x1]
+            if np.any(contribution > PART_RECONSTRUCTION * tuile):
+                a_reconstruire.append((ty, tx))
+            tuile -= contribution
+            np.maximum(tuile, 0.0, out=tuile)
+            self._modifiees.add((ty, tx))
+
+        for ty, tx in a_reconstruire:
+            self.reconstruire_tuile(ty, tx)
+        return len(tuiles)
+
+    def modifier_source(self, identifiant, source):
+        """Remplace une source : retrait de l'ancienne contribution, ajout de la nouvelle"""
+        self.supprimer_source(identifiant)
+        return self.ajouter_source(identifiant, source)
+
+    def reconstruire_tuile(self, ty, tx):
+        """Recalcule la somme énergétique d'une tuile à partir des contributions"""
+        y0, y1, x0, x1 = self._bornes_tuile(ty, tx)
+        tuile = self.energie[y0:y1, x0:x1]
+        tuile[:] = 0.0
+        self._modifiees.add((ty, tx))
+        for identifiant, source in self.sources.items():
+            if self.memoriser_contributions:
+                contribution = self.contributions[identifiant].get((ty, tx))
+                if contribution is not None:
+                    tuile += contribution
+            elif (ty, tx) in self.tuiles_influencees(source):
+                tuile += self._contribution(source, ty, tx)
+
+    def niveaux(self, region=None):
+        """Niveaux dB(A) de la carte (ou d'une région (y0, y1, x0, x1))"""
+        if region is None:
+            return en_niveau(self.energie)
+        y0, y1, x0, x1 = region
+        return en_niveau(self.energie[y0:y1, x0:x1])
+
+    def niveaux_evaluation(self, k1, k2, k3, reflexion, region=None):
+        """Niveaux d'évaluation Lr = Lpx + K1 + K2 + K3 + réflexion"""
+        return self.niveaux(region) + k1 + k2 + k3 + reflexion
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Configurations d'études acoustiques : formats typés et versionnés
+JSON ou TOML lisibles, binaire compact (struct) pour les lots, et lecture
+du format texte historique de sauvegarder_configuration (« cle = valeur »)
+"""
+
+import ast
+import json
+import math
+import os
+import re
+import struct
+from datetime import datetime
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+from modeles_sources import TYPES_SOURCE
+
+FORMAT_CONFIGURATION = "calculateur-acoustique"
+VERSION_CONFIGURATION = 1
+
+EXTENSIONS = ('.json', '.toml', '.cac', '.txt')
+
+# En-tête écrit par sauvegarder_configuration : « # Créée le 10/07/2025 »
+MOTIF_DATE_CREATION = re.compile(r"#\s*Cr[ée]{2}e le (\d{2}/\d{2}/\d{4})")
+
+# Champs conservés tels quels (un nom de projet « 2025 » reste un texte)
+CHAMPS_TEXTE = ('nom_projet', 'localisation', 'equipement', 'zone_sensibilite', 'type_source', 'mode_calcul')
+
+# Marqueurs du schéma : valeur sans défaut, nombre strictement positif
+OBLIGATOIRE = object()
+POSITIF = 'positif'
+
+# Champs de self.data : (type, valeur par défaut, contrainte)
+# type 'texte', 'reel' (nombre obligatoire) ou 'reel?' (nombre ou None) ;
+# contrainte : choix possibles, bornes (min, max) incluses ou POSITIF
+SCHEMA_CONFIGURATION = {
+    'nom_projet': ('texte', "Projet Acoustique", None),
+    'localisation': ('texte', "Non spécifié", None),
+    'equipement': ('texte', "Équipement non spécifié", None),
+    'zone_sensibilite': ('texte', OBLIGATOIRE, None),
+    'limite_jour': ('reel', OBLIGATOIRE, (0.0, 120.0)),
+    'limite_nuit': ('reel', OBLIGATOIRE, (0.0, 120.0)),
+    'lp1': ('reel', OBLIGATOIRE, (0.0, 120.0)),
+    'distance_ref': ('reel', OBLIGATOIRE, POSITIF),
+    'distance_cible': ('reel', OBLIGATOIRE, POSITIF),
+    'type_source': ('texte', 'ponctuelle', TYPES_SOURCE),
+    'longueur_source': ('reel?', None, POSITIF),
+    'largeur_source': ('reel?', None, POSITIF),
+    'puissance_sonore': ('reel?', None, (0.0, 200.0)),
+    'mode_calcul': ('texte', 'pression', ('pression', 'puissance')),
+    'facteur_q': ('reel?', None, POSITIF),
+    'puissance_frigorifique': ('reel?', None, POSITIF),
+    'k1_jour': ('reel', 5.0, None),
+    'k1_nuit': ('reel', 10.0, None),
+    'k2': ('reel', 4.0, None),
+    'k3': ('reel', 0.0, None),
+    'reflexion': ('reel', 1.0, None),
+}
+
+CHAMPS_REELS = tuple(champ for champ, (genre, _, _) in SCHEMA_CONFIGURATION.items() if genre != 'texte')
+CHAMPS_CHAINES = tuple(champ for champ, (genre, _, _) in SCHEMA_CONFIGURATION.items() if genre == 'texte')
+
+# Format binaire : en-tête, valeurs réelles (NaN pour None), textes et champs
+# supplémentaires (JSON) précédés de leur longueur
+MAGIC_CONFIGURATION = b"CAC1"
+MAGIC_LOT = b"CACL"
+STRUCT_ENTETE = struct.Struct("<4sH")
+STRUCT_REELS = struct.Struct("<" + "d" * len(CHAMPS_REELS))
+STRUCT_LONGUEUR = struct.Struct("<I")
+STRUCT_LOT = struct.Struct("<4sHI")
+
+
+def convertir_valeur(texte):
+    """Valeur Python d'un texte écrit par str() : nombre, None, liste, sinon texte brut"""
+    texte = texte.strip()
+    try:
+        return ast.literal_eval(texte)
+    except (ValueError, SyntaxError):
+        return texte
+
+
+def lire_configuration_texte(chemin):
+    """Lit un fichier « cle = valeur » et retourne (données, date de l'étude)
+
+    La date est celle de l'en-tête « Créée le » (format JJ/MM/AAAA), ou None.
+    """
+    donnees = {}
+    date_etude = None
+    with open(chemin, 'r', encoding='utf-8') as f:
+        for numero, ligne in enumerate(f, 1):
+            ligne = ligne.strip()
+            if not ligne:
+                continue
+            if ligne.startswith('#'):
+                correspondance = MOTIF_DATE_CREATION.match(ligne)
+                if correspondance:
+                    date_etude = correspondance.group(1)
+                continue
+            cle, separateur, valeur = ligne.partition('=')
+            if not separateur:
+                raise ValueError(f"{chemin}, ligne {numero} : « cle = valeur » attendu")
+            cle = cle.strip()
+            donnees[cle] = valeur.strip() if cle in CHAMPS_TEXTE else convertir_valeur(valeur)
+    return donnees, date_etude
+
+
+def date_iso(date_etude):
+    """Date JJ/MM/AAAA (format de l'application) en AAAA-MM-JJ, triable et indexable"""
+    if date_etude is None:
+        return None
+    return datetime.strptime(date_etude, "%d/%m/%Y").strftime("%Y-%m-%d")
+
+
+def valider_configuration(donnees):
+    """Contrôle et normalise les données d'une étude, retourne un nouveau dictionnaire
+
+    Les champs absents reçoivent leur valeur par défaut, les nombres sont
+    convertis en float ; les champs hors schéma sont conservés tels quels.
+    Lève ValueError en cas de champ manquant, de type ou de valeur invalide.
+    """
+    resultat = dict(donnees)
+    for champ, (genre, defaut, contrainte) in SCHEMA_CONFIGURATION.items():
+        valeur = donnees.get(champ)
+        if valeur is None:
+            if defaut is OBLIGATOIRE:
+                raise ValueError(f"Champ obligatoire manquant : {champ}")
+            resultat[champ] = defaut
+            continue
+
+        if genre == 'texte':
+            if not isinstance(valeur, str):
+                raise ValueError(f"{champ} : texte attendu, reçu {valeur!r}")
+            if contrainte is not None and valeur not in contrainte:
+                raise ValueError(f"{champ} : valeur '{valeur}' invalide ({', '.join(contrainte)})")
+            continue
+
+        if isinstance(valeur, bool) or not isinstance(valeur, (int, float)):
+            raise ValueError(f"{champ} : nombre attendu, reçu {valeur!r}")
+        valeur = float(valeur)
+        if math.isnan(valeur):
+            if genre == 'reel':
+                raise ValueError(f"Champ obligatoire manquant : {champ}")
+            valeur = None
+        elif contrainte == POSITIF:
+            if valeur <= 0:
+                raise ValueError(f"{champ} : la valeur doit être positive ({valeur})")
+        elif contrainte is not None and not contrainte[0] <= valeur <= contrainte[1]:
+            raise ValueError(f"{champ} : valeur {valeur} hors limites ({contrainte[0]:.0f} à {contrainte[1]:.0f})")
+        resultat[champ] = valeur
+
+    # Cohérence entre champs (mêmes règles que la saisie interactive)
+    if resultat['type_source'] != 'ponctuelle' and resultat['longueur_source'] is None:
+        raise ValueError("longueur_source obligatoire pour une source linéique ou surfacique")
+    if resultat['type_source'] == 'surfacique' and resultat['largeur_source'] is None:
+        raise ValueError("largeur_source obligatoire pour une source surfacique")
+    if resultat['mode_calcul'] == 'puissance':
+        if resultat['puissance_sonore'] is None:
+            raise ValueError("puissance_sonore obligatoire en mode de calcul 'puissance'")
+        if resultat['facteur_q'] is None:
+            resultat['facteur_q'] = 2.0
+    return resultat
+
+
+def _verifier_entete(document, chemin):
+    if document.get('format') != FORMAT_CONFIGURATION:
+        raise ValueError(f"{chemin} : ce n'est pas une configuration du calculateur acoustique")
+    version = document.get('version', 0)
+    if version > VERSION_CONFIGURATION:
+        raise ValueError(f"{chemin} : configuration trop récente (version {version})")
+    return document.get('donnees', {}), document.get('date_etude')
+
+
+# --- JSON et TOML ---
+
+def configuration_json(donnees, date_etude=None):
+    """Texte JSON d'une configuration (None écrit null)"""
+    document = {'format': FORMAT_CONFIGURATION, 'version': VERSION_CONFIGURATION,
+                'date_etude': date_etude, 'donnees': donnees}
+    return json.dumps(document, ensure_ascii=False, indent=2)
+
+
+def _valeur_toml(valeur):
+    if isinstance(valeur, bool):
+        return 'true' if valeur else 'false'
+    if isinstance(valeur, (int, float)):
+        return repr(float(valeur)) if isinstance(valeur, float) else str(valeur)
+    if isinstance(valeur, str):
+        return json.dumps(valeur, ensure_ascii=False)
+    if isinstance(valeur, (list, tuple)):
+        return "[" + ", ".join(_valeur_toml(v) for v in valeur) + "]"
+    if isinstance(valeur, dict):
+        return "{ " + ", ".join(f"{cle} = {_valeur_toml(v)}" for cle, v in valeur.items() if v is not None) + " }"
+    raise ValueError(f"Valeur non représentable en TOML : {valeur!r}")
+
+
+def configuration_toml(donnees, date_etude=None):
+    """Texte TOML d'une configuration (les valeurs None sont omises, TOML n'ayant pas de null)"""
+    lignes = [f'format = "{FORMAT_CONFIGURATION}"', f"version = {VERSION_CONFIGURATION}"]
+    if date_etude:
+        lignes.append(f'date_etude = "{date_etude}"')
+    lignes.append("\n[donnees]")
+    lignes += [f"{cle} = {_valeur_toml(valeur)}" for cle, valeur in donnees.items() if valeur is not None]
+    return "\n".join(lignes) + "\n"
+
+
+# --- Binaire ---
+
+def _texte_binaire(texte):
+    octets = texte.encode('utf-8')
+    return STRUCT_LONGUEUR.pack(len(octets)) + octets
+
+
+def configuration_binaire(donnees, date_etude=None):
+    """Enregistrement binaire compact d'une configuration validée"""
+    reels = [math.nan if donnees.get(champ) is None else donnees[champ] for champ in CHAMPS_REELS]
+    autres = {cle: valeur for cle, valeur in donnees.items() if cle not in SCHEMA_CONFIGURATION}
+    parties = [STRUCT_ENTETE.pack(MAGIC_CONFIGURATION, VERSION_CONFIGURATION), STRUCT_REELS.pack(*reels)]
+    parties += [_texte_binaire(donnees.get(champ) or '') for champ in CHAMPS_CHAINES]
+    parties.append(_texte_binaire(date_etude or ''))
+    parties.append(_texte_binaire(json.dumps(autres, ensure_ascii=False) if autres else ''))
+    return b"".join(parties)
+
+
+def _lire_binaire(tampon, position=0):
+    """Décode un enregistrement binaire, retourne (données, date, position suivante)"""
+    magic, version = STRUCT_ENTETE.unpack_from(tampon, position)
+    if magic != MAGIC_CONFIGURATION:
+        raise ValueError("Enregistrement binaire de configuration invalide")
+    if version > VERSION_CONFIGURATION:
+        raise ValueError(f"Configuration binaire trop récente (version {version})")
+    position += STRUCT_ENTETE.size
+    reels = STRUCT_REELS.unpack_from(tampon, position)
+    position += STRUCT_REELS.size
+    donnees = {champ: (None if valeur != valeur else valeur) for champ, valeur in zip(CHAMPS_REELS, reels)}
+
+    textes = []
+    for _ in range(len(CHAMPS_CHAINES) + 2):
+        (longueur,) = STRUCT_LONGUEUR.unpack_from(tampon, position)
+        position += STRUCT_LONGUEUR.size
+        textes.append(bytes(tampon[position:position + longueur]).decode('utf-8'))
+        position += longueur
+    donnees.update((champ, texte or None) for champ, texte in zip(CHAMPS_CHAINES, textes))
+    if textes[-1]:
+        donnees.update(json.loads(textes[-1]))
+    return donnees, textes[-2] or None, position
+
+
+def ecrire_lot_binaire(chemin, configurations):
+    """Écrit un lot de configurations [(données, date), ...] dans un seul fichier binaire"""
+    enregistrements = [configuration_binaire(valider_configuration(donnees), date_etude)
+                       for donnees, date_etude in configurations]
+    with open(chemin, 'wb') as f:
+        f.write(STRUCT_LOT.pack(MAGIC_LOT, VERSION_CONFIGURATION, len(enregistrements)))
+        f.writelines(enregistrements)
+    return len(enregistrements)
+
+
+def lire_lot_binaire(chemin, valider=True):
+    """Lit toutes les configurations d'un fichier écrit par ecrire_lot_binaire"""
+    with open(chemin, 'rb') as f:
+        tampon = f.read()
+    magic, version, nombre = STRUCT_LOT.unpack_from(tampon, 0)
+    if magic != MAGIC_LOT:
+        raise ValueError(f"{chemin} : ce n'est pas un lot de configurations")
+    if version > VERSION_CONFIGURATION:
+        raise ValueError(f"{chemin} : lot trop récent (version {version})")
+
+    configurations = []
+    position = STRUCT_LOT.size
+    vue = memoryview(tampon)
+    for _ in range(nombre):
+        donnees, date_etude, position = _lire_binaire(vue, position)
+        configurations.append((valider_configuration(donnees) if valider else donnees, date_etude))
+    return configurations
+
+
+# --- Lecture et écriture selon l'extension ---
+
+def lire_configuration(chemin):
+    """Lit une configuration (.json, .toml, .cac ou ancien .txt), retourne (données validées, date)"""
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == '.json':
+        with open(chemin, 'r', encoding='utf-8') as f:
+            donnees, date_etude = _verifier_entete(json.load(f), chemin)
+    elif extension == '.toml':
+        if tomllib is None:
+            raise ValueError("La lecture des fichiers TOML nécessite Python 3.11 ou plus récent")
+        with open(chemin, 'rb') as f:
+            donnees, date_etude = _verifier_entete(tomllib.load(f), chemin)
+    elif extension == '.cac':
+        with open(chemin, 'rb') as f:
+            donnees, date_etude, _ = _lire_binaire(f.read())
+    elif extension == '.txt':
+        donnees, date_etude = lire_configuration_texte(chemin)
+    else:
+        raise ValueError(f"Format de configuration non reconnu : {chemin} ({', '.join(EXTENSIONS)})")
+    try:
+        return valider_configuration(donnees), date_etude
+    except ValueError as e:
+        raise ValueError(f"{chemin} : {e}")
+
+
+def ecrire_configuration(chemin, donnees, date_etude=None):
+    """Écrit une configuration validée au format déduit de l'extension (.json par défaut)"""
+    donnees = valider_configuration(donnees)
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension == '.cac':
+        with open(chemin, 'wb') as f:
+            f.write(configuration_binaire(donnees, date_etude))
+        return chemin
+    if extension not in ('.json', '.toml'):
+        chemin += '.json'
+        extension = '.json'
+    texte = configuration_toml(donnees, date_etude) if extension == '.toml' else configuration_json(donnees, date_etude)
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write(texte)
+    return chemin
+
+
+def lister_configurations(chemins):
+    """Fichiers de configuration désignés par une liste de fichiers et de dossiers"""
+    fichiers = []
+    for chemin in chemins:
+        if os.path.isdir(chemin):
+            with os.scandir(chemin) as entrees:
+                fichiers += sorted(entree.path for entree in entrees
+                                   if entree.is_file() and os.path.splitext(entree.name)[1].lower() in EXTENSIONS)
+        else:
+            fichiers.append(chemin)
+    return fichiers
+
+
+def charger_configurations(chemins, ignorer_erreurs=False):
+    """Chargement en masse : fichiers, dossiers et lots binaires
+
+    Retourne ([(données, date), ...], [(chemin, message d'erreur), ...]).
+    Si ignorer_erreurs est faux, la première erreur est levée.
+    """
+    configurations, erreurs = [], []
+    for chemin in lister_configurations(chemins):
+        try:
+            with open(chemin, 'rb') as f:
+                lot = f.read(len(MAGIC_LOT)) == MAGIC_LOT
+            if lot:
+                configurations += lire_lot_binaire(chemin)
+            else:
+                configurations.append(lire_configuration(chemin))
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            if not ignorer_erreurs:
+                raise
+            erreurs.append((chemin, str(e)))
+    return configurations, erreurs
+
+
+def colonnes_configurations(configurations):
+    """Colonnes {champ: liste de valeurs} pour resultats.calculer_lignes"""
+    return {champ: [donnees.get(champ) for donnees, _ in configurations] for champ in SCHEMA_CONFIGURATION}
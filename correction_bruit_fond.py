@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Correction du bruit de fond des niveaux mesurés
+Soustraction énergétique intervalle par intervalle (source en marche / arrêtée),
+intervalles à marge insuffisante écartés et incertitude propagée
+"""
+
+import math
+import numpy as np
+
+from modeles_sources import en_niveau
+from limites_reglementaires import HEURE_DEBUT_NUIT, HEURE_FIN_NUIT
+
+# Durée (s) des intervalles de comparaison source en marche / bruit de fond
+DUREE_INTERVALLE_S = 60
+
+# Écart minimal (dB) entre niveau mesuré et bruit de fond pour que la correction soit valable
+MARGE_MINIMALE_DB = 3.0
+
+# Écart maximal (s) entre un intervalle mesuré et le bruit de fond le plus proche :
+# au-delà, le bruit de fond n'est ni interpolé ni prolongé et l'intervalle est écarté
+ECART_FOND_MAX_S = 1800
+
+# Incertitude type (dB) de l'appareil de mesure (sonomètre de classe 1)
+INCERTITUDE_APPAREIL_DB = 0.7
+
+# Conversion entre incertitude relative sur l'énergie et incertitude en dB
+DB_PAR_NEPER = 10 / math.log(10)
+
+
+class SerieIntervalles:
+    """Niveaux d'une série de mesures regroupés en intervalles réguliers"""
+
+    def __init__(self, debuts_ms, duree_s, energie, incertitude, nombre):
+        self.debuts_ms = debuts_ms
+        self.duree_s = duree_s
+        self.energie = energie
+        self.incertitude = incertitude
+        self.nombre = nombre
+
+    @property
+    def leq(self):
+        return en_niveau(self.energie)
+
+    def __len__(self):
+        return len(self.debuts_ms)
+
+
+def agreger_intervalles(blocs, duree_s=DUREE_INTERVALLE_S):
+    """Leq par intervalle d'une série de mesures lue par blocs (voir mesures_sonometre.blocs_mesures)
+
+    blocs : itérable de (instants ms, niveaux) ou de (instants ms, niveaux, lignes rejetées).
+    L'incertitude d'un intervalle est l'erreur type de sa moyenne énergétique
+    (dispersion des niveaux courts), sans l'incertitude de l'appareil.
+    """
+    duree_ms = int(duree_s * 1000)
+    premier = None
+    sommes = np.zeros((0, 3))
+    for bloc in blocs:
+        instants, niveaux = bloc[0], bloc[1]
+        if not len(instants):
+            continue
+        indices = np.asarray(instants, dtype=np.int64) // duree_ms
+        if premier is None:
+            premier = int(indices.min())
+        if indices.min() < premier:
+            decalage = premier - int(indices.min())
+            sommes = np.concatenate([np.zeros((decalage, 3)), sommes])
+            premier -= decalage
+        indices = indices - premier
+        taille = int(indices.max()) + 1
+        if taille > len(sommes):
+            sommes = np.concatenate([sommes, np.zeros((taille - len(sommes), 3))])
+        energies = np.power(10.0, np.asarray(niveaux, dtype=float) / 10)
+        sommes[:, 0] += np.bincount(indices, minlength=len(sommes))
+        sommes[:, 1] += np.bincount(indices, weights=energies, minlength=len(sommes))
+        sommes[:, 2] += np.bincount(indices, weights=energies * energies, minlength=len(sommes))
+
+    if premier is None:
+        raise ValueError("Série de mesures vide")
+    presents = sommes[:, 0] > 0
+    nombre = sommes[presents, 0]
+    moyenne = sommes[presents, 1] / nombre
+    variance = np.maximum(sommes[presents, 2] / nombre - moyenne ** 2, 0.0) * nombre / np.maximum(nombre - 1, 1)
+    incertitude = DB_PAR_NEPER * np.sqrt(variance / nombre) / moyenne
+    debuts = (np.flatnonzero(presents) + premier) * duree_ms
+    return SerieIntervalles(debuts, duree_s, moyenne, incertitude, nombre.astype(np.int64))
+
+
+class CorrectionBruitFond:
+    """Niveaux de la source seule par intervalle (NaN où la marge est insuffisante)
+
+    L'incertitude comprend une part aléatoire propre à chaque intervalle et
+    une part systématique (appareil), amplifiée par la soustraction lorsque
+    la marge est faible, qui ne diminue pas en moyennant les intervalles.
+    """
+
+    def __init__(self, debuts_ms, duree_s, leq_mesure, leq_fond, fond_simultane, leq_corrige,
+                 incertitude_aleatoire, sensibilite_appareil, incertitude_appareil, marge_minimale):
+        self.debuts_ms = debuts_ms
+        self.duree_s = duree_s
+        self.leq_mesure = leq_mesure
+        self.leq_fond = leq_fond
+        self.fond_simultane = fond_simultane
+        self.leq_corrige = leq_corrige
+        self.incertitude_aleatoire = incertitude_aleatoire
+        self.sensibilite_appareil = sensibilite_appareil
+        self.incertitude_appareil = incertitude_appareil
+        self.marge_minimale = marge_minimale
+
+    @property
+    def incertitude(self):
+        """Incertitude type (dB) de chaque intervalle corrigé"""
+        return np.hypot(self.incertitude_aleatoire, self.sensibilite_appareil * self.incertitude_appareil)
+
+    @property
+    def marge(self):
+        return self.leq_mesure - self.leq_fond
+
+    @property
+    def valides(self):
+        return ~np.isnan(self.leq_corrige)
+
+    @property
+    def taux_valide(self):
+        return float(self.valides.mean()) if len(self.valides) else 0.0
+
+    def _selection(self, periode):
+        selection = self.valides.copy()
+        if periode is not None:
+            heures = (self.debuts_ms // 3600000) % 24
+            nuit = (heures >= HEURE_DEBUT_NUIT) | (heures < HEURE_FIN_NUIT)
+            if periode == 'jour':
+                selection &= ~nuit
+            elif periode == 'nuit':
+                selection &= nuit
+            else:
+                raise KeyError(f"Période inconnue : {periode}")
+        return selection
+
+    def leq_source(self, periode=None):
+        """Leq de la source seule sur les intervalles valides (toute la série, 'jour' ou 'nuit')
+
+        Retourne (Leq, incertitude type en dB), (NaN, NaN) sans intervalle valide.
+        """
+        selection = self._selection(periode)
+        if not selection.any():
+            return float('nan'), float('nan')
+        energies = np.power(10.0, self.leq_corrige[selection] / 10)
+        moyenne = energies.mean()
+        # Part aléatoire : intervalles indépendants ; part appareil : pondérée par l'énergie, sans moyennage
+        aleatoire = np.sqrt(np.sum((energies * self.incertitude_aleatoire[selection]) ** 2)) / energies.sum()
+        appareil = np.sum(energies * self.sensibilite_appareil[selection]) / energies.sum() * self.incertitude_appareil
+        return float(en_niveau(moyenne)), float(np.hypot(aleatoire, appareil))
+
+
+def corriger_bruit_fond(mesure, fond, marge_minimale=MARGE_MINIMALE_DB, incertitude_appareil=INCERTITUDE_APPAREIL_DB,
+                        ecart_max_s=ECART_FOND_MAX_S):
+    """Soustraction énergétique du bruit de fond, intervalle par intervalle
+
+    mesure, fond : SerieIntervalles de même durée d'intervalle. Un intervalle
+    mesuré en même temps que le bruit de fond (deux appareils) est corrigé par
+    celui-ci ; sinon (mesures alternées marche / arrêt) le bruit de fond est
+    interpolé en énergie entre les intervalles de fond voisins, à condition
+    que l'un d'eux soit à moins de ecart_max_s secondes (NaN sinon).
+    """
+    if mesure.duree_s != fond.duree_s:
+        raise ValueError("Séries mesurée et de bruit de fond avec des intervalles de durées différentes")
+    if not len(fond):
+        raise ValueError("Série de bruit de fond vide")
+
+    position = np.searchsorted(fond.debuts_ms, mesure.debuts_ms)
+    position = np.minimum(position, len(fond) - 1)
+    simultane = fond.debuts_ms[position] == mesure.debuts_ms
+    ecart_ms = np.minimum(np.abs(fond.debuts_ms[position] - mesure.debuts_ms),
+                          np.abs(mesure.debuts_ms - fond.debuts_ms[np.maximum(position - 1, 0)]))
+    connu = simultane | (ecart_ms <= ecart_max_s * 1000)
+    energie_fond = np.where(simultane, fond.energie[position],
+                            np.where(connu, np.interp(mesure.debuts_ms, fond.debuts_ms, fond.energie), np.nan))
+    incertitude_fond = np.where(simultane, fond.incertitude[position],
+                                np.interp(mesure.debuts_ms, fond.debuts_ms, fond.incertitude))
+
+    rapport = energie_fond / mesure.energie
+    valides = rapport <= 10 ** (-marge_minimale / 10)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        leq_corrige = np.where(valides, en_niveau(mesure.energie - energie_fond), np.nan)
+        # Sensibilités de L = 10 log10(E_mesure - E_fond) aux deux niveaux mesurés
+        sensibilite_mesure = 1 / (1 - rapport)
+        sensibilite_fond = rapport / (1 - rapport)
+        aleatoire = np.where(valides, np.hypot(sensibilite_mesure * mesure.incertitude,
+                                               sensibilite_fond * incertitude_fond), np.nan)
+        # Appareils distincts supposés (cas défavorable) : erreurs de mesure et de fond indépendantes
+        appareil = np.where(valides, np.hypot(sensibilite_mesure, sensibilite_fond), np.nan)
+    return CorrectionBruitFond(mesure.debuts_ms, mesure.duree_s, en_niveau(mesure.energie), en_niveau(energie_fond),
+                               simultane, leq_corrige, aleatoire, appareil, incertitude_appareil, marge_minimale)
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Conversion puissance sonore Lw -> pression Lp avec directivité
+Facteur de directivité Q (champ libre, hémisphérique, dièdre, trièdre)
+et diagrammes tabulés par angle, interpolés depuis une table précalculée
+"""
+
+import math
+import numpy as np
+
+# Facteurs de directivité usuels selon l'emplacement de la source
+FACTEURS_Q = {
+    1: "Champ libre (sphérique)",
+    2: "Sur un plan réfléchissant (hémisphérique)",
+    4: "Dans un dièdre (pied de façade)",
+    8: "Dans un trièdre (coin de bâtiment)",
+}
+
+# Résolution angulaire de la table de correspondance (degrés)
+PAS_TABLE = 0.5
+
+# Nombre de couples source x récepteur traités en une passe (limite mémoire)
+TAILLE_BLOC = 262144
+
+
+def lpx_depuis_puissance(lw, distance, facteur_q=2.0, indice_directivite=0.0):
+    """Lp = Lw - 20 x log10(r) - 11 + 10 x log10(Q) + DI"""
+    return lw - 20 * math.log10(distance) - 11 + 10 * math.log10(facteur_q) + indice_directivite
+
+
+class TableDirectivite:
+    """Table précalculée des diagrammes de directivité tabulés
+
+    Chaque diagramme donne la correction DI (dB) en fonction de l'angle entre
+    l'axe de la source et la direction du récepteur (0° à 180°, symétrie de
+    révolution). Les diagrammes sont rééchantillonnés au pas PAS_TABLE et
+    empilés dans un seul tableau pour une lecture vectorisée.
+    """
+
+    def __init__(self):
+        self.noms = []
+        self.index = {}
+        self.angles = np.arange(0.0, 180.0 + PAS_TABLE, PAS_TABLE)
+        self.table = np.zeros((0, len(self.angles)))
+        self.ajouter_motif('omnidirectionnel', [0.0, 180.0], [0.0, 0.0])
+
+    def ajouter_motif(self, nom, angles, corrections):
+        """Ajoute (ou remplace) un diagramme tabulé angle (°) -> correction (dB)"""
+        angles = np.asarray(angles, dtype=float)
+        corrections = np.asarray(corrections, dtype=float)
+        if angles.shape != corrections.shape or angles.size < 2:
+            raise ValueError(f"Diagramme '{nom}' : angles et corrections incohérents")
+        ordre = np.argsort(angles)
+        ligne = np.interp(self.angles, angles[ordre], corrections[ordre])
+
+        if nom in self.index:
+            self.table[self.index[nom]] = ligne
+        else:
+            self.index[nom] = len(self.noms)
+            self.noms.append(nom)
+            self.table = np.vstack([self.table, ligne])
+        return self.index[nom]
+
+    def corrections(self, indices_motifs, angles_deg):
+        """Corrections DI pour des indices de diagrammes et des angles (diffusion numpy)"""
+        colonnes = np.rint(np.clip(angles_deg, 0.0, 180.0) / PAS_TABLE).astype(np.intp)
+        return self.table[indices_motifs, colonnes]
+
+
+TABLE_DIRECTIVITE = TableDirectivite()
+
+
+class SourcePuissance:
+    """Source définie par sa puissance Lw, son facteur Q et un diagramme de directivité"""
+
+    def __init__(self, position, lw, facteur_q=2.0, motif='omnidirectionnel', axe=(0.0, 0.0, 1.0)):
+        position = np.asarray(position, dtype=float)
+        self.position = np.append(position, 0.0) if position.size == 2 else position
+        self.lw = lw
+        self.facteur_q = facteur_q
+        self.motif = motif
+        axe = np.asarray(axe, dtype=float)
+        self.axe = axe / np.linalg.norm(axe)
+
+    @property
+    def centre(self):
+        return self.position
+
+    def rayon_influence(self, seuil, table=None):
+        """Distance au-delà de laquelle la contribution passe sous le seuil dB(A)"""
+        table = table or TABLE_DIRECTIVITE
+        correction_max = table.table[table.index[self.motif]].max()
+        return 10 ** ((self.lw - 11 + 10 * math.log10(self.facteur_q) + correction_max - seuil) / 20)
+
+    def energie_recepteurs(self, recepteurs):
+        """Énergie reçue en chaque récepteur, même interface que modeles_sources"""
+        return np.power(10.0, niveaux_depuis_puissance([self], recepteurs) / 10)
+
+
+def niveaux_depuis_puissance(sources, recepteurs, table=TABLE_DIRECTIVITE):
+    """Niveau global dB(A) en chaque récepteur pour un ensemble de sources Lw
+
+    Toutes les sources sont évaluées dans la même passe vectorisée : une source
+    omnidirectionnelle lit simplement la ligne nulle de la table, de sorte
+    qu'un diagramme tabulé ne coûte pas plus cher qu'une source omnidirectionnelle.
+    """
+    recepteurs = np.atleast_2d(np.asarray(recepteurs, dtype=float))
+    if recepteurs.shape[1] == 2:
+        recepteurs = np.column_stack([recepteurs, np.zeros(len(recepteurs))])
+    if not len(sources):
+        # Aucune source : énergie nulle, comme modeles_sources.niveaux_recepteurs
+        return np.full(len(recepteurs), -np.inf)
+
+    positions = np.array([s.position for s in sources])
+    axes = np.array([s.axe for s in sources])
+    indices = np.array([table.index[s.motif] for s in sources])[:, np.newaxis]
+    # Lw + 10 x log10(Q) - 11, constant par source
+    niveaux_base = np.array([s.lw + 10 * math.log10(s.facteur_q) - 11 for s in sources])[:, np.newaxis]
+
+    resultat = np.empty(len(recepteurs))
+    taille_bloc = max(1, TAILLE_BLOC // len(sources))
+    for debut in range(0, len(recepteurs), taille_bloc):
+        bloc = recepteurs[debut:debut + taille_bloc]
+        vecteurs = bloc[np.newaxis, :, :] - positions[:, np.newaxis, :]
+        d2 = np.maximum(np.einsum('sni,sni->sn', vecteurs, vecteurs), 1e-4)
+        cosinus = np.einsum('sni,si->sn', vecteurs, axes) / np.sqrt(d2)
+        angles = np.degrees(np.arccos(np.clip(cosinus, -1.0, 1.0)))
+
+        niveaux = niveaux_base - 10 * np.log10(d2) + table.corrections(indices, angles)
+        resultat[debut:debut + taille_bloc] = 10 * np.log10(np.sum(np.power(10.0, niveaux / 10), axis=0))
+
+    return resultat
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Export des résultats d'études en JSON et HTML pour les tableaux de bord
+Documents construits à partir du même ResultatEtude que le rapport PDF, modèles
+HTML compilés une seule fois et lots écrits en flux, sans passer par ReportLab
+"""
+
+import html
+import json
+import math
+import os
+from string import Template
+
+from resultats import CHAMPS_RESULTAT
+
+FORMAT_EXPORT = "calculateur-acoustique-resultats"
+VERSION_EXPORT = 1
+
+EXTENSIONS_EXPORT = ('.json', '.jsonl', '.html', '.htm')
+
+# Champs de self.data repris dans les exports
+CHAMPS_PROJET = ('nom_projet', 'localisation', 'equipement', 'zone_sensibilite')
+CHAMPS_PARAMETRES = ('lp1', 'distance_ref', 'distance_cible', 'type_source', 'mode_calcul',
+                     'puissance_sonore', 'facteur_q', 'k1_jour', 'k1_nuit', 'k2', 'k3', 'reflexion')
+
+# Décimales conservées pour les niveaux (les lots sont calculés en float32)
+DECIMALES = 2
+
+# Encodeurs réutilisés : compact pour les lots, indenté pour une étude seule
+_JSON_COMPACT = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+_JSON_LISIBLE = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+# --- Modèles HTML (string.Template), compilés au chargement du module ---
+
+_STYLE_HTML = """
+body { font-family: Helvetica, Arial, sans-serif; font-size: 14px; color: #222; margin: 2em; }
+h1 { color: #1f4e79; font-size: 1.5em; }
+h2 { color: #1f4e79; font-size: 1.15em; border-bottom: 1px solid #1f4e79; }
+table { border-collapse: collapse; margin: 0.5em 0 1.5em; }
+th { background: #1f4e79; color: #fff; }
+th, td { border: 1px solid #c8d3e0; padding: 4px 8px; }
+td.nombre { text-align: right; }
+.conforme { background: #d4edda; }
+.non-conforme { background: #f8d7da; }
+"""
+
+MODELE_DEBUT = Template("""<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>$titre</title>
+<style>$style</style>
+</head>
+<body>
+<h1>$titre</h1>
+""")
+
+MODELE_FIN = Template("""<p>$resume</p>
+</body>
+</html>
+""")
+
+MODELE_ETUDE = Template("""<h2>$nom_projet</h2>
+<table>
+<tr><th>Localisation</th><td>$localisation</td></tr>
+<tr><th>Equipement</th><td>$equipement</td></tr>
+<tr><th>Date de l'etude</th><td>$date_etude</td></tr>
+<tr><th>Degre de sensibilite</th><td>$zone_sensibilite</td></tr>
+</table>
+<table>
+<tr><th>Lp1</th><th>Distance ref.</th><th>Distance cible</th><th>Attenuation</th><th>Lpx</th></tr>
+<tr><td class="nombre">$lp1 dB(A)</td><td class="nombre">$distance_ref m</td><td class="nombre">$distance_cible m</td>
+<td class="nombre">$attenuation dB(A)</td><td class="nombre">$lpx dB(A)</td></tr>
+</table>
+<table>
+<tr><th>Periode</th><th>Lr</th><th>Limite OPB</th><th>Conformite</th></tr>
+<tr class="$classe_jour"><td>Jour (07h-22h)</td><td class="nombre">$lr_jour dB(A)</td><td class="nombre">$limite_jour dB(A)</td><td>$statut_jour</td></tr>
+<tr class="$classe_nuit"><td>Nuit (22h-07h)</td><td class="nombre">$lr_nuit dB(A)</td><td class="nombre">$limite_nuit dB(A)</td><td>$statut_nuit</td></tr>
+</table>
+""")
+
+ENTETE_LOT = """<table>
+<tr><th>N°</th><th>Projet</th><th>Localisation</th><th>Equipement</th><th>DS</th>
+<th>Lr jour</th><th>Limite jour</th><th>Lr nuit</th><th>Limite nuit</th><th>Conformite</th></tr>
+"""
+
+MODELE_LIGNE_LOT = Template("""<tr class="$classe"><td class="nombre">$numero</td><td>$nom_projet</td><td>$localisation</td>\
+<td>$equipement</td><td>$zone_sensibilite</td><td class="nombre">$lr_jour</td><td class="nombre">$limite_jour</td>\
+<td class="nombre">$lr_nuit</td><td class="nombre">$limite_nuit</td><td>$statut</td></tr>
+""")
+
+
+def _valeur(valeur):
+    """Valeur JSON : flottants arrondis, NaN en null, scalaires NumPy convertis"""
+    if isinstance(valeur, bool) or valeur is None or isinstance(valeur, str):
+        return valeur
+    if hasattr(valeur, 'item'):
+        valeur = valeur.item()
+        if isinstance(valeur, bool):
+            return valeur
+    valeur = float(valeur)
+    return None if math.isnan(valeur) else round(valeur, DECIMALES)
+
+
+def _document(donnees, date_etude, valeurs):
+    """Document d'export d'une étude : projet, paramètres et résultats (valeurs : {champ de CHAMPS_RESULTAT})"""
+    resultats = {champ: _valeur(valeurs[champ]) for champ in CHAMPS_RESULTAT}
+    resultats['conforme'] = bool(resultats['conforme_jour'] and resultats['conforme_nuit'])
+    projet = {champ: donnees.get(champ) for champ in CHAMPS_PROJET}
+    projet['date_etude'] = date_etude
+    return {
+        'projet': projet,
+        'parametres': {champ: _valeur(donnees.get(champ)) for champ in CHAMPS_PARAMETRES},
+        'resultats': resultats,
+    }
+
+
+def document_resultat(resultats, date_etude=None):
+    """Document d'export d'un ResultatEtude (celui de effectuer_calculs et du rapport PDF)"""
+    return _document(resultats['parametres'], date_etude, resultats)
+
+
+def documents_lot(lot, dates=None):
+    """Documents d'export d'un LotResultats, dates : date de chaque étude (ou None)
+
+    Les colonnes du lot (étiquettes décodées une fois) sont converties en
+    listes Python ; les documents sont produits un par un, sans liste intermédiaire.
+    """
+    champs = CHAMPS_PROJET + CHAMPS_PARAMETRES
+    colonnes = [lot.colonne(champ).tolist() for champ in champs + CHAMPS_RESULTAT]
+    dates = dates if dates is not None else [None] * len(lot)
+    for date_etude, valeurs in zip(dates, zip(*colonnes)):
+        donnees = dict(zip(champs, valeurs[:len(champs)]))
+        yield _document(donnees, date_etude, dict(zip(CHAMPS_RESULTAT, valeurs[len(champs):])))
+
+
+def json_resultat(resultats, date_etude=None):
+    """Texte JSON d'une étude, avec l'en-tête de format"""
+    document = {'format': FORMAT_EXPORT, 'version': VERSION_EXPORT, 'etude': document_resultat(resultats, date_etude)}
+    return _JSON_LISIBLE.encode(document) + "\n"
+
+
+def flux_json(documents, lignes_json=False):
+    """Morceaux de texte JSON d'un lot
+
+    Par défaut un document {"format", "version", "etudes": [...]} écrit au fil
+    de l'eau ; avec lignes_json, une étude JSON par ligne (JSON Lines), que
+    les tableaux de bord peuvent lire sans charger tout le fichier.
+    """
+    if lignes_json:
+        for document in documents:
+            yield _JSON_COMPACT.encode(document) + "\n"
+        return
+    yield f'{{"format":"{FORMAT_EXPORT}","version":{VERSION_EXPORT},"etudes":[\n'
+    separateur = ""
+    for document in documents:
+        yield separateur + _JSON_COMPACT.encode(document)
+        separateur = ",\n"
+    yield "\n]}\n"
+
+
+def _texte(valeur):
+    return html.escape(str(valeur)) if valeur is not None else ""
+
+
+def _nombre(valeur, decimales=1):
+    return f"{valeur:.{decimales}f}" if valeur is not None else "-"
+
+
+def _statut(conforme):
+    return ("conforme", "CONFORME") if conforme else ("non-conforme", "NON CONFORME")
+
+
+def html_resultat(resultats, date_etude=None):
+    """Page HTML d'une étude, au contenu du rapport PDF (sans les sections rédigées)"""
+    document = document_resultat(resultats, date_etude)
+    projet, parametres, valeurs = document['projet'], document['parametres'], document['resultats']
+    classe_jour, statut_jour = _statut(valeurs['conforme_jour'])
+    classe_nuit, statut_nuit = _statut(valeurs['conforme_nuit'])
+    corps = MODELE_ETUDE.substitute(
+        {champ: _texte(projet[champ]) for champ in projet},
+        lp1=_nombre(parametres['lp1']), distance_ref=_nombre(parametres['distance_ref']),
+        distance_cible=_nombre(parametres['distance_cible']),
+        attenuation=_nombre(valeurs['attenuation'], 2), lpx=_nombre(valeurs['lpx'], 2),
+        lr_jour=_nombre(valeurs['lr_jour']), lr_nuit=_nombre(valeurs['lr_nuit']),
+        limite_jour=_nombre(valeurs['limite_jour'], 0), limite_nuit=_nombre(valeurs['limite_nuit'], 0),
+        classe_jour=classe_jour, statut_jour=statut_jour, classe_nuit=classe_nuit, statut_nuit=statut_nuit,
+    )
+    resume = "Installation conforme aux normes OPB" if valeurs['conforme'] else "Mesures d'attenuation necessaires"
+    return (MODELE_DEBUT.substitute(titre="Etude acoustique environnementale", style=_STYLE_HTML)
+            + corps + MODELE_FIN.substitute(resume=resume))
+
+
+def flux_html(documents, titre="Resultats des etudes acoustiques"):
+    """Morceaux d'une page HTML récapitulative d'un lot (une ligne de tableau par étude)"""
+    yield MODELE_DEBUT.substitute(titre=_texte(titre), style=_STYLE_HTML)
+    yield ENTETE_LOT
+    nombre = non_conformes = 0
+    for nombre, document in enumerate(documents, start=1):
+        projet, valeurs = document['projet'], document['resultats']
+        classe, statut = _statut(valeurs['conforme'])
+        non_conformes += not valeurs['conforme']
+        yield MODELE_LIGNE_LOT.substitute(
+            numero=nombre, nom_projet=_texte(projet['nom_projet']), localisation=_texte(projet['localisation']),
+            equipement=_texte(projet['equipement']),
+            zone_sensibilite=_texte((projet['zone_sensibilite'] or '').split('(')[0].strip()),
+            lr_jour=_nombre(valeurs['lr_jour']), limite_jour=_nombre(valeurs['limite_jour'], 0),
+            lr_nuit=_nombre(valeurs['lr_nuit']), limite_nuit=_nombre(valeurs['limite_nuit'], 0),
+            classe=classe, statut=statut,
+        )
+    yield "</table>\n"
+    yield MODELE_FIN.substitute(resume=f"{nombre} etude(s), {non_conformes} non conforme(s)")
+
+
+def _format_export(chemin):
+    extension = os.path.splitext(chemin)[1].lower()
+    if extension not in EXTENSIONS_EXPORT:
+        raise ValueError(f"Format d'export non reconnu : {chemin} ({', '.join(EXTENSIONS_EXPORT)})")
+    return extension
+
+
+def exporter_resultat(chemin, resultats, date_etude=None):
+    """Écrit l'export d'une étude au format déduit de l'extension (.json ou .html)"""
+    extension = _format_export(chemin)
+    if extension == '.jsonl':
+        texte = _JSON_COMPACT.encode(document_resultat(resultats, date_etude)) + "\n"
+    elif extension == '.json':
+        texte = json_resultat(resultats, date_etude)
+    else:
+        texte = html_resultat(resultats, date_etude)
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write(texte)
+    return chemin
+
+
+def exporter_lot(chemin, lot, dates=None):
+    """Écrit en flux l'export d'un LotResultats (.json, .jsonl ou .html) ; retourne le nombre d'études"""
+    extension = _format_export(chemin)
+    documents = documents_lot(lot, dates)
+    if extension in ('.html', '.htm'):
+        morceaux = flux_html(documents)
+    else:
+        morceaux = flux_json(documents, lignes_json=extension == '.jsonl')
+    with open(chemin, 'w', encoding='utf-8', buffering=1 << 20) as f:
+        f.writelines(morceaux)
+    return len(lot)
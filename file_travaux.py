@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+File locale de travaux (calculs, rapports PDF, lots du portefeuille)
+Table SQLite persistante, groupe borné de fils de travail, priorités,
+suivi de la progression, annulation et relance
+"""
+
+import json
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import datetime
+
+FICHIER_TRAVAUX = "travaux_acoustiques.db"
+
+# Une étude isolée passe devant les lots du portefeuille
+PRIORITE_ETUDE = 10
+PRIORITE_LOT = 0
+
+EN_ATTENTE = 'en_attente'
+EN_COURS = 'en_cours'
+TERMINE = 'termine'
+ECHEC = 'echec'
+ANNULE = 'annule'
+ETATS_FINAUX = (TERMINE, ECHEC, ANNULE)
+
+# Intervalle minimal (s) entre deux enregistrements de la progression d'un travail
+INTERVALLE_PROGRESSION = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS travaux (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    priorite INTEGER NOT NULL DEFAULT 0,
+    etat TEXT NOT NULL,
+    parametres TEXT,
+    progression REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    resultat TEXT,
+    erreur TEXT,
+    tentatives INTEGER NOT NULL DEFAULT 0,
+    cree_le TEXT,
+    debut TEXT,
+    fin TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_travaux_attente ON travaux (etat, priorite DESC, id);
+"""
+
+
+class TravailAnnule(Exception):
+    """Levée dans un travail en cours dont l'annulation a été demandée"""
+
+
+class FileTravaux:
+    """File de travaux persistante exécutée par un groupe borné de fils
+
+    Chaque type de travail est une fonction fonction(parametres, progression)
+    retournant un résultat sérialisable en JSON ; progression(fraction, message)
+    publie l'avancement et lève TravailAnnule si le travail a été annulé.
+    Les événements (id, état, progression, message) sont publiés dans
+    self.evenements (queue.Queue) ; avec evenements=False personne ne les
+    lit et rien n'est publié (self.evenements vaut None).
+    """
+
+    def __init__(self, chemin=FICHIER_TRAVAUX, fils=2, evenements=True):
+        self.chemin = chemin
+        self.fils = fils
+        self.types = {}
+        self.evenements = queue.Queue() if evenements else None
+        self._local = threading.local()
+        self._condition = threading.Condition()
+        self._annulations = set()
+        self._arret = False
+        self._travailleurs = []
+        self._limites = None
+        connexion = self._connexion()
+        with connexion:
+            connexion.executescript(SCHEMA)
+            # Travaux interrompus par un arrêt brutal : remis en attente
+            connexion.execute("UPDATE travaux SET etat = ?, progression = 0 WHERE etat = ?", (EN_ATTENTE, EN_COURS))
+
+    def _connexion(self):
+        """Connexion SQLite propre à chaque fil"""
+        connexion = getattr(self._local, 'connexion', None)
+        if connexion is None:
+            connexion = sqlite3.connect(self.chemin, timeout=30)
+            connexion.row_factory = sqlite3.Row
+            connexion.execute("PRAGMA journal_mode = WAL")
+            self._local.connexion = connexion
+        return connexion
+
+    def enregistrer_type(self, nom, fonction):
+        self.types[nom] = fonction
+
+    def soumettre(self, type_travail, parametres=None, priorite=PRIORITE_ETUDE):
+        """Ajoute un travail à la file, retourne son identifiant"""
+        if type_travail not in self.types:
+            raise KeyError(f"Type de travail inconnu : {type_travail}")
+        connexion = self._connexion()
+        with connexion:
+            curseur = connexion.execute(
+                "INSERT INTO travaux (type, priorite, etat, parametres, cree_le) VALUES (?, ?, ?, ?, ?)",
+                (type_travail, priorite, EN_ATTENTE, json.dumps(parametres, ensure_ascii=False),
+                 datetime.now().isoformat(timespec='seconds'))
+            )
+        self._publier(curseur.lastrowid, EN_ATTENTE, 0.0, None)
+        with self._condition:
+            # Fils limités à certains travaux : ceux soumis ensuite par cette file en font partie
+            if self._limites is not None:
+                self._limites.add(curseur.lastrowid)
+            self._condition.notify()
+        return curseur.lastrowid
+
+    def travail(self, identifiant):
+        """État d'un travail (dictionnaire), résultat décodé"""
+        ligne = self._connexion().execute("SELECT * FROM travaux WHERE id = ?", (identifiant,)).fetchone()
+        if ligne is None:
+            raise KeyError(f"Travail introuvable : {identifiant}")
+        travail = dict(ligne)
+        for champ in ('parametres', 'resultat'):
+            if travail[champ] is not None:
+                travail[champ] = json.loads(travail[champ])
+        return travail
+
+    def lister(self, etat=None):
+        """Travaux dans l'ordre d'exécution (priorité puis ancienneté)"""
+        requete = "SELECT id, type, priorite, etat, progression, message, tentatives FROM travaux"
+        valeurs = ()
+        if etat is not None:
+            requete += " WHERE etat = ?"
+            valeurs = (etat,)
+        requete += " ORDER BY priorite DESC, id"
+        return [dict(ligne) for ligne in self._connexion().execute(requete, valeurs)]
+
+    def annuler(self, identifiant):
+        """Annule un travail en attente, ou demande l'arrêt d'un travail en cours"""
+        connexion = self._connexion()
+        with connexion:
+            annule = connexion.execute(
+                "UPDATE travaux SET etat = ?, fin = ? WHERE id = ? AND etat = ?",
+                (ANNULE, datetime.now().isoformat(timespec='seconds'), identifiant, EN_ATTENTE)
+            ).rowcount
+        if annule:
+            self._publier(identifiant, ANNULE, None, None)
+            return True
+        if self.travail(identifiant)['etat'] == EN_COURS:
+            self._annulations.add(identifiant)
+            return True
+        return False
+
+    def relancer(self, identifiant, priorite=None):
+        """Remet en attente un travail en échec ou annulé"""
+        connexion = self._connexion()
+        with connexion:
+            relance = connexion.execute(
+                "UPDATE travaux SET etat = ?, progression = 0, message = NULL, erreur = NULL, "
+                "priorite = COALESCE(?, priorite) WHERE id = ? AND etat IN (?, ?)",
+                (EN_ATTENTE, priorite, identifiant, ECHEC, ANNULE)
+            ).rowcount
+        if relance:
+            self._publier(identifiant, EN_ATTENTE, 0.0, None)
+            with self._condition:
+                self._condition.notify()
+        return bool(relance)
+
+    def _publier(self, identifiant, etat, progression, message):
+        if self.evenements is None:
+            return
+        self.evenements.put((identifiant, etat, progression, message))
+
+    def _prendre(self):
+        """Réserve le prochain travail en attente (le plus prioritaire, puis le plus ancien)
+
+        Si les fils ont été démarrés pour des travaux précis, seuls ceux-ci sont pris.
+        """
+        connexion = self._connexion()
+        requete = "SELECT id, type, parametres FROM travaux WHERE etat = ?"
+        valeurs = (EN_ATTENTE,)
+        with self._condition:
+            limites = None if self._limites is None else tuple(self._limites)
+        if limites is not None:
+            requete += f" AND id IN ({', '.join('?' * len(limites))})"
+            valeurs += limites
+        requete += " ORDER BY priorite DESC, id LIMIT 1"
+        while True:
+            ligne = connexion.execute(requete, valeurs).fetchone()
+            if ligne is None:
+                return None
+            with connexion:
+                reserve = connexion.execute(
+                    "UPDATE travaux SET etat = ?, debut = ?, tentatives = tentatives + 1 WHERE id = ? AND etat = ?",
+                    (EN_COURS, datetime.now().isoformat(timespec='seconds'), ligne['id'], EN_ATTENTE)
+                ).rowcount
+            # Un autre fil a pu réserver le même travail entre-temps
+            if reserve:
+                return ligne
+
+    def _executer(self, ligne):
+        identifiant = ligne['id']
+        connexion = self._connexion()
+        dernier = [0.0]
+
+        def progression(fraction, message=None):
+            if identifiant in self._annulations:
+                raise TravailAnnule()
+            maintenant = time.monotonic()
+            if maintenant - dernier[0] >= INTERVALLE_PROGRESSION or fraction >= 1:
+                dernier[0] = maintenant
+                with connexion:
+                    connexion.execute("UPDATE travaux SET progression = ?, message = ? WHERE id = ?",
+                                      (fraction, message, identifiant))
+            self._publier(identifiant, EN_COURS, fraction, message)
+
+        self._publier(identifiant, EN_COURS, 0.0, None)
+        resultat, erreur = None, None
+        try:
+            resultat = self.types[ligne['type']](json.loads(ligne['parametres']), progression)
+            etat = TERMINE
+        except TravailAnnule:
+            etat = ANNULE
+        except Exception as e:
+            etat = ECHEC
+            erreur = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        self._annulations.discard(identifiant)
+
+        with connexion:
+            connexion.execute(
+                "UPDATE travaux SET etat = ?, progression = COALESCE(?, progression), resultat = ?, erreur = ?, "
+                "fin = ? WHERE id = ?",
+                (etat, 1.0 if etat == TERMINE else None, json.dumps(resultat, ensure_ascii=False), erreur,
+                 datetime.now().isoformat(timespec='seconds'), identifiant)
+            )
+        self._publier(identifiant, etat, 1.0 if etat == TERMINE else None, erreur)
+
+    def _boucle(self):
+        while True:
+            with self._condition:
+                if self._arret:
+                    return
+            ligne = self._prendre()
+            if ligne is None:
+                with self._condition:
+                    if self._arret:
+                        return
+                    self._condition.wait(timeout=1.0)
+                continue
+            self._executer(ligne)
+
+    def demarrer(self, identifiants=None):
+        """Lance les fils de travail (au plus self.fils travaux simultanés)
+
+        identifiants limite les fils à ces travaux et à ceux soumis ensuite
+        par cette instance : les autres travaux en attente de la file
+        persistante restent pour une exécution ultérieure.
+        """
+        if self._travailleurs:
+            return
+        self._arret = False
+        self._limites = None if identifiants is None else set(identifiants)
+        for _ in range(self.fils):
+            fil = threading.Thread(target=self._boucle, daemon=True)
+            fil.start()
+            self._travailleurs.append(fil)
+
+    def attendre(self, identifiant, delai=None):
+        """Attend la fin d'un travail, retourne son état final (dictionnaire)"""
+        fin = None if delai is None else time.monotonic() + delai
+        while True:
+            travail = self.travail(identifiant)
+            if travail['etat'] in ETATS_FINAUX or (fin is not None and time.monotonic() >= fin):
+                return travail
+            time.sleep(0.1)
+
+    def arreter(self):
+        """Termine les travaux en cours puis arrête les fils (les travaux en attente restent en file)"""
+        with self._condition:
+            self._arret = True
+            self._condition.notify_all()
+        for fil in self._travailleurs:
+            fil.join()
+        self._travailleurs = []
+
+    def __enter__(self):
+        self.demarrer()
+        return self
+
+    def __exit__(self, *exception):
+        self.arreter()
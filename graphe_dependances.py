@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Graphe de dépendances d'une étude acoustique
+Entrées -> atténuation -> Lpx -> Lr jour/nuit -> conformité -> sections du rapport :
+modifier une entrée ne recalcule que les nœuds en aval, et seulement si nécessaire
+"""
+
+from directivite import lpx_depuis_puissance
+from modeles_sources import calculer_attenuation_source
+from resultats import ResultatEtude
+
+
+def _egales(a, b):
+    """Égalité tolérante aux valeurs non comparables (tableaux NumPy, objets)"""
+    if a is b:
+        return True
+    try:
+        return bool(a == b)
+    except (ValueError, TypeError):
+        return False
+
+
+class _Noeud:
+    __slots__ = ('nom', 'fonction', 'dependances', 'valeur', 'calcule', 'modifie_a', 'verifie_a')
+
+    def __init__(self, nom, fonction, dependances):
+        self.nom = nom
+        self.fonction = fonction
+        self.dependances = tuple(dependances)
+        self.valeur = None
+        self.calcule = False
+        self.modifie_a = 0
+        self.verifie_a = -1
+
+
+class GrapheDependances:
+    """Nœuds d'entrée et nœuds calculés, évalués à la demande avec cache
+
+    Chaque modification d'entrée incrémente une révision. Un nœud calculé
+    n'est réévalué que si l'une de ses dépendances a changé depuis sa
+    dernière vérification ; s'il retrouve la même valeur, les nœuds en aval
+    conservent leur cache (arrêt anticipé de la propagation).
+    """
+
+    def __init__(self):
+        self.noeuds = {}
+        self.aval = {}
+        self.revision = 0
+        self.recalculs = []
+
+    def __contains__(self, nom):
+        return nom in self.noeuds
+
+    def definir_entree(self, nom, valeur):
+        """Crée ou modifie un nœud d'entrée, retourne True si sa valeur a changé"""
+        noeud = self.noeuds.get(nom)
+        if noeud is None:
+            noeud = self.noeuds[nom] = _Noeud(nom, None, ())
+            self.aval.setdefault(nom, [])
+        elif noeud.fonction is not None:
+            raise KeyError(f"Le nœud '{nom}' est calculé, il ne peut pas être modifié directement")
+        elif noeud.calcule and _egales(noeud.valeur, valeur):
+            return False
+        self.revision += 1
+        noeud.valeur = valeur
+        noeud.calcule = True
+        noeud.modifie_a = noeud.verifie_a = self.revision
+        return True
+
+    def ajouter_noeud(self, nom, fonction, dependances):
+        """Nœud calculé : fonction({dépendance: valeur}) -> valeur"""
+        if nom in self.noeuds:
+            raise KeyError(f"Nœud déjà défini : {nom}")
+        self.noeuds[nom] = _Noeud(nom, fonction, dependances)
+        self.aval.setdefault(nom, [])
+        for dependance in dependances:
+            self.aval.setdefault(dependance, []).append(nom)
+
+    def _noeud(self, nom):
+        noeud = self.noeuds.get(nom)
+        if noeud is None:
+            # Entrée optionnelle jamais définie (par exemple un champ absent de self.data)
+            self.definir_entree(nom, None)
+            noeud = self.noeuds[nom]
+        return noeud
+
+    def valeur(self, nom):
+        """Valeur d'un nœud, recalculée uniquement si une dépendance a changé"""
+        noeud = self._noeud(nom)
+        if noeud.fonction is None or noeud.verifie_a == self.revision:
+            return noeud.valeur
+
+        valeurs = {dependance: self.valeur(dependance) for dependance in noeud.dependances}
+        if noeud.calcule and all(self.noeuds[d].modifie_a <= noeud.verifie_a for d in noeud.dependances):
+            noeud.verifie_a = self.revision
+            return noeud.valeur
+
+        valeur = noeud.fonction(valeurs)
+        self.recalculs.append(nom)
+        if not noeud.calcule or not _egales(noeud.valeur, valeur):
+            noeud.valeur = valeur
+            noeud.modifie_a = self.revision
+        noeud.calcule = True
+        noeud.verifie_a = self.revision
+        return noeud.valeur
+
+    def descendants(self, nom):
+        """Nœuds situés en aval d'un nœud (potentiellement à recalculer)"""
+        vus, pile = set(), list(self.aval.get(nom, ()))
+        while pile:
+            suivant = pile.pop()
+            if suivant not in vus:
+                vus.add(suivant)
+                pile.extend(self.aval.get(suivant, ()))
+        return vus
+
+
+def _attenuation_distance(v):
+    """Atténuation géométrique entre la distance de référence et la distance cible"""
+    if v['mode_calcul'] == 'puissance':
+        return None
+    return calculer_attenuation_source(
+        v['type_source'] or 'ponctuelle', v['distance_ref'], v['distance_cible'],
+        v['longueur_source'], v['largeur_source']
+    )
+
+
+def _lpx(v):
+    if v['mode_calcul'] == 'puissance':
+        return lpx_depuis_puissance(v['puissance_sonore'], v['distance_cible'], v['facteur_q'])
+    return v['lp1'] + v['attenuation_distance']
+
+
+def _attenuation(v):
+    if v['mode_calcul'] == 'puissance':
+        return v['lpx'] - v['puissance_sonore']
+    return v['attenuation_distance']
+
+
+def ajouter_noeuds_calcul(graphe):
+    """Nœuds des calculs de effectuer_calculs : atténuation, Lpx, Lr et conformité"""
+    graphe.ajouter_noeud('attenuation_distance', _attenuation_distance,
+                         ('mode_calcul', 'type_source', 'distance_ref', 'distance_cible',
+                          'longueur_source', 'largeur_source'))
+    graphe.ajouter_noeud('lpx', _lpx, ('mode_calcul', 'puissance_sonore', 'distance_cible', 'facteur_q',
+                                       'lp1', 'attenuation_distance'))
+    graphe.ajouter_noeud('attenuation', _attenuation,
+                         ('mode_calcul', 'lpx', 'puissance_sonore', 'attenuation_distance'))
+    graphe.ajouter_noeud('corrections', lambda v: v['k2'] + v['k3'] + v['reflexion'], ('k2', 'k3', 'reflexion'))
+    graphe.ajouter_noeud('lr_jour', lambda v: v['lpx'] + v['k1_jour'] + v['corrections'],
+                         ('lpx', 'k1_jour', 'corrections'))
+    graphe.ajouter_noeud('lr_nuit', lambda v: v['lpx'] + v['k1_nuit'] + v['corrections'],
+                         ('lpx', 'k1_nuit', 'corrections'))
+    graphe.ajouter_noeud('conforme_jour', lambda v: v['lr_jour'] <= v['limite_jour'], ('lr_jour', 'limite_jour'))
+    graphe.ajouter_noeud('conforme_nuit', lambda v: v['lr_nuit'] <= v['limite_nuit'], ('lr_nuit', 'limite_nuit'))
+
+
+def resultats_graphe(graphe, donnees):
+    """ResultatEtude équivalent à effectuer_calculs, lu dans le graphe
+
+    Les paramètres du résultat sont une référence aux données de l'étude
+    (pas de copie) : un résultat est relu aussitôt, avant toute nouvelle saisie.
+    """
+    valeur = graphe.valeur
+    return ResultatEtude(
+        valeur('attenuation'), valeur('lpx'), valeur('lr_jour'), valeur('lr_nuit'),
+        valeur('limite_jour'), valeur('limite_nuit'),
+        valeur('conforme_jour'), valeur('conforme_nuit'),
+        donnees
+    )
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Table versionnée des limites réglementaires par degré de sensibilité
+Jeux de limites (valeurs par défaut des études, OPB annexe 6 : planification,
+immission, alarme) et contrôles de conformité vectorisés sur des tableaux
+"""
+
+import json
+import numpy as np
+
+VERSION_TABLE = 1
+
+LIBELLES_DEGRES = {
+    1: "DS I (Zone de silence)",
+    2: "DS II (Zone d'habitation)",
+    3: "DS III (Zone mixte)",
+    4: "DS IV (Zone industrielle)",
+}
+
+# Degré des récepteurs sans zone attribuée (limites NaN)
+HORS_ZONAGE = 0
+
+# Période nuit de l'OPB : 22h00 - 07h00
+HEURE_DEBUT_NUIT = 22
+HEURE_FIN_NUIT = 7
+
+_CHIFFRES_ROMAINS = {'I': 1, 'II': 2, 'III': 3, 'IV': 4}
+
+# Jeux de limites : (nom, version, libellé, référence, {degré: (jour, nuit) dB(A)})
+JEUX_LIMITES = (
+    ('etude', 1, "Limites par défaut des études", "Valeurs proposées par le calculateur",
+     {1: (45.0, 35.0), 2: (55.0, 45.0), 3: (60.0, 50.0), 4: (65.0, 55.0)}),
+    ('opb_planification', 1, "Valeurs de planification", "OPB (RS 814.41), annexe 6",
+     {1: (50.0, 40.0), 2: (55.0, 45.0), 3: (60.0, 50.0), 4: (65.0, 55.0)}),
+    ('opb_immission', 1, "Valeurs limites d'immission", "OPB (RS 814.41), annexe 6",
+     {1: (55.0, 45.0), 2: (60.0, 50.0), 3: (65.0, 55.0), 4: (70.0, 60.0)}),
+    ('opb_alarme', 1, "Valeurs d'alarme", "OPB (RS 814.41), annexe 6",
+     {1: (65.0, 60.0), 2: (70.0, 65.0), 3: (70.0, 65.0), 4: (75.0, 70.0)}),
+)
+
+JEU_DEFAUT = 'etude'
+
+# Seuils croissants de l'OPB : classer() compte les seuils dépassés
+ECHELLE_OPB = ('opb_planification', 'opb_immission', 'opb_alarme')
+
+
+def degre_depuis_texte(valeur):
+    """Degré 1-4 depuis 2, '2', 'II', 'DS II' ou "DS II (Zone d'habitation)" """
+    if isinstance(valeur, (int, float, np.integer)) and not isinstance(valeur, bool):
+        degre = int(valeur)
+    else:
+        texte = str(valeur).strip().upper()
+        texte = texte[2:].strip() if texte.startswith('DS') else texte
+        texte = texte.split()[0] if texte else texte
+        degre = int(texte) if texte.isdigit() else _CHIFFRES_ROMAINS.get(texte)
+    if degre not in LIBELLES_DEGRES:
+        raise ValueError(f"Degré de sensibilité invalide : {valeur!r}")
+    return degre
+
+
+def _degre_ou_hors_zonage(zone):
+    try:
+        return degre_depuis_texte(zone)
+    except ValueError:
+        return HORS_ZONAGE
+
+
+def degres_depuis_zones(zones):
+    """Degrés (tableau int8) d'un tableau de libellés zone_sensibilite, HORS_ZONAGE si non reconnu"""
+    zones = np.asarray(zones, dtype=object)
+    uniques, inverse = np.unique(zones.astype(str), return_inverse=True)
+    degres = np.array([_degre_ou_hors_zonage(zone) for zone in uniques], dtype=np.int8)
+    return degres[inverse].reshape(zones.shape)
+
+
+class TableLimites:
+    """Jeux de limites empilés : valeurs[jeu, degré, période] (période 0 = jour, 1 = nuit)
+
+    Un jeu peut exister en plusieurs versions ; sans version précisée, la plus
+    récente est utilisée. La ligne du degré HORS_ZONAGE vaut NaN, de sorte que
+    les récepteurs sans zone ne sont jamais déclarés conformes.
+    """
+
+    def __init__(self, jeux=JEUX_LIMITES):
+        self.entrees = []
+        self.index = {}
+        self.derniere = {}
+        self.valeurs = np.zeros((0, max(LIBELLES_DEGRES) + 1, 2))
+        for nom, version, libelle, reference, valeurs in jeux:
+            self.ajouter_jeu(nom, version, libelle, valeurs, reference)
+
+    def ajouter_jeu(self, nom, version, libelle, valeurs, reference=""):
+        """Ajoute un jeu de limites {degré: (jour, nuit)} ; tous les degrés sont requis"""
+        ligne = np.full((max(LIBELLES_DEGRES) + 1, 2), np.nan)
+        for degre, (jour, nuit) in valeurs.items():
+            ligne[degre_depuis_texte(degre)] = (float(jour), float(nuit))
+        if np.isnan(ligne[list(LIBELLES_DEGRES)]).any():
+            raise ValueError(f"Jeu de limites '{nom}' incomplet : degrés I à IV requis")
+        if (nom, version) in self.index:
+            raise KeyError(f"Jeu de limites déjà défini : {nom} version {version}")
+
+        self.index[(nom, version)] = len(self.entrees)
+        self.entrees.append({'nom': nom, 'version': version, 'libelle': libelle, 'reference': reference})
+        self.valeurs = np.concatenate([self.valeurs, ligne[np.newaxis]])
+        if nom not in self.derniere or version > self.entrees[self.derniere[nom]]['version']:
+            self.derniere[nom] = self.index[(nom, version)]
+        return self.index[(nom, version)]
+
+    @classmethod
+    def depuis_json(cls, chemin, avec_defaut=True):
+        """Table complétée par des jeux JSON [{"nom", "version", "libelle", "reference", "valeurs"}]"""
+        with open(chemin, 'r', encoding='utf-8') as f:
+            contenu = json.load(f)
+        table = cls() if avec_defaut else cls(())
+        for jeu in contenu.get('jeux', contenu) if isinstance(contenu, dict) else contenu:
+            try:
+                table.ajouter_jeu(jeu['nom'], jeu.get('version', 1), jeu.get('libelle', jeu['nom']),
+                                  jeu['valeurs'], jeu.get('reference', ""))
+            except (TypeError, AttributeError) as e:
+                raise ValueError(f"Jeu de limites invalide dans {chemin} : {e}")
+        return table
+
+    def indice(self, jeu, version=None):
+        try:
+            return self.derniere[jeu] if version is None else self.index[(jeu, version)]
+        except KeyError:
+            raise KeyError(f"Jeu de limites inconnu : {jeu}" + (f" version {version}" if version else ""))
+
+    def jeu(self, jeu, version=None):
+        """Description du jeu (nom, version, libellé, référence)"""
+        return self.entrees[self.indice(jeu, version)]
+
+    def limites(self, degres, jeu=JEU_DEFAUT, version=None):
+        """Limites (jour, nuit) dB(A) pour un degré ou un tableau de degrés"""
+        valeurs = self.valeurs[self.indice(jeu, version)][np.asarray(degres, dtype=np.intp)]
+        return valeurs[..., 0], valeurs[..., 1]
+
+    def _seuils(self, degres, jeux):
+        """Seuils (jeux, ..., 2) pour des degrés (...) en une lecture indexée"""
+        jeux = (jeux,) if isinstance(jeux, str) else tuple(jeux)
+        indices = np.array([self.indice(jeu) for jeu in jeux], dtype=np.intp)
+        degres = np.asarray(degres, dtype=np.intp)
+        return self.valeurs[indices.reshape((-1,) + (1,) * degres.ndim), degres]
+
+    def conformite(self, lr_jour, lr_nuit, degres, jeux=ECHELLE_OPB):
+        """Conformité jour et nuit vis-à-vis de plusieurs jeux : deux tableaux booléens (jeux, ...)"""
+        seuils = self._seuils(degres, jeux)
+        return np.asarray(lr_jour) <= seuils[..., 0], np.asarray(lr_nuit) <= seuils[..., 1]
+
+    def classer(self, lr_jour, lr_nuit, degres, jeux=ECHELLE_OPB):
+        """Nombre de seuils croissants dépassés le jour ou la nuit (0 = tous respectés)
+
+        Avec ECHELLE_OPB : 0 sous les valeurs de planification, 1 au-delà,
+        2 au-delà des valeurs limites d'immission, 3 au-delà des valeurs
+        d'alarme. -1 pour les récepteurs hors zonage.
+        """
+        conforme_jour, conforme_nuit = self.conformite(lr_jour, lr_nuit, degres, jeux)
+        classes = np.count_nonzero(~(conforme_jour & conforme_nuit), axis=0)
+        return np.where(np.asarray(degres) == HORS_ZONAGE, -1, classes)
+
+    def zone(self, degre, jeu=JEU_DEFAUT):
+        """Libellé zone_sensibilite et limites (jour, nuit) d'un degré"""
+        degre = degre_depuis_texte(degre)
+        jour, nuit = self.limites(degre, jeu)
+        return LIBELLES_DEGRES[degre], float(jour), float(nuit)
+
+
+TABLE_LIMITES = TableLimites()
+
+
+def zone_sensibilite(degre, jeu=JEU_DEFAUT):
+    """Libellé zone_sensibilite et limites (jour, nuit) d'un degré dans la table par défaut"""
+    return TABLE_LIMITES.zone(degre, jeu)
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Lecture des exports CSV de sonomètre (LAeq 1 s ou 100 ms) par blocs
+Horodatages et niveaux décodés octet par octet avec NumPy, Leq jour (07h-22h)
+et nuit (22h-07h) cumulés par journée sans charger le fichier en mémoire
+"""
+
+import re
+import numpy as np
+
+from modeles_sources import en_niveau
+from limites_reglementaires import HEURE_DEBUT_NUIT, HEURE_FIN_NUIT
+
+# Taille des blocs lus (octets) : quelques dizaines de Mo de tableaux de travail au plus
+TAILLE_BLOC = 8 * 1024 * 1024
+
+# Longueur maximale du champ de niveau (« 102.35 »)
+LARGEUR_NIVEAU = 8
+
+DUREE_JOUR_H = HEURE_DEBUT_NUIT - HEURE_FIN_NUIT
+DUREE_NUIT_H = 24 - DUREE_JOUR_H
+
+# Horodatages reconnus : 2025-07-10 14:00:00.1 ou 10.07.2025;14:00:00,100
+MOTIF_ISO = re.compile(r"(\d{4})-(\d{2})-(\d{2})[T ;,\t](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,3}))?")
+MOTIF_EUROPEEN = re.compile(r"(\d{2})[./](\d{2})[./](\d{4})[T ;,\t](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,3}))?")
+
+
+class FormatHorodatage:
+    """Position des chiffres de l'horodatage dans une ligne (largeur fixe)"""
+
+    def __init__(self, ligne, separateur):
+        for motif, ordre in ((MOTIF_ISO, (0, 1, 2)), (MOTIF_EUROPEEN, (2, 1, 0))):
+            correspondance = motif.match(ligne)
+            if correspondance is None:
+                continue
+            fraction = correspondance.group(7)
+            if fraction is not None and ligne[correspondance.start(7) - 1] == separateur:
+                # « 14:00:00,1 » avec la virgule comme séparateur : 1 est la colonne suivante
+                correspondance = motif.match(ligne[:correspondance.start(7) - 1])
+                fraction = None
+            groupes = [correspondance.span(ordre[0] + 1), correspondance.span(ordre[1] + 1),
+                       correspondance.span(ordre[2] + 1)] + [correspondance.span(i) for i in (4, 5, 6)]
+            self.champs = groupes
+            self.fraction = correspondance.span(7) if fraction is not None else None
+            self.largeur = correspondance.end()
+            # Date et heure dans deux colonnes : un séparateur de plus avant le niveau
+            self.colonnes = 2 if ligne[correspondance.end(3)] == separateur else 1
+            return
+        raise ValueError(f"Horodatage non reconnu : {ligne[:40]!r}")
+
+    def decoder(self, octets, debuts):
+        """Millisecondes depuis 1970 (heure locale de l'appareil) et masque des lignes valides"""
+        valides = np.ones(len(debuts), dtype=bool)
+        valeurs = []
+        for debut, fin in self.champs + ([self.fraction] if self.fraction else []):
+            chiffres = octets[debuts[:, np.newaxis] + np.arange(debut, fin)].astype(np.int64) - 48
+            valides &= ((chiffres >= 0) & (chiffres <= 9)).all(axis=1)
+            valeurs.append(chiffres @ (10 ** np.arange(fin - debut - 1, -1, -1)))
+        annee, mois, jour, heure, minute, seconde = valeurs[:6]
+        millisecondes = valeurs[6] * 10 ** (3 - (self.fraction[1] - self.fraction[0])) if self.fraction else 0
+
+        # Jours depuis 1970 (calendrier grégorien proleptique, calcul entier vectorisé)
+        a = annee - (mois <= 2)
+        ere = np.floor_divide(a, 400)
+        annee_ere = a - ere * 400
+        jour_annee = (153 * (mois + np.where(mois > 2, -3, 9)) + 2) // 5 + jour - 1
+        jour_ere = annee_ere * 365 + annee_ere // 4 - annee_ere // 100 + jour_annee
+        jours = ere * 146097 + jour_ere - 719468
+
+        valides &= (mois >= 1) & (mois <= 12) & (jour >= 1) & (jour <= 31) & (heure < 24) & (minute < 60) & (seconde < 61)
+        return ((jours * 24 + heure) * 3600 + minute * 60 + seconde) * 1000 + millisecondes, valides
+
+
+def decoder_niveaux(octets, debuts, fins):
+    """Nombres décimaux (point ou virgule) entre debuts et fins, NaN si le champ est invalide"""
+    positions = debuts[:, np.newaxis] + np.arange(LARGEUR_NIVEAU)
+    dans_champ = positions < fins[:, np.newaxis]
+    caracteres = octets[np.minimum(positions, len(octets) - 1)]
+    # Espaces et guillemets ignorés, séparateur décimal « . » ou « , »
+    ignores = (caracteres == 32) | (caracteres == 34) | ~dans_champ
+    chiffres = caracteres.astype(np.int64) - 48
+    est_chiffre = (chiffres >= 0) & (chiffres <= 9) & dans_champ
+    est_decimal = ((caracteres == 46) | (caracteres == 44)) & dans_champ
+    valides = (est_chiffre | est_decimal | ignores).all(axis=1) & est_chiffre.any(axis=1) & (est_decimal.sum(axis=1) <= 1)
+
+    # Rang de chaque chiffre : puissance de 10 selon sa position par rapport au séparateur décimal
+    position_decimale = np.where(est_decimal.any(axis=1), np.argmax(est_decimal, axis=1), LARGEUR_NIVEAU)
+    rang_chiffre = np.cumsum(est_chiffre, axis=1) - 1
+    avant = np.where(est_chiffre & (np.arange(LARGEUR_NIVEAU) < position_decimale[:, np.newaxis]), 1, 0).sum(axis=1)
+    exposants = (avant[:, np.newaxis] - 1 - rang_chiffre).astype(float)
+    valeurs = np.where(est_chiffre, chiffres * np.power(10.0, exposants), 0.0).sum(axis=1)
+    return np.where(valides, valeurs, np.nan)
+
+
+class CampagneMesures:
+    """Énergie LAeq cumulée par journée d'évaluation et par période
+
+    La nuit du jour J va de 22h (J) à 07h (J+1). Les échantillons ont tous
+    la même durée (intervalle de l'appareil) : le Leq d'une période est la
+    moyenne énergétique des échantillons présents.
+    """
+
+    def __init__(self, chemin, intervalle_ms, jours, energie, echantillons, lignes_rejetees):
+        self.chemin = chemin
+        self.intervalle_ms = intervalle_ms
+        self.jours = jours
+        self.energie = energie
+        self.echantillons = echantillons
+        self.lignes_rejetees = lignes_rejetees
+
+    def _periode(self, periode):
+        try:
+            return ('jour', 'nuit').index(periode)
+        except ValueError:
+            raise KeyError(f"Période inconnue : {periode}")
+
+    def leq(self, periode):
+        """Leq de la période pour chaque journée (NaN sans mesure)"""
+        indice = self._periode(periode)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return en_niveau(self.energie[:, indice] / self.echantillons[:, indice])
+
+    def leq_global(self, periode):
+        """Leq de la période sur toute la campagne"""
+        indice = self._periode(periode)
+        total = self.echantillons[:, indice].sum()
+        return float(en_niveau(self.energie[:, indice].sum() / total)) if total else float('nan')
+
+    def couverture(self, periode):
+        """Part de chaque période effectivement mesurée (0 à 1)"""
+        duree_h = DUREE_JOUR_H if periode == 'jour' else DUREE_NUIT_H
+        return self.echantillons[:, self._periode(periode)] * self.intervalle_ms / (duree_h * 3600 * 1000)
+
+
+class FormatLignes:
+    """Séparateur, horodatage et rang de la colonne de niveau d'un export de sonomètre"""
+
+    def __init__(self, ligne, nom_colonnes=None, colonne_niveau='laeq'):
+        self.separateur = next((s for s in (';', '\t', ',') if s in ligne), ',')
+        self.horodatage = FormatHorodatage(ligne, self.separateur)
+        self.rang = 0
+        if nom_colonnes is not None:
+            noms = [nom.strip().strip('"').lower() for nom in nom_colonnes.split(self.separateur)]
+            trouves = [i for i, nom in enumerate(noms) if colonne_niveau.lower() in nom]
+            if trouves:
+                self.rang = trouves[0] - self.horodatage.colonnes
+        if self.rang < 0:
+            raise ValueError(f"Colonne de niveau « {colonne_niveau} » introuvable")
+
+    def decoder(self, bloc):
+        """Lignes complètes (uint8, chacune terminée par \\n) -> (instants ms, niveaux, lignes rejetées)"""
+        horodatage = self.horodatage
+        fins_lignes = np.flatnonzero(bloc == 10)
+        debuts = np.concatenate([[0], fins_lignes[:-1] + 1]).astype(np.int64)
+        fins = fins_lignes - (bloc[np.maximum(fins_lignes - 1, 0)] == 13)
+
+        # Lignes trop courtes (vides, pied de fichier) écartées
+        longues = fins - debuts > horodatage.largeur
+        rejetees = int(np.count_nonzero(~longues & (fins > debuts)))
+        debuts, fins = debuts[longues], fins[longues]
+        if not len(debuts):
+            return np.zeros(0, dtype=np.int64), np.zeros(0), rejetees
+
+        instants, valides = horodatage.decoder(bloc, debuts)
+
+        # Champ du niveau : entre le séparateur de rang voulu et le suivant (ou la fin de ligne)
+        separateurs = np.flatnonzero(bloc == ord(self.separateur))
+        if not len(separateurs):
+            return np.zeros(0, dtype=np.int64), np.zeros(0), rejetees + len(debuts)
+        premier = np.searchsorted(separateurs, debuts + horodatage.largeur)
+        indice = np.minimum(premier + self.rang, len(separateurs) - 1)
+        debut_champ = separateurs[indice] + 1
+        valides &= (premier + self.rang < len(separateurs)) & (debut_champ < fins)
+        suivant = separateurs[np.minimum(indice + 1, len(separateurs) - 1)]
+        fin_champ = np.where((indice + 1 < len(separateurs)) & (suivant < fins), suivant, fins)
+        niveaux = decoder_niveaux(bloc, debut_champ, np.minimum(fin_champ, debut_champ + LARGEUR_NIVEAU))
+        valides &= ~np.isnan(niveaux) & (fin_champ - debut_champ <= LARGEUR_NIVEAU)
+        rejetees += int(np.count_nonzero(~valides))
+        return instants[valides], niveaux[valides], rejetees
+
+
+def _entete(chemin, colonne_niveau):
+    """Format des lignes de mesure et position de la première d'entre elles"""
+    with open(chemin, 'rb') as f:
+        position = 0
+        nom_colonnes = None
+        for ligne_brute in f:
+            ligne = ligne_brute.decode('latin-1').rstrip('\r\n')
+            if MOTIF_ISO.match(ligne) or MOTIF_EUROPEEN.match(ligne):
+                try:
+                    return FormatLignes(ligne, nom_colonnes, colonne_niveau), position
+                except ValueError as e:
+                    raise ValueError(f"{chemin} : {e}")
+            # Lignes d'en-tête de l'appareil : la dernière avant les données porte les noms de colonnes
+            if ligne.strip():
+                nom_colonnes = ligne
+            position += len(ligne_brute)
+    raise ValueError(f"Aucune mesure horodatée dans {chemin}")
+
+
+def blocs_mesures(chemin, colonne_niveau='laeq', taille_bloc=TAILLE_BLOC):
+    """Parcourt un export CSV de sonomètre : (instants ms, niveaux, lignes rejetées) par bloc lu"""
+    format_lignes, position = _entete(chemin, colonne_niveau)
+    tampon = bytearray(taille_bloc)
+    reste = b""
+    with open(chemin, 'rb') as f:
+        f.seek(position)
+        while True:
+            lus = f.readinto(tampon)
+            if not lus and not reste:
+                return
+            bloc = np.frombuffer(reste + bytes(memoryview(tampon)[:lus]), dtype=np.uint8)
+            if lus:
+                # Dernière ligne incomplète reportée au bloc suivant
+                fin_derniere = len(bloc) - 1 - np.argmax(bloc[::-1] == 10) if (bloc == 10).any() else -1
+                reste = bloc[fin_derniere + 1:].tobytes()
+                if fin_derniere < 0:
+                    continue
+                bloc = bloc[:fin_derniere + 1]
+            else:
+                reste = b""
+                bloc = np.append(bloc, np.uint8(10))
+            yield format_lignes.decoder(bloc)
+            if not lus:
+                return
+
+
+def intervalle_echantillons(instants):
+    """Durée d'un échantillon (ms) : plus petit écart positif entre deux horodatages"""
+    ecarts = np.diff(instants)
+    ecarts = ecarts[ecarts > 0]
+    return int(ecarts.min()) if len(ecarts) else None
+
+
+def lire_campagne(chemin, colonne_niveau='laeq', taille_bloc=TAILLE_BLOC):
+    """Lit un export CSV de sonomètre par blocs et cumule les Leq jour / nuit par journée
+
+    colonne_niveau : partie du nom de la colonne des niveaux (« LAeq » par défaut) ;
+    sans ligne de noms, la première colonne après l'horodatage est retenue.
+    """
+    premier_jour = None
+    energie = np.zeros((0, 2))
+    echantillons = np.zeros((0, 2), dtype=np.int64)
+    intervalles = None
+    rejetees = 0
+
+    for instants, niveaux, lignes_rejetees in blocs_mesures(chemin, colonne_niveau, taille_bloc):
+        rejetees += lignes_rejetees
+        if not len(instants):
+            continue
+        if intervalles is None:
+            intervalles = intervalle_echantillons(instants)
+
+        # Journée d'évaluation : les heures 00h-07h appartiennent à la nuit de la veille
+        heures = (instants // 3600000) % 24
+        nuit = (heures >= HEURE_DEBUT_NUIT) | (heures < HEURE_FIN_NUIT)
+        jours = (instants - HEURE_FIN_NUIT * 3600000) // 86400000
+        if premier_jour is None:
+            premier_jour = int(jours.min())
+        decalage = int(jours.min()) - premier_jour
+        if decalage < 0:
+            # Mesures antérieures au premier jour lu (fichier non trié)
+            energie = np.concatenate([np.zeros((-decalage, 2)), energie])
+            echantillons = np.concatenate([np.zeros((-decalage, 2), dtype=np.int64), echantillons])
+            premier_jour += decalage
+        cles = (jours - premier_jour) * 2 + nuit
+        taille = int(cles.max()) // 2 + 1
+        if taille > len(energie):
+            energie = np.concatenate([energie, np.zeros((taille - len(energie), 2))])
+            echantillons = np.concatenate([echantillons, np.zeros((taille - len(echantillons), 2), dtype=np.int64)])
+        energie += np.bincount(cles, weights=np.power(10.0, niveaux / 10), minlength=2 * len(energie)).reshape(-1, 2)
+        echantillons += np.bincount(cles, minlength=2 * len(echantillons)).reshape(-1, 2)
+
+    if premier_jour is None:
+        raise ValueError(f"Aucune mesure valide dans {chemin}")
+    jours = np.datetime64('1970-01-01') + np.arange(premier_jour, premier_jour + len(energie)).astype('timedelta64[D]')
+    return CampagneMesures(chemin, intervalles or 1000, jours, energie, echantillons, rejetees)
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modèles de sources sonores - ponctuelle, linéique et surfacique
+Les sources étendues sont intégrées numériquement par subdivision adaptative
+en sources ponctuelles équivalentes (divergence géométrique 20 x log10)
+"""
+
+import abc
+import math
+import numpy as np
+
+# Un élément est traité comme ponctuel dès que le récepteur est à une distance
+# supérieure à RAPPORT_SUBDIVISION fois sa dimension (erreur < 0.1 dB)
+RAPPORT_SUBDIVISION = 2.0
+
+# Profondeurs maximales de subdivision (2^12 segments, 4^7 rectangles)
+PROFONDEUR_MAX_LINEIQUE = 12
+PROFONDEUR_MAX_SURFACIQUE = 7
+
+TYPES_SOURCE = ('ponctuelle', 'lineique', 'surfacique')
+
+
+def en_energie(niveau):
+    """Conversion d'un niveau dB(A) en énergie relative 10^(L/10)"""
+    return np.power(10.0, np.asarray(niveau, dtype=float) / 10.0)
+
+
+def en_niveau(energie):
+    """Conversion d'une énergie relative en niveau dB(A)"""
+    with np.errstate(divide='ignore'):
+        return 10.0 * np.log10(energie)
+
+
+def _points_3d(points):
+    """Normalise des coordonnées (n, 2) ou (n, 3) en tableau (n, 3)"""
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    if points.shape[1] == 2:
+        points = np.column_stack([points, np.zeros(len(points))])
+    return points
+
+
+def _vecteur_normal(direction):
+    """Vecteur unitaire perpendiculaire à une direction donnée"""
+    direction = direction / np.linalg.norm(direction)
+    axe = np.array([0.0, 0.0, 1.0]) if abs(direction[2]) < 0.9 else np.array([1.0, 0.0, 0.0])
+    normal = np.cross(direction, axe)
+    return normal / np.linalg.norm(normal)
+
+
+class SourcePonctuelle:
+    """Source ponctuelle définie par Lp1 à la distance de référence"""
+
+    type_source = 'ponctuelle'
+
+    def __init__(self, position, lp1, distance_ref):
+        self.position = _points_3d(position)[0]
+        self.lp1 = lp1
+        self.distance_ref = distance_ref
+
+    @property
+    def dimension(self):
+        return 0.0
+
+    @property
+    def centre(self):
+        return self.position
+
+    def point_reference(self, distance):
+        """Point situé à la distance donnée, perpendiculairement à la source"""
+        return self.position + np.array([distance, 0.0, 0.0])
+
+    def rayon_influence(self, seuil):
+        """Distance au-delà de laquelle la contribution passe sous le seuil dB(A)"""
+        return self.distance_ref * 10 ** ((self.lp1 - seuil) / 20)
+
+    def energie_recepteurs(self, recepteurs):
+        """Énergie reçue en chaque récepteur (tableau (n, 2) ou (n, 3))"""
+        recepteurs = _points_3d(recepteurs)
+        d2 = np.sum((recepteurs - self.position) ** 2, axis=1)
+        d2 = np.maximum(d2, 1e-4)
+        return en_energie(self.lp1) * self.distance_ref ** 2 / d2
+
+
+class _SourceEtendue(abc.ABC):
+    """Base commune des sources intégrées par subdivision adaptative"""
+
+    def __init__(self, lp1, distance_ref):
+        self.lp1 = lp1
+        self.distance_ref = distance_ref
+        self._puissance = None
+
+    @abc.abstractmethod
+    def _energie_unitaire(self, recepteurs):
+        """Énergie reçue par récepteur pour une puissance unitaire"""
+
+    @property
+    def puissance(self):
+        """Puissance équivalente calée pour retrouver Lp1 au point de référence"""
+        if self._puissance is None:
+            reference = self.point_reference(self.distance_ref)[np.newaxis, :]
+            self._puissance = en_energie(self.lp1) / self._energie_unitaire(reference)[0]
+        return self._puissance
+
+    def rayon_influence(self, seuil):
+        """Distance au-delà de laquelle la contribution passe sous le seuil dB(A)"""
+        return self.dimension + self.distance_ref * 10 ** ((self.lp1 - seuil) / 20)
+
+    def energie_recepteurs(self, recepteurs):
+        """Énergie reçue en chaque récepteur (tableau (n, 2) ou (n, 3))"""
+        return self.puissance * self._energie_unitaire(_points_3d(recepteurs))
+
+
+class SourceLineique(_SourceEtendue):
+    """Source linéique (batterie de condenseurs, gaine) entre deux extrémités"""
+
+    type_source = 'lineique'
+
+    def __init__(self, debut, fin, lp1, distance_ref):
+        super().__init__(lp1, distance_ref)
+        self.debut = _points_3d(debut)[0]
+        self.fin = _points_3d(fin)[0]
+
+    @property
+    def dimension(self):
+        return float(np.linalg.norm(self.fin - self.debut))
+
+    @property
+    def centre(self):
+        return (self.debut + self.fin) / 2
+
+    def point_reference(self, distance):
+        return self.centre + distance * _vecteur_normal(self.fin - self.debut)
+
+    def _energie_unitaire(self, recepteurs):
+        """Somme 1/r² sur les segments, subdivisés seulement près des récepteurs"""
+        energie = np.zeros(len(recepteurs))
+        pile = [(self.debut, self.fin, 1.0, np.arange(len(recepteurs)), 0)]
+
+        while pile:
+            a, b, poids, indices, profondeur = pile.pop()
+            milieu = (a + b) / 2
+            longueur = np.linalg.norm(b - a)
+            d2 = np.sum((recepteurs[indices] - milieu) ** 2, axis=1)
+
+            if profondeur >= PROFONDEUR_MAX_LINEIQUE:
+                loin = np.ones(len(indices), dtype=bool)
+            else:
+                loin = d2 >= (RAPPORT_SUBDIVISION * longueur) ** 2
+
+            energie[indices[loin]] += poids / np.maximum(d2[loin], (longueur / 2) ** 2 + 1e-4)
+
+            proches = indices[~loin]
+            if proches.size:
+                pile.append((a, milieu, poids / 2, proches, profondeur + 1))
+                pile.append((milieu, b, poids / 2, proches, profondeur + 1))
+
+        return energie
+
+
+class SourceSurfacique(_SourceEtendue):
+    """Source surfacique rectangulaire (grille de ventilation, façade rayonnante)"""
+
+    type_source = 'surfacique'
+
+    def __init__(self, origine, cote_u, cote_v, lp1, distance_ref):
+        super().__init__(lp1, distance_ref)
+        self.origine = _points_3d(origine)[0]
+        self.cote_u = _points_3d(cote_u)[0]
+        self.cote_v = _points_3d(cote_v)[0]
+
+    @property
+    def dimension(self):
+        return float(np.hypot(np.linalg.norm(self.cote_u), np.linalg.norm(self.cote_v)))
+
+    @property
+    def centre(self):
+        return self.origine + (self.cote_u + self.cote_v) / 2
+
+    def point_reference(self, distance):
+        normal = np.cross(self.cote_u, self.cote_v)
+        return self.centre + distance * normal / np.linalg.norm(normal)
+
+    def _energie_unitaire(self, recepteurs):
+        """Somme 1/r² sur les éléments, subdivisés en quadrants près des récepteurs"""
+        energie = np.zeros(len(recepteurs))
+        pile = [(self.origine, self.cote_u, self.cote_v, 1.0, np.arange(len(recepteurs)), 0)]
+
+        while pile:
+            origine, u, v, poids, indices, profondeur = pile.pop()
+            centre = origine + (u + v) / 2
+            diagonale = np.linalg.norm(u + v)
+            d2 = np.sum((recepteurs[indices] - centre) ** 2, axis=1)
+
+            if profondeur >= PROFONDEUR_MAX_SURFACIQUE:
+                loin = np.ones(len(indices), dtype=bool)
+            else:
+                loin = d2 >= (RAPPORT_SUBDIVISION * diagonale) ** 2
+
+            energie[indices[loin]] += poids / np.maximum(d2[loin], (diagonale / 2) ** 2 + 1e-4)
+
+            proches = indices[~loin]
+            if proches.size:
+                u2, v2 = u / 2, v / 2
+                for decalage in (0 * u2, u2, v2, u2 + v2):
+                    pile.append((origine + decalage, u2, v2, poids / 4, proches, profondeur + 1))
+
+        return energie
+
+
+def creer_source(type_source, lp1, distance_ref, longueur=None, largeur=None, position=(0.0, 0.0, 0.0)):
+    """Crée une source centrée sur la position donnée selon son type"""
+    centre = _points_3d(position)[0]
+    if type_source == 'ponctuelle':
+        return SourcePonctuelle(centre, lp1, distance_ref)
+    if type_source == 'lineique':
+        demi = np.array([longueur / 2, 0.0, 0.0])
+        return SourceLineique(centre - demi, centre + demi, lp1, distance_ref)
+    if type_source == 'surfacique':
+        u = np.array([longueur, 0.0, 0.0])
+        v = np.array([0.0, 0.0, largeur])
+        return SourceSurfacique(centre - (u + v) / 2, u, v, lp1, distance_ref)
+    raise ValueError(f"Type de source inconnu : {type_source}")
+
+
+def niveaux_recepteurs(sources, recepteurs):
+    """Niveau global dB(A) en chaque récepteur, somme énergétique des sources"""
+    recepteurs = _points_3d(recepteurs)
+    energie = np.zeros(len(recepteurs))
+    for source in sources:
+        energie += source.energie_recepteurs(recepteurs)
+    return en_niveau(energie)
+
+
+def calculer_attenuation_source(type_source, distance_ref, distance_cible, longueur=None, largeur=None):
+    """Atténuation entre la distance de référence et la distance cible
+
+    Pour une source ponctuelle on retrouve 20 x log10(d1/d2) ; pour une source
+    étendue, le récepteur est placé perpendiculairement au centre de la source.
+    """
+    if type_source == 'ponctuelle':
+        return 20 * math.log10(distance_ref / distance_cible)
+
+    source = creer_source(type_source, 0.0, distance_ref, longueur, largeur)
+    cible = source.point_reference(distance_cible)
+    return float(niveaux_recepteurs([source], cible)[0])
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Optimisation des mesures d'atténuation (silencieux, capotages, écrans)
+Recherche de la combinaison la moins coûteuse respectant les limites jour et nuit
+en chaque récepteur, par séparation et évaluation (branch-and-bound) vectorisée
+"""
+
+import time
+import numpy as np
+
+# Catalogue indicatif : pertes d'insertion globales dB(A) et coûts en CHF
+# à remplacer par les offres des fournisseurs pour chaque projet
+CATALOGUE_MESURES_TYPE = [
+    {'nom': "Réglage EC vitesse réduite", 'type_mesure': 'reglage', 'cout': 500.0, 'perte_insertion': 3.0, 'groupe': 'reglage'},
+    {'nom': "Silencieux au refoulement", 'type_mesure': 'silencieux', 'cout': 2500.0, 'perte_insertion': 5.0, 'groupe': 'silencieux'},
+    {'nom': "Silencieux renforcé au refoulement", 'type_mesure': 'silencieux', 'cout': 4500.0, 'perte_insertion': 9.0, 'groupe': 'silencieux'},
+    {'nom': "Capotage acoustique partiel", 'type_mesure': 'capotage', 'cout': 6000.0, 'perte_insertion': 8.0, 'groupe': 'capotage'},
+    {'nom': "Capotage acoustique complet", 'type_mesure': 'capotage', 'cout': 12000.0, 'perte_insertion': 15.0, 'groupe': 'capotage'},
+    {'nom': "Écran acoustique en toiture", 'type_mesure': 'ecran', 'cout': 8000.0, 'perte_insertion': 10.0, 'groupe': 'ecran'},
+]
+
+# Limites de la recherche : au-delà, la meilleure solution trouvée est
+# retournée sans garantie d'optimalité (SolutionAttenuation.optimale = False),
+# avec le coût minimal prouvé (borne). Avec le catalogue type et 6 récepteurs,
+# l'optimum est prouvé en moins d'une seconde jusqu'à une douzaine de sources
+# et en quelques secondes vers 15 sources. À 20 sources la recherche est un
+# meilleur effort : environ une fois sur deux elle s'arrête à DUREE_MAX avec
+# une solution à 1-3 % de la borne (SolutionAttenuation.ecart), affichée comme telle.
+NOEUDS_MAX = 20000
+DUREE_MAX = 10.0
+
+# Itérations de sous-gradient de la borne lagrangienne (à la racine, puis par nœud)
+ITERATIONS_RACINE = 200
+ITERATIONS_NOEUD = 8
+
+
+class MesureAttenuation:
+    """Mesure d'atténuation applicable à certaines sources et certains trajets
+
+    perte_insertion : dB(A) global ou tableau par bande d'octave
+    sources : indices des sources concernées (None = toutes)
+    recepteurs : indices des récepteurs protégés, pour un écran (None = tous)
+    groupe : les mesures d'un même groupe s'excluent (un seul capotage par source)
+    """
+
+    def __init__(self, nom, cout, perte_insertion, sources=None, recepteurs=None,
+                 groupe=None, type_mesure='silencieux'):
+        self.nom = nom
+        self.cout = float(cout)
+        self.perte_insertion = np.asarray(perte_insertion, dtype=float)
+        self.sources = sources
+        self.recepteurs = recepteurs
+        self.groupe = groupe if groupe is not None else nom
+        self.type_mesure = type_mesure
+
+    def facteurs(self, forme):
+        """Facteurs énergétiques (S, R, B) appliqués aux contributions"""
+        nb_sources, nb_recepteurs, nb_bandes = forme
+        facteur = np.power(10.0, -np.broadcast_to(self.perte_insertion, (nb_bandes,)) / 10)
+        masque_sources = np.zeros(nb_sources, dtype=bool)
+        masque_sources[slice(None) if self.sources is None else list(self.sources)] = True
+        masque_recepteurs = np.zeros(nb_recepteurs, dtype=bool)
+        masque_recepteurs[slice(None) if self.recepteurs is None else list(self.recepteurs)] = True
+        concerne = masque_sources[:, np.newaxis] & masque_recepteurs[np.newaxis, :]
+        return np.where(concerne[:, :, np.newaxis], facteur[np.newaxis, np.newaxis, :], 1.0)
+
+
+class SolutionAttenuation:
+    """Combinaison retenue et niveaux d'évaluation obtenus"""
+
+    def __init__(self, mesures, cout, lr_jour, lr_nuit, noeuds, optimale, borne=None):
+        self.mesures = mesures
+        self.cout = cout
+        self.lr_jour = lr_jour
+        self.lr_nuit = lr_nuit
+        self.noeuds = noeuds
+        self.optimale = optimale
+        # Coût en dessous duquel aucune combinaison ne respecte les limites
+        self.borne = cout if optimale else borne
+
+    @property
+    def trouvee(self):
+        return self.mesures is not None
+
+    @property
+    def ecart(self):
+        """Surcoût relatif maximal de la solution par rapport à l'optimum (0 si optimale)"""
+        if self.optimale or not self.trouvee:
+            return 0.0
+        return (self.cout - self.borne) / self.cout if self.cout > 0 else 0.0
+
+
+def catalogue_depuis_dicts(entrees, nb_sources=1):
+    """Construit des MesureAttenuation, dupliquées par source si nécessaire"""
+    catalogue = []
+    for entree in entrees:
+        entree = dict(entree)
+        if entree.get('sources') is None and entree.get('type_mesure') in ('silencieux', 'capotage', 'reglage') and nb_sources > 1:
+            # Un silencieux ou un capotage équipe une seule source
+            for source in range(nb_sources):
+                par_source = dict(entree, sources=[source], groupe=f"{entree.get('groupe', entree['nom'])}#{source}")
+                par_source['nom'] = f"{entree['nom']} (source {source + 1})"
+                catalogue.append(MesureAttenuation(**par_source))
+        else:
+            catalogue.append(MesureAttenuation(**entree))
+    return catalogue
+
+
+def _energies(niveaux, corrections):
+    """Énergies (S, R, B) pondérées par les corrections K de chaque source"""
+    corrections = np.broadcast_to(np.asarray(corrections, dtype=float), (niveaux.shape[0],))
+    return np.power(10.0, (niveaux + corrections[:, np.newaxis, np.newaxis]) / 10)
+
+
+def _options_groupes(catalogue, forme):
+    """Options exclusives (combinaisons de mesures, facteurs, coûts) par groupe
+
+    Les groupes agissant sur les mêmes trajets (par exemple réglage, silencieux
+    et capotage d'une même source) sont fusionnés en un seul groupe dont les
+    options sont leurs combinaisons, les combinaisons dominées (plus chères et
+    moins efficaces) étant éliminées. Les options sont triées par coût croissant.
+    """
+    groupes = {}
+    for mesure in catalogue:
+        groupes.setdefault(mesure.groupe, []).append(mesure)
+
+    fusions = {}
+    for mesures in groupes.values():
+        empreinte = tuple(
+            (None if m.sources is None else tuple(sorted(m.sources)),
+             None if m.recepteurs is None else tuple(sorted(m.recepteurs)))
+            for m in mesures
+        )
+        cle = empreinte[0] if len(set(empreinte)) == 1 else id(mesures)
+        fusions.setdefault(cle, []).append(mesures)
+
+    resultat = []
+    for sous_groupes in fusions.values():
+        options = [((), np.ones(forme), 0.0)]
+        for mesures in sous_groupes:
+            completees = []
+            for combinaison, facteurs, cout in options:
+                for mesure in mesures:
+                    completees.append((combinaison + (mesure,), facteurs * mesure.facteurs(forme), cout + mesure.cout))
+            options = completees + options
+        options.sort(key=lambda option: option[2])
+
+        retenues = []
+        for combinaison, facteurs, cout in options:
+            if not any(np.all(f <= facteurs) for _, f, _ in retenues):
+                retenues.append((combinaison, facteurs, cout))
+        resultat.append((
+            [combinaison for combinaison, _, _ in retenues],
+            np.stack([facteurs for _, facteurs, _ in retenues]),
+            np.array([cout for _, _, cout in retenues]),
+        ))
+    return resultat
+
+
+def _options_minimales(valeurs, minima, debuts):
+    """Indice (C, G) de l'option de valeur minimale dans chaque groupe (options contiguës)"""
+    tailles = np.diff(np.append(debuts, valeurs.shape[1]))
+    positions = np.where(valeurs <= np.repeat(minima, tailles, axis=1), np.arange(valeurs.shape[1]), valeurs.shape[1])
+    return np.minimum.reduceat(positions, debuts, axis=1)
+
+
+def optimiser_mesures(niveaux, corrections_jour, corrections_nuit, limites_jour, limites_nuit,
+                      catalogue, noeuds_max=NOEUDS_MAX, duree_max=DUREE_MAX):
+    """Combinaison de mesures de coût minimal respectant toutes les limites
+
+    niveaux : Lpx dB(A) par source et récepteur, tableau (S, R) ou (S, R, B)
+    corrections_jour / corrections_nuit : K1 + K2 + K3 + réflexion, scalaire ou par source
+    limites_jour / limites_nuit : limites dB(A), scalaire ou par récepteur
+    """
+    niveaux = np.asarray(niveaux, dtype=float)
+    if niveaux.ndim == 2:
+        niveaux = niveaux[:, :, np.newaxis]
+    forme = niveaux.shape
+    nb_recepteurs = forme[1]
+
+    # Énergies des deux périodes empilées : (P, S, R, B)
+    energies = np.stack([_energies(niveaux, corrections_jour), _energies(niveaux, corrections_nuit)])
+    limites = np.stack([
+        np.broadcast_to(np.asarray(limites_jour, dtype=float), (nb_recepteurs,)),
+        np.broadcast_to(np.asarray(limites_nuit, dtype=float), (nb_recepteurs,)),
+    ])
+    budget = np.power(10.0, limites / 10) * (1 + 1e-9)
+
+    def totaux(facteurs):
+        """Énergie totale par période et récepteur pour des facteurs (..., S, R, B)"""
+        return np.einsum('psrb,...srb->...pr', energies, facteurs)
+
+    # Les groupes agissant sur les trajets d'autres groupes (un écran devant toutes les
+    # sources) sont décidés en premier : les groupes restants sont alors indépendants
+    # et la borne lagrangienne est exacte pour eux ; puis les plus efficaces d'abord
+    groupes = _options_groupes(catalogue, forme)
+    efficacite = [np.sum(totaux(np.ones(forme)) - totaux(facteurs[-1])) for _, facteurs, _ in groupes]
+    trajets = np.array([np.any(facteurs != 1.0, axis=(0, 3)).ravel() for _, facteurs, _ in groupes])
+    partages = (trajets.astype(int) @ trajets.T.astype(int) > 0).sum(axis=1) > 1
+    groupes = [groupes[i] for i in np.lexsort((-np.array(efficacite), ~partages))]
+    options_facteurs = [facteurs for _, facteurs, _ in groupes]
+    options_couts = [couts for _, _, couts in groupes]
+
+    # Borne optimiste : meilleure atténuation possible des groupes restants
+    optimiste = [np.ones(forme)]
+    for facteurs in reversed(options_facteurs):
+        optimiste.append(optimiste[-1] * facteurs.min(axis=0))
+    optimiste = optimiste[::-1]
+
+    # Incréments entre options successives de chaque groupe restant (borne de coût),
+    # rangés (R, S x B, O) pour un produit matriciel par récepteur
+    nb_sources, _, nb_bandes = forme
+    restantes = []
+    for indice in range(len(groupes) + 1):
+        increments = [np.zeros((0,) + forme)] + [f[:-1] - f[1:] for f in options_facteurs[indice:]]
+        increments = np.concatenate(increments)
+        increments = np.ascontiguousarray(
+            increments.transpose(2, 1, 3, 0).reshape(nb_recepteurs, nb_sources * nb_bandes, len(increments))
+        )
+        surcouts = [np.zeros(0)] + [np.diff(c) for c in options_couts[indice:]]
+        restantes.append((increments, np.concatenate(surcouts)))
+
+    # Réductions de chaque option des groupes restants (1 - facteurs), rangées (R, S x B, O),
+    # coûts des options et début de chaque groupe pour la borne lagrangienne
+    lagrangiens = []
+    for indice in range(len(groupes) + 1):
+        reductions = np.concatenate([np.zeros((0,) + forme)] + [1.0 - f for f in options_facteurs[indice:]])
+        reductions = np.ascontiguousarray(
+            reductions.transpose(2, 1, 3, 0).reshape(nb_recepteurs, nb_sources * nb_bandes, len(reductions))
+        )
+        couts = np.concatenate([np.zeros(0)] + options_couts[indice:])
+        debuts = np.cumsum([0] + [len(c) for c in options_couts[indice:-1]]).astype(np.intp)
+        lagrangiens.append((reductions, couts, debuts))
+    echelle = 1.0 / budget.ravel()
+
+    def borne_lagrangienne(candidats, excedents, indice, multiplicateurs, iterations, majorant):
+        """Borne de coût (C,) par relaxation lagrangienne de toutes les contraintes à la fois
+
+        Modèle additif : chaque option des groupes restants retire
+        l'énergie E x (1 - facteurs) ; ce modèle minore l'énergie réelle
+        (produit de facteurs), la relaxation reste donc valide même lorsque
+        des groupes se recouvrent. Pour des multiplicateurs λ >= 0 (un par
+        période et récepteur), min Σ coûts - λ · (réductions - excédents) se
+        sépare en un minimum par groupe. λ est amélioré par sous-gradient
+        (pas de Polyak), en partant des multiplicateurs du nœud parent.
+        """
+        reductions, couts, debuts = lagrangiens[indice]
+        nb_candidats = len(candidats)
+        excedents = excedents.reshape(nb_candidats, -1) * echelle
+        if len(couts) == 0:
+            bornes = np.where(np.any(excedents > 0, axis=1), np.inf, 0.0)
+            return bornes, multiplicateurs
+
+        # Énergie retirée par chaque option, rapportée aux budgets : (C, O, P x R)
+        ponderees = (energies[np.newaxis] * candidats[:, np.newaxis]).transpose(3, 0, 1, 2, 4)
+        ponderees = ponderees.reshape(nb_recepteurs, nb_candidats * 2, nb_sources * nb_bandes)
+        retraits = np.matmul(ponderees, reductions).reshape(nb_recepteurs, nb_candidats, 2, len(couts))
+        retraits = retraits.transpose(1, 3, 2, 0).reshape(nb_candidats, len(couts), -1) * echelle
+
+        # Au-delà de la réduction maximale possible d'une contrainte, aucune solution
+        impossible = np.any(excedents > np.maximum.reduceat(retraits, debuts, axis=1).sum(axis=1), axis=1)
+
+        lambdas = multiplicateurs.copy()
+        bornes = np.full(nb_candidats, -np.inf)
+        lignes = np.arange(nb_candidats)[:, np.newaxis]
+        for _ in range(iterations):
+            valeurs = couts[np.newaxis] - np.einsum('cok,ck->co', retraits, lambdas)
+            minima = np.minimum.reduceat(valeurs, debuts, axis=1)
+            courantes = minima.sum(axis=1) + np.einsum('ck,ck->c', lambdas, excedents)
+            ameliore = courantes > bornes
+            bornes[ameliore] = courantes[ameliore]
+            multiplicateurs = np.where(ameliore[:, np.newaxis], lambdas, multiplicateurs)
+
+            # Sous-gradient : excédent non résorbé par les options retenues
+            retenues = _options_minimales(valeurs, minima, debuts)
+            gradients = excedents - retraits[lignes, retenues].sum(axis=1)
+            normes = np.einsum('ck,ck->c', gradients, gradients)
+            ecart = np.where(np.isfinite(majorant), majorant - courantes, np.abs(courantes) + 1.0)
+            pas = np.where(normes > 0, np.maximum(ecart, 0.0) / np.maximum(normes, 1e-300), 0.0)
+            lambdas = np.maximum(lambdas + pas[:, np.newaxis] * gradients, 0.0)
+        bornes[impossible] = np.inf
+        return np.maximum(bornes, 0.0), multiplicateurs
+
+    def bornes_cout(candidats, excedents, indice):
+        """Coût minimal des mesures restantes pour résorber les excédents (C,)
+
+        Relaxation : chaque groupe restant est décomposé en incréments
+        (passage d'une option à la suivante) qui peuvent être pris partiellement
+        et indépendamment ; un tri par coût par unité d'énergie donne la borne
+        de chaque récepteur et période en dépassement, la plus grande étant retenue.
+        """
+        increments, surcouts = restantes[indice]
+        actifs = excedents > 0
+        bornes = np.zeros(len(candidats))
+        if len(surcouts) == 0:
+            bornes[np.any(actifs, axis=(1, 2))] = np.inf
+            return bornes
+
+        # Réduction d'énergie apportée par chaque incrément : (C, P, R, O)
+        nb_candidats = len(candidats)
+        ponderees = (energies[np.newaxis] * candidats[:, np.newaxis]).transpose(3, 0, 1, 2, 4)
+        ponderees = ponderees.reshape(nb_recepteurs, nb_candidats * 2, nb_sources * nb_bandes)
+        gains = np.matmul(ponderees, increments).reshape(nb_recepteurs, nb_candidats, 2, len(surcouts))
+        gains = np.maximum(gains.transpose(1, 2, 0, 3)[actifs], 0.0)
+        besoin = excedents[actifs][:, np.newaxis]
+
+        ordre = np.argsort(surcouts / np.maximum(gains, 1e-300), axis=1)
+        gains = np.take_along_axis(gains, ordre, axis=1)
+        avant = np.cumsum(gains, axis=1) - gains
+        parts = np.clip((besoin - avant) / np.maximum(gains, 1e-300), 0.0, 1.0)
+        par_colonne = np.sum(surcouts[ordre] * parts, axis=1)
+        par_colonne[np.sum(gains, axis=1) < besoin[:, 0]] = np.inf
+
+        np.maximum.at(bornes, np.nonzero(actifs)[0], par_colonne)
+        return bornes
+
+    meilleur_cout = np.inf
+    meilleur_choix = None
+    noeuds = 0
+    interrompue = False
+    echeance = time.monotonic() + duree_max
+
+    # Multiplicateurs lagrangiens de la racine, repris et affinés par chaque nœud
+    nb_contraintes = 2 * nb_recepteurs
+    racine = np.ones((1,) + forme)
+    _, multiplicateurs = borne_lagrangienne(racine, (totaux(racine) - budget), 0,
+                                           np.zeros((1, nb_contraintes)), ITERATIONS_RACINE, np.array([np.inf]))
+
+    # Parcours en profondeur : (indice du groupe, facteurs courants, coût, borne, choix, multiplicateurs)
+    pile = [(0, np.ones(forme), 0.0, 0.0, (), multiplicateurs[0])]
+    while pile:
+        indice, facteurs, cout, borne, choix, multiplicateurs = pile.pop()
+        if cout + borne >= meilleur_cout or indice == len(groupes):
+            continue
+        noeuds += 1
+        if noeuds > noeuds_max or time.monotonic() > echeance:
+            interrompue = True
+            pile.append((indice, facteurs, cout, borne, choix, multiplicateurs))
+            break
+
+        # Évaluation vectorisée de toutes les options du groupe
+        candidats = facteurs[np.newaxis] * options_facteurs[indice]
+        couts = cout + options_couts[indice]
+        excedents = totaux(candidats) - budget
+        conformes = np.all(excedents <= 0, axis=(1, 2))
+        realisables = np.all(totaux(candidats * optimiste[indice + 1]) <= budget, axis=(1, 2))
+
+        for option in np.nonzero(conformes)[0]:
+            if couts[option] < meilleur_cout:
+                meilleur_cout = couts[option]
+                meilleur_choix = choix + ((indice, option),)
+
+        # Une combinaison conforme n'est jamais complétée : toute mesure ajoutée coûte
+        a_explorer = np.nonzero(~conformes & realisables & (couts < meilleur_cout))[0]
+        if a_explorer.size == 0:
+            continue
+        bornes = bornes_cout(candidats[a_explorer], excedents[a_explorer], indice + 1)
+        lagrangiennes, multiplicateurs = borne_lagrangienne(
+            candidats[a_explorer], excedents[a_explorer], indice + 1,
+            np.broadcast_to(multiplicateurs, (a_explorer.size, nb_contraintes)), ITERATIONS_NOEUD,
+            meilleur_cout - couts[a_explorer])
+        bornes = np.maximum(bornes, lagrangiennes)
+        estimations = couts[a_explorer] + bornes
+        # Les options les plus prometteuses sont explorées en premier
+        for k in np.argsort(-estimations, kind='stable'):
+            if estimations[k] < meilleur_cout:
+                option = a_explorer[k]
+                pile.append((indice + 1, candidats[option], couts[option], bornes[k], choix + ((indice, option),),
+                             multiplicateurs[k]))
+
+    # Coût minimal prouvé : plus petite estimation des nœuds non explorés
+    borne_globale = min([meilleur_cout] + [cout + borne for _, _, cout, borne, _, _ in pile]) if interrompue else None
+    if meilleur_choix is None:
+        return SolutionAttenuation(None, np.inf, None, None, noeuds, not interrompue, borne_globale)
+
+    facteurs = np.ones(forme)
+    mesures = []
+    for indice, option in meilleur_choix:
+        facteurs = facteurs * options_facteurs[indice][option]
+        mesures.extend(groupes[indice][0][option])
+    with np.errstate(divide='ignore'):
+        lr = 10 * np.log10(totaux(facteurs))
+    return SolutionAttenuation(mesures, float(meilleur_cout), lr[0], lr[1], noeuds, not interrompue, borne_globale)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Optimisation de l'emplacement des équipements en toiture
+Évaluation vectorisée d'une grille de positions autorisées (une ou plusieurs unités)
+par lots répartis sur plusieurs processus, critère : pire marge Lr - limite
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Nombre d'implantations évaluées par lot (une tâche de processus)
+TAILLE_LOT = 20000
+
+# Au-delà, la grille doit être élargie (pas plus grand) ou le nombre d'unités réduit
+IMPLANTATIONS_MAX = 50_000_000
+
+# En dessous, l'évaluation reste dans le processus courant (démarrage des processus trop coûteux)
+IMPLANTATIONS_MIN_PROCESSUS = 200_000
+
+
+class UniteImplantation:
+    """Unité à placer, assimilée à une source ponctuelle omnidirectionnelle
+
+    niveau_1m : niveau de pression équivalent à 1 m (dB(A)), de sorte que
+    Lp(r) = niveau_1m - 20 x log10(r)
+    """
+
+    def __init__(self, nom, niveau_1m):
+        self.nom = nom
+        self.niveau_1m = float(niveau_1m)
+
+    @classmethod
+    def depuis_pression(cls, nom, lp1, distance_ref):
+        """Unité définie par Lp1 mesuré à la distance de référence"""
+        return cls(nom, lp1 + 20 * math.log10(distance_ref))
+
+    @classmethod
+    def depuis_puissance(cls, nom, lw, facteur_q=2.0):
+        """Unité définie par sa puissance Lw et son facteur de directivité Q"""
+        return cls(nom, lw - 11 + 10 * math.log10(facteur_q))
+
+
+class Implantation:
+    """Positions retenues pour chaque unité et niveaux d'évaluation obtenus"""
+
+    def __init__(self, positions, marge, lr_jour, lr_nuit):
+        self.positions = positions
+        self.marge = marge
+        self.lr_jour = lr_jour
+        self.lr_nuit = lr_nuit
+
+    @property
+    def conforme(self):
+        return self.marge <= 0.0
+
+    def distances(self, recepteurs):
+        """Distances (unités, récepteurs) entre chaque unité et chaque récepteur"""
+        recepteurs = np.asarray(recepteurs, dtype=float)
+        return np.linalg.norm(self.positions[:, np.newaxis, :] - recepteurs[np.newaxis, :, :], axis=2)
+
+    def __repr__(self):
+        return f"Implantation(marge={self.marge:+.1f} dB, positions={self.positions.round(1).tolist()})"
+
+
+def dans_polygone(points, polygone):
+    """Test point dans polygone (lancer de rayon) vectorisé sur des points (n, 2)"""
+    points = np.asarray(points, dtype=float)
+    polygone = np.asarray(polygone, dtype=float)
+    x, y = points[:, 0, np.newaxis], points[:, 1, np.newaxis]
+    x1, y1 = polygone[:, 0], polygone[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    traverse = (y1 > y) != (y2 > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_intersection = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(traverse & (x < x_intersection), axis=1) % 2 == 1
+
+
+def grille_positions(contour, pas, hauteur=0.0, exclusions=()):
+    """Positions candidates (n, 3) sur une grille régulière à l'intérieur du contour
+
+    contour : polygone [(x, y), ...] de la zone autorisée en toiture
+    exclusions : polygones interdits (trémies, accès, zones techniques)
+    """
+    contour = np.asarray(contour, dtype=float)
+    if pas <= 0:
+        raise ValueError("Le pas de la grille doit être positif")
+    xs = np.arange(contour[:, 0].min(), contour[:, 0].max() + pas / 2, pas)
+    ys = np.arange(contour[:, 1].min(), contour[:, 1].max() + pas / 2, pas)
+    grille_x, grille_y = np.meshgrid(xs, ys)
+    points = np.column_stack([grille_x.ravel(), grille_y.ravel()])
+
+    # Les points du bord sont acceptés : décalages infimes dans les quatre
+    # directions diagonales (un coin n'est intérieur que dans l'une d'elles)
+    autorise = dans_polygone(points, contour)
+    for decalage in ((1e-9, 1e-9), (-1e-9, -1e-9), (1e-9, -1e-9), (-1e-9, 1e-9)):
+        autorise |= dans_polygone(points + decalage, contour)
+    for exclusion in exclusions:
+        autorise &= ~dans_polygone(points, exclusion)
+    points = points[autorise]
+    return np.column_stack([points, np.full(len(points), float(hauteur))])
+
+
+# Contexte partagé par les processus de calcul (initialisé une fois par processus)
+_CONTEXTE = {}
+
+
+def _initialiser(contexte):
+    _CONTEXTE.clear()
+    _CONTEXTE.update(contexte)
+
+
+def _evaluer_lot(debut, fin, nombre):
+    """Évalue les implantations d'indices [debut, fin) et garde les `nombre` meilleures
+
+    Les indices d'implantation sont décomposés en une position par unité ;
+    les implantations non valides (même position, écart insuffisant, ordre
+    inverse entre unités identiques) sont écartées avant le calcul.
+    """
+    energies = _CONTEXTE['energies']
+    nb_unites, nb_positions = energies.shape[1], energies.shape[2]
+    indices = np.stack(np.unravel_index(np.arange(debut, fin), (nb_positions,) * nb_unites), axis=1)
+
+    valides = np.ones(len(indices), dtype=bool)
+    plan = _CONTEXTE['plan']
+    ecart_min2 = _CONTEXTE['ecart_min'] ** 2
+    identiques = _CONTEXTE['identiques']
+    for a in range(nb_unites):
+        for b in range(a + 1, nb_unites):
+            if identiques[a, b]:
+                valides &= indices[:, a] < indices[:, b]
+            # Écart en plan calculé pour le lot seulement (pas de matrice positions x positions)
+            ecarts2 = np.sum((plan[indices[:, a]] - plan[indices[:, b]]) ** 2, axis=1)
+            valides &= ecarts2 >= ecart_min2
+    indices = indices[valides]
+    if len(indices) == 0:
+        return np.zeros((0, nb_unites), dtype=np.intp), np.zeros(0)
+
+    # Énergie totale (I, P, R) : sources existantes + somme des unités placées
+    total = np.broadcast_to(_CONTEXTE['fond'], (len(indices),) + _CONTEXTE['fond'].shape).copy()
+    for unite in range(nb_unites):
+        total += energies[:, unite, indices[:, unite], :].transpose(1, 0, 2)
+    marges = (10 * np.log10(total) - _CONTEXTE['limites']).max(axis=(1, 2))
+
+    if len(marges) > nombre:
+        meilleures = np.argpartition(marges, nombre)[:nombre]
+        indices, marges = indices[meilleures], marges[meilleures]
+    return indices, marges
+
+
+def _niveaux_evaluation(contexte, indices):
+    total = contexte['fond'].copy()
+    for unite, position in enumerate(indices):
+        total += contexte['energies'][:, unite, position, :]
+    return 10 * np.log10(total)
+
+
+def optimiser_placement(unites, positions, recepteurs, limites_jour, limites_nuit,
+                        corrections_jour, corrections_nuit, sources_existantes=(),
+                        ecart_min=0.0, nombre=10, processus=None, taille_lot=TAILLE_LOT):
+    """Implantations minimisant la pire marge max(Lr - limite) jour et nuit
+
+    unites : UniteImplantation à placer (une position distincte chacune)
+    positions : positions candidates (n, 3), par exemple grille_positions(...)
+    recepteurs : fenêtres (r, 3) ; limites_jour / limites_nuit : scalaire ou par récepteur
+    corrections_jour / corrections_nuit : K1 + K2 + K3 + réflexion
+    sources_existantes : sources déjà en place (modeles_sources, directivite)
+    ecart_min : distance minimale entre deux unités (dégagements d'entretien)
+    processus : nombre de processus (None = nombre de cœurs, 1 = sans processus)
+    Retourne les `nombre` meilleures implantations, de la plus favorable à la moins favorable.
+    """
+    positions = np.asarray(positions, dtype=float)
+    recepteurs = np.atleast_2d(np.asarray(recepteurs, dtype=float))
+    nb_unites, nb_positions, nb_recepteurs = len(unites), len(positions), len(recepteurs)
+    if nb_unites == 0 or nb_positions < nb_unites:
+        raise ValueError("Pas assez de positions candidates pour les unités à placer")
+    nb_implantations = nb_positions ** nb_unites
+    if nb_implantations > IMPLANTATIONS_MAX:
+        raise ValueError(
+            f"{nb_implantations:.2e} implantations à évaluer : augmenter le pas de la grille "
+            f"ou réduire le nombre d'unités"
+        )
+
+    corrections = np.array([corrections_jour, corrections_nuit], dtype=float)[:, np.newaxis]
+    limites = np.stack([
+        np.broadcast_to(np.asarray(limites_jour, dtype=float), (nb_recepteurs,)),
+        np.broadcast_to(np.asarray(limites_nuit, dtype=float), (nb_recepteurs,)),
+    ])
+
+    # Énergie de chaque unité en chaque position candidate : (période, unité, position, récepteur)
+    d2 = np.maximum(np.sum((positions[:, np.newaxis, :] - recepteurs[np.newaxis, :, :]) ** 2, axis=2), 1e-4)
+    niveaux_1m = np.array([unite.niveau_1m for unite in unites])
+    energies = (np.power(10.0, (niveaux_1m[np.newaxis, :, np.newaxis, np.newaxis]
+                                + corrections[:, :, np.newaxis, np.newaxis]) / 10)
+                / d2[np.newaxis, np.newaxis, :, :])
+
+    fond = np.zeros((2, nb_recepteurs))
+    for source in sources_existantes:
+        fond += source.energie_recepteurs(recepteurs)[np.newaxis, :] * np.power(10.0, corrections / 10)
+
+    # Écart minimal entre deux unités (au moins des positions distinctes), contrôlé par lot
+    identiques = np.array([[a.niveau_1m == b.niveau_1m for b in unites] for a in unites])
+    contexte = {'energies': energies, 'fond': fond, 'limites': limites,
+                'plan': np.ascontiguousarray(positions[:, :2]), 'ecart_min': max(ecart_min, 1e-9),
+                'identiques': identiques}
+
+    lots = [(debut, min(debut + taille_lot, nb_implantations), nombre)
+            for debut in range(0, nb_implantations, taille_lot)]
+    if processus is None:
+        processus = os.cpu_count() or 1
+    if processus <= 1 or nb_implantations < IMPLANTATIONS_MIN_PROCESSUS:
+        _initialiser(contexte)
+        resultats = [_evaluer_lot(*lot) for lot in lots]
+    else:
+        with ProcessPoolExecutor(max_workers=processus, initializer=_initialiser,
+                                 initargs=(contexte,)) as executeur:
+            resultats = list(executeur.map(_evaluer_lot, *zip(*lots)))
+
+    indices = np.concatenate([indices for indices, _ in resultats])
+    marges = np.concatenate([marges for _, marges in resultats])
+    ordre = np.argsort(marges, kind='stable')[:nombre]
+
+    implantations = []
+    for i in ordre:
+        lr_jour, lr_nuit = _niveaux_evaluation(contexte, indices[i])
+        implantations.append(Implantation(positions[indices[i]], float(marges[i]), lr_jour, lr_nuit))
+    return implantations
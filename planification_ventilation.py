@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Planification horaire de la vitesse des ventilateurs EC (condenseurs)
+Compromis puissance frigorifique / bruit : programmation dynamique vectorisée
+sur toutes les heures de l'année et toutes les unités d'un site
+"""
+
+import math
+import numpy as np
+
+from limites_reglementaires import HEURE_DEBUT_NUIT, HEURE_FIN_NUIT
+
+# Nombre de pas de discrétisation du budget énergétique sonore horaire
+RESOLUTION_ENERGIE = 400
+
+# Pas (dB) d'arrondi du budget lorsque le bruit des autres sources varie d'heure en heure
+PAS_BUDGET_DB = 0.1
+
+# Lois de similitude des ventilateurs : Lw + 50 x log10(n / n_nominal)
+EXPOSANT_PUISSANCE_SONORE = 50.0
+# Puissance frigorifique ~ débit d'air ^ 0.7 (approximation à remplacer par les courbes du fabricant)
+EXPOSANT_CAPACITE = 0.7
+
+
+class CourbeVentilateur:
+    """Courbes vitesse -> puissance sonore Lw (dB(A)) et vitesse -> puissance frigorifique (kW)
+
+    vitesses : fractions de la vitesse nominale (0 à 1), dans l'ordre croissant
+    """
+
+    def __init__(self, vitesses, lw, capacites):
+        self.vitesses = np.asarray(vitesses, dtype=float)
+        self.lw = np.asarray(lw, dtype=float)
+        self.capacites = np.asarray(capacites, dtype=float)
+        if not self.vitesses.shape == self.lw.shape == self.capacites.shape:
+            raise ValueError("Courbe de ventilateur : vitesses, Lw et capacités de longueurs différentes")
+
+    @classmethod
+    def similitude(cls, lw_nominal, capacite_nominale, vitesses=(0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+                   exposant_lw=EXPOSANT_PUISSANCE_SONORE, exposant_capacite=EXPOSANT_CAPACITE):
+        """Courbe déduite des valeurs nominales par les lois de similitude"""
+        vitesses = np.asarray(vitesses, dtype=float)
+        return cls(
+            vitesses,
+            lw_nominal + exposant_lw * np.log10(vitesses),
+            capacite_nominale * vitesses ** exposant_capacite,
+        )
+
+
+class UniteVentilation:
+    """Condenseur d'un site et transfert Lw -> Lr au récepteur déterminant
+
+    transfert_jour / transfert_nuit : Lr - Lw (dB), corrections K comprises
+    """
+
+    def __init__(self, nom, courbe, transfert_jour, transfert_nuit):
+        self.nom = nom
+        self.courbe = courbe
+        self.transfert_jour = float(transfert_jour)
+        self.transfert_nuit = float(transfert_nuit)
+
+    @classmethod
+    def depuis_distance(cls, nom, courbe, distance, facteur_q, corrections_jour, corrections_nuit):
+        """Transfert par Lp = Lw - 20 x log10(r) - 11 + 10 x log10(Q), plus K1 + K2 + K3 + réflexion"""
+        propagation = -20 * math.log10(distance) - 11 + 10 * math.log10(facteur_q)
+        return cls(nom, courbe, propagation + corrections_jour, propagation + corrections_nuit)
+
+
+class PlanningVentilation:
+    """Vitesse retenue par heure et par unité, capacité fournie et niveau d'évaluation"""
+
+    def __init__(self, vitesses, capacites, demande, lr, limites):
+        self.vitesses = vitesses
+        self.capacites = capacites
+        self.demande = demande
+        self.lr = lr
+        self.limites = limites
+
+    @property
+    def capacite_fournie(self):
+        """Puissance frigorifique utile par heure (kW), plafonnée à la demande"""
+        return np.minimum(self.capacites, self.demande)
+
+    @property
+    def taux_couverture(self):
+        """Part de la demande annuelle couverte (kWh fournis / kWh demandés)"""
+        demande = self.demande.sum()
+        return float(self.capacite_fournie.sum() / demande) if demande > 0 else 1.0
+
+    @property
+    def heures_deficit(self):
+        """Heures où la limite impose une capacité inférieure à la demande"""
+        return int(np.count_nonzero(self.capacites < self.demande - 1e-9))
+
+
+def heures_nuit(nombre_heures, heure_debut=0):
+    """Masque des heures de nuit (22h-07h) pour une série horaire commençant à heure_debut"""
+    heures = (np.arange(nombre_heures) + heure_debut) % 24
+    return (heures >= HEURE_DEBUT_NUIT) | (heures < HEURE_FIN_NUIT)
+
+
+def planifier_vitesses(unites, demande, limite_jour, limite_nuit, niveau_fond=None,
+                       heure_debut=0, arret_autorise=True, resolution=RESOLUTION_ENERGIE):
+    """Vitesse horaire de chaque unité maximisant la puissance frigorifique fournie
+
+    demande : besoin frigorifique horaire du site (kW), par exemple 8760 valeurs
+    niveau_fond : Lr des autres sources au récepteur (scalaire ou horaire), réduit le budget
+    Les limites sont vérifiées heure par heure (limite nuit de 22h à 07h).
+    Lorsque la demande peut être couverte, la combinaison la plus silencieuse
+    couvrant la demande est retenue, sinon la capacité maximale admissible.
+    Sans arrêt autorisé, une heure où même la vitesse minimale dépasse la
+    limite reçoit la vitesse minimale (dépassement visible dans PlanningVentilation.lr).
+    """
+    demande = np.asarray(demande, dtype=float)
+    nombre_heures = len(demande)
+    nuit = heures_nuit(nombre_heures, heure_debut)
+
+    # Budget énergétique horaire au récepteur, diminué du bruit des autres sources
+    limites = np.where(nuit, limite_nuit, limite_jour).astype(float)
+    budget = np.power(10.0, limites / 10)
+    if niveau_fond is not None:
+        budget = budget - np.power(10.0, np.broadcast_to(np.asarray(niveau_fond, dtype=float), (nombre_heures,)) / 10)
+    # Budget arrondi par défaut au pas PAS_BUDGET_DB : nombre de groupes d'heures limité
+    with np.errstate(divide='ignore'):
+        budget_db = np.floor(10 * np.log10(np.maximum(budget, 0.0)) / PAS_BUDGET_DB) * PAS_BUDGET_DB
+    budget = np.power(10.0, budget_db / 10)
+
+    # Options de chaque unité : vitesses de la courbe (et arrêt), énergie relative 10^(Lw/10)
+    options = []
+    for unite in unites:
+        vitesses = unite.courbe.vitesses
+        lw = unite.courbe.lw
+        capacites = unite.courbe.capacites
+        if arret_autorise:
+            vitesses = np.concatenate([[0.0], vitesses])
+            lw = np.concatenate([[-np.inf], lw])
+            capacites = np.concatenate([[0.0], capacites])
+        options.append((vitesses, np.power(10.0, lw / 10), capacites))
+
+    # Les heures sont regroupées par budget et période (en pratique un groupe jour et un
+    # groupe nuit) : la programmation dynamique est menée une fois par groupe, tous
+    # les groupes dans la même passe vectorisée
+    cles, groupe_heure = np.unique(np.column_stack([budget, nuit]), axis=0, return_inverse=True)
+    groupe_heure = groupe_heure.ravel()
+    budgets_groupes, nuit_groupes = cles[:, 0], cles[:, 1].astype(bool)
+    quantum = np.where(budgets_groupes > 0, budgets_groupes / resolution, np.inf)
+
+    # Pas d'énergie (arrondis vers le haut : le budget n'est jamais dépassé) par groupe et option
+    transferts = np.array([
+        np.where(nuit_groupes, unite.transfert_nuit, unite.transfert_jour) for unite in unites
+    ]).reshape(len(unites), len(cles))
+    pas = []
+    for (_, energies, _), transfert in zip(options, transferts):
+        recues = energies[np.newaxis, :] * np.power(10.0, transfert / 10)[:, np.newaxis]
+        q = np.ceil(recues / quantum[:, np.newaxis] - 1e-9)
+        q = np.where(np.isfinite(quantum)[:, np.newaxis], q, resolution + 1)
+        pas.append(np.where(recues > 0, np.minimum(q, resolution + 1), 0).astype(np.intp))
+
+    # meilleur[g, m] : capacité maximale du groupe g avec au plus m pas d'énergie
+    niveaux_budget = np.arange(resolution + 1)
+    meilleur = np.zeros((len(cles), resolution + 1))
+    decisions = []
+    for (_, _, capacites), pas_unite in zip(options, pas):
+        precedent = niveaux_budget[np.newaxis, np.newaxis, :] - pas_unite[:, :, np.newaxis]
+        candidats = np.take_along_axis(meilleur[:, np.newaxis, :], np.maximum(precedent, 0), axis=2)
+        candidats = np.where(precedent >= 0, candidats + capacites[np.newaxis, :, np.newaxis], -np.inf)
+        decisions.append(np.argmax(candidats, axis=1))
+        meilleur = candidats.max(axis=1)
+
+    # Pour chaque heure : plus petit budget couvrant la demande, sinon budget complet
+    suffisant = meilleur[groupe_heure] >= demande[:, np.newaxis] - 1e-9
+    restant = np.where(suffisant.any(axis=1), np.argmax(suffisant, axis=1), resolution)
+
+    # Remontée des décisions, vectorisée sur toutes les heures
+    choix_vitesses = np.zeros((nombre_heures, len(unites)))
+    capacites_totales = np.zeros(nombre_heures)
+    energies_totales = np.zeros(nombre_heures)
+    for indice in reversed(range(len(unites))):
+        option = decisions[indice][groupe_heure, restant]
+        vitesses, energies, capacites = options[indice]
+        choix_vitesses[:, indice] = vitesses[option]
+        capacites_totales += capacites[option]
+        energies_totales += energies[option] * np.power(10.0, transferts[indice][groupe_heure] / 10)
+        restant = np.maximum(restant - pas[indice][groupe_heure, option], 0)
+
+    energie_recepteur = energies_totales
+    if niveau_fond is not None:
+        energie_recepteur = energie_recepteur + np.power(10.0, np.broadcast_to(
+            np.asarray(niveau_fond, dtype=float), (nombre_heures,)) / 10)
+    with np.errstate(divide='ignore'):
+        lr = 10 * np.log10(energie_recepteur)
+    return PlanningVentilation(choix_vitesses, capacites_totales, demande, lr, limites)
+
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pyramide multi-résolution des niveaux d'une campagne de mesures
+Leq énergétique, minimum et maximum par tranche de 1 s, 1 min, 15 min et 1 h,
+stockés en memmap à côté de l'export CSV : toute fenêtre se trace en O(pixels)
+"""
+
+import json
+import os
+import numpy as np
+
+from modeles_sources import en_niveau
+from mesures_sonometre import TAILLE_BLOC, blocs_mesures
+
+VERSION_FORMAT = 1
+
+# Durées (s) des tranches de chaque niveau, de la plus fine à la plus grossière
+PAS_PYRAMIDE_S = (1, 60, 900, 3600)
+
+EXTENSION_PYRAMIDE = ".pyramide"
+FICHIER_ENTETE = "entete.json"
+
+# Énergie moyenne de la tranche, niveaux extrêmes et nombre d'échantillons (0 : tranche sans mesure)
+DTYPE_TRANCHE = np.dtype([
+    ('energie', 'f8'),
+    ('minimum', 'f4'),
+    ('maximum', 'f4'),
+    ('nombre', 'u4'),
+])
+
+
+def _fichier_niveau(pas_s):
+    return f"niveau_{pas_s}s.npy"
+
+
+class _Accumulateur:
+    """Tranches de 1 s d'une série lue par blocs, tableaux agrandis par doublement"""
+
+    def __init__(self):
+        self.origine_s = None
+        self.longueur = 0
+        self.energie = np.zeros(0)
+        self.minimum = np.zeros(0, dtype='f4')
+        self.maximum = np.zeros(0, dtype='f4')
+        self.nombre = np.zeros(0, dtype='u4')
+
+    def _agrandir(self, avant, longueur):
+        """Décale les tranches de `avant` vers la fin et garantit `longueur` tranches"""
+        capacite = len(self.nombre)
+        if avant or longueur > capacite:
+            capacite = max(longueur, avant + self.longueur, 2 * capacite if longueur > capacite else capacite)
+            for nom, vide in (('energie', 0.0), ('minimum', np.nan), ('maximum', np.nan), ('nombre', 0)):
+                ancien = getattr(self, nom)
+                nouveau = np.full(capacite, vide, dtype=ancien.dtype)
+                nouveau[avant:avant + self.longueur] = ancien[:self.longueur]
+                setattr(self, nom, nouveau)
+        self.longueur = max(self.longueur + avant, longueur)
+
+    def ajouter(self, instants, niveaux):
+        secondes = np.asarray(instants, dtype=np.int64) // 1000
+        niveaux = np.asarray(niveaux, dtype='f4')
+        if np.any(secondes[1:] < secondes[:-1]):
+            ordre = np.argsort(secondes, kind='stable')
+            secondes, niveaux = secondes[ordre], niveaux[ordre]
+
+        if self.origine_s is None:
+            # Origine calée sur l'heure pile : les tranches de tous les niveaux sont alignées
+            self.origine_s = int(secondes[0]) // PAS_PYRAMIDE_S[-1] * PAS_PYRAMIDE_S[-1]
+        avant = 0
+        if secondes[0] < self.origine_s:
+            nouvelle_origine = int(secondes[0]) // PAS_PYRAMIDE_S[-1] * PAS_PYRAMIDE_S[-1]
+            avant = self.origine_s - nouvelle_origine
+            self.origine_s = nouvelle_origine
+        indices = secondes - self.origine_s
+        self._agrandir(avant, int(indices[-1]) + 1)
+
+        debuts = np.flatnonzero(np.r_[True, indices[1:] != indices[:-1]])
+        tranches = indices[debuts]
+        energies = np.power(10.0, niveaux / 10)
+        self.energie[tranches] += np.add.reduceat(energies, debuts)
+        self.nombre[tranches] += np.diff(np.r_[debuts, len(indices)]).astype('u4')
+        self.minimum[tranches] = np.fmin(self.minimum[tranches], np.minimum.reduceat(niveaux, debuts))
+        self.maximum[tranches] = np.fmax(self.maximum[tranches], np.maximum.reduceat(niveaux, debuts))
+
+    def tranches(self):
+        """Tableau DTYPE_TRANCHE de 1 s, complété jusqu'à une heure entière"""
+        self._agrandir(0, -(-self.longueur // PAS_PYRAMIDE_S[-1]) * PAS_PYRAMIDE_S[-1])
+        longueur = self.longueur
+        tranches = np.zeros(longueur, dtype=DTYPE_TRANCHE)
+        nombre = self.nombre[:longueur]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tranches['energie'] = np.where(nombre > 0, self.energie[:longueur] / nombre, 0.0)
+        tranches['minimum'] = self.minimum[:longueur]
+        tranches['maximum'] = self.maximum[:longueur]
+        tranches['nombre'] = nombre
+        return tranches
+
+
+def regrouper_tranches(tranches, facteur):
+    """Niveau supérieur : regroupe les tranches par `facteur` (longueur multiple de facteur)"""
+    groupes = tranches.reshape(-1, facteur)
+    nombre = groupes['nombre'].sum(axis=1, dtype='u8')
+    resultat = np.zeros(len(groupes), dtype=DTYPE_TRANCHE)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resultat['energie'] = np.where(nombre > 0, (groupes['energie'] * groupes['nombre']).sum(axis=1) / nombre, 0.0)
+    resultat['minimum'] = np.fmin.reduce(groupes['minimum'], axis=1)
+    resultat['maximum'] = np.fmax.reduce(groupes['maximum'], axis=1)
+    resultat['nombre'] = nombre
+    return resultat
+
+
+class PyramideNiveaux:
+    """Niveaux d'une campagne à plusieurs résolutions, projetés en mémoire
+
+    niveaux[i] est un tableau DTYPE_TRANCHE de pas PAS_PYRAMIDE_S[i] ; la
+    tranche j commence à origine_ms + j * pas. Les tranches sans mesure ont
+    un nombre nul et des extrêmes NaN.
+    """
+
+    def __init__(self, chemin, entete):
+        self.chemin = chemin
+        self.entete = entete
+        self.origine_ms = entete['origine_s'] * 1000
+        self.pas_s = tuple(entete['pas_s'])
+        self.niveaux = [np.load(os.path.join(chemin, _fichier_niveau(pas)), mmap_mode='r') for pas in self.pas_s]
+
+    @classmethod
+    def construire(cls, chemin_csv, colonne_niveau='laeq', chemin=None, taille_bloc=TAILLE_BLOC):
+        """Lit l'export CSV par blocs et écrit la pyramide (par défaut dans <csv>.pyramide)"""
+        chemin = chemin or chemin_csv + EXTENSION_PYRAMIDE
+        accumulateur = _Accumulateur()
+        rejetees = 0
+        for instants, niveaux, lignes_rejetees in blocs_mesures(chemin_csv, colonne_niveau, taille_bloc):
+            rejetees += lignes_rejetees
+            if len(instants):
+                accumulateur.ajouter(instants, niveaux)
+        if accumulateur.origine_s is None:
+            raise ValueError(f"Aucune mesure exploitable dans {chemin_csv}")
+
+        os.makedirs(chemin, exist_ok=True)
+        tranches = accumulateur.tranches()
+        precedent = PAS_PYRAMIDE_S[0]
+        for pas in PAS_PYRAMIDE_S:
+            if pas != precedent:
+                tranches = regrouper_tranches(tranches, pas // precedent)
+                precedent = pas
+            niveau = np.lib.format.open_memmap(
+                os.path.join(chemin, _fichier_niveau(pas)), mode='w+', dtype=DTYPE_TRANCHE, shape=tranches.shape
+            )
+            niveau[:] = tranches
+            niveau.flush()
+            del niveau
+
+        infos = os.stat(chemin_csv)
+        entete = {
+            'version': VERSION_FORMAT,
+            'source': os.path.basename(chemin_csv),
+            'taille': infos.st_size,
+            'mtime_ns': infos.st_mtime_ns,
+            'colonne': colonne_niveau.lower(),
+            'origine_s': accumulateur.origine_s,
+            'pas_s': list(PAS_PYRAMIDE_S),
+            'lignes_rejetees': rejetees,
+        }
+        with open(os.path.join(chemin, FICHIER_ENTETE), 'w', encoding='utf-8') as f:
+            json.dump(entete, f, ensure_ascii=False, indent=2)
+        return cls(chemin, entete)
+
+    @classmethod
+    def ouvrir(cls, chemin):
+        with open(os.path.join(chemin, FICHIER_ENTETE), 'r', encoding='utf-8') as f:
+            entete = json.load(f)
+        if entete.get('version', 0) > VERSION_FORMAT:
+            raise ValueError(f"Format de pyramide trop récent : version {entete['version']}")
+        return cls(chemin, entete)
+
+    def a_jour(self, chemin_csv, colonne_niveau):
+        """Vrai si la pyramide correspond encore à l'export CSV (taille, date, colonne)"""
+        try:
+            infos = os.stat(chemin_csv)
+        except OSError:
+            return False
+        return (self.entete['taille'], self.entete['mtime_ns'], self.entete['colonne']) == \
+            (infos.st_size, infos.st_mtime_ns, colonne_niveau.lower())
+
+    @property
+    def debut_ms(self):
+        """Instant de la première tranche mesurée"""
+        return self.origine_ms + int(np.argmax(self.niveaux[0]['nombre'] > 0)) * 1000
+
+    @property
+    def fin_ms(self):
+        """Fin de la dernière tranche mesurée"""
+        nombre = self.niveaux[0]['nombre']
+        return self.origine_ms + (len(nombre) - int(np.argmax(nombre[::-1] > 0))) * 1000
+
+    def fenetre(self, debut_ms, fin_ms, pixels):
+        """Leq, minimum et maximum d'au plus `pixels` colonnes couvrant [debut_ms, fin_ms)
+
+        Le niveau lu est le plus grossier offrant au moins une tranche par
+        colonne : le coût ne dépend que du nombre de pixels, pas de la durée.
+        Une fenêtre plus courte que `pixels` secondes n'a qu'une colonne par seconde.
+        Retourne (instants ms du début de chaque colonne, leq, minimum, maximum),
+        NaN pour les colonnes sans mesure.
+        """
+        if fin_ms <= debut_ms or pixels < 1:
+            raise ValueError("Fenêtre vide")
+        duree_s = (fin_ms - debut_ms) / 1000
+        pixels = min(int(pixels), max(1, int(np.ceil(duree_s / self.pas_s[0]))))
+        indice = 0
+        for i, pas in enumerate(self.pas_s):
+            if duree_s / pas >= pixels:
+                indice = i
+        pas_ms = self.pas_s[indice] * 1000
+        niveau = self.niveaux[indice]
+
+        premier = max(0, (debut_ms - self.origine_ms) // pas_ms)
+        dernier = min(len(niveau), -(-(fin_ms - self.origine_ms) // pas_ms))
+        instants = debut_ms + (np.arange(pixels) * (fin_ms - debut_ms)) // pixels
+        leq = np.full(pixels, np.nan)
+        minimum = np.full(pixels, np.nan)
+        maximum = np.full(pixels, np.nan)
+        if dernier <= premier:
+            return instants, leq, minimum, maximum
+
+        tranches = np.asarray(niveau[premier:dernier])
+        # Colonne de chaque tranche, puis regroupement des tranches consécutives d'une même colonne
+        colonnes = ((self.origine_ms + np.arange(premier, dernier) * pas_ms - debut_ms) * pixels) // (fin_ms - debut_ms)
+        colonnes = np.clip(colonnes, 0, pixels - 1)
+        debuts = np.flatnonzero(np.r_[True, colonnes[1:] != colonnes[:-1]])
+        cibles = colonnes[debuts]
+        nombre = np.add.reduceat(tranches['nombre'].astype('u8'), debuts)
+        energie = np.add.reduceat(tranches['energie'] * tranches['nombre'], debuts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            leq[cibles] = np.where(nombre > 0, en_niveau(energie / np.maximum(nombre, 1)), np.nan)
+        minimum[cibles] = np.fmin.reduceat(tranches['minimum'], debuts)
+        maximum[cibles] = np.fmax.reduceat(tranches['maximum'], debuts)
+        return instants, leq, minimum, maximum
+
+
+def pyramide_mesures(chemin_csv, colonne_niveau='laeq'):
+    """Pyramide d'un export CSV : réutilisée si à jour, (re)construite sinon"""
+    chemin = chemin_csv + EXTENSION_PYRAMIDE
+    if os.path.exists(os.path.join(chemin, FICHIER_ENTETE)):
+        try:
+            pyramide = PyramideNiveaux.ouvrir(chemin)
+            if pyramide.a_jour(chemin_csv, colonne_niveau):
+                return pyramide
+        except (OSError, ValueError, KeyError):
+            pass
+    return PyramideNiveaux.construire(chemin_csv, colonne_niveau, chemin)
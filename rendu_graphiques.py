@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Graphiques du rapport PDF avec cache par empreinte de contenu
+Diagramme Lr / valeurs limites et historique des mesures (vectoriels), carte de
+bruit rastérisée par classes de 5 dB ; un graphique déjà rendu est réutilisé
+"""
+
+import hashlib
+import io
+import math
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image
+from reportlab.graphics.shapes import Drawing, Line, PolyLine, Polygon, Rect, String
+from reportlab.lib import colors
+
+from limites_reglementaires import HEURE_DEBUT_NUIT, HEURE_FIN_NUIT
+
+# Dossier des images rendues (PNG nommés par leur empreinte SHA-256)
+DOSSIER_CACHE = "cache_graphiques"
+
+# Nombre de dessins vectoriels conservés en mémoire (les plus récemment utilisés)
+DESSINS_MAX = 256
+
+# Côté maximal (pixels) d'une carte rastérisée ; au-delà, les cellules sont regroupées
+PIXELS_MAX = 1200
+
+# Nombre de cellules lues par bloc de lignes lors de la réduction d'une carte
+CELLULES_BLOC = 4_000_000
+
+# Classes de niveaux des cartes de bruit (dB(A)) et couleurs (palette usuelle ISO 1996-2)
+BORNES_CLASSES = (35, 40, 45, 50, 55, 60, 65, 70, 75)
+COULEURS_CLASSES = (
+    '#d9efc4', '#a6d96a', '#4daf4a', '#ffff8c', '#fdd26e',
+    '#fd9a4b', '#e8452c', '#b3001b', '#7b2a8c', '#3c3c9c',
+)
+COULEUR_SANS_VALEUR = '#ffffff'
+COULEUR_ISOPHONE = '#404040'
+
+_PALETTE = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)]
+                     for c in COULEURS_CLASSES + (COULEUR_SANS_VALEUR,)], dtype=np.uint8)
+
+
+def empreinte(*parties):
+    """Empreinte SHA-256 de données de graphique (tableaux NumPy, nombres, textes)
+
+    Les tableaux (éventuellement projetés en mémoire) sont lus par blocs de
+    lignes, sans copie complète.
+    """
+    h = hashlib.sha256()
+    for partie in parties:
+        if isinstance(partie, np.ndarray):
+            h.update(f"{partie.dtype.str}{partie.shape}".encode())
+            tableau = partie.reshape(-1, partie.shape[-1]) if partie.ndim > 1 else partie.reshape(1, -1)
+            lignes = max(1, CELLULES_BLOC // max(1, tableau.shape[1]))
+            for debut in range(0, len(tableau), lignes):
+                h.update(np.ascontiguousarray(tableau[debut:debut + lignes]).data)
+        else:
+            h.update(repr(partie).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class CacheGraphiques:
+    """Graphiques rendus indexés par l'empreinte de leurs données et paramètres
+
+    Les images PNG sont conservées sur disque et partagées entre rapports (et
+    entre processus) ; les dessins vectoriels, peu coûteux en place, restent
+    en mémoire. rendus compte les graphiques effectivement dessinés.
+    """
+
+    def __init__(self, dossier=DOSSIER_CACHE, dessins_max=DESSINS_MAX):
+        self.dossier = dossier
+        self.dessins_max = dessins_max
+        self.dessins = OrderedDict()
+        self.rendus = 0
+
+    def dessin(self, cle, rendre):
+        """Dessin reportlab de clé donnée, construit par rendre() s'il est absent"""
+        if cle in self.dessins:
+            self.dessins.move_to_end(cle)
+            return self.dessins[cle]
+        dessin = self.dessins[cle] = rendre()
+        self.rendus += 1
+        if len(self.dessins) > self.dessins_max:
+            self.dessins.popitem(last=False)
+        return dessin
+
+    def image(self, cle, rendre):
+        """Chemin du PNG de clé donnée, écrit à partir de rendre() (octets) s'il est absent"""
+        chemin = os.path.join(self.dossier, f"{cle}.png")
+        if not os.path.exists(chemin):
+            os.makedirs(self.dossier, exist_ok=True)
+            temporaire = f"{chemin}.{os.getpid()}.tmp"
+            with open(temporaire, 'wb') as f:
+                f.write(rendre())
+            os.replace(temporaire, chemin)
+            self.rendus += 1
+        return chemin
+
+
+CACHE_GRAPHIQUES = CacheGraphiques()
+
+
+def _diagramme_conformite(lr_jour, lr_nuit, limite_jour, limite_nuit, largeur, hauteur):
+    marge_gauche, marge_bas = 32, 18
+    largeur_trace, hauteur_trace = largeur - marge_gauche - 4, hauteur - marge_bas - 12
+    niveaux = (lr_jour, lr_nuit, limite_jour, limite_nuit)
+    bas = (min(niveaux) // 10 - 1) * 10
+    haut = -(-max(niveaux) // 5) * 5 + 5
+    def y(niveau):
+        return marge_bas + (niveau - bas) / (haut - bas) * hauteur_trace
+
+    dessin = Drawing(largeur, hauteur)
+    for niveau in range(int(bas), int(haut) + 1, 5 if haut - bas <= 40 else 10):
+        dessin.add(Line(marge_gauche, y(niveau), marge_gauche + largeur_trace, y(niveau),
+                        strokeColor=colors.HexColor('#e0e0e0'), strokeWidth=0.5))
+        dessin.add(String(marge_gauche - 4, y(niveau) - 2, f"{niveau}", fontSize=6, textAnchor='end'))
+
+    groupe = largeur_trace / 2
+    for i, (periode, lr, limite) in enumerate((("Jour", lr_jour, limite_jour), ("Nuit", lr_nuit, limite_nuit))):
+        x0 = marge_gauche + i * groupe + groupe * 0.3
+        largeur_barre = groupe * 0.4
+        couleur = colors.HexColor('#28a745') if lr <= limite else colors.HexColor('#c0392b')
+        dessin.add(Rect(x0, marge_bas, largeur_barre, y(lr) - marge_bas, fillColor=couleur, strokeColor=None))
+        dessin.add(String(x0 + largeur_barre / 2, y(lr) + 2, f"{lr:.1f}", fontSize=7, textAnchor='middle'))
+        dessin.add(Line(x0 - groupe * 0.1, y(limite), x0 + largeur_barre + groupe * 0.1, y(limite),
+                        strokeColor=colors.HexColor('#1f4e79'), strokeWidth=1, strokeDashArray=[3, 2]))
+        dessin.add(String(x0 + largeur_barre + groupe * 0.1, y(limite) + 2, f"VL {limite:.0f}",
+                          fontSize=6, textAnchor='end', fillColor=colors.HexColor('#1f4e79')))
+        dessin.add(String(x0 + largeur_barre / 2, 6, periode, fontSize=7, textAnchor='middle'))
+    dessin.add(Line(marge_gauche, marge_bas, marge_gauche + largeur_trace, marge_bas, strokeWidth=0.5))
+    dessin.add(String(4, marge_bas + hauteur_trace + 4, "dB(A)", fontSize=6))
+    return dessin
+
+
+def diagramme_conformite(lr_jour, lr_nuit, limite_jour, limite_nuit, largeur, hauteur, cache=CACHE_GRAPHIQUES):
+    """Barres Lr jour / nuit (vert conforme, rouge non conforme) et valeurs limites en tirets"""
+    valeurs = tuple(round(float(v), 1) for v in (lr_jour, lr_nuit, limite_jour, limite_nuit))
+    return cache.dessin(empreinte('conformite', valeurs, largeur, hauteur),
+                        lambda: _diagramme_conformite(*valeurs, largeur, hauteur))
+
+
+def _troncons(valeurs):
+    """Plages [debut, fin) consécutives sans NaN"""
+    presents = np.r_[False, ~np.isnan(valeurs), False]
+    bornes = np.flatnonzero(presents[1:] != presents[:-1])
+    return zip(bornes[::2], bornes[1::2])
+
+
+def _graphique_historique(debut, fin, leq, minimum, maximum, largeur, hauteur, lp1):
+    marge_gauche, marge_bas = 32, 18
+    largeur_trace, hauteur_trace = largeur - marge_gauche - 4, hauteur - marge_bas - 4
+    colonnes = len(leq)
+
+    bas = math.floor(np.nanmin(minimum) / 5) * 5
+    haut = math.ceil(np.nanmax(maximum) / 5) * 5
+    if lp1 is not None:
+        bas, haut = min(bas, math.floor(lp1 / 5) * 5), max(haut, math.ceil(lp1 / 5) * 5)
+    haut = max(haut, bas + 10)
+    def x(t):
+        return marge_gauche + (t - debut) / (fin - debut) * largeur_trace
+    def y(niveau):
+        return marge_bas + (niveau - bas) / (haut - bas) * hauteur_trace
+
+    dessin = Drawing(largeur, hauteur)
+    # Nuits (22h-07h) grisées, dates à minuit (le lundi seulement au-delà d'un mois)
+    origine = datetime(1970, 1, 1)
+    jour = (origine + timedelta(milliseconds=debut)).replace(hour=0, minute=0, second=0, microsecond=0)
+    while jour < origine + timedelta(milliseconds=fin, days=1):
+        minuit = (jour - origine) // timedelta(milliseconds=1)
+        x0 = x(max(minuit - (24 - HEURE_DEBUT_NUIT) * 3600000, debut))
+        x1 = x(min(minuit + HEURE_FIN_NUIT * 3600000, fin))
+        if x1 > x0:
+            dessin.add(Rect(x0, marge_bas, x1 - x0, hauteur_trace, fillColor=colors.HexColor('#eef1f6'), strokeColor=None))
+        if debut <= minuit <= fin and (fin - debut <= 31 * 86400000 or jour.weekday() == 0):
+            dessin.add(String(x(minuit), 6, jour.strftime('%d.%m'), fontSize=6, textAnchor='middle'))
+        jour += timedelta(days=1)
+
+    x_colonnes = marge_gauche + (np.arange(colonnes) + 0.5) * largeur_trace / colonnes
+    for i, j in _troncons(leq):
+        haute = [v for k in range(i, j) for v in (x_colonnes[k], y(maximum[k]))]
+        basse = [v for k in range(j - 1, i - 1, -1) for v in (x_colonnes[k], y(minimum[k]))]
+        dessin.add(Polygon(haute + basse, fillColor=colors.HexColor('#b8cce4'), strokeColor=None))
+        if j - i > 1:
+            dessin.add(PolyLine([v for k in range(i, j) for v in (x_colonnes[k], y(leq[k]))],
+                                strokeColor=colors.HexColor('#1f4e79'), strokeWidth=0.8))
+    if lp1 is not None:
+        dessin.add(Line(marge_gauche, y(lp1), marge_gauche + largeur_trace, y(lp1),
+                        strokeColor=colors.HexColor('#c0392b'), strokeWidth=0.8, strokeDashArray=[3, 2]))
+        dessin.add(String(marge_gauche + largeur_trace - 2, y(lp1) + 2, f"Lp1 retenu {lp1:.1f} dB(A)",
+                          fontSize=6, textAnchor='end', fillColor=colors.HexColor('#c0392b')))
+
+    for niveau in range(int(bas), int(haut) + 1, 5 if haut - bas <= 40 else 10):
+        dessin.add(Line(marge_gauche - 2, y(niveau), marge_gauche, y(niveau), strokeWidth=0.5))
+        dessin.add(String(marge_gauche - 4, y(niveau) - 2, f"{niveau}", fontSize=6, textAnchor='end'))
+    dessin.add(Rect(marge_gauche, marge_bas, largeur_trace, hauteur_trace, fillColor=None, strokeWidth=0.5))
+    return dessin
+
+
+def graphique_historique(pyramide, largeur, hauteur, lp1=None, cache=CACHE_GRAPHIQUES):
+    """Historique des niveaux mesurés (Leq et plage min-max) lu dans une PyramideNiveaux
+
+    La clé est l'empreinte de la fenêtre lue dans la pyramide : un rapport
+    régénéré sur la même campagne reprend le dessin déjà construit.
+    """
+    debut, fin = pyramide.debut_ms, pyramide.fin_ms
+    # Une colonne de la fenêtre par point de la largeur tracée (marges 32 + 4)
+    _, leq, minimum, maximum = pyramide.fenetre(debut, fin, int(largeur - 36))
+    lp1 = None if lp1 is None else round(float(lp1), 1)
+    cle = empreinte('historique', debut, fin, leq, minimum, maximum, largeur, hauteur, lp1)
+    return cache.dessin(cle, lambda: _graphique_historique(debut, fin, leq, minimum, maximum, largeur, hauteur, lp1))
+
+
+def reduire_carte(niveaux, pixels_max=PIXELS_MAX):
+    """Niveaux (ny, nx) ramenés à au plus pixels_max de côté par moyenne énergétique des blocs
+
+    La carte (éventuellement projetée en mémoire) est lue par bandes de
+    lignes ; les cellules NaN sont ignorées, un bloc sans valeur reste NaN.
+    """
+    ny, nx = niveaux.shape
+    facteur = max(1, -(-max(ny, nx) // pixels_max))
+    if facteur == 1:
+        return np.asarray(niveaux, dtype=float)
+
+    sy, sx = -(-ny // facteur), -(-nx // facteur)
+    reduite = np.empty((sy, sx))
+    lignes = facteur * max(1, CELLULES_BLOC // (facteur * nx))
+    for debut in range(0, ny, lignes):
+        bande = np.asarray(niveaux[debut:debut + lignes], dtype=float)
+        hauteur_bande = -(-len(bande) // facteur)
+        valeurs = np.full((hauteur_bande * facteur, sx * facteur), np.nan)
+        valeurs[:len(bande), :nx] = bande
+        valides = ~np.isnan(valeurs)
+        energies = np.power(10.0, np.where(valides, valeurs, 0.0) / 10) * valides
+        forme = (hauteur_bande, facteur, sx, facteur)
+        somme = energies.reshape(forme).sum(axis=(1, 3))
+        nombre = valides.reshape(forme).sum(axis=(1, 3))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            reduite[debut // facteur:debut // facteur + hauteur_bande] = np.where(
+                nombre > 0, 10 * np.log10(somme / nombre), np.nan)
+    return reduite
+
+
+def rasteriser_carte(niveaux, pixels_max=PIXELS_MAX, isophones=True):
+    """Image RGB (lignes, colonnes, 3) d'une carte de niveaux, nord en haut
+
+    Chaque cellule reçoit la couleur de sa classe de 5 dB par une seule
+    lecture indexée de la palette ; les limites entre classes (isophones)
+    sont tracées là où la classe change d'une cellule à sa voisine.
+    """
+    reduite = reduire_carte(niveaux, pixels_max)
+    classes = np.searchsorted(np.asarray(BORNES_CLASSES, dtype=float), reduite, side='right').astype(np.uint8)
+    classes[np.isnan(reduite)] = len(COULEURS_CLASSES)
+    image = _PALETTE[classes]
+    if isophones:
+        limites = np.zeros(classes.shape, dtype=bool)
+        limites[:, 1:] |= classes[:, 1:] != classes[:, :-1]
+        limites[1:, :] |= classes[1:, :] != classes[:-1, :]
+        limites &= classes != len(COULEURS_CLASSES)
+        image[limites] = [int(COULEUR_ISOPHONE[i:i + 2], 16) for i in (1, 3, 5)]
+    # Ligne 0 de la grille au sud (y croissant) : retournement pour l'image
+    return image[::-1]
+
+
+def png_carte(niveaux, pixels_max=PIXELS_MAX):
+    """Carte de bruit rastérisée encodée en PNG (octets)"""
+    tampon = io.BytesIO()
+    Image.fromarray(np.ascontiguousarray(rasteriser_carte(niveaux, pixels_max)), 'RGB').save(tampon, 'PNG')
+    return tampon.getvalue()
+
+
+def image_carte(niveaux, pixels_max=PIXELS_MAX, cache=CACHE_GRAPHIQUES):
+    """Chemin du PNG d'une carte de niveaux et taille de l'image (largeur, hauteur) en pixels
+
+    La clé est l'empreinte des niveaux eux-mêmes : des rapports partageant
+    la même carte de site ne la rastérisent qu'une fois.
+    """
+    ny, nx = niveaux.shape
+    facteur = max(1, -(-max(ny, nx) // pixels_max))
+    cle = empreinte('carte', niveaux, pixels_max, BORNES_CLASSES, COULEURS_CLASSES)
+    return cache.image(cle, lambda: png_carte(niveaux, pixels_max)), (-(-nx // facteur), -(-ny // facteur))
+
+
+def legende_carte(largeur, hauteur=14):
+    """Légende des classes de niveaux d'une carte de bruit"""
+    dessin = Drawing(largeur, hauteur)
+    case = largeur / len(COULEURS_CLASSES)
+    libelles = [f"< {BORNES_CLASSES[0]}"] + [f"{a}-{b}" for a, b in zip(BORNES_CLASSES, BORNES_CLASSES[1:])] + \
+        [f">= {BORNES_CLASSES[-1]}"]
+    for i, (couleur, libelle) in enumerate(zip(COULEURS_CLASSES, libelles)):
+        dessin.add(Rect(i * case, 7, case, hauteur - 7, fillColor=colors.HexColor(couleur),
+                        strokeColor=colors.HexColor('#808080'), strokeWidth=0.3))
+        dessin.add(String(i * case + case / 2, 0, libelle, fontSize=5.5, textAnchor='middle'))
+    return dessin
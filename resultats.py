@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Représentation compacte des résultats d'études acoustiques
+ResultatEtude : résultat unique à attributs fixes (__slots__), accessible comme un dictionnaire
+LotResultats : lot d'études en colonnes (tableau structuré NumPy + étiquettes codées)
+"""
+
+import numpy as np
+
+from modeles_sources import calculer_attenuation_source
+from stockage_mmap import DTYPE_RESULTAT
+
+CHAMPS_RESULTAT = (
+    'attenuation', 'lpx', 'lr_jour', 'lr_nuit',
+    'limite_jour', 'limite_nuit', 'conforme_jour', 'conforme_nuit',
+)
+
+# Champs texte de self.data stockés sous forme de codes entiers dans un lot ;
+# int16 suffit aux vocabulaires courts (zones, types), coder() refuse un débordement
+TYPES_CODES = {
+    'nom_projet': np.int32,
+    'localisation': np.int32,
+    'equipement': np.int32,
+    'zone_sensibilite': np.int16,
+    'type_source': np.int16,
+    'mode_calcul': np.int16,
+}
+CHAMPS_ETIQUETTES = tuple(TYPES_CODES)
+
+# Champs numériques de self.data conservés dans les colonnes d'un lot
+CHAMPS_PARAMETRES = tuple(nom for nom in DTYPE_RESULTAT.names if nom not in CHAMPS_RESULTAT)
+
+# Paramètres propres à chaque étude, stockés en colonnes pleines dans un lot ;
+# les autres (corrections K, géométrie, Q...) gardent presque toujours leurs
+# valeurs par défaut et sont codés par combinaison distincte
+CHAMPS_DENSES = ('lp1', 'distance_ref', 'distance_cible')
+CHAMPS_SECONDAIRES = tuple(nom for nom in CHAMPS_PARAMETRES if nom not in CHAMPS_DENSES)
+DTYPE_LOT = np.dtype([(nom, DTYPE_RESULTAT[nom]) for nom in CHAMPS_RESULTAT + CHAMPS_DENSES])
+DTYPE_SECONDAIRES = np.dtype([(nom, DTYPE_RESULTAT[nom]) for nom in CHAMPS_SECONDAIRES])
+
+VALEURS_DEFAUT = {
+    'type_source': 'ponctuelle',
+    'mode_calcul': 'pression',
+}
+
+
+class ResultatEtude:
+    """Résultat d'une étude : attributs fixes, sans dictionnaire d'instance
+
+    L'accès par clé (resultats['lr_jour'], resultats['parametres']['lp1'])
+    est conservé pour afficher_resultats et la génération du PDF.
+    """
+
+    __slots__ = CHAMPS_RESULTAT + ('parametres',)
+
+    def __init__(self, attenuation, lpx, lr_jour, lr_nuit, limite_jour, limite_nuit,
+                 conforme_jour, conforme_nuit, parametres):
+        self.attenuation = attenuation
+        self.lpx = lpx
+        self.lr_jour = lr_jour
+        self.lr_nuit = lr_nuit
+        self.limite_jour = limite_jour
+        self.limite_nuit = limite_nuit
+        self.conforme_jour = conforme_jour
+        self.conforme_nuit = conforme_nuit
+        self.parametres = parametres
+
+    def __getitem__(self, cle):
+        if cle not in self.__slots__:
+            raise KeyError(cle)
+        return getattr(self, cle)
+
+    def __contains__(self, cle):
+        return cle in self.__slots__
+
+    def get(self, cle, defaut=None):
+        return getattr(self, cle) if cle in self.__slots__ else defaut
+
+    def keys(self):
+        return self.__slots__
+
+    def en_dict(self):
+        """Dictionnaire équivalent à l'ancien format de effectuer_calculs"""
+        return {cle: getattr(self, cle) for cle in self.__slots__}
+
+    def __repr__(self):
+        return (f"ResultatEtude(lr_jour={self.lr_jour:.1f}, lr_nuit={self.lr_nuit:.1f}, "
+                f"conforme_jour={self.conforme_jour}, conforme_nuit={self.conforme_nuit})")
+
+
+class LotResultats:
+    """Lot d'études en colonnes
+
+    Les résultats et les paramètres propres à chaque étude sont dans un
+    tableau structuré DTYPE_LOT ; les textes répétés (zone, localisation...)
+    et les combinaisons de paramètres secondaires sont remplacés par des
+    codes entiers vers des vocabulaires partagés : environ 60 octets par étude.
+    """
+
+    def __init__(self, capacite=1024):
+        self.lignes = np.zeros(capacite, dtype=DTYPE_LOT)
+        self.codes = {champ: np.zeros(capacite, dtype=type_code) for champ, type_code in TYPES_CODES.items()}
+        self.vocabulaires = {champ: [] for champ in CHAMPS_ETIQUETTES}
+        self._index = {champ: {} for champ in CHAMPS_ETIQUETTES}
+        self.codes_secondaires = np.zeros(capacite, dtype=np.int32)
+        self.secondaires = np.zeros(0, dtype=DTYPE_SECONDAIRES)
+        self._index_secondaires = {}
+        self.nombre = 0
+
+    @classmethod
+    def depuis_colonnes(cls, colonnes, nombre):
+        """Lot calculé en une passe (calculer_lignes) à partir de colonnes de paramètres
+
+        colonnes : {champ de self.data: liste de valeurs}, par exemple
+        configuration.colonnes_configurations(configurations)
+        """
+        lot = cls(max(nombre, 1))
+        etiquettes = {
+            champ: [VALEURS_DEFAUT.get(champ, '') if valeur is None else valeur for valeur in colonnes[champ]]
+            for champ in CHAMPS_ETIQUETTES if champ in colonnes
+        }
+        lot.etendre(calculer_lignes(colonnes, nombre), etiquettes)
+        return lot
+
+    def __len__(self):
+        return self.nombre
+
+    @property
+    def nbytes(self):
+        """Mémoire occupée par les colonnes (hors vocabulaires)"""
+        return (self.lignes[:self.nombre].nbytes + self.codes_secondaires[:self.nombre].nbytes
+                + sum(c[:self.nombre].nbytes for c in self.codes.values()))
+
+    def _reserver(self, nombre):
+        capacite = len(self.lignes)
+        if self.nombre + nombre <= capacite:
+            return
+        capacite = max(2 * capacite, self.nombre + nombre)
+        self.lignes = np.resize(self.lignes, capacite)
+        self.codes = {champ: np.resize(codes, capacite) for champ, codes in self.codes.items()}
+        self.codes_secondaires = np.resize(self.codes_secondaires, capacite)
+
+    def coder(self, champ, valeurs):
+        """Codes entiers d'une liste de textes, le vocabulaire étant complété au besoin"""
+        index = self._index[champ]
+        vocabulaire = self.vocabulaires[champ]
+        code_max = np.iinfo(TYPES_CODES[champ]).max
+        codes = np.empty(len(valeurs), dtype=np.int32)
+        for i, valeur in enumerate(valeurs):
+            code = index.get(valeur)
+            if code is None:
+                if len(vocabulaire) > code_max:
+                    raise ValueError(f"Trop de valeurs distinctes pour {champ} : {code_max + 1} au plus")
+                code = index[valeur] = len(vocabulaire)
+                vocabulaire.append(valeur)
+            codes[i] = code
+        return codes
+
+    def coder_secondaires(self, lignes):
+        """Codes des combinaisons de paramètres secondaires d'un bloc DTYPE_RESULTAT"""
+        secondaires = np.empty(len(lignes), dtype=DTYPE_SECONDAIRES)
+        for champ in CHAMPS_SECONDAIRES:
+            # Un seul motif de NaN, pour que les paramètres absents se comparent octet à octet
+            secondaires[champ] = np.where(np.isnan(lignes[champ]), np.float32(np.nan), lignes[champ])
+        octets = secondaires.view(f"V{DTYPE_SECONDAIRES.itemsize}")
+        distincts, inverse = np.unique(octets, return_inverse=True)
+        codes_distincts = np.empty(len(distincts), dtype=np.int32)
+        for i, combinaison in enumerate(distincts):
+            cle = combinaison.tobytes()
+            code = self._index_secondaires.get(cle)
+            if code is None:
+                code = self._index_secondaires[cle] = len(self.secondaires)
+                self.secondaires = np.append(self.secondaires, np.frombuffer(cle, dtype=DTYPE_SECONDAIRES))
+            codes_distincts[i] = code
+        return codes_distincts[inverse.ravel()]
+
+    def ajouter(self, resultats):
+        """Ajoute un résultat (ResultatEtude ou dictionnaire) au lot"""
+        parametres = resultats['parametres']
+        ligne = np.zeros(1, dtype=DTYPE_RESULTAT)
+        for champ in CHAMPS_RESULTAT:
+            ligne[champ] = resultats[champ]
+        for champ in CHAMPS_PARAMETRES:
+            valeur = parametres.get(champ)
+            ligne[champ] = np.nan if valeur is None else valeur
+        etiquettes = {champ: [parametres.get(champ, VALEURS_DEFAUT.get(champ, ''))] for champ in CHAMPS_ETIQUETTES}
+        self.etendre(ligne, etiquettes)
+        return self.nombre - 1
+
+    def etendre(self, lignes, etiquettes):
+        """Ajoute un bloc de lignes déjà calculées (DTYPE_RESULTAT) et leurs étiquettes (listes ou codes)"""
+        nombre = len(lignes)
+        self._reserver(nombre)
+        bloc = slice(self.nombre, self.nombre + nombre)
+        for champ in DTYPE_LOT.names:
+            self.lignes[champ][bloc] = lignes[champ]
+        self.codes_secondaires[bloc] = self.coder_secondaires(lignes)
+        for champ in CHAMPS_ETIQUETTES:
+            valeurs = etiquettes.get(champ, [VALEURS_DEFAUT.get(champ, '')] * nombre)
+            if isinstance(valeurs, str):
+                valeurs = [valeurs] * nombre
+            self.codes[champ][bloc] = self.coder(champ, valeurs)
+        self.nombre += nombre
+
+    def colonne(self, champ):
+        """Vue sur une colonne numérique, ou textes décodés pour une étiquette"""
+        if champ in self.codes:
+            vocabulaire = np.array(self.vocabulaires[champ], dtype=object)
+            return vocabulaire[self.codes[champ][:self.nombre]]
+        if champ in CHAMPS_SECONDAIRES:
+            return self.secondaires[champ][self.codes_secondaires[:self.nombre]]
+        return self.lignes[champ][:self.nombre]
+
+    def __getitem__(self, indice):
+        """ResultatEtude reconstruit à la demande pour une étude du lot"""
+        if not -self.nombre <= indice < self.nombre:
+            raise IndexError(indice)
+        indice %= self.nombre
+        ligne = self.lignes[indice]
+        secondaires = self.secondaires[self.codes_secondaires[indice]]
+        parametres = {}
+        for champ in CHAMPS_PARAMETRES:
+            valeur = float(secondaires[champ] if champ in CHAMPS_SECONDAIRES else ligne[champ])
+            parametres[champ] = None if np.isnan(valeur) else valeur
+        for champ in CHAMPS_ETIQUETTES:
+            parametres[champ] = self.vocabulaires[champ][self.codes[champ][indice]]
+        parametres['limite_jour'] = float(ligne['limite_jour'])
+        parametres['limite_nuit'] = float(ligne['limite_nuit'])
+        return ResultatEtude(
+            float(ligne['attenuation']), float(ligne['lpx']),
+            float(ligne['lr_jour']), float(ligne['lr_nuit']),
+            float(ligne['limite_jour']), float(ligne['limite_nuit']),
+            bool(ligne['conforme_jour']), bool(ligne['conforme_nuit']),
+            parametres
+        )
+
+    def __iter__(self):
+        for indice in range(self.nombre):
+            yield self[indice]
+
+
+def _colonne(colonnes, champ, nombre, defaut=np.nan):
+    valeurs = colonnes.get(champ)
+    if valeurs is None:
+        return np.full(nombre, defaut, dtype=float)
+    valeurs = np.asarray([np.nan if v is None else v for v in valeurs] if isinstance(valeurs, list) else valeurs,
+                         dtype=float)
+    return np.broadcast_to(valeurs, (nombre,)) if valeurs.ndim == 0 else valeurs
+
+
+def calculer_lignes(colonnes, nombre):
+    """Calcul vectorisé de effectuer_calculs pour des colonnes de paramètres
+
+    colonnes : {champ de self.data: tableau de valeurs (ou scalaire)}
+    Retourne un tableau structuré DTYPE_RESULTAT de longueur `nombre`.
+    """
+    lignes = np.zeros(nombre, dtype=DTYPE_RESULTAT)
+    for champ in CHAMPS_PARAMETRES:
+        lignes[champ] = _colonne(colonnes, champ, nombre)
+    lignes['limite_jour'] = _colonne(colonnes, 'limite_jour', nombre)
+    lignes['limite_nuit'] = _colonne(colonnes, 'limite_nuit', nombre)
+
+    # Calculs en double précision, seul le stockage est en float32
+    colonne = {champ: lignes[champ].astype(float) for champ in CHAMPS_PARAMETRES}
+    distance_ref = colonne['distance_ref']
+    distance_cible = colonne['distance_cible']
+    attenuation = 20 * np.log10(distance_ref / distance_cible)
+    lpx = colonne['lp1'] + attenuation
+
+    # Sources étendues : intégration numérique une fois par géométrie distincte
+    types = np.broadcast_to(np.asarray(colonnes.get('type_source', 'ponctuelle'), dtype=object), (nombre,))
+    geometries = {}
+    for i in np.nonzero(types != 'ponctuelle')[0]:
+        longueur, largeur = colonne['longueur_source'][i], colonne['largeur_source'][i]
+        cle = (types[i], float(distance_ref[i]), float(distance_cible[i]),
+               None if np.isnan(longueur) else float(longueur), None if np.isnan(largeur) else float(largeur))
+        if cle not in geometries:
+            geometries[cle] = calculer_attenuation_source(*cle)
+        attenuation[i] = geometries[cle]
+        lpx[i] = colonne['lp1'][i] + attenuation[i]
+
+    # Mode puissance : Lp = Lw - 20 x log10(r) - 11 + 10 x log10(Q)
+    modes = np.broadcast_to(np.asarray(colonnes.get('mode_calcul', 'pression'), dtype=object), (nombre,))
+    puissance = modes == 'puissance'
+    if np.any(puissance):
+        lw = colonne['puissance_sonore'][puissance]
+        lpx[puissance] = (lw - 20 * np.log10(distance_cible[puissance])
+                          - 11 + 10 * np.log10(colonne['facteur_q'][puissance]))
+        attenuation[puissance] = lpx[puissance] - lw
+
+    corrections = colonne['k2'] + colonne['k3'] + colonne['reflexion']
+    lr_jour = lpx + colonne['k1_jour'] + corrections
+    lr_nuit = lpx + colonne['k1_nuit'] + corrections
+    lignes['attenuation'] = attenuation
+    lignes['lpx'] = lpx
+    lignes['lr_jour'] = lr_jour
+    lignes['lr_nuit'] = lr_nuit
+    lignes['conforme_jour'] = lr_jour <= _colonne(colonnes, 'limite_jour', nombre)
+    lignes['conforme_nuit'] = lr_nuit <= _colonne(colonnes, 'limite_nuit', nombre)
+    return lignes
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Comparaison de variantes d'une étude (déplacement, écran, autre modèle...)
+Chaque variante modifie quelques champs de l'étude de base ; toutes sont
+calculées en un seul appel vectorisé et comparées à la base (écarts, marges)
+"""
+
+import itertools
+import json
+
+import numpy as np
+
+from configuration import colonnes_configurations, valider_configuration
+from limites_reglementaires import zone_sensibilite
+from resultats import calculer_lignes
+
+FORMAT_SCENARIOS = "calculateur-acoustique-scenarios"
+VERSION_SCENARIOS = 1
+
+NOM_BASE = "Etude de base"
+
+# Nombre maximal de variantes produites par une grille (produit cartésien)
+VARIANTES_MAX = 10_000
+
+
+def _description(modifications, ecarts):
+    """Résumé court d'une variante : « distance_cible=25, k3+-5 »"""
+    parties = [f"{champ}={valeur:g}" if isinstance(valeur, (int, float)) else f"{champ}={valeur}"
+               for champ, valeur in modifications.items()]
+    parties += [f"{champ}{ecart:+g}" for champ, ecart in ecarts.items()]
+    return ", ".join(parties)
+
+
+def variantes_grille(grille):
+    """Variantes (nom, modifications, écarts) de toutes les combinaisons {champ: [valeurs]}"""
+    champs = list(grille)
+    nombre = int(np.prod([len(grille[champ]) for champ in champs])) if champs else 0
+    if nombre > VARIANTES_MAX:
+        raise ValueError(f"Grille de {nombre} variantes (maximum {VARIANTES_MAX})")
+    variantes = []
+    for valeurs in itertools.product(*(grille[champ] for champ in champs)):
+        modifications = dict(zip(champs, valeurs))
+        variantes.append((_description(modifications, {}), modifications, {}))
+    return variantes
+
+
+def lire_scenarios(chemin):
+    """Variantes [(nom, modifications, écarts)] d'un fichier JSON de scénarios
+
+    {"format": "calculateur-acoustique-scenarios", "version": 1,
+     "variantes": [{"nom": "Ecran 2 m", "modifications": {"k3": -8}},
+                   {"nom": "Recul de 5 m", "ecarts": {"distance_cible": 5}}],
+     "grille": {"distance_cible": [10, 15, 20], "lp1": [52, 55]}}
+
+    modifications remplace des champs de l'étude, ecarts s'ajoute à leur
+    valeur ; la grille ajoute toutes les combinaisons de ses valeurs.
+    """
+    with open(chemin, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if isinstance(document, list):
+        document = {'variantes': document}
+    if document.get('format', FORMAT_SCENARIOS) != FORMAT_SCENARIOS:
+        raise ValueError(f"{chemin} : ce n'est pas un fichier de scénarios du calculateur acoustique")
+    if document.get('version', 0) > VERSION_SCENARIOS:
+        raise ValueError(f"{chemin} : fichier de scénarios trop récent (version {document['version']})")
+
+    variantes = []
+    for numero, variante in enumerate(document.get('variantes', []), 1):
+        modifications = variante.get('modifications', {})
+        ecarts = variante.get('ecarts', {})
+        if not isinstance(modifications, dict) or not isinstance(ecarts, dict):
+            raise ValueError(f"{chemin}, variante {numero} : « modifications » et « ecarts » doivent être des objets")
+        variantes.append((variante.get('nom') or _description(modifications, ecarts) or f"Variante {numero}",
+                          modifications, ecarts))
+    variantes += variantes_grille(document.get('grille', {}))
+    if not variantes:
+        raise ValueError(f"{chemin} : aucune variante")
+    return variantes
+
+
+def appliquer_variante(base, modifications, ecarts=None):
+    """Données d'une variante : base modifiée, validée comme une configuration
+
+    Un changement de zone_sensibilite sans limites explicites reprend les
+    limites du degré choisi.
+    """
+    donnees = dict(base, **modifications)
+    for champ, ecart in (ecarts or {}).items():
+        if base.get(champ) is None:
+            raise ValueError(f"Écart sur {champ} impossible : valeur absente de l'étude de base")
+        donnees[champ] = base[champ] + ecart
+    if 'zone_sensibilite' in modifications and not {'limite_jour', 'limite_nuit'} & set(modifications):
+        donnees['zone_sensibilite'], donnees['limite_jour'], donnees['limite_nuit'] = \
+            zone_sensibilite(modifications['zone_sensibilite'])
+    return valider_configuration(donnees)
+
+
+class ComparaisonScenarios:
+    """Étude de base (ligne 0) et variantes calculées ensemble
+
+    lignes est le tableau DTYPE_RESULTAT de calculer_lignes ; les écarts
+    sont comptés par rapport à la base, les marges par rapport aux limites
+    de chaque variante (positives si la limite est respectée).
+    """
+
+    def __init__(self, noms, descriptions, donnees, lignes):
+        self.noms = noms
+        self.descriptions = descriptions
+        self.donnees = donnees
+        self.lignes = lignes
+        lr_jour = lignes['lr_jour'].astype(float)
+        lr_nuit = lignes['lr_nuit'].astype(float)
+        self.ecart_jour = lr_jour - lr_jour[0]
+        self.ecart_nuit = lr_nuit - lr_nuit[0]
+        self.marge_jour = lignes['limite_jour'] - lr_jour
+        self.marge_nuit = lignes['limite_nuit'] - lr_nuit
+        self.conformes = lignes['conforme_jour'] & lignes['conforme_nuit']
+
+    def __len__(self):
+        return len(self.lignes)
+
+    def meilleure(self):
+        """Indice de la variante conforme de plus grande marge (la base comprise), ou None"""
+        marges = np.where(self.conformes, np.minimum(self.marge_jour, self.marge_nuit), -np.inf)
+        return int(np.argmax(marges)) if self.conformes.any() else None
+
+    def tableau(self):
+        """Lignes du tableau comparatif (textes), en-tête compris"""
+        lignes = [["Variante", "Modifications", "Lr jour", "Ecart", "Lr nuit", "Ecart", "Limites J/N", "Conformite"]]
+        for i in range(len(self)):
+            ligne = self.lignes[i]
+            lignes.append([
+                self.noms[i], self.descriptions[i],
+                f"{ligne['lr_jour']:.1f}", "-" if i == 0 else f"{self.ecart_jour[i]:+.1f}",
+                f"{ligne['lr_nuit']:.1f}", "-" if i == 0 else f"{self.ecart_nuit[i]:+.1f}",
+                f"{ligne['limite_jour']:.0f} / {ligne['limite_nuit']:.0f}",
+                "CONFORME" if self.conformes[i] else "NON CONFORME",
+            ])
+        return lignes
+
+
+def comparer_scenarios(base, variantes):
+    """Calcule l'étude de base et ses variantes [(nom, modifications, écarts)] en une passe"""
+    base = valider_configuration(base)
+    noms, descriptions, donnees = [NOM_BASE], [""], [base]
+    for nom, modifications, ecarts in variantes:
+        try:
+            donnees.append(appliquer_variante(base, modifications, ecarts))
+        except (TypeError, ValueError) as e:
+            raise ValueError(f"Variante « {nom} » : {e}")
+        noms.append(nom)
+        descriptions.append(_description(modifications, ecarts or {}))
+    lignes = calculer_lignes(colonnes_configurations([(d, None) for d in donnees]), len(donnees))
+    return ComparaisonScenarios(noms, descriptions, donnees, lignes)
+
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stockage sur disque des cartes de bruit
+Tableaux NumPy projetés en mémoire (memmap) et petit en-tête JSON :
+l'ouverture est immédiate et seules les régions lues sont chargées
+"""
+
+import json
+import os
+import numpy as np
+
+from carte_bruit import CarteBruit
+from modeles_sources import en_niveau
+
+VERSION_FORMAT = 1
+
+FICHIER_ENTETE = "entete.json"
+FICHIER_NIVEAUX = "niveaux.npy"
+FICHIER_ENERGIE = "energie.npy"
+
+PERIODES = ('jour', 'nuit')
+
+# Une ligne par étude (resultats.calculer_lignes) : uniquement des valeurs numériques
+DTYPE_RESULTAT = np.dtype([
+    ('attenuation', 'f4'),
+    ('lpx', 'f4'),
+    ('lr_jour', 'f4'),
+    ('lr_nuit', 'f4'),
+    ('limite_jour', 'f4'),
+    ('limite_nuit', 'f4'),
+    ('conforme_jour', '?'),
+    ('conforme_nuit', '?'),
+    ('lp1', 'f4'),
+    ('puissance_sonore', 'f4'),
+    ('puissance_frigorifique', 'f4'),
+    ('distance_ref', 'f4'),
+    ('distance_cible', 'f4'),
+    ('k1_jour', 'f4'),
+    ('k1_nuit', 'f4'),
+    ('k2', 'f4'),
+    ('k3', 'f4'),
+    ('reflexion', 'f4'),
+    ('facteur_q', 'f4'),
+    ('longueur_source', 'f4'),
+    ('largeur_source', 'f4'),
+])
+
+
+def _lire_entete(chemin):
+    with open(os.path.join(chemin, FICHIER_ENTETE), 'r', encoding='utf-8') as f:
+        entete = json.load(f)
+    if entete.get('version', 0) > VERSION_FORMAT:
+        raise ValueError(f"Format de stockage trop récent : version {entete['version']}")
+    return entete
+
+
+def _ecrire_entete(chemin, entete):
+    with open(os.path.join(chemin, FICHIER_ENTETE), 'w', encoding='utf-8') as f:
+        json.dump(entete, f, ensure_ascii=False, indent=2)
+
+
+class StockageCarte:
+    """Carte de bruit sur disque : niveaux[scenario, periode, y, x]
+
+    L'en-tête contient l'origine de la grille, la résolution, les clés de
+    scénarios et de périodes. Un tableau d'énergie optionnel sert de tampon
+    de calcul pour CarteBruit lorsque la grille ne tient pas en mémoire.
+    """
+
+    def __init__(self, chemin, entete, mode):
+        self.chemin = chemin
+        self.entete = entete
+        self.niveaux = np.load(os.path.join(chemin, FICHIER_NIVEAUX), mmap_mode=mode)
+        chemin_energie = os.path.join(chemin, FICHIER_ENERGIE)
+        self._energie = np.load(chemin_energie, mmap_mode=mode) if os.path.exists(chemin_energie) else None
+
+    @classmethod
+    def creer(cls, chemin, origine, resolution, nx, ny, scenarios=('base',), periodes=PERIODES,
+              avec_energie=False, dtype='float64'):
+        """Crée une carte vide sur disque (fichiers clairsemés, aucune écriture des données)"""
+        os.makedirs(chemin, exist_ok=True)
+        entete = {
+            'version': VERSION_FORMAT,
+            'origine': [float(origine[0]), float(origine[1])],
+            'resolution': float(resolution),
+            'nx': int(nx),
+            'ny': int(ny),
+            'scenarios': list(scenarios),
+            'periodes': list(periodes),
+            'dtype': np.dtype(dtype).str,
+        }
+        niveaux = np.lib.format.open_memmap(
+            os.path.join(chemin, FICHIER_NIVEAUX), mode='w+', dtype=dtype,
+            shape=(len(scenarios), len(periodes), ny, nx)
+        )
+        del niveaux
+        if avec_energie:
+            energie = np.lib.format.open_memmap(
+                os.path.join(chemin, FICHIER_ENERGIE), mode='w+', dtype='float64',
+                shape=(len(scenarios), ny, nx)
+            )
+            del energie
+        _ecrire_entete(chemin, entete)
+        return cls(chemin, entete, 'r+')
+
+    @classmethod
+    def ouvrir(cls, chemin, mode='r'):
+        """Ouvre une carte existante sans charger les données"""
+        return cls(chemin, _lire_entete(chemin), mode)
+
+    def _indice_scenario(self, scenario):
+        try:
+            return self.entete['scenarios'].index(scenario)
+        except ValueError:
+            raise KeyError(f"Scénario inconnu : {scenario}")
+
+    def _indice_periode(self, periode):
+        try:
+            return self.entete['periodes'].index(periode)
+        except ValueError:
+            raise KeyError(f"Période inconnue : {periode}")
+
+    def grille(self, scenario, periode):
+        """Vue (ny, nx) projetée en mémoire, en écriture si ouverte en 'r+'"""
+        return self.niveaux[self._indice_scenario(scenario), self._indice_periode(periode)]
+
+    def energie(self, scenario):
+        """Tampon d'énergie (ny, nx) à passer à CarteBruit(energie=...)"""
+        if self._energie is None:
+            raise KeyError("Cette carte a été créée sans tampon d'énergie")
+        return self._energie[self._indice_scenario(scenario)]
+
+    def indices_region(self, x_min, x_max, y_min, y_max):
+        """Bornes (y0, y1, x0, x1) des cellules couvrant un rectangle en mètres"""
+        ox, oy = self.entete['origine']
+        pas = self.entete['resolution']
+        x0 = max(0, int(np.floor((x_min - ox) / pas)))
+        x1 = min(self.entete['nx'], int(np.ceil((x_max - ox) / pas)) + 1)
+        y0 = max(0, int(np.floor((y_min - oy) / pas)))
+        y1 = min(self.entete['ny'], int(np.ceil((y_max - oy) / pas)) + 1)
+        return y0, y1, x0, x1
+
+    def region(self, scenario, periode, x_min, x_max, y_min, y_max):
+        """Lit uniquement les cellules d'un rectangle en mètres (copie en mémoire)"""
+        y0, y1, x0, x1 = self.indices_region(x_min, x_max, y_min, y_max)
+        return np.array(self.grille(scenario, periode)[y0:y1, x0:x1])
+
+    def carte_bruit(self, scenario, **options):
+        """CarteBruit de la grille de la carte, sommant l'énergie dans le tampon sur disque"""
+        entete = self.entete
+        return CarteBruit(entete['origine'], entete['resolution'], entete['nx'], entete['ny'],
+                          energie=self.energie(scenario), **options)
+
+    def ecrire_carte(self, carte, scenario, corrections, tuiles=None):
+        """Écrit les niveaux d'une CarteBruit tuile par tuile (toutes, ou celles données)
+
+        corrections : {periode: somme K1 + K2 + K3 + réflexion}
+        """
+        if tuiles is None:
+            nty, ntx = carte.nombre_tuiles
+            tuiles = [(ty, tx) for ty in range(nty) for tx in range(ntx)]
+        for periode, correction in corrections.items():
+            grille = self.grille(scenario, periode)
+            for ty, tx in tuiles:
+                y0, y1, x0, x1 = carte._bornes_tuile(ty, tx)
+                grille[y0:y1, x0:x1] = en_niveau(carte.energie[y0:y1, x0:x1]) + correction
+        self.flush()
+
+    def enregistrer_entete(self):
+        """Réécrit l'en-tête (par exemple après modification de self.entete['sources'])"""
+        _ecrire_entete(self.chemin, self.entete)
+
+    def flush(self):
+        """Force l'écriture des pages modifiées sur le disque"""
+        if isinstance(self.niveaux, np.memmap):
+            self.niveaux.flush()
+        if isinstance(self._energie, np.memmap):
+            self._energie.flush()
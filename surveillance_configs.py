@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Surveillance d'un dossier de configurations d'études
+Scrutation légère des dates de modification, anti-rebond, empreintes SHA-256
+des données : seules les études réellement modifiées sont recalculées
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from configuration import EXTENSIONS, lire_configuration
+
+# Intervalle (s) entre deux scrutations du dossier
+INTERVALLE_SCRUTATION = 1.0
+
+# Délai (s) sans nouvelle modification avant de traiter un fichier (sauvegardes successives)
+DELAI_STABILITE = 0.5
+
+
+def empreinte_configuration(donnees):
+    """Empreinte SHA-256 des données d'une étude, indépendante de la mise en forme du fichier"""
+    texte = json.dumps(donnees, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(texte.encode('utf-8')).hexdigest()
+
+
+class _Etat:
+    __slots__ = ('signature', 'vu_a', 'empreinte', 'tache', 'en_attente')
+
+    def __init__(self, signature, vu_a):
+        self.signature = signature
+        self.vu_a = vu_a
+        self.empreinte = None
+        self.tache = None
+        self.en_attente = None
+
+
+class SurveillanceConfigurations:
+    """Surveille un dossier et confie les études modifiées à un groupe de processus
+
+    traiter(chemin, donnees, date_etude) est exécuté dans un processus de travail
+    (fonction de niveau module) ; rapporter(chemin, resultat, erreur) est appelé
+    dans le fil de surveillance à la fin de chaque traitement.
+    Au repos, une scrutation ne coûte qu'un os.scandir du dossier : les fichiers
+    ne sont relus que si leur taille ou leur date de modification change.
+    Les fichiers présents au démarrage ne sont pas recalculés (seule leur
+    empreinte est relevée), sauf avec existants=True.
+    """
+
+    def __init__(self, dossier, traiter, rapporter=None, intervalle=INTERVALLE_SCRUTATION,
+                 delai=DELAI_STABILITE, processus=None, horloge=time.monotonic, existants=False):
+        if not os.path.isdir(dossier):
+            raise ValueError(f"Dossier à surveiller introuvable : {dossier}")
+        self.dossier = dossier
+        self.traiter = traiter
+        self.rapporter = rapporter
+        self.intervalle = intervalle
+        self.delai = delai
+        self.processus = processus
+        self.horloge = horloge
+        self.existants = existants
+        self.amorcee = False
+        self.etats = {}
+        self.executeur = None
+        self.arret = threading.Event()
+
+    def _signatures(self):
+        signatures = {}
+        with os.scandir(self.dossier) as entrees:
+            for entree in entrees:
+                if os.path.splitext(entree.name)[1].lower() not in EXTENSIONS or not entree.is_file():
+                    continue
+                infos = entree.stat()
+                signatures[entree.path] = (infos.st_mtime_ns, infos.st_size)
+        return signatures
+
+    def _amorcer(self, signatures):
+        """Relève l'empreinte des fichiers déjà présents, sans les recalculer"""
+        for chemin, signature in signatures.items():
+            etat = self.etats[chemin] = _Etat(signature, None)
+            try:
+                etat.empreinte = empreinte_configuration(lire_configuration(chemin)[0])
+            except (OSError, ValueError, KeyError, struct.error):
+                # Illisible au démarrage : traité à sa prochaine sauvegarde
+                pass
+
+    def scruter(self):
+        """Une passe de surveillance : retourne les chemins soumis au recalcul"""
+        maintenant = self.horloge()
+        signatures = self._signatures()
+        if not self.amorcee:
+            self.amorcee = True
+            if not self.existants:
+                self._amorcer(signatures)
+                return []
+
+        for chemin in set(self.etats) - set(signatures):
+            # Fichier supprimé : une tâche en cours se termine, son résultat n'est plus rapporté
+            del self.etats[chemin]
+
+        prets = []
+        for chemin, signature in signatures.items():
+            etat = self.etats.get(chemin)
+            if etat is None:
+                self.etats[chemin] = _Etat(signature, maintenant)
+            elif etat.signature != signature:
+                etat.signature = signature
+                etat.vu_a = maintenant
+            elif etat.vu_a is not None and maintenant - etat.vu_a >= self.delai:
+                etat.vu_a = None
+                prets.append(chemin)
+
+        soumis = []
+        for chemin in prets:
+            etat = self.etats[chemin]
+            try:
+                donnees, date_etude = lire_configuration(chemin)
+            except (OSError, ValueError, KeyError, struct.error) as e:
+                # Fichier en cours d'écriture ou invalide : signalé, retenté à la prochaine sauvegarde
+                self._rapporter(chemin, None, e)
+                continue
+            empreinte = empreinte_configuration(donnees)
+            if empreinte == etat.empreinte:
+                continue
+            etat.empreinte = empreinte
+            etat.en_attente = (donnees, date_etude)
+            soumis.append(chemin)
+
+        self._soumettre()
+        return soumis
+
+    def _terminer(self):
+        """Rapporte les tâches achevées"""
+        for chemin, etat in self.etats.items():
+            if etat.tache is not None and etat.tache.done():
+                tache, etat.tache = etat.tache, None
+                erreur = tache.exception()
+                self._rapporter(chemin, None if erreur else tache.result(), erreur)
+
+    def _soumettre(self):
+        """Lance les études en attente, une seule tâche à la fois par étude"""
+        self._terminer()
+        for chemin, etat in self.etats.items():
+            if etat.tache is None and etat.en_attente is not None:
+                if self.executeur is None:
+                    self.executeur = ProcessPoolExecutor(max_workers=self.processus)
+                etat.tache = self.executeur.submit(self.traiter, chemin, *etat.en_attente)
+                etat.en_attente = None
+
+    def _rapporter(self, chemin, resultat, erreur):
+        if self.rapporter is not None:
+            self.rapporter(chemin, resultat, erreur)
+
+    @property
+    def occupee(self):
+        """Vrai tant qu'une étude est en cours de traitement ou en attente"""
+        return any(etat.tache is not None or etat.en_attente is not None or etat.vu_a is not None
+                   for etat in self.etats.values())
+
+    def executer(self, duree=None):
+        """Surveille jusqu'à arreter() (ou pendant duree secondes)"""
+        fin = None if duree is None else self.horloge() + duree
+        try:
+            while not self.arret.is_set() and (fin is None or self.horloge() < fin):
+                self.scruter()
+                self.arret.wait(self.intervalle)
+        finally:
+            self.fermer()
+
+    def arreter(self):
+        self.arret.set()
+
+    def fermer(self):
+        """Attend les traitements en cours et libère les processus de travail"""
+        if self.executeur is not None:
+            self.executeur.shutdown(wait=True)
+            self.executeur = None
+            self._terminer()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Surveillance continue de la conformité après mise en service
+Niveaux courts reçus d'un socket local ou d'un fichier en cours d'écriture,
+sommes énergétiques glissantes de la période jour / nuit et alertes sur le Lr projeté
+"""
+
+import os
+import socket
+import time
+import numpy as np
+
+from mesures_sonometre import MOTIF_EUROPEEN, MOTIF_ISO, FormatLignes, intervalle_echantillons
+from modeles_sources import en_niveau
+from limites_reglementaires import HEURE_DEBUT_NUIT, HEURE_FIN_NUIT
+
+# Fenêtre (s) du niveau récent utilisé pour projeter la fin de la période
+FENETRE_RECENTE_S = 900
+
+# Une alerte de prévision n'est relancée qu'après un retour sous la limite moins cet écart
+HYSTERESIS_DB = 1.0
+
+# Taille des lectures sur le socket ou le fichier suivi
+TAILLE_LECTURE = 65536
+
+DUREES_PERIODES_S = {
+    'jour': (HEURE_DEBUT_NUIT - HEURE_FIN_NUIT) * 3600,
+    'nuit': (24 - HEURE_DEBUT_NUIT + HEURE_FIN_NUIT) * 3600,
+}
+
+
+class Alerte:
+    """Dépassement prévu (Lr projeté) ou avéré (énergie déjà reçue) d'une valeur limite"""
+
+    def __init__(self, instant_ms, jour, periode, nature, lr, limite):
+        self.instant_ms = instant_ms
+        self.jour = jour
+        self.periode = periode
+        self.nature = nature
+        self.lr = lr
+        self.limite = limite
+
+    def __str__(self):
+        heure = np.datetime64(int(self.instant_ms), 'ms').astype('datetime64[s]')
+        libelle = "Dépassement avéré" if self.nature == 'depassement' else "Dépassement prévu"
+        return (f"{heure} {libelle} ({self.periode} du {self.jour}) : "
+                f"Lr {self.lr:.1f} dB(A) > limite {self.limite:.0f} dB(A)")
+
+
+class BilanPeriode:
+    """Lr d'une période jour ou nuit terminée"""
+
+    def __init__(self, jour, periode, leq, lr, limite, couverture):
+        self.jour = jour
+        self.periode = periode
+        self.leq = leq
+        self.lr = lr
+        self.limite = limite
+        self.couverture = couverture
+
+    @property
+    def conforme(self):
+        return self.lr <= self.limite
+
+
+class SurveillanceContinue:
+    """Lr courant et projeté de la période en cours, mis à jour par blocs d'échantillons
+
+    Le coût par échantillon est constant : l'énergie de la période et celle de
+    la fenêtre récente (tampon circulaire de secondes) sont des sommes courantes.
+    Les corrections K1 (selon la période), K2, K3 et réflexion sont celles de
+    la configuration de l'étude (self.data).
+    """
+
+    def __init__(self, donnees, intervalle_ms=None, fenetre_s=FENETRE_RECENTE_S, alerter=None):
+        self.corrections = donnees['k2'] + donnees['k3'] + donnees['reflexion']
+        self.k1 = {'jour': donnees['k1_jour'], 'nuit': donnees['k1_nuit']}
+        self.limites = {'jour': donnees['limite_jour'], 'nuit': donnees['limite_nuit']}
+        self.intervalle_ms = intervalle_ms
+        self.fenetre_s = int(fenetre_s)
+        self.alerter = alerter
+        self.bilans = []
+        self.echantillons = 0
+
+        self.cle = None
+        self.energie = 0.0
+        self.duree_s = 0.0
+        self.dernier_ms = None
+        self._energie_secondes = np.zeros(self.fenetre_s)
+        self._duree_secondes = np.zeros(self.fenetre_s)
+        self._energie_recente = 0.0
+        self._duree_recente = 0.0
+        self._derniere_seconde = None
+        self._alertes = set()
+
+    @property
+    def periode(self):
+        return None if self.cle is None else ('nuit' if self.cle % 2 else 'jour')
+
+    @property
+    def jour(self):
+        return None if self.cle is None else np.datetime64(self.cle // 2, 'D')
+
+    def _debut_periode_ms(self):
+        heure = HEURE_DEBUT_NUIT if self.cle % 2 else HEURE_FIN_NUIT
+        return (self.cle // 2) * 86400000 + heure * 3600000
+
+    def _clore_periode(self):
+        if self.cle is None or self.duree_s <= 0:
+            return
+        periode = self.periode
+        leq = float(en_niveau(self.energie / self.duree_s))
+        lr = leq + self.k1[periode] + self.corrections
+        self.bilans.append(BilanPeriode(self.jour, periode, leq, lr, self.limites[periode],
+                                        self.duree_s / DUREES_PERIODES_S[periode]))
+
+    def _fenetre(self, secondes, energies, durees):
+        """Tampon circulaire des dernières secondes (secondes triées, une passe vectorisée)"""
+        fin = int(secondes[-1])
+        if self._derniere_seconde is None:
+            self._derniere_seconde = fin - self.fenetre_s
+        # Secondes sorties de la fenêtre : retirées des sommes courantes puis remises à zéro
+        a_vider = min(fin - self._derniere_seconde, self.fenetre_s)
+        if a_vider > 0:
+            indices = np.arange(fin - a_vider + 1, fin + 1) % self.fenetre_s
+            self._energie_recente -= self._energie_secondes[indices].sum()
+            self._duree_recente -= self._duree_secondes[indices].sum()
+            self._energie_secondes[indices] = 0.0
+            self._duree_secondes[indices] = 0.0
+            self._derniere_seconde = fin
+        dans_fenetre = secondes > fin - self.fenetre_s
+        indices = secondes[dans_fenetre] % self.fenetre_s
+        energie = np.bincount(indices, weights=energies[dans_fenetre], minlength=self.fenetre_s)
+        duree = np.bincount(indices, weights=durees[dans_fenetre], minlength=self.fenetre_s)
+        self._energie_secondes += energie
+        self._duree_secondes += duree
+        self._energie_recente += energie.sum()
+        self._duree_recente += duree.sum()
+
+    def ajouter(self, instants_ms, niveaux):
+        """Ajoute un bloc d'échantillons (instants en ms croissants, LAeq courts en dB(A))"""
+        instants_ms = np.asarray(instants_ms, dtype=np.int64)
+        niveaux = np.asarray(niveaux, dtype=float)
+        if not len(instants_ms):
+            return
+        if self.intervalle_ms is None:
+            self.intervalle_ms = intervalle_echantillons(instants_ms)
+            if self.intervalle_ms is None:
+                return
+        duree_echantillon = self.intervalle_ms / 1000
+
+        heures = (instants_ms // 3600000) % 24
+        nuit = (heures >= HEURE_DEBUT_NUIT) | (heures < HEURE_FIN_NUIT)
+        cles = ((instants_ms - HEURE_FIN_NUIT * 3600000) // 86400000) * 2 + nuit
+        energies = np.power(10.0, niveaux / 10) * duree_echantillon
+        durees = np.full(len(niveaux), duree_echantillon)
+
+        # Découpage du bloc aux changements de période (en général aucun)
+        coupures = np.flatnonzero(np.diff(cles)) + 1
+        for debut, fin in zip(np.concatenate([[0], coupures]), np.concatenate([coupures, [len(cles)]])):
+            cle = int(cles[debut])
+            if cle != self.cle:
+                self._clore_periode()
+                self.cle = cle
+                self.energie = 0.0
+                self.duree_s = 0.0
+                self._alertes = set()
+            self.energie += energies[debut:fin].sum()
+            self.duree_s += (fin - debut) * duree_echantillon
+            self._fenetre(instants_ms[debut:fin] // 1000, energies[debut:fin], durees[debut:fin])
+        self.dernier_ms = int(instants_ms[-1])
+        self.echantillons += len(instants_ms)
+        self._verifier()
+
+    def etat(self):
+        """Leq mesuré, Lr minimal (énergie déjà reçue) et Lr projeté de la période en cours"""
+        if self.cle is None or self.duree_s <= 0:
+            return None
+        periode = self.periode
+        correction = self.k1[periode] + self.corrections
+        duree_periode = DUREES_PERIODES_S[periode]
+        restant = max(duree_periode - (self.dernier_ms - self._debut_periode_ms()) / 1000, 0.0)
+        puissance_recente = self._energie_recente / self._duree_recente if self._duree_recente > 0 else 0.0
+        with np.errstate(divide='ignore'):
+            leq = float(en_niveau(self.energie / self.duree_s))
+            lr_minimal = float(en_niveau(self.energie / duree_periode)) + correction
+            lr_projete = float(en_niveau((self.energie + puissance_recente * restant)
+                                         / (self.duree_s + restant))) + correction
+        return {
+            'jour': self.jour,
+            'periode': periode,
+            'leq': leq,
+            'leq_recent': float(en_niveau(puissance_recente)) if puissance_recente > 0 else float('-inf'),
+            'lr': leq + correction,
+            'lr_minimal': lr_minimal,
+            'lr_projete': lr_projete,
+            'limite': self.limites[periode],
+            'avancement': 1 - restant / duree_periode,
+        }
+
+    def _verifier(self):
+        etat = self.etat()
+        if etat is None:
+            return
+        limite = etat['limite']
+        if etat['lr_minimal'] > limite and 'depassement' not in self._alertes:
+            self._alertes.add('depassement')
+            self._alerter(Alerte(self.dernier_ms, etat['jour'], etat['periode'], 'depassement',
+                                 etat['lr_minimal'], limite))
+        if etat['lr_projete'] > limite:
+            if 'prevision' not in self._alertes:
+                self._alertes.add('prevision')
+                self._alerter(Alerte(self.dernier_ms, etat['jour'], etat['periode'], 'prevision',
+                                     etat['lr_projete'], limite))
+        elif etat['lr_projete'] < limite - HYSTERESIS_DB:
+            self._alertes.discard('prevision')
+
+    def _alerter(self, alerte):
+        if self.alerter is not None:
+            self.alerter(alerte)
+
+    def consommer(self, flux, colonne_niveau='laeq', rapporter=None):
+        """Traite un flux d'octets (lignes « horodatage;niveau ») jusqu'à son épuisement
+
+        rapporter(surveillance) est appelé après chaque bloc reçu.
+        """
+        format_lignes = None
+        nom_colonnes = None
+        reste = b""
+        for donnees in flux:
+            tampon = reste + donnees
+            fin = tampon.rfind(b"\n")
+            if fin < 0:
+                reste = tampon
+                continue
+            reste = tampon[fin + 1:]
+            lignes = tampon[:fin + 1]
+            if format_lignes is None:
+                # Lignes d'en-tête éventuelles avant la première mesure horodatée
+                for position, ligne in _lignes_avec_position(lignes):
+                    texte = ligne.decode('latin-1').rstrip('\r\n')
+                    if MOTIF_ISO.match(texte) or MOTIF_EUROPEEN.match(texte):
+                        format_lignes = FormatLignes(texte, nom_colonnes, colonne_niveau)
+                        lignes = lignes[position:]
+                        break
+                    if texte.strip():
+                        nom_colonnes = texte
+                else:
+                    continue
+            instants, niveaux, _ = format_lignes.decoder(np.frombuffer(lignes, dtype=np.uint8))
+            self.ajouter(instants, niveaux)
+            if rapporter is not None:
+                rapporter(self)
+        self._clore_periode()
+        self.cle = None
+
+
+def _lignes_avec_position(octets):
+    position = 0
+    for ligne in octets.splitlines(keepends=True):
+        yield position, ligne
+        position += len(ligne)
+
+
+def flux_fichier(chemin, depuis_debut=False, attente=0.2, arret=None):
+    """Suit un fichier en cours d'écriture (tail -f), y compris après troncature ou rotation"""
+    f = open(chemin, 'rb')
+    try:
+        if not depuis_debut:
+            f.seek(0, os.SEEK_END)
+        while arret is None or not arret.is_set():
+            donnees = f.read(TAILLE_LECTURE)
+            if donnees:
+                yield donnees
+                continue
+            try:
+                infos = os.stat(chemin)
+            except FileNotFoundError:
+                infos = None
+            if infos is not None and (infos.st_ino != os.fstat(f.fileno()).st_ino or infos.st_size < f.tell()):
+                # Fichier remplacé ou tronqué par l'appareil : relecture depuis le début
+                f.close()
+                f = open(chemin, 'rb')
+                continue
+            time.sleep(attente)
+    finally:
+        f.close()
+
+
+def flux_socket(adresse, arret=None):
+    """Lit un socket local : « hote:port » (TCP) ou chemin d'un socket Unix"""
+    if os.path.exists(adresse):
+        connexion = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connexion.connect(adresse)
+    else:
+        hote, _, port = adresse.rpartition(':')
+        connexion = socket.create_connection((hote or 'localhost', int(port)))
+    connexion.settimeout(1.0)
+    with connexion:
+        while arret is None or not arret.is_set():
+            try:
+                donnees = connexion.recv(TAILLE_LECTURE)
+            except socket.timeout:
+                continue
+            if not donnees:
+                return
+            yield donnees
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""Les modules du calculateur sont à la racine du dépôt (pas de paquet installé)"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
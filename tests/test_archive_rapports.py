@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""Archive des rapports : déduplication des objets et restauration des données et fichiers externes"""
+
+import json
+import lzma
+import os
+
+import numpy as np
+import pytest
+
+from archive_rapports import DOSSIER_OBJETS, ArchiveRapports
+from resultats import ResultatEtude
+from stockage_mmap import StockageCarte
+
+PDF = b"%PDF-1.4 rapport de test\n" * 50
+
+
+def ecrire(chemin, contenu):
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write(contenu)
+    return str(chemin)
+
+
+def resultat(donnees, lr_nuit=44.0):
+    return ResultatEtude(-21.6, 34.0, lr_nuit - 5.0, lr_nuit, 55.0, 45.0, True, lr_nuit <= 45.0, donnees)
+
+
+@pytest.fixture
+def etude(tmp_path):
+    mesures = ecrire(tmp_path / "mesures.csv", "Date;Heure;LAeq\n01/07/2025;22:00:00;48,2\n" * 20)
+    scenarios = ecrire(tmp_path / "variantes.json", json.dumps([{"nom": "Ecran", "modifications": {"k3": -8}}]))
+    carte = StockageCarte.creer(str(tmp_path / "carte"), (0.0, 0.0), 1.0, 8, 6, avec_energie=True)
+    carte.grille('base', 'nuit')[:] = np.arange(48.0).reshape(6, 8)
+    carte.flush()
+    donnees = {'nom_projet': "EMS test", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+               'campagne_mesures': mesures, 'scenarios': scenarios, 'carte_bruit': str(tmp_path / "carte"),
+               'bruit_fond_mesures': str(tmp_path / "absent.csv")}
+    return donnees
+
+
+def nombre_objets(archive):
+    return archive.statistiques()['objets']
+
+
+def test_meme_rendu_archive_une_seule_fois(tmp_path, etude):
+    with ArchiveRapports(str(tmp_path / "archives")) as archive:
+        identifiant, nouveau = archive.archiver(resultat(etude), PDF, "01/07/2025", "rapport.pdf")
+        objets = nombre_objets(archive)
+        # PDF, paquet, CSV, scénarios et les trois fichiers de la carte ; le fichier absent est ignoré
+        assert nouveau and objets == 7
+        assert archive.archiver(resultat(dict(etude)), PDF, "01/07/2025", "rapport.pdf") == (identifiant, False)
+        assert nombre_objets(archive) == objets and len(archive) == 1
+
+        # Autre étude, même PDF et mêmes fichiers : seul son paquet est ajouté
+        autre = dict(etude, nom_projet="Garage")
+        assert archive.archiver(resultat(autre), PDF, "01/07/2025")[1]
+        assert nombre_objets(archive) == objets + 1
+        assert archive.statistiques()['pdf_distincts'] == 1
+
+
+def test_fichier_externe_modifie_cree_un_nouveau_paquet(tmp_path, etude):
+    with ArchiveRapports(str(tmp_path / "archives")) as archive:
+        premier, _ = archive.archiver(resultat(etude), PDF)
+        objets = nombre_objets(archive)
+        ecrire(etude['campagne_mesures'], "Date;Heure;LAeq\n01/07/2025;22:00:00;51,0\n" * 20)
+
+        second, nouveau = archive.archiver(resultat(etude), PDF)
+        assert nouveau and second != premier
+        # Nouveau CSV et nouveau paquet ; PDF, scénarios et carte déjà présents
+        assert nombre_objets(archive) == objets + 2
+
+
+def test_restauration_des_donnees_et_des_fichiers(tmp_path, etude):
+    with open(etude['campagne_mesures'], 'rb') as f:
+        mesures = f.read()
+    with ArchiveRapports(str(tmp_path / "archives")) as archive:
+        identifiant, _ = archive.archiver(resultat(etude), PDF, "01/07/2025", "rapport.pdf")
+    # Fichiers d'origine modifiés ou supprimés après l'archivage
+    os.remove(etude['campagne_mesures'])
+    StockageCarte.ouvrir(etude['carte_bruit'], 'r+').grille('base', 'nuit')[:] = -1.0
+
+    with ArchiveRapports(str(tmp_path / "archives")) as archive:
+        assert archive.pdf(identifiant) == PDF
+        assert archive.rapport(identifiant)['fichier'] == "rapport.pdf"
+        donnees, date_etude = archive.donnees(identifiant)
+        assert donnees == etude and date_etude == "01/07/2025"
+
+        restaure, _ = archive.donnees(identifiant, str(tmp_path / "restauration"))
+    assert restaure['nom_projet'] == etude['nom_projet']
+    assert restaure['bruit_fond_mesures'] == etude['bruit_fond_mesures']
+    with open(restaure['campagne_mesures'], 'rb') as f:
+        assert f.read() == mesures
+    with open(restaure['scenarios'], encoding='utf-8') as f:
+        assert json.load(f)[0]['nom'] == "Ecran"
+    carte = StockageCarte.ouvrir(restaure['carte_bruit'])
+    np.testing.assert_array_equal(carte.grille('base', 'nuit'), np.arange(48.0).reshape(6, 8))
+
+
+def test_objet_corrompu_detecte(tmp_path, etude):
+    with ArchiveRapports(str(tmp_path / "archives")) as archive:
+        identifiant, _ = archive.archiver(resultat(etude), PDF)
+        empreinte = archive.rapport(identifiant)['empreinte_pdf']
+        chemin = os.path.join(str(tmp_path / "archives"), DOSSIER_OBJETS, empreinte[:2], f"{empreinte}.xz")
+        with open(chemin, 'wb') as f:
+            f.write(lzma.compress(PDF + b"modifie"))
+        with pytest.raises(ValueError):
+            archive.pdf(identifiant)
+        with pytest.raises(KeyError):
+            archive.rapport(99)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Base d'études SQLite : enregistrement, recherches indexées et import de configurations"""
+
+import pytest
+
+from base_etudes import BaseEtudes, canton_depuis_localisation, code_zone
+from resultats import LotResultats, ResultatEtude
+
+PARAMETRES = {
+    'nom_projet': "EMS test", 'localisation': "Sion, Valais", 'equipement': "PAC air-eau",
+    'zone_sensibilite': "DS II (Zone d'habitation)", 'type_source': 'ponctuelle', 'mode_calcul': 'pression',
+    'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.0,
+    'k1_jour': 5.0, 'k1_nuit': 10.0, 'k2': 4.0, 'k3': 0.0, 'reflexion': 1.0,
+}
+
+# (localisation, zone, Lr nuit, date)
+ETUDES = [
+    ("Sion, Valais", "DS II (Zone d'habitation)", 44.0, "01/03/2025"),
+    ("Sion, Valais", "DS II (Zone d'habitation)", 47.5, "15/05/2025"),
+    ("Martigny, Valais, Suisse", "DS III (Zone mixte)", 52.0, "10/07/2025"),
+    ("Lausanne, Vaud", "DS II (Zone d'habitation)", 46.0, "20/06/2025"),
+    ("Crans-Montana, Valais, CH", "DS II (Zone d'habitation)", 49.0, "02/02/2024"),
+]
+
+LIMITES = {"DS II (Zone d'habitation)": (55.0, 45.0), "DS III (Zone mixte)": (60.0, 50.0)}
+
+
+def resultat(localisation, zone, lr_nuit, **parametres):
+    limite_jour, limite_nuit = LIMITES[zone]
+    donnees = dict(PARAMETRES, localisation=localisation, zone_sensibilite=zone,
+                   limite_jour=limite_jour, limite_nuit=limite_nuit, **parametres)
+    lr_jour = lr_nuit - 5.0
+    return ResultatEtude(-21.6, lr_nuit - 15.0, lr_jour, lr_nuit, limite_jour, limite_nuit,
+                         lr_jour <= limite_jour, lr_nuit <= limite_nuit, donnees)
+
+
+@pytest.fixture
+def base(tmp_path):
+    with BaseEtudes(str(tmp_path / "etudes.db")) as base:
+        base.enregistrer_lot([(resultat(lieu, zone, lr_nuit), date) for lieu, zone, lr_nuit, date in ETUDES])
+        yield base
+
+
+def test_canton_et_zone_depuis_les_libelles():
+    assert canton_depuis_localisation("Sion, Valais") == "Valais"
+    assert canton_depuis_localisation("Crans-Montana, Valais, Suisse") == "Valais"
+    assert canton_depuis_localisation("Genève, CH") == "Genève"
+    assert canton_depuis_localisation("Bulle") == "Bulle"
+    assert canton_depuis_localisation("") is None and canton_depuis_localisation(None) is None
+    assert code_zone("DS III (Zone mixte)") == "DS III"
+    assert code_zone(None) is None
+
+
+def test_recherche_par_zone_canton_et_conformite_nuit(base):
+    assert len(base) == len(ETUDES)
+    trouvees = base.rechercher(zone="DS II", canton="Valais", conforme_nuit=False)
+    assert [r.lr_nuit for r in trouvees] == [47.5, 49.0]
+    # Zone donnée par son libellé complet, canton sans tenir compte de la casse
+    assert base.compter(zone="DS II (Zone d'habitation)", canton="valais") == 3
+    assert base.compter(conforme_nuit=True) == 1
+    assert base.compter(canton="Vaud", conforme_jour=True) == 1
+    assert base.compter(localisation="Sion, Valais") == 2
+
+
+def test_recherche_par_date_la_plus_recente_d_abord(base):
+    dates = [r.parametres['date_etude'] for r in base.rechercher(date_debut="01/03/2025", date_fin="30/06/2025")]
+    assert dates == ["20/06/2025", "15/05/2025", "01/03/2025"]
+    assert len(base.rechercher(limite=2)) == 2
+    assert base.rechercher(limite=1)[0].parametres['date_etude'] == "10/07/2025"
+
+
+def test_resultat_relu_depuis_la_base(tmp_path):
+    original = resultat("Sion, Valais", "DS II (Zone d'habitation)", 44.0,
+                        carte_bruit="cartes/ems", k3=-6.0)
+    with BaseEtudes(str(tmp_path / "etudes.db")) as base:
+        identifiant = base.enregistrer(original, "01/07/2025")
+        relu, = base.rechercher()
+    assert relu.parametres['id_etude'] == identifiant
+    for champ in ('attenuation', 'lpx', 'lr_jour', 'lr_nuit', 'limite_jour', 'limite_nuit',
+                  'conforme_jour', 'conforme_nuit'):
+        assert relu[champ] == original[champ]
+    for champ in ('nom_projet', 'localisation', 'zone_sensibilite', 'lp1', 'k3'):
+        assert relu.parametres[champ] == original.parametres[champ]
+    # Données hors colonnes conservées en JSON
+    assert relu.parametres['carte_bruit'] == "cartes/ems"
+
+
+def test_lot_de_resultats_enregistre_colonne_par_colonne(tmp_path):
+    lot = LotResultats()
+    for lieu, zone, lr_nuit, _ in ETUDES:
+        lot.ajouter(resultat(lieu, zone, lr_nuit))
+    with BaseEtudes(str(tmp_path / "etudes.db")) as base:
+        assert base.enregistrer_lot(lot, "01/07/2025") == len(ETUDES)
+        assert base.compter(zone="DS II", canton="Valais", conforme_nuit=False) == 2
+        assert base.compter(zone="DS III", canton="Valais") == 1
+        assert sorted(r.lr_nuit for r in base.rechercher()) == pytest.approx(sorted(e[2] for e in ETUDES))
+
+
+def test_import_de_configurations_texte(tmp_path):
+    dossier = tmp_path / "configurations"
+    dossier.mkdir()
+    for i, (lieu, zone, _, date) in enumerate(ETUDES[:3]):
+        limite_jour, limite_nuit = LIMITES[zone]
+        # En-tête de l'ancien sauvegarder_configuration
+        lignes = ["# Configuration Calculateur Acoustique", f"# Créée le {date}", ""]
+        lignes += [f"{cle} = {valeur}" for cle, valeur in dict(
+            PARAMETRES, localisation=lieu, zone_sensibilite=zone, limite_jour=limite_jour,
+            limite_nuit=limite_nuit, lp1=60.0 + 5 * i).items()]
+        (dossier / f"etude_{i}.txt").write_text("\n".join(lignes) + "\n", encoding='utf-8')
+
+    with BaseEtudes(str(tmp_path / "etudes.db")) as base:
+        assert base.importer_configurations(sorted(str(chemin) for chemin in dossier.iterdir())) == 3
+        assert base.compter(canton="Valais") == 3
+        etudes = {r.parametres['lp1']: r for r in base.rechercher()}
+    assert sorted(etudes) == [60.0, 65.0, 70.0]
+    assert etudes[65.0].parametres['date_etude'] == "15/05/2025"
+    # Lpx = Lp1 - 20 log10(12 / 1), Lr nuit = Lpx + K1 + K2 + K3 + réflexion
+    assert etudes[70.0].lpx == pytest.approx(70.0 - 21.5836, abs=1e-3)
+    assert etudes[70.0].lr_nuit == pytest.approx(etudes[70.0].lpx + 15.0, abs=1e-3)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Mises à jour incrémentales de CarteBruit confrontées à une carte recalculée de zéro"""
+
+import numpy as np
+import pytest
+
+import carte_bruit
+from carte_bruit import CarteBruit
+from modeles_sources import creer_source
+
+ORIGINE = (0.0, 0.0)
+RESOLUTION = 1.0
+NX, NY = 90, 70
+TAILLE_TUILE = 16
+HAUTEUR = 1.5
+
+# Contributions conservées en float32 : les arrondis des retraits successifs
+# restent sous le millième de dB
+TOLERANCE_DB = 1e-3
+
+
+def nouvelle_carte(**options):
+    return CarteBruit(ORIGINE, RESOLUTION, NX, NY, hauteur=HAUTEUR, taille_tuile=TAILLE_TUILE, **options)
+
+
+def source_aleatoire(rng):
+    type_source = rng.choice(['ponctuelle', 'lineique', 'surfacique'])
+    position = (rng.uniform(0, NX), rng.uniform(0, NY), rng.uniform(0.5, 4.0))
+    return creer_source(type_source, rng.uniform(50, 75), 1.0, longueur=rng.uniform(2, 10),
+                        largeur=rng.uniform(1, 3), position=position)
+
+
+def carte_recalculee(sources, **options):
+    carte = nouvelle_carte(**options)
+    for identifiant, source in sources.items():
+        carte.ajouter_source(identifiant, source)
+    return carte
+
+
+@pytest.mark.parametrize("memoriser", [True, False])
+def test_modifications_egales_a_une_reconstruction(memoriser):
+    rng = np.random.default_rng(7)
+    carte = nouvelle_carte(memoriser_contributions=memoriser)
+    sources = {}
+    for i in range(12):
+        sources[i] = source_aleatoire(rng)
+        carte.ajouter_source(i, sources[i])
+
+    for _ in range(30):
+        identifiant = int(rng.choice(list(sources)))
+        if rng.random() < 0.3 and len(sources) > 3:
+            carte.supprimer_source(identifiant)
+            del sources[identifiant]
+        else:
+            sources[identifiant] = source_aleatoire(rng)
+            carte.modifier_source(identifiant, sources[identifiant])
+
+    attendu = carte_recalculee(sources, memoriser_contributions=memoriser)
+    assert set(carte.sources) == set(sources)
+    np.testing.assert_allclose(carte.niveaux(), attendu.niveaux(), atol=TOLERANCE_DB)
+
+
+def test_retrait_d_une_source_dominante_reconstruit_la_tuile(monkeypatch):
+    reconstruites = []
+    reconstruire = CarteBruit.reconstruire_tuile
+
+    def espion(self, ty, tx):
+        reconstruites.append((ty, tx))
+        reconstruire(self, ty, tx)
+
+    monkeypatch.setattr(CarteBruit, 'reconstruire_tuile', espion)
+    forte = creer_source('ponctuelle', 90.0, 1.0, position=(10.0, 10.0, 1.5))
+    faible = creer_source('ponctuelle', 30.0, 1.0, position=(80.0, 60.0, 1.5))
+    carte = nouvelle_carte(seuil=-50.0)
+    carte.ajouter_source('forte', forte)
+    carte.ajouter_source('faible', faible)
+
+    carte.supprimer_source('forte')
+
+    # Sur la tuile de la source forte, la faible pèse moins de 1 - PART_RECONSTRUCTION
+    assert (10 // TAILLE_TUILE, 10 // TAILLE_TUILE) in reconstruites
+    attendu = carte_recalculee({'faible': faible}, seuil=-50.0)
+    np.testing.assert_allclose(carte.energie, attendu.energie, rtol=1e-6)
+    np.testing.assert_allclose(carte.niveaux(), attendu.niveaux(), atol=TOLERANCE_DB)
+    assert np.all(carte.energie > 0)
+
+
+def test_sans_reconstruction_le_residu_fausserait_les_niveaux(monkeypatch):
+    # Garde-fou du seuil : sans reconstruction, l'arrondi float32 de la contribution
+    # retirée laisse un résidu du même ordre que la source faible
+    monkeypatch.setattr(carte_bruit, 'PART_RECONSTRUCTION', np.inf)
+    forte = creer_source('ponctuelle', 110.0, 1.0, position=(10.0, 10.0, 1.5))
+    faible = creer_source('ponctuelle', 20.0, 1.0, position=(80.0, 60.0, 1.5))
+    carte = nouvelle_carte(seuil=-50.0)
+    carte.ajouter_source('forte', forte)
+    carte.ajouter_source('faible', faible)
+    carte.supprimer_source('forte')
+
+    attendu = carte_recalculee({'faible': faible}, seuil=-50.0)
+    assert np.max(np.abs(carte.niveaux() - attendu.niveaux())) > 0.1
+
+
+def test_tuiles_modifiees_limitees_au_rayon_d_influence():
+    carte = nouvelle_carte(limite=45.0)
+    source = creer_source('ponctuelle', 45.0, 1.0, position=(20.0, 20.0, 1.5))
+    carte.ajouter_source('a', source)
+
+    modifiees = carte.tuiles_modifiees()
+    assert modifiees == sorted(carte.tuiles_influencees(source))
+    assert len(modifiees) < carte.nombre_tuiles[0] * carte.nombre_tuiles[1]
+    assert carte.tuiles_modifiees() == []
+
+    deplacee = creer_source('ponctuelle', 45.0, 1.0, position=(70.0, 50.0, 1.5))
+    carte.modifier_source('a', deplacee)
+    assert set(carte.tuiles_modifiees()) == set(modifiees) | set(carte.tuiles_influencees(deplacee))
+
+
+def test_tampon_d_energie_de_mauvaise_forme():
+    with pytest.raises(ValueError):
+        nouvelle_carte(energie=np.zeros((NX, NY)))
+    with pytest.raises(KeyError):
+        carte = nouvelle_carte()
+        source = creer_source('ponctuelle', 60.0, 1.0)
+        carte.ajouter_source('a', source)
+        carte.ajouter_source('a', source)
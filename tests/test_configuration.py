@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Configurations : relecture à l'identique dans chaque format, ancien format texte et validation"""
+
+import json
+
+import pytest
+
+from configuration import (SCHEMA_CONFIGURATION, charger_configurations, configuration_json, ecrire_configuration,
+                           ecrire_lot_binaire, lire_configuration, lire_configuration_texte, lire_lot_binaire,
+                           valider_configuration)
+
+BASE = {
+    'nom_projet': "EMS « Les Tilleuls »", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+    'limite_jour': 55.0, 'limite_nuit': 45.0, 'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.5,
+}
+
+VARIANTES = [
+    {},
+    {'type_source': 'surfacique', 'longueur_source': 3.0, 'largeur_source': 1.5, 'k3': -6.0},
+    {'mode_calcul': 'puissance', 'puissance_sonore': 80.0, 'puissance_frigorifique': 45.0},
+    {'campagne_mesures': "mesures/juillet.csv", 'colonne_mesures': 2},
+]
+
+
+@pytest.mark.parametrize("extension", ['.json', '.toml', '.cac'])
+@pytest.mark.parametrize("variante", VARIANTES)
+def test_relecture_identique(tmp_path, extension, variante):
+    donnees = valider_configuration({**BASE, **variante})
+    chemin = ecrire_configuration(str(tmp_path / f"etude{extension}"), donnees, "10/07/2025")
+    assert lire_configuration(chemin) == (donnees, "10/07/2025")
+
+
+def test_lot_binaire(tmp_path):
+    configurations = [({**BASE, **variante}, date) for variante, date in
+                      zip(VARIANTES, ["01/01/2025", None, "03/03/2025", "04/04/2025"])]
+    chemin = str(tmp_path / "lot.cac")
+    assert ecrire_lot_binaire(chemin, configurations) == len(configurations)
+    assert lire_lot_binaire(chemin) == [(valider_configuration(donnees), date) for donnees, date in configurations]
+
+    # Le chargement en masse reconnaît un lot parmi des fichiers isolés
+    ecrire_configuration(str(tmp_path / "seule.json"), BASE)
+    charge, erreurs = charger_configurations([str(tmp_path)])
+    assert len(charge) == len(configurations) + 1 and erreurs == []
+
+
+def test_ancien_format_texte(tmp_path):
+    chemin = tmp_path / "config_ems.txt"
+    chemin.write_text(
+        "# Configuration Calculateur Acoustique\n"
+        "# Créée le 10/07/2025\n\n"
+        "nom_projet = 2025\n"
+        "localisation = Sion, Valais\n"
+        "zone_sensibilite = DS II (Zone d'habitation)\n"
+        "limite_jour = 55.0\nlimite_nuit = 45.0\nlp1 = 68\n"
+        "distance_ref = 1.0\ndistance_cible = 12.0\n"
+        "longueur_source = None\nk3 = -6\n"
+        "position = [1.0, 2.5]\n",
+        encoding='utf-8')
+
+    brutes, date_etude = lire_configuration_texte(str(chemin))
+    assert date_etude == "10/07/2025"
+    # Un nom de projet numérique reste un texte, les nombres et None sont convertis
+    assert brutes['nom_projet'] == "2025"
+    assert brutes['lp1'] == 68 and brutes['longueur_source'] is None and brutes['position'] == [1.0, 2.5]
+
+    donnees, date_etude = lire_configuration(str(chemin))
+    assert date_etude == "10/07/2025"
+    assert donnees['nom_projet'] == "2025" and donnees['lp1'] == 68.0 and isinstance(donnees['lp1'], float)
+    assert donnees['k3'] == -6.0 and donnees['k2'] == SCHEMA_CONFIGURATION['k2'][1]
+    assert donnees['position'] == [1.0, 2.5]
+
+    chemin.write_text("lp1 68\n", encoding='utf-8')
+    with pytest.raises(ValueError, match="ligne 1"):
+        lire_configuration_texte(str(chemin))
+
+
+@pytest.mark.parametrize("modification, message", [
+    ({'lp1': None}, "lp1"),
+    ({'lp1': 130.0}, "hors limites"),
+    ({'lp1': "68"}, "nombre attendu"),
+    ({'lp1': True}, "nombre attendu"),
+    ({'distance_cible': 0.0}, "positive"),
+    ({'nom_projet': 2025}, "texte attendu"),
+    ({'type_source': 'volumique'}, "type_source"),
+    ({'type_source': 'lineique'}, "longueur_source"),
+    ({'type_source': 'surfacique', 'longueur_source': 3.0}, "largeur_source"),
+    ({'mode_calcul': 'puissance'}, "puissance_sonore"),
+])
+def test_configuration_invalide(modification, message):
+    with pytest.raises(ValueError, match=message):
+        valider_configuration({**BASE, **modification})
+
+
+def test_valeurs_par_defaut_et_champs_hors_schema():
+    donnees = valider_configuration(dict(BASE, mode_calcul='puissance', puissance_sonore=80, autre="conservé"))
+    assert donnees['facteur_q'] == 2.0 and donnees['k1_nuit'] == 10.0
+    assert donnees['autre'] == "conservé"
+    assert set(SCHEMA_CONFIGURATION) <= set(donnees)
+
+
+def test_fichiers_refuses(tmp_path):
+    inconnu = tmp_path / "etude.yaml"
+    inconnu.write_text("lp1: 68\n", encoding='utf-8')
+    autre_format = tmp_path / "etude.json"
+    autre_format.write_text(json.dumps({'format': "autre", 'donnees': BASE}), encoding='utf-8')
+    recente = tmp_path / "recente.json"
+    recente.write_text(configuration_json(BASE).replace('"version": 1', '"version": 99'), encoding='utf-8')
+    incomplete = tmp_path / "incomplete.json"
+    incomplete.write_text(configuration_json({'lp1': 68.0}), encoding='utf-8')
+
+    for chemin in (inconnu, autre_format, recente, incomplete):
+        with pytest.raises(ValueError):
+            lire_configuration(str(chemin))
+    with pytest.raises(ValueError, match="zone_sensibilite"):
+        lire_configuration(str(incomplete))
+
+    # Chargement en masse : erreurs collectées, fichier non reconnu ignoré dans un dossier
+    configurations, erreurs = charger_configurations([str(tmp_path)], ignorer_erreurs=True)
+    assert configurations == []
+    assert sorted(chemin.rsplit('/', 1)[1] for chemin, _ in erreurs) == [
+        "etude.json", "incomplete.json", "recente.json"]
+    with pytest.raises(ValueError):
+        charger_configurations([str(tmp_path)])
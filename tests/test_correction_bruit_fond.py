@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Correction du bruit de fond : intervalles à marge insuffisante ou sans fond proche écartés"""
+
+import numpy as np
+import pytest
+
+from correction_bruit_fond import (ECART_FOND_MAX_S, MARGE_MINIMALE_DB, SerieIntervalles, agreger_intervalles,
+                                   corriger_bruit_fond)
+
+DUREE_S = 60
+# 01/07/2025 20:00:00 en ms depuis 1970
+DEBUT_MS = int(np.datetime64('2025-07-01T20:00:00', 'ms').astype(np.int64))
+
+
+def serie(debuts_ms, niveaux):
+    energie = 10 ** (np.asarray(niveaux, dtype=float) / 10)
+    return SerieIntervalles(np.asarray(debuts_ms, dtype=np.int64), DUREE_S, energie,
+                            np.full(len(energie), 0.2), np.full(len(energie), 60))
+
+
+def test_marge_insuffisante_masquee():
+    debuts = DEBUT_MS + np.arange(6) * DUREE_S * 1000
+    mesures = np.array([50.0, 45.0, 43.1, 42.9, 40.0, 60.0])
+    fond = serie(debuts, np.full(6, 40.0))
+    correction = corriger_bruit_fond(serie(debuts, mesures), fond)
+
+    marge = mesures - 40.0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        attendu = np.where(marge >= MARGE_MINIMALE_DB, 10 * np.log10(10 ** (mesures / 10) - 10 ** 4.0), np.nan)
+    np.testing.assert_allclose(correction.leq_corrige, attendu, atol=1e-9)
+    np.testing.assert_allclose(correction.marge, marge, atol=1e-9)
+    assert correction.valides.tolist() == [True, True, True, False, False, True]
+    assert correction.taux_valide == pytest.approx(4 / 6)
+    assert correction.fond_simultane.all()
+    # Soustraction à 3.1 dB de marge : incertitude amplifiée par rapport à une marge de 20 dB
+    assert correction.incertitude[2] > 2 * correction.incertitude[5]
+    assert np.isnan(correction.incertitude[3])
+
+
+def test_fond_interpole_ou_ecarte_selon_l_ecart():
+    minute = DUREE_S * 1000
+    fond = serie(DEBUT_MS + np.array([0, 10]) * minute, [40.0, 44.0])
+    # Intervalles entre les deux fonds, puis à 30 et 31 minutes du dernier
+    debuts = DEBUT_MS + np.array([5, 40, 41]) * minute
+    correction = corriger_bruit_fond(serie(debuts, [55.0, 55.0, 55.0]), fond)
+
+    assert not correction.fond_simultane.any()
+    assert correction.leq_fond[0] == pytest.approx(10 * np.log10((10 ** 4.0 + 10 ** 4.4) / 2))
+    assert ECART_FOND_MAX_S == 30 * 60
+    # Prolongé jusqu'à ECART_FOND_MAX_S, écarté au-delà
+    assert correction.leq_fond[1] == pytest.approx(44.0)
+    assert np.isnan(correction.leq_fond[2]) and correction.valides.tolist() == [True, True, False]
+    assert not corriger_bruit_fond(serie(debuts, [55.0] * 3), fond, ecart_max_s=60).valides[1:].any()
+
+    with pytest.raises(ValueError):
+        corriger_bruit_fond(serie(debuts, [55.0] * 3),
+                            SerieIntervalles(fond.debuts_ms, 30, fond.energie, fond.incertitude, fond.nombre))
+
+
+def test_leq_source_par_periode():
+    # 20h-24h : intervalles de jour jusqu'à 22h, de nuit ensuite
+    debuts = DEBUT_MS + np.arange(240) * DUREE_S * 1000
+    mesures = np.where(np.arange(240) < 120, 52.0, 46.0)
+    correction = corriger_bruit_fond(serie(debuts, mesures), serie(debuts, np.full(240, 40.0)))
+
+    for periode, niveau in (('jour', 52.0), ('nuit', 46.0)):
+        leq, incertitude = correction.leq_source(periode)
+        assert leq == pytest.approx(10 * np.log10(10 ** (niveau / 10) - 10 ** 4.0))
+        assert 0 < incertitude < 2.0
+    with pytest.raises(KeyError):
+        correction.leq_source('soir')
+
+
+def test_intervalles_egaux_au_leq_par_minute():
+    rng = np.random.default_rng(2)
+    instants = DEBUT_MS + np.sort(rng.choice(np.arange(0, 600_000, 100), 3000, replace=False))
+    niveaux = rng.uniform(30, 70, len(instants))
+    blocs = [(instants[i:i + 700], niveaux[i:i + 700]) for i in range(0, len(instants), 700)]
+    intervalles = agreger_intervalles(blocs[::-1])
+
+    minutes = (instants - DEBUT_MS) // 60000
+    assert len(intervalles) == 10
+    for i, minute in enumerate(np.unique(minutes)):
+        assert intervalles.leq[i] == pytest.approx(10 * np.log10(np.mean(10 ** (niveaux[minutes == minute] / 10))))
+        assert intervalles.nombre[i] == np.count_nonzero(minutes == minute)
+    with pytest.raises(ValueError):
+        agreger_intervalles([])
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Conversion Lw -> Lp : facteur Q, diagrammes tabulés et passe vectorisée par blocs"""
+
+import math
+
+import numpy as np
+import pytest
+
+import directivite
+from directivite import SourcePuissance, TableDirectivite, lpx_depuis_puissance, niveaux_depuis_puissance
+from modeles_sources import niveaux_recepteurs
+
+
+def table_cardioide():
+    table = TableDirectivite()
+    table.ajouter_motif('cardioide', [0.0, 90.0, 180.0], [3.0, 0.0, -10.0])
+    return table
+
+
+@pytest.mark.parametrize("facteur_q", [1.0, 2.0, 4.0, 8.0])
+def test_source_omnidirectionnelle_egale_a_la_formule(facteur_q):
+    source = SourcePuissance((0.0, 0.0, 0.0), 90.0, facteur_q=facteur_q)
+    distances = np.array([1.0, 7.5, 30.0, 250.0])
+    recepteurs = np.column_stack([distances, np.zeros(4), np.zeros(4)])
+    attendu = [lpx_depuis_puissance(90.0, d, facteur_q) for d in distances]
+    np.testing.assert_allclose(niveaux_depuis_puissance([source], recepteurs), attendu, atol=1e-9)
+    assert lpx_depuis_puissance(90.0, 10.0, 2.0) == pytest.approx(90.0 - 20.0 - 11.0 + 10 * math.log10(2))
+
+
+def test_diagramme_tabule_selon_l_angle():
+    table = table_cardioide()
+    source = SourcePuissance((0.0, 0.0, 0.0), 80.0, facteur_q=1.0, motif='cardioide', axe=(2.0, 0.0, 0.0))
+    # Axe, 45°, travers et arrière à 10 m ; la table est interpolée linéairement
+    angles = np.radians([0.0, 45.0, 90.0, 180.0])
+    recepteurs = 10.0 * np.column_stack([np.cos(angles), np.sin(angles), np.zeros(4)])
+    corrections = [3.0, 1.5, 0.0, -10.0]
+    attendu = [lpx_depuis_puissance(80.0, 10.0, 1.0, di) for di in corrections]
+    np.testing.assert_allclose(niveaux_depuis_puissance([source], recepteurs, table), attendu, atol=1e-9)
+    assert source.rayon_influence(40.0, table) == pytest.approx(10 ** ((80.0 - 11 + 3.0 - 40.0) / 20))
+
+
+def test_sources_sommees_et_blocs_equivalents(monkeypatch):
+    table = table_cardioide()
+    rng = np.random.default_rng(3)
+    sources = [SourcePuissance(rng.uniform(-20, 20, 3), rng.uniform(70, 95), facteur_q=float(rng.choice([1, 2, 4])),
+                               motif=str(rng.choice(['omnidirectionnel', 'cardioide'])), axe=rng.normal(size=3))
+               for _ in range(5)]
+    recepteurs = rng.uniform(-50, 50, (200, 2))
+
+    somme = 10 * np.log10(sum(10 ** (niveaux_depuis_puissance([s], recepteurs, table) / 10) for s in sources))
+    niveaux = niveaux_depuis_puissance(sources, recepteurs, table)
+    np.testing.assert_allclose(niveaux, somme, atol=1e-9)
+    # Plusieurs passes de quelques récepteurs : mêmes niveaux
+    monkeypatch.setattr(directivite, 'TAILLE_BLOC', 17)
+    np.testing.assert_allclose(niveaux_depuis_puissance(sources, recepteurs, table), niveaux, atol=1e-12)
+
+
+def test_sans_source_niveau_nul_en_energie():
+    recepteurs = [(0.0, 5.0), (3.0, 4.0)]
+    niveaux = niveaux_depuis_puissance([], recepteurs)
+    assert niveaux.shape == (2,) and np.all(np.isneginf(niveaux))
+    np.testing.assert_array_equal(niveaux, niveaux_recepteurs([], recepteurs))
+
+
+def test_diagramme_incoherent():
+    with pytest.raises(ValueError):
+        TableDirectivite().ajouter_motif('faux', [0.0, 90.0], [1.0])
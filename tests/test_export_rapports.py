@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Exports JSON et HTML : champs des documents d'une étude et d'un lot, relus depuis les fichiers écrits"""
+
+import json
+import re
+
+import numpy as np
+import pytest
+
+from configuration import colonnes_configurations, valider_configuration
+from export_rapports import (FORMAT_EXPORT, VERSION_EXPORT, exporter_lot, exporter_resultat, html_resultat,
+                             json_resultat)
+from resultats import CHAMPS_RESULTAT, LotResultats, ResultatEtude, calculer_lignes
+
+BASE = {
+    'nom_projet': "EMS <Les Tilleuls> & annexe", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+    'limite_jour': 55.0, 'limite_nuit': 45.0, 'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.5,
+}
+
+
+def configurations_lot():
+    niveaux = (50.0, 80.0, 45.0, 66.5)
+    return [(valider_configuration(dict(BASE, nom_projet=f"Site {i} <{lp1}>", lp1=lp1)), f"0{i + 1}/07/2025")
+            for i, lp1 in enumerate(niveaux)]
+
+
+def exporter(chemin, configurations):
+    lot = LotResultats.depuis_colonnes(colonnes_configurations(configurations), len(configurations))
+    return exporter_lot(chemin, lot, [date_etude for _, date_etude in configurations])
+
+
+def resultat():
+    donnees = valider_configuration(BASE)
+    return ResultatEtude(np.float32(21.9382), np.float32(46.0618), 50.0618, 56.0618, 55.0, 45.0,
+                         np.bool_(True), np.bool_(False), donnees)
+
+
+def test_json_d_une_etude():
+    document = json.loads(json_resultat(resultat(), "10/07/2025"))
+    assert (document['format'], document['version']) == (FORMAT_EXPORT, VERSION_EXPORT)
+    etude = document['etude']
+    assert etude['projet']['nom_projet'] == BASE['nom_projet']
+    assert etude['projet']['date_etude'] == "10/07/2025"
+    assert etude['parametres']['lp1'] == 68.0 and etude['parametres']['distance_cible'] == 12.5
+    # Flottants (y compris float32) arrondis à 2 décimales, booléens NumPy convertis
+    assert etude['resultats'] == {
+        'attenuation': 21.94, 'lpx': 46.06, 'lr_jour': 50.06, 'lr_nuit': 56.06, 'limite_jour': 55.0,
+        'limite_nuit': 45.0, 'conforme_jour': True, 'conforme_nuit': False, 'conforme': False,
+    }
+
+
+def test_html_d_une_etude_echappe_et_classe_les_periodes():
+    page = html_resultat(resultat(), "10/07/2025")
+    assert "<h2>EMS &lt;Les Tilleuls&gt; &amp; annexe</h2>" in page
+    assert '<tr class="conforme"><td>Jour (07h-22h)</td><td class="nombre">50.1 dB(A)</td>' in page
+    assert '<tr class="non-conforme"><td>Nuit (22h-07h)</td><td class="nombre">56.1 dB(A)</td>' in page
+    assert "<td>10/07/2025</td>" in page and "Mesures d'attenuation necessaires" in page
+
+
+@pytest.mark.parametrize("extension", ['.json', '.jsonl', '.html'])
+def test_export_d_une_etude_par_extension(tmp_path, extension):
+    chemin = exporter_resultat(str(tmp_path / f"etude{extension}"), resultat())
+    texte = open(chemin, encoding='utf-8').read()
+    if extension == '.html':
+        assert texte.startswith("<!DOCTYPE html>") and texte.rstrip().endswith("</html>")
+    else:
+        document = json.loads(texte)
+        etude = document['etude'] if extension == '.json' else document
+        assert etude['resultats']['lr_nuit'] == 56.06 and etude['projet']['date_etude'] is None
+    with pytest.raises(ValueError):
+        exporter_resultat(str(tmp_path / "etude.csv"), resultat())
+
+
+def test_export_d_un_lot_json_et_lignes_json(tmp_path):
+    configurations = configurations_lot()
+    lignes = calculer_lignes(colonnes_configurations(configurations), len(configurations))
+    assert exporter(str(tmp_path / "lot.json"), configurations) == len(configurations)
+    exporter(str(tmp_path / "lot.jsonl"), configurations)
+
+    with open(tmp_path / "lot.json", encoding='utf-8') as f:
+        document = json.load(f)
+    assert (document['format'], document['version']) == (FORMAT_EXPORT, VERSION_EXPORT)
+    with open(tmp_path / "lot.jsonl", encoding='utf-8') as f:
+        assert [json.loads(ligne) for ligne in f] == document['etudes']
+
+    assert len(document['etudes']) == len(configurations)
+    for i, (etude, (donnees, date_etude)) in enumerate(zip(document['etudes'], configurations)):
+        assert etude['projet']['nom_projet'] == donnees['nom_projet']
+        assert etude['projet']['zone_sensibilite'] == "DS II"
+        assert etude['projet']['date_etude'] == date_etude
+        assert etude['parametres']['lp1'] == donnees['lp1']
+        for champ in CHAMPS_RESULTAT:
+            attendu = lignes[champ][i].item()
+            if isinstance(attendu, bool):
+                assert etude['resultats'][champ] is attendu
+            else:
+                assert etude['resultats'][champ] == pytest.approx(round(attendu, 2))
+        assert etude['resultats']['conforme'] == bool(lignes['conforme_jour'][i] and lignes['conforme_nuit'][i])
+
+
+def test_export_d_un_lot_html(tmp_path):
+    configurations = configurations_lot()
+    lignes = calculer_lignes(colonnes_configurations(configurations), len(configurations))
+    exporter(str(tmp_path / "lot.html"), configurations)
+    page = (tmp_path / "lot.html").read_text(encoding='utf-8')
+
+    rangees = re.findall(r'<tr class="([a-z-]+)"><td class="nombre">(\d+)</td><td>([^<]*)</td>', page)
+    conformes = [bool(j and n) for j, n in zip(lignes['conforme_jour'], lignes['conforme_nuit'])]
+    assert rangees == [("conforme" if conforme else "non-conforme", str(i + 1), f"Site {i} &lt;{donnees['lp1']}&gt;")
+                       for i, (conforme, (donnees, _)) in enumerate(zip(conformes, configurations))]
+    assert f"<td class=\"nombre\">{lignes['lr_nuit'][1]:.1f}</td>" in page
+    non_conformes = conformes.count(False)
+    assert 0 < non_conformes < len(configurations)
+    assert f"<p>{len(configurations)} etude(s), {non_conformes} non conforme(s)</p>" in page
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""File de travaux : ordre des priorités, annulation, relance et reprise après un arrêt brutal"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from file_travaux import (ANNULE, ECHEC, EN_ATTENTE, EN_COURS, PRIORITE_ETUDE, PRIORITE_LOT, TERMINE,
+                          FileTravaux)
+
+DELAI = 10.0
+
+
+@pytest.fixture
+def chemin(tmp_path):
+    return str(tmp_path / "travaux.db")
+
+
+def test_ordre_priorite_puis_anciennete(chemin):
+    ordre = []
+    file_travaux = FileTravaux(chemin, fils=1, evenements=False)
+    file_travaux.enregistrer_type('note', lambda parametres, progression: ordre.append(parametres['nom']))
+    for nom, priorite in [("lot 1", PRIORITE_LOT), ("etude 1", PRIORITE_ETUDE), ("lot 2", PRIORITE_LOT),
+                          ("urgent", PRIORITE_ETUDE + 5), ("etude 2", PRIORITE_ETUDE)]:
+        file_travaux.soumettre('note', {'nom': nom}, priorite=priorite)
+    assert [t['priorite'] for t in file_travaux.lister(EN_ATTENTE)] == sorted(
+        [PRIORITE_LOT, PRIORITE_ETUDE, PRIORITE_LOT, PRIORITE_ETUDE + 5, PRIORITE_ETUDE], reverse=True)
+
+    with file_travaux:
+        file_travaux.attendre(5, DELAI)
+        file_travaux.attendre(3, DELAI)
+    assert ordre == ["urgent", "etude 1", "etude 2", "lot 1", "lot 2"]
+    assert all(t['etat'] == TERMINE for t in file_travaux.lister())
+
+
+def test_annulation_en_attente_et_en_cours(chemin):
+    demarre = threading.Event()
+
+    def long(parametres, progression):
+        demarre.set()
+        for i in range(1000):
+            progression(i / 1000)
+            time.sleep(0.01)
+        return "fini"
+
+    file_travaux = FileTravaux(chemin, fils=1)
+    file_travaux.enregistrer_type('long', long)
+    en_cours = file_travaux.soumettre('long')
+    en_attente = file_travaux.soumettre('long')
+    with file_travaux:
+        assert demarre.wait(DELAI)
+        assert file_travaux.annuler(en_attente)
+        assert file_travaux.annuler(en_cours)
+        travail = file_travaux.attendre(en_cours, DELAI)
+    assert travail['etat'] == ANNULE and travail['resultat'] is None
+    assert file_travaux.travail(en_attente)['etat'] == ANNULE
+    # Un travail terminé ou annulé ne s'annule plus
+    assert not file_travaux.annuler(en_cours)
+
+    etats = []
+    while not file_travaux.evenements.empty():
+        identifiant, etat, _, _ = file_travaux.evenements.get()
+        if identifiant == en_cours:
+            etats.append(etat)
+    assert etats[0] == EN_ATTENTE and EN_COURS in etats and etats[-1] == ANNULE
+
+
+def test_relance_apres_echec(chemin):
+    appels = []
+
+    def fragile(parametres, progression):
+        appels.append(1)
+        if len(appels) == 1:
+            raise ValueError("capteur débranché")
+        return {'appels': len(appels)}
+
+    file_travaux = FileTravaux(chemin, fils=1, evenements=False)
+    file_travaux.enregistrer_type('fragile', fragile)
+    identifiant = file_travaux.soumettre('fragile')
+    with file_travaux:
+        travail = file_travaux.attendre(identifiant, DELAI)
+        assert travail['etat'] == ECHEC and "capteur débranché" in travail['erreur']
+        assert not file_travaux.relancer(9999)
+        assert file_travaux.relancer(identifiant, priorite=PRIORITE_LOT)
+        travail = file_travaux.attendre(identifiant, DELAI)
+    assert travail['etat'] == TERMINE and travail['erreur'] is None
+    assert travail['resultat'] == {'appels': 2}
+    assert travail['tentatives'] == 2 and travail['priorite'] == PRIORITE_LOT
+    # Un travail terminé n'est pas relancé
+    assert not file_travaux.relancer(identifiant)
+
+
+def test_reprise_des_travaux_interrompus(chemin):
+    file_travaux = FileTravaux(chemin, fils=1, evenements=False)
+    file_travaux.enregistrer_type('note', lambda parametres, progression: parametres['valeur'] * 2)
+    identifiant = file_travaux.soumettre('note', {'valeur': 21})
+    # Arrêt brutal pendant l'exécution : le travail reste marqué en cours
+    with sqlite3.connect(chemin) as connexion:
+        connexion.execute("UPDATE travaux SET etat = ?, progression = 0.4 WHERE id = ?", (EN_COURS, identifiant))
+
+    reprise = FileTravaux(chemin, fils=1, evenements=False)
+    travail = reprise.travail(identifiant)
+    assert travail['etat'] == EN_ATTENTE and travail['progression'] == 0
+    reprise.enregistrer_type('note', lambda parametres, progression: parametres['valeur'] * 2)
+    with reprise:
+        assert reprise.attendre(identifiant, DELAI)['resultat'] == 42
+
+
+def test_fils_limites_aux_travaux_de_la_session(chemin):
+    executes = []
+    ancienne = FileTravaux(chemin, fils=1, evenements=False)
+    ancienne.enregistrer_type('note', lambda parametres, progression: executes.append(parametres))
+    reste = ancienne.soumettre('note', 'ancien', priorite=PRIORITE_ETUDE + 5)
+
+    file_travaux = FileTravaux(chemin, fils=1, evenements=False)
+    file_travaux.enregistrer_type('note', lambda parametres, progression: executes.append(parametres))
+    premier = file_travaux.soumettre('note', 'premier')
+    file_travaux.demarrer(identifiants=[premier])
+    file_travaux.attendre(premier, DELAI)
+    # Soumis après le démarrage par la même file : exécuté aussi
+    second = file_travaux.soumettre('note', 'second')
+    assert file_travaux.attendre(second, DELAI)['etat'] == TERMINE
+    file_travaux.arreter()
+
+    assert executes == ['premier', 'second']
+    assert file_travaux.travail(reste)['etat'] == EN_ATTENTE
+    with pytest.raises(KeyError):
+        file_travaux.soumettre('inconnu')
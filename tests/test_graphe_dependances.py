@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""Graphe de dépendances : nœuds recalculés après une saisie et arrêt anticipé de la propagation"""
+
+import math
+
+import pytest
+
+from configuration import valider_configuration
+from graphe_dependances import GrapheDependances, ajouter_noeuds_calcul, resultats_graphe
+
+DONNEES = valider_configuration({
+    'nom_projet': "EMS test", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+    'limite_jour': 55.0, 'limite_nuit': 45.0, 'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.0,
+})
+
+NOEUDS_RESULTAT = ('attenuation', 'lpx', 'lr_jour', 'lr_nuit', 'conforme_jour', 'conforme_nuit')
+
+# Sections du rapport, mêmes dépendances que SECTIONS_PDF du calculateur
+SECTIONS = {
+    'pdf_entete': ('nom_projet', 'localisation', 'equipement', 'zone_sensibilite'),
+    'pdf_corrections': ('k1_jour', 'k1_nuit', 'k2', 'k3', 'reflexion'),
+    'pdf_calculs': ('mode_calcul', 'distance_ref', 'distance_cible', 'facteur_q', 'type_source',
+                    'attenuation', 'puissance_sonore', 'lp1', 'lpx'),
+    'pdf_conclusion': ('conforme_jour', 'conforme_nuit', 'nom_projet', 'lr_jour', 'lr_nuit'),
+}
+
+
+def nouveau_graphe(donnees=DONNEES):
+    graphe = GrapheDependances()
+    ajouter_noeuds_calcul(graphe)
+    for nom, dependances in SECTIONS.items():
+        graphe.ajouter_noeud(nom, lambda v, nom=nom: [nom, dict(v)], dependances)
+    for cle, valeur in donnees.items():
+        graphe.definir_entree(cle, valeur)
+    return graphe
+
+
+def evaluer(graphe):
+    """Évalue résultats et sections, retourne les nœuds recalculés"""
+    graphe.recalculs.clear()
+    for nom in NOEUDS_RESULTAT + tuple(SECTIONS):
+        graphe.valeur(nom)
+    return sorted(graphe.recalculs)
+
+
+def test_premier_calcul_evalue_tout_une_fois():
+    graphe = nouveau_graphe()
+    calcules = sorted(nom for nom, noeud in graphe.noeuds.items() if noeud.fonction is not None)
+    assert evaluer(graphe) == calcules
+    assert evaluer(graphe) == []
+    resultat = resultats_graphe(graphe, DONNEES)
+    assert resultat.lpx == pytest.approx(68.0 - 20 * math.log10(12.0))
+    assert resultat.lr_nuit == pytest.approx(resultat.lpx + 10.0 + 4.0 + 0.0 + 1.0)
+
+
+def test_modification_de_k3_ne_recalcule_pas_l_attenuation():
+    graphe = nouveau_graphe()
+    evaluer(graphe)
+    assert graphe.definir_entree('k3', -6.0)
+    assert evaluer(graphe) == sorted(['corrections', 'lr_jour', 'lr_nuit', 'conforme_jour', 'conforme_nuit',
+                                      'pdf_corrections', 'pdf_conclusion'])
+    assert graphe.valeur('lr_nuit') == pytest.approx(resultats_graphe(nouveau_graphe(), DONNEES).lr_nuit - 6.0)
+    # Même valeur saisie une seconde fois : aucune révision, aucun recalcul
+    assert not graphe.definir_entree('k3', -6.0)
+    assert evaluer(graphe) == []
+
+
+def test_arret_anticipe_quand_la_valeur_ne_change_pas():
+    graphe = nouveau_graphe()
+    evaluer(graphe)
+    # K2 + K3 inchangé : seules les corrections et leur section sont réévaluées
+    graphe.definir_entree('k2', 5.0)
+    graphe.definir_entree('k3', -1.0)
+    assert evaluer(graphe) == ['corrections', 'pdf_corrections']
+
+    # Lr nuit modifié mais toujours non conforme : la conclusion est recalculée,
+    # l'entrée du rapport et la section des calculs sont réutilisées
+    avant = graphe.valeur('pdf_calculs')
+    graphe.definir_entree('k1_nuit', 6.0)
+    recalculs = evaluer(graphe)
+    assert 'conforme_nuit' in recalculs and 'pdf_conclusion' in recalculs
+    assert 'pdf_entete' not in recalculs and 'pdf_calculs' not in recalculs
+    assert graphe.valeur('pdf_calculs') is avant
+
+
+def test_sections_concernees_par_une_saisie():
+    graphe = nouveau_graphe()
+    assert {nom for nom in graphe.descendants('distance_cible') if nom.startswith('pdf_')} == {
+        'pdf_calculs', 'pdf_conclusion'}
+    assert {nom for nom in graphe.descendants('nom_projet') if nom.startswith('pdf_')} == {
+        'pdf_entete', 'pdf_conclusion'}
+    assert graphe.descendants('equipement') == {'pdf_entete'}
+
+
+def test_mode_puissance_et_entrees_protegees():
+    donnees = valider_configuration(dict(DONNEES, mode_calcul='puissance', puissance_sonore=80.0, facteur_q=2.0))
+    graphe = nouveau_graphe(donnees)
+    evaluer(graphe)
+    graphe.definir_entree('lp1', 75.0)
+    # Lp1 ne sert pas en mode puissance : Lpx garde sa valeur, l'aval n'est pas recalculé
+    assert evaluer(graphe) == ['lpx', 'pdf_calculs']
+    with pytest.raises(KeyError):
+        graphe.definir_entree('lpx', 50.0)
+    with pytest.raises(KeyError):
+        graphe.ajouter_noeud('lpx', lambda v: 0, ())
+    # Entrée jamais saisie : lue comme None
+    assert graphe.valeur('champ_absent') is None
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Table des limites : valeurs de l'OPB annexe 6, classement vectorisé, versions et jeux JSON"""
+
+import json
+
+import numpy as np
+import pytest
+
+from limites_reglementaires import (HORS_ZONAGE, TABLE_LIMITES, TableLimites, degre_depuis_texte,
+                                    degres_depuis_zones, zone_sensibilite)
+
+# OPB (RS 814.41), annexe 6 : {degré: (jour, nuit)} par jeu de valeurs
+OPB_ANNEXE_6 = {
+    'opb_planification': {1: (50, 40), 2: (55, 45), 3: (60, 50), 4: (65, 55)},
+    'opb_immission': {1: (55, 45), 2: (60, 50), 3: (65, 55), 4: (70, 60)},
+    'opb_alarme': {1: (65, 60), 2: (70, 65), 3: (70, 65), 4: (75, 70)},
+}
+
+
+@pytest.mark.parametrize("jeu", sorted(OPB_ANNEXE_6))
+def test_valeurs_de_l_annexe_6(jeu):
+    degres = np.array([1, 2, 3, 4])
+    jour, nuit = TABLE_LIMITES.limites(degres, jeu)
+    assert jour.tolist() == [OPB_ANNEXE_6[jeu][d][0] for d in degres]
+    assert nuit.tolist() == [OPB_ANNEXE_6[jeu][d][1] for d in degres]
+    assert TABLE_LIMITES.jeu(jeu)['reference'].startswith("OPB")
+
+
+def test_degres_et_zones_par_defaut():
+    for valeur in (2, '2', 'II', 'ds ii', "DS II (Zone d'habitation)", np.int8(2)):
+        assert degre_depuis_texte(valeur) == 2
+    for valeur in ('V', 'DS', '', 0, True):
+        with pytest.raises(ValueError):
+            degre_depuis_texte(valeur)
+    assert zone_sensibilite(3) == ("DS III (Zone mixte)", 60.0, 50.0)
+    assert degres_depuis_zones(["DS I", "inconnue", "DS IV", "DS I"]).tolist() == [1, HORS_ZONAGE, 4, 1]
+
+
+def test_classer_aux_seuils():
+    # DS II : planification 55/45, immission 60/50, alarme 70/65 ; une limite atteinte est respectée
+    lr_jour = np.array([55.0, 55.1, 50.0, 60.1, 70.0, 80.0, 40.0])
+    lr_nuit = np.array([45.0, 40.0, 50.0, 40.0, 65.1, 40.0, 40.0])
+    degres = np.array([2, 2, 2, 2, 2, 2, HORS_ZONAGE])
+    assert TABLE_LIMITES.classer(lr_jour, lr_nuit, degres).tolist() == [0, 1, 1, 2, 3, 3, -1]
+
+    conforme_jour, conforme_nuit = TABLE_LIMITES.conformite(lr_jour, lr_nuit, degres)
+    assert conforme_jour.shape == (3, len(degres))
+    # Ligne NaN : un récepteur hors zonage n'est jamais conforme
+    assert not conforme_jour[:, -1].any() and not conforme_nuit[:, -1].any()
+    assert np.isnan(TABLE_LIMITES.limites(HORS_ZONAGE, 'opb_immission')).all()
+
+
+def test_versions_du_jeu():
+    table = TableLimites()
+    table.ajouter_jeu('opb_planification', 2, "Valeurs de planification révisées",
+                      {1: (48, 38), 2: (53, 43), 3: (58, 48), 4: (63, 53)})
+    assert table.jeu('opb_planification')['version'] == 2
+    assert float(table.limites(2, 'opb_planification')[0]) == 53.0
+    assert float(table.limites(2, 'opb_planification', version=1)[0]) == 55.0
+    # Une version plus ancienne ajoutée ensuite ne remplace pas la plus récente
+    table.ajouter_jeu('opb_planification', 0, "Ancienne", {1: (1, 1), 2: (1, 1), 3: (1, 1), 4: (1, 1)})
+    assert table.jeu('opb_planification')['version'] == 2
+
+    with pytest.raises(KeyError):
+        table.ajouter_jeu('opb_planification', 2, "Doublon", OPB_ANNEXE_6['opb_planification'])
+    with pytest.raises(ValueError):
+        table.ajouter_jeu('incomplet', 1, "Incomplet", {1: (50, 40), 2: (55, 45)})
+    with pytest.raises(KeyError):
+        table.indice('inconnu')
+    with pytest.raises(KeyError):
+        table.indice('opb_alarme', version=9)
+
+
+def test_depuis_json(tmp_path):
+    chemin = tmp_path / "limites.json"
+    jeu = {'nom': 'cantonal', 'version': 3, 'libelle': "Directive cantonale",
+           'valeurs': {'I': [47, 37], 'II': [52, 42], 'III': [57, 47], 'IV': [62, 52]}}
+    chemin.write_text(json.dumps({'jeux': [jeu]}), encoding='utf-8')
+    table = TableLimites.depuis_json(str(chemin))
+    assert table.jeu('cantonal')['version'] == 3
+    assert table.zone('DS III', 'cantonal') == ("DS III (Zone mixte)", 57.0, 47.0)
+    assert 'etude' in table.derniere
+    assert list(TableLimites.depuis_json(str(chemin), avec_defaut=False).derniere) == ['cantonal']
+
+    chemin.write_text(json.dumps([{'nom': 'faux', 'valeurs': [50, 40]}]), encoding='utf-8')
+    with pytest.raises(ValueError):
+        TableLimites.depuis_json(str(chemin))
+    chemin.write_text(json.dumps([{'valeurs': {}}]), encoding='utf-8')
+    with pytest.raises(KeyError):
+        TableLimites.depuis_json(str(chemin))
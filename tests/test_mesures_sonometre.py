@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Lecture par blocs des exports de sonomètre confrontée à un Leq calculé ligne par ligne"""
+
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from limites_reglementaires import HEURE_DEBUT_NUIT, HEURE_FIN_NUIT
+from mesures_sonometre import lire_campagne
+
+
+def ecrire_export(chemin, debut, nombre, pas_s, rng, format_date, separateur, decimale):
+    """Export CSV avec quelques lignes invalides ; retourne les (instant, niveau) valides"""
+    mesures = []
+    with open(chemin, 'w', encoding='utf-8') as f:
+        dates = "Date;Heure" if ';' in format_date else "Date"
+        f.write(f"{dates}{separateur}LAeq{separateur}LAFmax\n")
+        for i in range(nombre):
+            instant = debut + timedelta(seconds=i * pas_s)
+            niveau = round(float(rng.uniform(35, 75)), 1)
+            if i % 997 == 0:
+                f.write(f"{instant.strftime(format_date)}{separateur}---{separateur}0\n")
+                continue
+            texte = f"{niveau:.1f}".replace('.', decimale)
+            f.write(f"{instant.strftime(format_date)}{separateur}{texte}{separateur}{niveau + 10:.1f}\n")
+            mesures.append((instant, niveau))
+    return mesures
+
+
+def leq_ligne_par_ligne(mesures):
+    """{(journée d'évaluation, période): Leq} ; la nuit de J va de 22h (J) à 07h (J+1)"""
+    energies = {}
+    for instant, niveau in mesures:
+        nuit = instant.hour >= HEURE_DEBUT_NUIT or instant.hour < HEURE_FIN_NUIT
+        journee = (instant - timedelta(hours=HEURE_FIN_NUIT)).date()
+        cle = (np.datetime64(journee), 'nuit' if nuit else 'jour')
+        total, nombre = energies.get(cle, (0.0, 0))
+        energies[cle] = (total + 10 ** (niveau / 10), nombre + 1)
+    return {cle: 10 * math.log10(total / nombre) for cle, (total, nombre) in energies.items()}
+
+
+@pytest.mark.parametrize("format_date, separateur, decimale", [
+    ("%Y-%m-%d %H:%M:%S", ";", "."),
+    ("%d.%m.%Y;%H:%M:%S", ";", ","),
+    ("%Y-%m-%dT%H:%M:%S", ",", "."),
+])
+def test_leq_egal_au_calcul_ligne_par_ligne(tmp_path, format_date, separateur, decimale):
+    rng = np.random.default_rng(0)
+    chemin = tmp_path / "campagne.csv"
+    mesures = ecrire_export(chemin, datetime(2025, 7, 10, 13, 30), 30000, 5, rng, format_date, separateur, decimale)
+
+    # Petits blocs : des lignes sont coupées à chaque frontière de bloc
+    campagne = lire_campagne(str(chemin), taille_bloc=65536)
+    attendus = leq_ligne_par_ligne(mesures)
+
+    assert campagne.intervalle_ms == 5000
+    assert campagne.lignes_rejetees == len(range(0, 30000, 997))
+    obtenus = {}
+    for periode in ('jour', 'nuit'):
+        for journee, leq in zip(campagne.jours, campagne.leq(periode)):
+            if not np.isnan(leq):
+                obtenus[(journee, periode)] = leq
+    assert obtenus.keys() == attendus.keys()
+    for cle, leq in attendus.items():
+        assert obtenus[cle] == pytest.approx(leq, abs=1e-9)
+
+
+def test_leq_global_et_couverture(tmp_path):
+    rng = np.random.default_rng(1)
+    chemin = tmp_path / "campagne.csv"
+    # Une nuit complète mesurée à la seconde, de 22h à 07h
+    mesures = ecrire_export(chemin, datetime(2025, 7, 10, 22), 9 * 3600, 1, rng, "%Y-%m-%d %H:%M:%S", ";", ".")
+    campagne = lire_campagne(str(chemin))
+
+    energie = sum(10 ** (niveau / 10) for _, niveau in mesures) / len(mesures)
+    assert campagne.leq_global('nuit') == pytest.approx(10 * math.log10(energie), abs=1e-9)
+    assert math.isnan(campagne.leq_global('jour'))
+    assert campagne.couverture('nuit').max() == pytest.approx(len(mesures) / (9 * 3600))
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""Sources étendues : intégration adaptative confrontée aux intégrales analytiques"""
+
+import math
+
+import numpy as np
+import pytest
+
+from modeles_sources import (RAPPORT_SUBDIVISION, _SourceEtendue, calculer_attenuation_source, creer_source,
+                            niveaux_recepteurs)
+
+# Chaque niveau est à moins de 0.1 dB de l'intégrale exacte (RAPPORT_SUBDIVISION) :
+# une atténuation, différence de deux niveaux, à moins de 0.2 dB
+TOLERANCE_DB = 0.2
+
+
+def attenuation_lineique_exacte(longueur, distance_ref, distance_cible):
+    """Intégrale de 1/r² le long d'une ligne, récepteur dans le plan médian : 2/d x atan(L/2d)"""
+    def energie(d):
+        return 2 / d * math.atan(longueur / (2 * d))
+    return 10 * math.log10(energie(distance_cible) / energie(distance_ref))
+
+
+def attenuation_surfacique_exacte(longueur, largeur, distance_ref, distance_cible):
+    """Intégrale de 1/r² sur un rectangle, récepteur sur l'axe : quadrature 1D de la forme en atan"""
+    def energie(d):
+        pas = longueur / 2 / 200000
+        rayon = np.sqrt(d ** 2 + ((np.arange(200000) + 0.5) * pas) ** 2)
+        return 4 * np.sum(np.arctan(largeur / 2 / rayon) / rayon) * pas
+    return 10 * math.log10(energie(distance_cible) / energie(distance_ref))
+
+
+def test_source_ponctuelle():
+    assert calculer_attenuation_source('ponctuelle', 1.0, 10.0) == pytest.approx(-20.0)
+
+
+@pytest.mark.parametrize("longueur, distance_ref, distance_cible", [
+    (10.0, 1.0, 20.0), (50.0, 2.0, 5.0), (5.0, 1.0, 100.0), (100.0, 1.0, 10.0), (0.5, 1.0, 3.0),
+])
+def test_source_lineique_integrale_analytique(longueur, distance_ref, distance_cible):
+    calculee = calculer_attenuation_source('lineique', distance_ref, distance_cible, longueur)
+    exacte = attenuation_lineique_exacte(longueur, distance_ref, distance_cible)
+    assert calculee == pytest.approx(exacte, abs=TOLERANCE_DB)
+
+
+@pytest.mark.parametrize("longueur, largeur, distance_ref, distance_cible", [
+    (4.0, 2.0, 1.0, 10.0), (20.0, 5.0, 2.0, 8.0), (1.0, 1.0, 1.0, 30.0),
+])
+def test_source_surfacique_integrale_analytique(longueur, largeur, distance_ref, distance_cible):
+    calculee = calculer_attenuation_source('surfacique', distance_ref, distance_cible, longueur, largeur)
+    exacte = attenuation_surfacique_exacte(longueur, largeur, distance_ref, distance_cible)
+    assert calculee == pytest.approx(exacte, abs=TOLERANCE_DB)
+
+
+def test_source_lineique_tres_longue_decroit_de_3_db():
+    # Ligne très longue devant la distance : divergence cylindrique, 10 x log10(d1/d2)
+    assert calculer_attenuation_source('lineique', 1.0, 2.0, 1000.0) == pytest.approx(-3.01, abs=0.05)
+
+
+def test_source_lineique_lointaine_equivaut_a_une_source_ponctuelle():
+    source = creer_source('lineique', 60.0, 1.0, longueur=2.0)
+    distances = np.array([50.0, 200.0, 1000.0])
+    recepteurs = source.point_reference(0.0) + distances[:, np.newaxis] * np.array([0.0, 1.0, 0.0])
+    ponctuelle = creer_source('ponctuelle', 60.0, 1.0)
+    ecarts = niveaux_recepteurs([source], recepteurs) - niveaux_recepteurs([ponctuelle], recepteurs)
+    # L'écart se stabilise : la ligne est vue comme un point de puissance équivalente
+    assert np.ptp(ecarts) < 0.01
+    assert RAPPORT_SUBDIVISION * source.dimension < distances.min()
+
+
+def test_lp1_retrouve_au_point_de_reference():
+    for source in (creer_source('lineique', 70.0, 3.0, longueur=12.0),
+                   creer_source('surfacique', 70.0, 3.0, longueur=6.0, largeur=2.0)):
+        niveau = niveaux_recepteurs([source], source.point_reference(3.0))[0]
+        assert niveau == pytest.approx(70.0, abs=1e-9)
+
+
+def test_source_etendue_abstraite():
+    with pytest.raises(TypeError):
+        _SourceEtendue(70.0, 1.0)
+
+    class SansEnergie(_SourceEtendue):
+        pass
+
+    with pytest.raises(TypeError):
+        SansEnergie(70.0, 1.0)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Séparation et évaluation confrontée à l'énumération de toutes les combinaisons"""
+
+import itertools
+import time
+
+import numpy as np
+import pytest
+
+from optimisation_attenuation import (CATALOGUE_MESURES_TYPE, MesureAttenuation, catalogue_depuis_dicts,
+                                      optimiser_mesures)
+
+
+def optimum_exhaustif(niveaux, corrections_jour, corrections_nuit, limite_jour, limite_nuit, catalogue):
+    """Coût minimal sur toutes les combinaisons (une mesure au plus par groupe), inf si aucune ne convient"""
+    forme = niveaux.shape + (1,)
+    energies = [10 ** ((niveaux + corrections) / 10) for corrections in (corrections_jour, corrections_nuit)]
+    # Options de chaque groupe : aucune mesure, ou l'une de ses mesures (coût, facteurs énergétiques)
+    groupes = {}
+    for mesure in catalogue:
+        groupes.setdefault(mesure.groupe, [(0.0, np.ones(niveaux.shape))]).append(
+            (mesure.cout, mesure.facteurs(forme)[:, :, 0]))
+    meilleur = np.inf
+    for choix in itertools.product(*groupes.values()):
+        cout = sum(option[0] for option in choix)
+        if cout >= meilleur:
+            continue
+        facteurs = np.prod([option[1] for option in choix], axis=0)
+        if all(np.all(10 * np.log10((energie * facteurs).sum(axis=0)) <= limite + 1e-9)
+               for energie, limite in zip(energies, (limite_jour, limite_nuit))):
+            meilleur = cout
+    return meilleur
+
+
+@pytest.mark.parametrize("graine", range(30))
+def test_optimum_egal_a_l_enumeration(graine):
+    rng = np.random.default_rng(graine)
+    nb_sources, nb_recepteurs = int(rng.integers(1, 4)), int(rng.integers(1, 3))
+    niveaux = rng.uniform(35, 55, (nb_sources, nb_recepteurs))
+    limite_nuit = rng.uniform(40, 50)
+    catalogue = catalogue_depuis_dicts(CATALOGUE_MESURES_TYPE, nb_sources)
+
+    solution = optimiser_mesures(niveaux, 10, 15, limite_nuit + 10, limite_nuit, catalogue)
+    exhaustif = optimum_exhaustif(niveaux, 10, 15, limite_nuit + 10, limite_nuit, catalogue)
+
+    if np.isinf(exhaustif):
+        assert not solution.trouvee
+    else:
+        assert solution.optimale
+        assert solution.cout == pytest.approx(exhaustif)
+        assert solution.borne == pytest.approx(exhaustif)
+        assert np.all(np.asarray(solution.lr_nuit) <= limite_nuit + 1e-6)
+
+
+def test_ecran_partage_entre_sources():
+    # Un écran devant les deux sources coûte moins que deux silencieux
+    catalogue = [
+        MesureAttenuation("Silencieux A", 3000, 8, sources=[0]),
+        MesureAttenuation("Silencieux B", 3000, 8, sources=[1]),
+        MesureAttenuation("Ecran", 4500, 8, type_mesure='ecran'),
+    ]
+    niveaux = np.array([[40.0], [40.0]])
+    solution = optimiser_mesures(niveaux, 10, 10, 50, 50, catalogue)
+    assert solution.optimale
+    assert [mesure.nom for mesure in solution.mesures] == ["Ecran"]
+    assert solution.cout == optimum_exhaustif(niveaux, 10, 10, 50, 50, catalogue)
+
+
+def test_borne_prouvee_si_la_recherche_est_interrompue():
+    rng = np.random.default_rng(0)
+    niveaux = rng.uniform(30, 45, (12, 4))
+    catalogue = catalogue_depuis_dicts(CATALOGUE_MESURES_TYPE, 12)
+    solution = optimiser_mesures(niveaux, 10, 15, 55, 45, catalogue, noeuds_max=5)
+    assert solution.borne is not None
+    if solution.trouvee:
+        assert solution.borne <= solution.cout + 1e-6
+
+
+@pytest.mark.parametrize("graine", range(100, 104))
+def test_vingt_sources_meilleur_effort_dans_le_temps_imparti(graine):
+    # À 20 sources la preuve d'optimalité n'est pas garantie : la recherche
+    # s'arrête à duree_max avec une solution proche de la borne
+    rng = np.random.default_rng(graine)
+    niveaux = rng.uniform(25, 45, (20, 6))
+    catalogue = catalogue_depuis_dicts(CATALOGUE_MESURES_TYPE, 20)
+
+    debut = time.perf_counter()
+    solution = optimiser_mesures(niveaux, 10, 15, 55, 45, catalogue, duree_max=2.0)
+    assert time.perf_counter() - debut < 2.0 + 1.5
+
+    assert solution.trouvee
+    assert np.all(np.asarray(solution.lr_nuit) <= 45 + 1e-6)
+    assert solution.borne <= solution.cout + 1e-6
+    if solution.optimale:
+        assert solution.ecart == 0.0
+    else:
+        assert solution.ecart == pytest.approx((solution.cout - solution.borne) / solution.cout)
+    assert solution.ecart <= 0.05
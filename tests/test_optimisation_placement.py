@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Placement en toiture : écart minimal entre unités et meilleure implantation confrontée à l'énumération"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from modeles_sources import creer_source
+from optimisation_placement import UniteImplantation, grille_positions, optimiser_placement
+
+CONTOUR = [(0.0, 0.0), (12.0, 0.0), (12.0, 8.0), (0.0, 8.0)]
+RECEPTEURS = np.array([[-10.0, 4.0, 4.0], [6.0, 25.0, 6.0], [30.0, -5.0, 3.0]])
+
+
+def pire_marge(unites, positions, indices, limites, corrections, fond):
+    """max(Lr - limite) jour et nuit d'une implantation, calculé position par position"""
+    marge = -np.inf
+    for periode in (0, 1):
+        energie = fond[periode].copy()
+        for unite, i in zip(unites, indices):
+            d2 = np.maximum(np.sum((positions[i] - RECEPTEURS) ** 2, axis=1), 1e-4)
+            energie += 10 ** ((unite.niveau_1m + corrections[periode]) / 10) / d2
+        marge = max(marge, np.max(10 * np.log10(energie) - limites[periode]))
+    return marge
+
+
+def optimum_exhaustif(unites, positions, ecart_min, limites, corrections, fond):
+    meilleure = np.inf
+    for indices in itertools.permutations(range(len(positions)), len(unites)):
+        plan = positions[list(indices), :2]
+        if any(np.linalg.norm(plan[a] - plan[b]) < ecart_min
+               for a, b in itertools.combinations(range(len(unites)), 2)):
+            continue
+        meilleure = min(meilleure, pire_marge(unites, positions, indices, limites, corrections, fond))
+    return meilleure
+
+
+@pytest.mark.parametrize("niveaux, ecart_min", [((70.0, 70.0), 5.0), ((72.0, 65.0), 3.0), ((70.0, 68.0, 66.0), 4.0)])
+def test_meilleure_implantation_egale_a_l_enumeration(niveaux, ecart_min):
+    unites = [UniteImplantation(f"PAC {i}", niveau) for i, niveau in enumerate(niveaux)]
+    positions = grille_positions(CONTOUR, 2.0, hauteur=1.0)
+    existante = creer_source('ponctuelle', 55.0, 1.0, position=(6.0, 4.0, 1.0))
+    corrections = (5.0 + 4.0, 10.0 + 4.0)
+    fond = np.array([existante.energie_recepteurs(RECEPTEURS) * 10 ** (c / 10) for c in corrections])
+    limites = ([55.0, 55.0, 60.0], [45.0, 45.0, 50.0])
+
+    implantations = optimiser_placement(unites, positions, RECEPTEURS, limites[0], limites[1], *corrections,
+                                        sources_existantes=[existante], ecart_min=ecart_min, nombre=5,
+                                        processus=1, taille_lot=97)
+    assert len(implantations) == 5
+    assert [i.marge for i in implantations] == sorted(i.marge for i in implantations)
+    for implantation in implantations:
+        plan = implantation.positions[:, :2]
+        for a, b in itertools.combinations(range(len(unites)), 2):
+            assert np.linalg.norm(plan[a] - plan[b]) >= ecart_min - 1e-9
+        assert np.max(implantation.lr_nuit - limites[1]) <= implantation.marge + 1e-9
+
+    meilleure = optimum_exhaustif(unites, positions, ecart_min, limites, corrections, fond)
+    assert implantations[0].marge == pytest.approx(meilleure)
+
+
+def test_ecart_trop_grand_ou_positions_insuffisantes():
+    unites = [UniteImplantation.depuis_pression("A", 60.0, 1.0), UniteImplantation.depuis_puissance("B", 75.0)]
+    positions = grille_positions(CONTOUR, 4.0)
+    assert optimiser_placement(unites, positions, RECEPTEURS, 55, 45, 9, 14, ecart_min=50.0, processus=1) == []
+    with pytest.raises(ValueError):
+        optimiser_placement(unites * 3, positions[:4], RECEPTEURS, 55, 45, 9, 14, processus=1)
+
+
+def test_grille_avec_bords_et_exclusions():
+    positions = grille_positions(CONTOUR, 2.0, hauteur=1.5)
+    assert len(positions) == 7 * 5
+    assert np.all(positions[:, 2] == 1.5)
+    tremie = [(3.0, 3.0), (7.0, 3.0), (7.0, 7.0), (3.0, 7.0)]
+    restantes = grille_positions(CONTOUR, 2.0, exclusions=[tremie])
+    assert len(restantes) == 7 * 5 - 4
+    assert not any(3 < x < 7 and 3 < y < 7 for x, y, _ in restantes)
+    with pytest.raises(ValueError):
+        grille_positions(CONTOUR, 0.0)
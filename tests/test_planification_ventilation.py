@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Programmation dynamique des vitesses confrontée à l'énumération par heure"""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from planification_ventilation import (PAS_BUDGET_DB, RESOLUTION_ENERGIE, CourbeVentilateur, UniteVentilation,
+                                       heures_nuit, planifier_vitesses)
+
+
+def capacite_maximale(unites, demande, limite_db, nuit, arret_autorise=True):
+    """Capacité utile maximale d'une heure sur toutes les combinaisons de vitesses respectant la limite"""
+    options = []
+    for unite in unites:
+        courbe = unite.courbe
+        transfert = unite.transfert_nuit if nuit else unite.transfert_jour
+        energies = 10 ** ((courbe.lw + transfert) / 10)
+        capacites = courbe.capacites
+        if arret_autorise:
+            energies, capacites = np.r_[0.0, energies], np.r_[0.0, capacites]
+        options.append(list(zip(energies, capacites)))
+    meilleure = -np.inf
+    for choix in itertools.product(*options):
+        if sum(energie for energie, _ in choix) <= 10 ** (limite_db / 10):
+            meilleure = max(meilleure, min(demande, sum(capacite for _, capacite in choix)))
+    return meilleure
+
+
+@pytest.fixture
+def site():
+    courbe = CourbeVentilateur.similitude(63.0, 21.0)
+    unites = [UniteVentilation.depuis_distance(f"U{i}", courbe, 14.0 + 4 * i, 2, 6.0, 11.0) for i in range(3)]
+    rng = np.random.default_rng(1)
+    demande = np.clip(35 + 25 * np.sin(np.arange(72) / 24 * 2 * np.pi) + rng.normal(0, 8, 72), 0, None)
+    return unites, demande
+
+
+def test_planning_egal_a_l_enumeration(site):
+    unites, demande = site
+    planning = planifier_vitesses(unites, demande, 55.0, 45.0)
+    nuit = heures_nuit(len(demande))
+    limites = np.where(nuit, 45.0, 55.0)
+
+    # Jamais au-dessus de la limite
+    assert np.all(planning.lr <= limites + 1e-9)
+
+    # Optimum de l'énumération encadrant celui de la programmation dynamique : le budget
+    # est arrondi au pas PAS_BUDGET_DB, et chaque unité perd au plus un pas d'énergie
+    marge_db = PAS_BUDGET_DB - 10 * np.log10(1 - len(unites) / RESOLUTION_ENERGIE)
+    for heure in range(len(demande)):
+        fournie = planning.capacite_fournie[heure]
+        assert fournie <= capacite_maximale(unites, demande[heure], limites[heure], nuit[heure]) + 1e-9
+        assert fournie >= capacite_maximale(unites, demande[heure], limites[heure] - marge_db, nuit[heure]) - 1e-9
+
+
+def test_vitesses_de_la_courbe(site):
+    unites, demande = site
+    planning = planifier_vitesses(unites, demande, 55.0, 45.0)
+    admises = np.r_[0.0, unites[0].courbe.vitesses]
+    assert np.isin(planning.vitesses, admises).all()
+    assert planning.vitesses.shape == (len(demande), len(unites))
+
+
+def test_bruit_de_fond_reduit_le_budget(site):
+    unites, demande = site
+    sans_fond = planifier_vitesses(unites, demande, 55.0, 45.0)
+    avec_fond = planifier_vitesses(unites, demande, 55.0, 45.0, niveau_fond=42.0)
+    nuit = heures_nuit(len(demande))
+    assert np.all(avec_fond.lr <= np.where(nuit, 45.0, 55.0) + 1e-9)
+    assert avec_fond.taux_couverture <= sans_fond.taux_couverture
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Portefeuille PDF : index des sites, renvois vers leurs sections et nombre de pages"""
+
+import importlib.util
+import os
+import re
+
+import pytest
+
+from configuration import ecrire_configuration, valider_configuration
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location("calculateur_acoustique",
+                                               os.path.join(RACINE, "Calculateur Acoustique Interactif.py"))
+calculateur = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(calculateur)
+
+BASE = {
+    'nom_projet': "EMS", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+    'limite_jour': 55.0, 'limite_nuit': 45.0, 'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.5,
+}
+
+
+def portefeuille(dossier, niveaux):
+    """Génère le portefeuille des sites de niveaux Lp1 donnés ; retourne le contenu du PDF"""
+    os.makedirs(os.path.join(dossier, "sites"))
+    for i, lp1 in enumerate(niveaux):
+        ecrire_configuration(os.path.join(dossier, "sites", f"site_{i:02d}.json"),
+                             dict(BASE, nom_projet=f"Site {i + 1}", lp1=lp1))
+    chemin = os.path.join(dossier, "portefeuille.pdf")
+    calculateur.generer_portefeuille([os.path.join(dossier, "sites")], chemin)
+    with open(chemin, 'rb') as f:
+        return f.read()
+
+
+def pages(pdf):
+    """Numéros d'objet des pages, dans l'ordre du document"""
+    kids = re.search(rb'/Kids \[([^\]]*)\]', pdf).group(1)
+    return [int(numero) for numero in re.findall(rb'(\d+) 0 R', kids)]
+
+
+def test_index_renvoie_a_la_premiere_page_de_chaque_site(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pages_site = len(pages(portefeuille(str(tmp_path / "un"), [50.0]))) - 1
+    pdf = portefeuille(str(tmp_path / "trois"), [50.0, 80.0, 45.0])
+
+    # Page de synthèse, puis chaque site commence sur une nouvelle page
+    numeros = pages(pdf)
+    assert len(numeros) == 1 + 3 * pages_site
+    destinations = [int(n) for n in re.findall(rb'/Dest \[ (\d+) 0 R', pdf)]
+    assert [numeros.index(n) for n in destinations] == [1, 1 + pages_site, 1 + 2 * pages_site]
+
+
+def test_index_des_sites():
+    configurations = [(valider_configuration(dict(BASE, nom_projet=f"Site {i}", lp1=lp1)), None)
+                      for i, lp1 in enumerate((50.0, 80.0, 45.0))]
+    lignes = calculateur.calculer_lignes(calculateur.colonnes_configurations(configurations), len(configurations))
+    styles = calculateur.CalculateurAcoustiqueInteractif()._styles_pdf()
+    table, non_conformes = calculateur._index_portefeuille(configurations, lignes, styles)
+
+    cellules = table._cellvalues
+    assert len(cellules) == 1 + len(configurations)
+    conformes = [bool(c and n) for c, n in zip(lignes['conforme_jour'], lignes['conforme_nuit'])]
+    assert conformes == [True, False, True] and non_conformes == 1
+    for i, ligne in enumerate(cellules[1:]):
+        assert ligne[0] == str(i + 1)
+        assert f'href="#site{i + 1}"' in ligne[1].text
+        assert ligne[4:6] == [f"{lignes['lr_jour'][i]:.1f}", f"{lignes['lr_nuit'][i]:.1f}"]
+        assert ligne[6] == ("CONFORME" if conformes[i] else "NON CONFORME")
+
+
+def test_recit_differe_consomme_le_generateur_a_la_demande():
+    produits = []
+
+    def flowables():
+        for i in range(50):
+            produits.append(i)
+            yield i
+
+    recit = calculateur.RecitDiffere(flowables(), avance=4)
+    assert produits == []
+    # Boucle de doc.build : tête de liste consommée puis retirée
+    lus = []
+    while len(recit):
+        assert len(produits) - len(lus) <= 4
+        lus.append(recit[0])
+        del recit[0]
+    assert lus == list(range(50))
+    with pytest.raises(IndexError):
+        recit[0]
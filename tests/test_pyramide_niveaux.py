@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""Pyramide des niveaux : fenêtres tracées confrontées au Leq, minimum et maximum des mesures brutes"""
+
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from pyramide_niveaux import EXTENSION_PYRAMIDE, PyramideNiveaux, pyramide_mesures
+
+# Niveaux lus en float32
+TOLERANCE_DB = 1e-4
+
+DEBUT = datetime(2025, 7, 1, 13, 17, 30)
+
+
+def ms(instant):
+    return int(np.datetime64(instant, 'ms').astype(np.int64))
+
+
+@pytest.fixture
+def campagne(tmp_path):
+    """Export à 0.5 s sur 5 h, interrompu 20 minutes ; retourne (chemin, instants ms, niveaux)"""
+    rng = np.random.default_rng(6)
+    chemin = str(tmp_path / "campagne.csv")
+    instants, niveaux = [], []
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write("Date;LAeq\n")
+        for i in range(5 * 7200):
+            instant = DEBUT + timedelta(milliseconds=500 * i)
+            if datetime(2025, 7, 1, 15, 0) <= instant < datetime(2025, 7, 1, 15, 20):
+                continue
+            niveau = round(float(rng.uniform(30, 80)), 1)
+            f.write(f"{instant.strftime('%Y-%m-%d %H:%M:%S')}.{instant.microsecond // 1000:03d};{niveau}\n")
+            instants.append(ms(instant))
+            niveaux.append(niveau)
+    return chemin, np.array(instants), np.array(niveaux)
+
+
+def colonnes_brutes(instants, niveaux, debut_ms, fin_ms, pixels):
+    """Leq, minimum et maximum des mesures brutes de chaque colonne (bornes alignées sur les tranches)"""
+    bornes = debut_ms + (np.arange(pixels + 1) * (fin_ms - debut_ms)) // pixels
+    resultat = np.full((3, pixels), np.nan)
+    for colonne in range(pixels):
+        dans = (instants >= bornes[colonne]) & (instants < bornes[colonne + 1])
+        if dans.any():
+            resultat[:, colonne] = (10 * np.log10(np.mean(10 ** (niveaux[dans] / 10))),
+                                    niveaux[dans].min(), niveaux[dans].max())
+    return resultat
+
+
+@pytest.mark.parametrize("debut, fin, pixels", [
+    (datetime(2025, 7, 1, 14), datetime(2025, 7, 1, 16), 8),
+    (datetime(2025, 7, 1, 14), datetime(2025, 7, 1, 16), 120),
+    (datetime(2025, 7, 1, 13), datetime(2025, 7, 1, 19), 6),
+    (datetime(2025, 7, 1, 14, 59), datetime(2025, 7, 1, 15, 21, 30), 5000),
+    (datetime(2025, 7, 1, 10), datetime(2025, 7, 1, 13, 20), 200),
+])
+def test_fenetre_egale_aux_mesures_brutes(campagne, debut, fin, pixels):
+    chemin, instants, niveaux = campagne
+    pyramide = PyramideNiveaux.construire(chemin, taille_bloc=65536)
+    debut_ms, fin_ms = ms(debut), ms(fin)
+
+    colonnes, leq, minimum, maximum = pyramide.fenetre(debut_ms, fin_ms, pixels)
+    # Au plus une colonne par seconde
+    pixels = min(pixels, (fin_ms - debut_ms) // 1000)
+    assert len(colonnes) == len(leq) == pixels
+    attendu = colonnes_brutes(instants, niveaux, debut_ms, fin_ms, pixels)
+    for obtenu, attendu_colonnes in zip((leq, minimum, maximum), attendu):
+        np.testing.assert_array_equal(np.isnan(obtenu), np.isnan(attendu_colonnes))
+        np.testing.assert_allclose(obtenu, attendu_colonnes, atol=TOLERANCE_DB)
+
+
+def test_pyramide_reutilisee_tant_que_le_csv_est_inchange(campagne):
+    chemin, instants, _ = campagne
+    pyramide = pyramide_mesures(chemin)
+    assert pyramide.debut_ms == ms(DEBUT)
+    assert pyramide.fin_ms == (instants[-1] // 1000 + 1) * 1000
+    assert all(isinstance(niveau, np.memmap) for niveau in pyramide.niveaux)
+    assert os.path.isdir(chemin + EXTENSION_PYRAMIDE)
+
+    entete = os.path.join(chemin + EXTENSION_PYRAMIDE, "entete.json")
+    date = os.stat(entete).st_mtime_ns
+    assert pyramide_mesures(chemin).a_jour(chemin, 'laeq')
+    assert os.stat(entete).st_mtime_ns == date
+    assert not pyramide.a_jour(chemin, 'lafmax')
+
+    with open(chemin, 'a', encoding='utf-8') as f:
+        f.write("2025-07-01 18:30:00.000;55.0\n")
+    assert not pyramide.a_jour(chemin, 'laeq')
+    assert pyramide_mesures(chemin).fin_ms == ms(datetime(2025, 7, 1, 18, 30, 1))
+    with pytest.raises(ValueError):
+        pyramide.fenetre(ms(DEBUT), ms(DEBUT), 10)
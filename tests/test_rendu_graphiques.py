@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Graphiques du rapport : réutilisation par empreinte (CacheGraphiques.rendus) et réduction des cartes"""
+
+import os
+
+import numpy as np
+import pytest
+from reportlab.graphics.shapes import Rect
+from reportlab.lib import colors
+
+from pyramide_niveaux import PyramideNiveaux
+from rendu_graphiques import (BORNES_CLASSES, COULEURS_CLASSES, CacheGraphiques, diagramme_conformite,
+                              graphique_historique, image_carte, rasteriser_carte, reduire_carte)
+
+
+def barres(dessin):
+    """Couleurs des barres Lr jour et nuit"""
+    return [forme.fillColor for forme in dessin.contents if isinstance(forme, Rect) and forme.fillColor is not None]
+
+
+def test_diagramme_rendu_une_fois_par_jeu_de_valeurs(tmp_path):
+    cache = CacheGraphiques(str(tmp_path), dessins_max=2)
+    premier = diagramme_conformite(52.04, 47.3, 55, 45, 200, 120, cache=cache)
+    # Mêmes valeurs au dixième près : dessin repris tel quel
+    assert diagramme_conformite(52.0, 47.3, 55.0, 45.0, 200, 120, cache=cache) is premier
+    assert cache.rendus == 1
+    assert barres(premier) == [colors.HexColor('#28a745'), colors.HexColor('#c0392b')]
+
+    diagramme_conformite(52.0, 47.3, 55, 45, 300, 120, cache=cache)
+    diagramme_conformite(56.0, 44.0, 55, 45, 200, 120, cache=cache)
+    assert cache.rendus == 3
+    # Au-delà de dessins_max, le moins récemment utilisé est redessiné
+    assert diagramme_conformite(52.0, 47.3, 55, 45, 200, 120, cache=cache) is not premier
+    assert cache.rendus == 4
+    assert len(cache.dessins) == 2
+
+
+def test_carte_rasterisee_une_fois_pour_des_niveaux_identiques(tmp_path):
+    cache = CacheGraphiques(str(tmp_path / "cache"))
+    rng = np.random.default_rng(8)
+    niveaux = rng.uniform(30, 80, (300, 500))
+    chemin, taille = image_carte(niveaux, pixels_max=120, cache=cache)
+    assert taille == (-(-500 // 5), -(-300 // 5)) and cache.rendus == 1
+
+    # Même carte relue depuis le disque (memmap) : même PNG, pas de nouveau rendu
+    np.save(tmp_path / "carte.npy", niveaux)
+    projetee = np.load(tmp_path / "carte.npy", mmap_mode='r')
+    assert image_carte(projetee, pixels_max=120, cache=cache) == (chemin, taille)
+    assert cache.rendus == 1
+    # Un autre rapport (autre cache en mémoire) partage le PNG déjà écrit
+    autre = CacheGraphiques(cache.dossier)
+    assert image_carte(niveaux, pixels_max=120, cache=autre)[0] == chemin and autre.rendus == 0
+
+    modifiee = niveaux.copy()
+    modifiee[150, 250] += 1.0
+    assert image_carte(modifiee, pixels_max=120, cache=cache)[0] != chemin
+    assert cache.rendus == 2
+    assert sorted(os.listdir(cache.dossier)) == sorted(
+        os.path.basename(image_carte(n, pixels_max=120, cache=cache)[0]) for n in (niveaux, modifiee))
+
+
+def test_historique_rendu_une_fois_par_fenetre(tmp_path):
+    chemin = tmp_path / "mesures.csv"
+    rng = np.random.default_rng(9)
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write("Date;LAeq\n")
+        for seconde in range(0, 4 * 3600, 2):
+            f.write(f"2025-07-01 {20 + seconde // 3600:02d}:{seconde // 60 % 60:02d}:{seconde % 60:02d};"
+                    f"{rng.uniform(35, 70):.1f}\n")
+    pyramide = PyramideNiveaux.construire(str(chemin))
+    cache = CacheGraphiques(str(tmp_path))
+    premier = graphique_historique(pyramide, 400, 150, lp1=58.04, cache=cache)
+    assert graphique_historique(PyramideNiveaux.construire(str(chemin)), 400, 150, lp1=58.0, cache=cache) is premier
+    assert cache.rendus == 1
+    graphique_historique(pyramide, 400, 150, lp1=60.0, cache=cache)
+    graphique_historique(pyramide, 500, 150, lp1=58.0, cache=cache)
+    assert cache.rendus == 3
+
+
+def test_reduction_egale_a_la_moyenne_energetique_des_blocs():
+    rng = np.random.default_rng(10)
+    niveaux = rng.uniform(30, 80, (23, 37))
+    niveaux[rng.random(niveaux.shape) < 0.2] = np.nan
+    niveaux[:4, :4] = np.nan
+    reduite = reduire_carte(niveaux, pixels_max=10)
+
+    facteur = 4
+    assert reduite.shape == (6, 10)
+    for i in range(6):
+        for j in range(10):
+            bloc = niveaux[i * facteur:(i + 1) * facteur, j * facteur:(j + 1) * facteur]
+            bloc = bloc[~np.isnan(bloc)]
+            if len(bloc):
+                assert reduite[i, j] == pytest.approx(10 * np.log10(np.mean(10 ** (bloc / 10))))
+            else:
+                assert np.isnan(reduite[i, j])
+
+
+def test_classes_de_5_db_et_nord_en_haut():
+    # Ligne 0 au sud : une seule classe par ligne, sans isophone
+    niveaux = np.array([[32.0, 32.0], [52.0, 52.0], [np.nan, np.nan]])
+    image = rasteriser_carte(niveaux, isophones=False)
+    attendues = [COULEURS_CLASSES[0], COULEURS_CLASSES[BORNES_CLASSES.index(50) + 1], '#ffffff']
+    for ligne, couleur in zip(image[::-1], attendues):
+        assert [tuple(pixel) for pixel in ligne] == [tuple(int(couleur[k:k + 2], 16) for k in (1, 3, 5))] * 2
+    # Isophone à la limite entre les classes, pas autour des cellules sans valeur
+    assert (rasteriser_carte(niveaux)[::-1][1] == [0x40, 0x40, 0x40]).all()
+    assert not (rasteriser_carte(niveaux)[::-1][0] == 0x40).all()
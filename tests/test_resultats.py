@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""ResultatEtude et LotResultats : interface dictionnaire, codage des colonnes et relecture des lignes"""
+
+import numpy as np
+import pytest
+
+from configuration import colonnes_configurations, valider_configuration
+from graphe_dependances import GrapheDependances, ajouter_noeuds_calcul, resultats_graphe
+from resultats import CHAMPS_ETIQUETTES, CHAMPS_PARAMETRES, TYPES_CODES, LotResultats, ResultatEtude
+
+# Colonnes d'un lot stockées en float32
+TOLERANCE_DB = 1e-4
+
+BASE = {
+    'nom_projet': "EMS test", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+    'limite_jour': 55.0, 'limite_nuit': 45.0, 'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.0,
+    'k1_jour': 5.0, 'k1_nuit': 10.0,
+}
+
+
+def resultat_graphe(donnees):
+    graphe = GrapheDependances()
+    ajouter_noeuds_calcul(graphe)
+    for cle, valeur in donnees.items():
+        graphe.definir_entree(cle, valeur)
+    return resultats_graphe(graphe, donnees)
+
+
+def configurations():
+    variantes = [
+        {},
+        {'nom_projet': "Garage", 'lp1': 72.5, 'distance_cible': 7.0, 'k3': -6.0},
+        {'type_source': 'lineique', 'longueur_source': 8.0, 'localisation': "Lausanne, Vaud"},
+        {'type_source': 'surfacique', 'longueur_source': 3.0, 'largeur_source': 1.5},
+        {'mode_calcul': 'puissance', 'puissance_sonore': 80.0, 'facteur_q': 4.0, 'zone_sensibilite': "DS III",
+         'limite_jour': 60.0, 'limite_nuit': 50.0},
+        {'nom_projet': "Garage", 'lp1': 55.0},
+    ]
+    return [(valider_configuration({**BASE, **variante}), None) for variante in variantes]
+
+
+def test_resultat_etude_sans_dictionnaire_d_instance():
+    resultat = ResultatEtude(-21.6, 46.4, 56.4, 61.4, 55.0, 45.0, False, False, {'lp1': 68.0})
+    assert not hasattr(resultat, '__dict__')
+    with pytest.raises(AttributeError):
+        resultat.autre = 1
+
+    assert resultat['lr_nuit'] == resultat.lr_nuit == 61.4
+    assert resultat['parametres']['lp1'] == 68.0
+    assert 'lpx' in resultat and 'autre' not in resultat
+    assert resultat.get('autre', 'defaut') == 'defaut'
+    with pytest.raises(KeyError):
+        resultat['autre']
+    assert list(resultat.keys()) == list(resultat.en_dict())
+    assert resultat.en_dict()['conforme_jour'] is False
+
+
+def test_resultats_graphe_partage_les_donnees():
+    donnees = valider_configuration(BASE)
+    assert resultat_graphe(donnees)['parametres'] is donnees
+
+
+def test_lot_calcule_egal_au_graphe_et_relu_ligne_par_ligne():
+    etudes = configurations()
+    lot = LotResultats.depuis_colonnes(colonnes_configurations(etudes), len(etudes))
+
+    assert len(lot) == len(etudes)
+    for i, (donnees, _) in enumerate(etudes):
+        attendu = resultat_graphe(donnees)
+        relu = lot[i]
+        for champ in ('attenuation', 'lpx', 'lr_jour', 'lr_nuit', 'limite_jour', 'limite_nuit'):
+            assert relu[champ] == pytest.approx(attendu[champ], abs=TOLERANCE_DB), (i, champ)
+        assert relu['conforme_jour'] == attendu['conforme_jour']
+        assert relu['conforme_nuit'] == attendu['conforme_nuit']
+        for champ in CHAMPS_PARAMETRES:
+            if donnees.get(champ) is None:
+                assert relu['parametres'][champ] is None, (i, champ)
+            else:
+                assert relu['parametres'][champ] == pytest.approx(donnees[champ], abs=TOLERANCE_DB), (i, champ)
+        for champ in CHAMPS_ETIQUETTES:
+            assert relu['parametres'][champ] == donnees[champ]
+
+    assert lot[-1].parametres['lp1'] == lot[len(lot) - 1].parametres['lp1']
+    with pytest.raises(IndexError):
+        lot[len(lot)]
+    assert [r.lr_nuit for r in lot] == [lot[i].lr_nuit for i in range(len(lot))]
+
+
+def test_etiquettes_et_parametres_secondaires_codes_une_fois():
+    etudes = configurations()
+    lot = LotResultats.depuis_colonnes(colonnes_configurations(etudes), len(etudes))
+
+    assert lot.vocabulaires['nom_projet'] == ["EMS test", "Garage"]
+    assert lot.codes['nom_projet'][:len(lot)].tolist() == [0, 1, 0, 0, 0, 1]
+    assert list(lot.colonne('localisation')) == [donnees['localisation'] for donnees, _ in etudes]
+    # Combinaisons distinctes de paramètres secondaires : base, écran K3, ligne, surface, puissance
+    assert len(lot.secondaires) == 5
+    assert lot.codes_secondaires[0] == lot.codes_secondaires[5]
+    np.testing.assert_array_equal(lot.colonne('k3'), [0.0, -6.0, 0.0, 0.0, 0.0, 0.0])
+    assert lot.nbytes <= 60 * len(lot)
+
+
+def test_ajouter_equivaut_a_etendre():
+    etudes = configurations()
+    calcule = LotResultats.depuis_colonnes(colonnes_configurations(etudes), len(etudes))
+    lot = LotResultats(capacite=2)
+    for donnees, _ in etudes:
+        lot.ajouter(resultat_graphe(donnees))
+
+    assert len(lot) == len(calcule)
+    for champ in ('lr_jour', 'lr_nuit', 'lp1', 'k3', 'longueur_source') + CHAMPS_ETIQUETTES:
+        np.testing.assert_array_equal(lot.colonne(champ), calcule.colonne(champ))
+
+
+def test_vocabulaire_trop_grand_pour_son_type_de_code():
+    lot = LotResultats()
+    limite = np.iinfo(TYPES_CODES['zone_sensibilite']).max + 1
+    lot.coder('zone_sensibilite', [f"zone {i}" for i in range(limite)])
+    with pytest.raises(ValueError):
+        lot.coder('zone_sensibilite', ["zone de trop"])
+    # Une valeur déjà connue reste codable
+    assert lot.coder('zone_sensibilite', ["zone 0"]).tolist() == [0]
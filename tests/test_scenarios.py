@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""Variantes calculées en une passe confrontées au graphe de calcul d'une étude"""
+
+import json
+
+import numpy as np
+import pytest
+
+from configuration import valider_configuration
+from graphe_dependances import GrapheDependances, ajouter_noeuds_calcul, resultats_graphe
+from scenarios import NOM_BASE, comparer_scenarios, lire_scenarios, variantes_grille
+
+# Résultats des lots stockés en float32
+TOLERANCE_DB = 1e-4
+
+BASE = {
+    'nom_projet': "EMS test", 'zone_sensibilite': "II", 'limite_jour': 55.0, 'limite_nuit': 45.0,
+    'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.0, 'k1_jour': 5.0, 'k1_nuit': 10.0,
+}
+
+
+def resultat_graphe(donnees):
+    graphe = GrapheDependances()
+    ajouter_noeuds_calcul(graphe)
+    for cle, valeur in donnees.items():
+        graphe.definir_entree(cle, valeur)
+    return resultats_graphe(graphe, donnees)
+
+
+def test_lignes_egales_aux_resultats_du_graphe():
+    variantes = [
+        ("Ecran", {'k3': -8.0}, {}),
+        ("Recul", {}, {'distance_cible': 5.0}),
+        ("Batterie", {'type_source': 'lineique', 'longueur_source': 8.0}, {}),
+        ("Grille", {'type_source': 'surfacique', 'longueur_source': 3.0, 'largeur_source': 1.5}, {}),
+        ("Puissance", {'mode_calcul': 'puissance', 'puissance_sonore': 80.0, 'facteur_q': 2.0}, {}),
+        ("Zone III", {'zone_sensibilite': "III"}, {}),
+    ] + variantes_grille({'distance_cible': [8.0, 20.0], 'lp1': [60.0, 72.0]})
+    comparaison = comparer_scenarios(BASE, variantes)
+
+    assert len(comparaison) == len(variantes) + 1
+    assert comparaison.noms[0] == NOM_BASE
+    for i, donnees in enumerate(comparaison.donnees):
+        attendu = resultat_graphe(donnees)
+        ligne = comparaison.lignes[i]
+        for champ in ('lpx', 'lr_jour', 'lr_nuit', 'limite_jour', 'limite_nuit'):
+            assert float(ligne[champ]) == pytest.approx(attendu[champ], abs=TOLERANCE_DB), (comparaison.noms[i], champ)
+        assert bool(ligne['conforme_jour']) == attendu['conforme_jour']
+        assert bool(ligne['conforme_nuit']) == attendu['conforme_nuit']
+        assert comparaison.ecart_nuit[i] == pytest.approx(attendu['lr_nuit'] - comparaison.lignes['lr_nuit'][0],
+                                                          abs=TOLERANCE_DB)
+
+
+def test_changement_de_zone_reprend_ses_limites():
+    comparaison = comparer_scenarios(BASE, [("Zone III", {'zone_sensibilite': "III"}, {})])
+    base = valider_configuration(BASE)
+    assert comparaison.donnees[1]['limite_nuit'] > base['limite_nuit']
+
+
+def test_meilleure_variante_conforme():
+    variantes = [("Ecran", {'k3': -10.0}, {}), ("Loin", {'distance_cible': 100.0}, {}),
+                 ("Tres loin", {'distance_cible': 300.0}, {})]
+    comparaison = comparer_scenarios(BASE, variantes)
+    assert comparaison.conformes.tolist() == [False, False, True, True]
+    assert comparaison.noms[comparaison.meilleure()] == "Tres loin"
+
+    assert comparer_scenarios(BASE, variantes[:1]).meilleure() is None
+
+
+def test_ecart_sans_valeur_de_base():
+    with pytest.raises(ValueError, match="Variante « Q »"):
+        comparer_scenarios(BASE, [("Q", {}, {'facteur_q': 1.0})])
+
+
+def test_lire_scenarios(tmp_path):
+    chemin = tmp_path / "scenarios.json"
+    chemin.write_text(json.dumps({
+        "format": "calculateur-acoustique-scenarios", "version": 1,
+        "variantes": [{"nom": "Ecran 2 m", "modifications": {"k3": -8}}, {"ecarts": {"distance_cible": 5}}],
+        "grille": {"lp1": [60, 65]},
+    }), encoding='utf-8')
+    variantes = lire_scenarios(str(chemin))
+    assert [nom for nom, _, _ in variantes] == ["Ecran 2 m", "distance_cible+5", "lp1=60", "lp1=65"]
+
+    chemin.write_text(json.dumps({"format": "autre"}), encoding='utf-8')
+    with pytest.raises(ValueError):
+        lire_scenarios(str(chemin))
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Cartes de bruit sur disque : relecture, découpe de régions et écriture d'une CarteBruit"""
+
+import numpy as np
+import pytest
+
+from modeles_sources import creer_source, en_niveau
+from stockage_mmap import StockageCarte
+
+ORIGINE = (-10.0, 5.0)
+RESOLUTION = 0.5
+NX, NY = 37, 23
+
+
+def test_relecture_apres_fermeture(tmp_path):
+    stockage = StockageCarte.creer(tmp_path / "carte", ORIGINE, RESOLUTION, NX, NY,
+                                   scenarios=('base', 'ecran'), avec_energie=True)
+    rng = np.random.default_rng(1)
+    valeurs = {(s, p): rng.uniform(20, 70, (NY, NX)) for s in ('base', 'ecran') for p in ('jour', 'nuit')}
+    for (scenario, periode), grille in valeurs.items():
+        stockage.grille(scenario, periode)[:] = grille
+    stockage.energie('ecran')[:] = valeurs[('ecran', 'nuit')]
+    stockage.flush()
+    del stockage
+
+    relu = StockageCarte.ouvrir(tmp_path / "carte")
+    assert isinstance(relu.niveaux, np.memmap)
+    assert relu.entete['origine'] == list(ORIGINE)
+    for (scenario, periode), grille in valeurs.items():
+        np.testing.assert_array_equal(relu.grille(scenario, periode), grille)
+    np.testing.assert_array_equal(relu.energie('ecran'), valeurs[('ecran', 'nuit')])
+    with pytest.raises(KeyError):
+        relu.grille('variante', 'jour')
+    with pytest.raises(KeyError):
+        relu.grille('base', 'soir')
+
+
+def test_carte_sans_tampon_d_energie(tmp_path):
+    stockage = StockageCarte.creer(tmp_path / "carte", ORIGINE, RESOLUTION, NX, NY)
+    with pytest.raises(KeyError):
+        stockage.energie('base')
+
+
+def test_region_egale_a_la_selection_des_centres(tmp_path):
+    stockage = StockageCarte.creer(tmp_path / "carte", ORIGINE, RESOLUTION, NX, NY)
+    grille = np.arange(NX * NY, dtype=float).reshape(NY, NX)
+    stockage.grille('base', 'jour')[:] = grille
+    xs = ORIGINE[0] + RESOLUTION * np.arange(NX)
+    ys = ORIGINE[1] + RESOLUTION * np.arange(NY)
+
+    # Rectangles intérieurs, à cheval sur les bords et entièrement dehors
+    for x_min, x_max, y_min, y_max in [(-8.2, -3.1, 6.3, 9.9), (-7.0, -7.0, 8.0, 8.0),
+                                       (-30.0, -6.0, -2.0, 7.2), (0.0, 50.0, 12.4, 40.0),
+                                       (-30.0, 50.0, -30.0, 50.0)]:
+        region = stockage.region('base', 'jour', x_min, x_max, y_min, y_max)
+        y0, y1, x0, x1 = stockage.indices_region(x_min, x_max, y_min, y_max)
+        np.testing.assert_array_equal(region, grille[y0:y1, x0:x1])
+        # La région couvre toutes les cellules dont le centre est dans le rectangle
+        colonnes = np.nonzero((xs >= x_min) & (xs <= x_max))[0]
+        lignes = np.nonzero((ys >= y_min) & (ys <= y_max))[0]
+        if len(colonnes):
+            assert x0 <= colonnes[0] and colonnes[-1] < x1
+        if len(lignes):
+            assert y0 <= lignes[0] and lignes[-1] < y1
+        assert 0 <= x0 <= x1 <= NX and 0 <= y0 <= y1 <= NY
+
+    assert stockage.region('base', 'jour', 100.0, 120.0, 100.0, 120.0).size == 0
+
+
+def test_ecrire_carte_depuis_carte_bruit(tmp_path):
+    stockage = StockageCarte.creer(tmp_path / "carte", ORIGINE, RESOLUTION, NX, NY, avec_energie=True)
+    carte = stockage.carte_bruit('base', hauteur=1.5, taille_tuile=8, seuil=-100.0)
+    sources = [creer_source('ponctuelle', 70.0, 1.0, position=(-4.0, 9.0, 2.0)),
+               creer_source('lineique', 65.0, 1.0, longueur=6.0, position=(2.0, 12.0, 1.0))]
+    for i, source in enumerate(sources):
+        carte.ajouter_source(i, source)
+    corrections = {'jour': 5.0, 'nuit': 12.0}
+    stockage.ecrire_carte(carte, 'base', corrections)
+
+    # Énergie sommée directement dans le tampon sur disque
+    assert np.shares_memory(carte.energie, stockage.energie('base'))
+    xs = ORIGINE[0] + RESOLUTION * np.arange(NX)
+    ys = ORIGINE[1] + RESOLUTION * np.arange(NY)
+    grille_x, grille_y = np.meshgrid(xs, ys)
+    recepteurs = np.column_stack([grille_x.ravel(), grille_y.ravel(), np.full(grille_x.size, 1.5)])
+    attendu = en_niveau(sum(source.energie_recepteurs(recepteurs) for source in sources)).reshape(NY, NX)
+
+    relu = StockageCarte.ouvrir(tmp_path / "carte")
+    for periode, correction in corrections.items():
+        np.testing.assert_allclose(relu.grille('base', periode), attendu + correction, atol=1e-9)
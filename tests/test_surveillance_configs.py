@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Surveillance d'un dossier : anti-rebond des sauvegardes et études inchangées non recalculées"""
+
+import os
+
+import pytest
+
+from configuration import configuration_json, ecrire_configuration
+from surveillance_configs import SurveillanceConfigurations, empreinte_configuration
+
+DELAI = 0.5
+
+BASE = {
+    'nom_projet': "EMS test", 'localisation': "Sion, Valais", 'zone_sensibilite': "DS II",
+    'limite_jour': 55.0, 'limite_nuit': 45.0, 'lp1': 68.0, 'distance_ref': 1.0, 'distance_cible': 12.0,
+}
+
+
+def traiter(chemin, donnees, date_etude):
+    """Traitement exécuté dans un processus de travail"""
+    return donnees['lp1']
+
+
+class Horloge:
+    def __init__(self):
+        self.temps = 0.0
+
+    def __call__(self):
+        return self.temps
+
+
+class Dossier:
+    """Écritures horodatées explicitement : chaque sauvegarde change la date de modification"""
+
+    def __init__(self, chemin):
+        self.chemin = chemin
+        self.date = 1_700_000_000 * 10 ** 9
+
+    def ecrire(self, nom, texte):
+        chemin = os.path.join(self.chemin, nom)
+        with open(chemin, 'w', encoding='utf-8') as f:
+            f.write(texte)
+        self.date += 10 ** 9
+        os.utime(chemin, ns=(self.date, self.date))
+        return chemin
+
+
+@pytest.fixture
+def surveillance(tmp_path):
+    dossier = Dossier(str(tmp_path))
+    dossier.ecrire("ems.json", configuration_json(BASE))
+    horloge, rapports = Horloge(), []
+    surveillance = SurveillanceConfigurations(str(tmp_path), traiter, lambda *rapport: rapports.append(rapport),
+                                              delai=DELAI, processus=1, horloge=horloge)
+    yield surveillance, dossier, horloge, rapports
+    surveillance.fermer()
+
+
+def attendre(surveillance, horloge, duree):
+    horloge.temps += duree
+    return [os.path.basename(chemin) for chemin in surveillance.scruter()]
+
+
+def test_fichiers_existants_non_recalcules(surveillance):
+    surveillance, dossier, horloge, rapports = surveillance
+    assert attendre(surveillance, horloge, 0) == []
+    assert attendre(surveillance, horloge, 10 * DELAI) == []
+    assert not surveillance.occupee
+
+    # Mêmes données, mise en forme différente : relu mais pas recalculé
+    dossier.ecrire("ems.json", configuration_json(BASE).replace("  ", "    "))
+    assert attendre(surveillance, horloge, 0) == []
+    assert attendre(surveillance, horloge, DELAI) == []
+    surveillance.fermer()
+    assert rapports == []
+
+
+def test_sauvegardes_successives_traitees_une_fois(surveillance):
+    surveillance, dossier, horloge, rapports = surveillance
+    attendre(surveillance, horloge, 0)
+    for lp1 in (70.0, 71.0, 72.0):
+        dossier.ecrire("ems.json", configuration_json(dict(BASE, lp1=lp1)))
+        # Moins de DELAI depuis la dernière sauvegarde : rien n'est soumis
+        assert attendre(surveillance, horloge, DELAI / 2) == []
+    assert attendre(surveillance, horloge, DELAI / 2) == []
+    assert attendre(surveillance, horloge, DELAI) == ["ems.json"]
+    assert attendre(surveillance, horloge, 10 * DELAI) == []
+
+    surveillance.fermer()
+    assert [(os.path.basename(chemin), resultat, erreur) for chemin, resultat, erreur in rapports] == [
+        ("ems.json", 72.0, None)]
+
+
+def test_nouveau_fichier_et_fichier_invalide(surveillance):
+    surveillance, dossier, horloge, rapports = surveillance
+    attendre(surveillance, horloge, 0)
+    ecrire_configuration(os.path.join(dossier.chemin, "garage.toml"), dict(BASE, lp1=60.0))
+    dossier.ecrire("brouillon.json", "{ incomplet")
+    assert attendre(surveillance, horloge, 0) == []
+    assert attendre(surveillance, horloge, DELAI) == ["garage.toml"]
+    # Le fichier invalide est signalé une fois, puis ignoré jusqu'à sa prochaine sauvegarde
+    assert attendre(surveillance, horloge, DELAI) == []
+    surveillance.fermer()
+
+    erreurs = [(os.path.basename(chemin), erreur) for chemin, _, erreur in rapports if erreur is not None]
+    assert len(erreurs) == 1 and erreurs[0][0] == "brouillon.json"
+    assert [(os.path.basename(c), r) for c, r, e in rapports if e is None] == [("garage.toml", 60.0)]
+
+
+def test_empreinte_independante_de_l_ordre_des_champs():
+    assert empreinte_configuration({'a': 1, 'b': 2.0}) == empreinte_configuration({'b': 2.0, 'a': 1})
+    assert empreinte_configuration({'a': 1}) != empreinte_configuration({'a': 2})
+    with pytest.raises(ValueError):
+        SurveillanceConfigurations("/dossier/absent", traiter)
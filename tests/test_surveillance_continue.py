@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Surveillance continue : Lr glissant par blocs confronté au Leq calculé d'un seul tenant"""
+
+import numpy as np
+import pytest
+
+from surveillance_continue import DUREES_PERIODES_S, SurveillanceContinue
+
+DONNEES = {'k1_jour': 5.0, 'k1_nuit': 10.0, 'k2': 4.0, 'k3': -2.0, 'reflexion': 1.0,
+           'limite_jour': 55.0, 'limite_nuit': 45.0}
+CORRECTIONS = 4.0 - 2.0 + 1.0
+
+# 01/07/2025 06:00:00 en ms depuis 1970
+DEBUT_MS = int(np.datetime64('2025-07-01T06:00:00', 'ms').astype(np.int64))
+
+
+def leq(niveaux):
+    return 10 * np.log10(np.mean(10 ** (np.asarray(niveaux) / 10)))
+
+
+def echantillons(heures, rng, pas_s=1):
+    instants = DEBUT_MS + np.arange(0, heures * 3600, pas_s, dtype=np.int64) * 1000
+    return instants, rng.uniform(20, 50, len(instants))
+
+
+def par_blocs(surveillance, instants, niveaux, rng):
+    coupures = np.sort(rng.choice(np.arange(1, len(instants)), 40, replace=False))
+    for debut, fin in zip(np.concatenate([[0], coupures]), np.concatenate([coupures, [len(instants)]])):
+        surveillance.ajouter(instants[debut:fin], niveaux[debut:fin])
+
+
+def test_bilans_par_periode_egaux_au_leq_d_un_seul_tenant():
+    rng = np.random.default_rng(4)
+    instants, niveaux = echantillons(26, rng)
+    surveillance = SurveillanceContinue(DONNEES)
+    par_blocs(surveillance, instants, niveaux, rng)
+    surveillance._clore_periode()
+
+    heures = (instants // 3600000) % 24
+    nuit = (heures >= 22) | (heures < 7)
+    jours = (instants - 7 * 3600000) // 86400000
+    attendus = []
+    for cle in np.unique(jours * 2 + nuit):
+        dans_periode = jours * 2 + nuit == cle
+        attendus.append(('nuit' if cle % 2 else 'jour', leq(niveaux[dans_periode]), np.count_nonzero(dans_periode)))
+
+    # Fin de nuit (06h-07h), jour complet, nuit complète, début du jour suivant
+    assert [bilan.periode for bilan in surveillance.bilans] == ['nuit', 'jour', 'nuit', 'jour']
+    for bilan, (periode, attendu, nombre) in zip(surveillance.bilans, attendus):
+        assert bilan.periode == periode
+        assert bilan.leq == pytest.approx(attendu, abs=1e-9)
+        assert bilan.lr == pytest.approx(attendu + DONNEES[f'k1_{periode}'] + CORRECTIONS, abs=1e-9)
+        assert bilan.couverture == pytest.approx(nombre / DUREES_PERIODES_S[periode])
+    assert str(surveillance.bilans[1].jour) == "2025-07-01"
+    assert surveillance.echantillons == len(instants)
+
+
+def test_fenetre_recente_et_lr_projete():
+    rng = np.random.default_rng(5)
+    instants, niveaux = echantillons(4, rng, pas_s=2)
+    surveillance = SurveillanceContinue(DONNEES, fenetre_s=600)
+    par_blocs(surveillance, instants, niveaux, rng)
+
+    etat = surveillance.etat()
+    jour = instants >= DEBUT_MS + 3600 * 1000
+    assert etat['periode'] == 'jour'
+    assert etat['leq'] == pytest.approx(leq(niveaux[jour]), abs=1e-9)
+    # Fenêtre des 600 dernières secondes : 300 échantillons de 2 s
+    assert etat['leq_recent'] == pytest.approx(leq(niveaux[-300:]), abs=1e-9)
+
+    duree_periode = DUREES_PERIODES_S['jour']
+    ecoule = (instants[-1] - instants[jour][0]) / 1000
+    restant = duree_periode - ecoule
+    energie = np.sum(10 ** (niveaux[jour] / 10)) * 2
+    projete = 10 * np.log10((energie + 10 ** (leq(niveaux[-300:]) / 10) * restant) / (energie / 10 ** (
+        leq(niveaux[jour]) / 10) + restant))
+    assert etat['lr_projete'] == pytest.approx(projete + 5.0 + CORRECTIONS, abs=1e-9)
+    assert etat['lr_minimal'] == pytest.approx(10 * np.log10(energie / duree_periode) + 5.0 + CORRECTIONS, abs=1e-9)
+    assert etat['avancement'] == pytest.approx(ecoule / duree_periode)
+
+
+def test_alertes_une_fois_par_periode():
+    alertes = []
+    surveillance = SurveillanceContinue(DONNEES, alerter=alertes.append)
+    # Nuit : Lr courant 40 + 13 dB(A), au-delà de 45 dès le premier bloc ; l'énergie
+    # déjà reçue dépasse la limite après 32400 s x 10^(-0.8), soit environ 85 minutes
+    instants = int(np.datetime64('2025-07-01T22:00:00', 'ms').astype(np.int64)) + np.arange(7200) * 1000
+    for debut in range(0, len(instants), 600):
+        surveillance.ajouter(instants[debut:debut + 600], np.full(600, 40.0))
+        if debut == 4200:
+            assert [alerte.nature for alerte in alertes] == ['prevision']
+
+    assert [alerte.nature for alerte in alertes] == ['prevision', 'depassement']
+    assert alertes[1].instant_ms == instants[5399]
+    assert all(alerte.periode == 'nuit' and alerte.limite == 45.0 for alerte in alertes)
+    assert alertes[1].lr > 45.0 and "Dépassement avéré" in str(alertes[1])
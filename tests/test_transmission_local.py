@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""Local technique : niveau réverbéré et puissance rayonnée confrontés aux formules par bande"""
+
+import numpy as np
+import pytest
+
+from transmission_local import (BANDES_OCTAVE, CORRECTION_CHAMP_DIFFUS, MATERIAUX_TYPE, LocalTechnique,
+                                TableMateriaux, lw_exterieur, niveau_global, spectre_depuis_global)
+
+LONGUEUR, LARGEUR, HAUTEUR = 6.0, 4.0, 3.0
+SURFACE_OUVERTURE = 1.5
+
+
+def aire_attendue(materiau_murs, materiau_ouverture, surface_ouverture):
+    """A = somme des S x alpha : murs et plafond, sol en béton, plus l'ouverture"""
+    surface_murs = 2 * (LONGUEUR + LARGEUR) * HAUTEUR + LONGUEUR * LARGEUR
+    return (surface_murs * np.array(MATERIAUX_TYPE[materiau_murs][1])
+            + LONGUEUR * LARGEUR * np.array(MATERIAUX_TYPE['beton_20cm'][1])
+            + surface_ouverture * np.array(MATERIAUX_TYPE[materiau_ouverture][1]))
+
+
+@pytest.mark.parametrize("murs, ouverture", [('beton_20cm', 'grille_pare_pluie'),
+                                             ('doublage_absorbant', 'grille_acoustique'),
+                                             ('panneau_sandwich', 'porte_acier')])
+def test_formules_par_bande(murs, ouverture):
+    local = LocalTechnique.parallelepipede(LONGUEUR, LARGEUR, HAUTEUR, murs)
+    local.ajouter_ouverture(ouverture, SURFACE_OUVERTURE)
+    lw_bandes = spectre_depuis_global(85.0)
+    aire = aire_attendue(murs, ouverture, SURFACE_OUVERTURE)
+
+    # Lp = Lw + 10 log10(4/A)
+    lp = lw_bandes + 10 * np.log10(4 / aire)
+    np.testing.assert_allclose(local.aire_absorption(), aire)
+    np.testing.assert_allclose(local.niveau_reverbere(lw_bandes), lp, atol=1e-9)
+    # Lw' = Lp - R + 10 log10(S) - 6
+    lw_rayonne = lp - np.array(MATERIAUX_TYPE[ouverture][0]) + 10 * np.log10(SURFACE_OUVERTURE) - 6
+    assert CORRECTION_CHAMP_DIFFUS == -6.0
+    np.testing.assert_allclose(local.puissances_rayonnees(lw_bandes)[0], lw_rayonne, atol=1e-9)
+
+    lw, lp_local = lw_exterieur(85.0, LONGUEUR, LARGEUR, HAUTEUR, ouverture, SURFACE_OUVERTURE, murs)
+    assert lw == pytest.approx(niveau_global(lw_rayonne), abs=1e-9)
+    assert lp_local == pytest.approx(niveau_global(lp), abs=1e-9)
+
+
+def test_spectre_conserve_le_niveau_global():
+    bandes = spectre_depuis_global(np.array([70.0, 92.5]))
+    assert bandes.shape == (2, len(BANDES_OCTAVE))
+    np.testing.assert_allclose(niveau_global(bandes), [70.0, 92.5], atol=1e-9)
+
+
+def test_machines_et_ouvertures_multiples():
+    local = LocalTechnique.parallelepipede(LONGUEUR, LARGEUR, HAUTEUR)
+    local.ajouter_ouverture('grille_pare_pluie', 1.0, position=(0.0, 2.0), normale=(0.0, 2.0, 0.0))
+    local.ajouter_ouverture('porte_acier', 2.0, position=(6.0, 0.0, 1.0))
+    machines = spectre_depuis_global(np.array([80.0, 80.0]))
+
+    # Deux machines identiques : +3 dB sur chaque bande
+    np.testing.assert_allclose(local.niveau_reverbere(machines),
+                               local.niveau_reverbere(machines[0]) + 10 * np.log10(2), atol=1e-9)
+    puissances = local.puissances_rayonnees(machines)
+    assert puissances.shape == (2, len(BANDES_OCTAVE))
+    sources = local.sources(machines)
+    assert [s.lw for s in sources] == pytest.approx(list(niveau_global(puissances)))
+    np.testing.assert_allclose(sources[0].position, [0.0, 2.0, 0.0])
+    np.testing.assert_allclose(sources[0].axe, [0.0, 1.0, 0.0])
+
+
+def test_saisies_invalides():
+    table = TableMateriaux()
+    with pytest.raises(ValueError):
+        table.ajouter_materiau('mousse', 10, 1.2)
+    with pytest.raises(KeyError):
+        table.indice('inconnu')
+    with pytest.raises(ValueError):
+        LocalTechnique.parallelepipede(0.0, LARGEUR, HAUTEUR)
+    local = LocalTechnique.parallelepipede(LONGUEUR, LARGEUR, HAUTEUR)
+    with pytest.raises(ValueError):
+        local.puissances_rayonnees(spectre_depuis_global(80.0))
+    with pytest.raises(ValueError):
+        local.ajouter_ouverture('porte_acier', 1.0, normale=(0.0, 0.0, 0.0))
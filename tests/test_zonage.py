@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Index en grille du plan de zones confronté au test point dans polygone direct"""
+
+import json
+
+import numpy as np
+import pytest
+
+from optimisation_placement import dans_polygone
+from zonage import HORS_ZONAGE, IndexZonage
+
+
+def polygone_etoile(centre, rayon, branches, rng):
+    """Polygone non convexe (étoile irrégulière) de 2 x branches sommets"""
+    angles = np.sort(rng.uniform(0, 2 * np.pi, 2 * branches))
+    rayons = np.where(np.arange(2 * branches) % 2 == 0, rayon, rayon * rng.uniform(0.2, 0.6, 2 * branches))
+    return np.column_stack([centre[0] + rayons * np.cos(angles), centre[1] + rayons * np.sin(angles)])
+
+
+def degres_directs(zones, points):
+    """Degré le plus exigeant des zones contenant chaque point (règle pair-impair sur les anneaux)"""
+    resultat = np.full(len(points), 127)
+    for degre, anneaux in zones:
+        dedans = np.zeros(len(points), dtype=bool)
+        for anneau in anneaux:
+            dedans ^= dans_polygone(points, anneau)
+        resultat = np.where(dedans, np.minimum(resultat, degre), resultat)
+    return np.where(resultat == 127, HORS_ZONAGE, resultat)
+
+
+@pytest.mark.parametrize("graine", range(5))
+def test_degres_egaux_au_test_direct(graine):
+    rng = np.random.default_rng(graine)
+    zones = []
+    for _ in range(6):
+        centre = rng.uniform(0, 1000, 2)
+        contour = polygone_etoile(centre, rng.uniform(100, 300), int(rng.integers(5, 40)), rng)
+        trou = polygone_etoile(centre, 30.0, 6, rng)
+        zones.append((int(rng.integers(1, 5)), [contour, trou] if rng.random() < 0.5 else [contour]))
+    points = rng.uniform(-100, 1100, (50000, 2))
+
+    index = IndexZonage(zones)
+    np.testing.assert_array_equal(index.degres(points), degres_directs(zones, points))
+
+
+def test_zones_chevauchantes_degre_le_plus_exigeant():
+    carre = [(0, 0), (100, 0), (100, 100), (0, 100)]
+    decale = [(50, 50), (150, 50), (150, 150), (50, 150)]
+    index = IndexZonage([(3, carre), ('II', decale)])
+    degres = index.degres([(25, 25), (75, 75), (125, 125), (500, 500)])
+    assert degres.tolist() == [3, 2, 2, HORS_ZONAGE]
+
+
+def test_limites_nan_hors_zonage():
+    index = IndexZonage([(2, [(0, 0), (10, 0), (10, 10), (0, 10)])])
+    jour, nuit = index.limites([(5, 5), (50, 50)])
+    np.testing.assert_array_equal(jour, [55.0, np.nan])
+    np.testing.assert_array_equal(nuit, [45.0, np.nan])
+
+
+def test_depuis_geojson(tmp_path):
+    collection = {"type": "FeatureCollection", "features": [
+        {"type": "Feature", "properties": {"DS": "III"},
+         "geometry": {"type": "Polygon", "coordinates": [[[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]]}},
+    ]}
+    chemin = tmp_path / "zones.geojson"
+    chemin.write_text(json.dumps(collection), encoding='utf-8')
+    index = IndexZonage.depuis_geojson(str(chemin))
+    assert index.degres([(5, 5), (15, 5)]).tolist() == [3, HORS_ZONAGE]
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transmission d'un local technique vers l'extérieur par bandes d'octave
+Niveau réverbéré Lp = Lw + 10 x log10(4/A), puis puissance rayonnée par chaque
+ouverture ou élément de façade Lw' = Lp - R + 10 x log10(S) - 6
+"""
+
+import numpy as np
+
+from directivite import SourcePuissance
+from modeles_sources import en_energie, en_niveau
+
+# Bandes d'octave (Hz) ; tous les niveaux par bande sont pondérés A
+BANDES_OCTAVE = (63, 125, 250, 500, 1000, 2000, 4000, 8000)
+
+# Champ diffus rayonné à travers une paroi (ISO 12354-4, terme Cd)
+CORRECTION_CHAMP_DIFFUS = -6.0
+
+# Spectre relatif pondéré A d'un ventilateur hélicoïde (condenseur, aéroréfrigérant)
+SPECTRE_VENTILATEUR = (-22.0, -14.0, -8.0, -5.0, -5.0, -7.0, -11.0, -17.0)
+
+# Valeurs indicatives : indice d'affaiblissement R (dB) et coefficient d'absorption
+# alpha par bande d'octave, à remplacer par les fiches techniques des fournisseurs
+MATERIAUX_TYPE = {
+    'beton_20cm': ((42, 44, 50, 57, 64, 70, 75, 78),
+                   (0.01, 0.01, 0.01, 0.02, 0.02, 0.02, 0.03, 0.03)),
+    'maconnerie_brique': ((34, 38, 41, 47, 54, 60, 63, 65),
+                          (0.02, 0.02, 0.03, 0.04, 0.05, 0.06, 0.07, 0.07)),
+    'panneau_sandwich': ((15, 19, 22, 25, 28, 34, 40, 42),
+                         (0.10, 0.10, 0.08, 0.06, 0.05, 0.05, 0.05, 0.05)),
+    'doublage_absorbant': ((42, 44, 50, 57, 64, 70, 75, 78),
+                           (0.15, 0.25, 0.60, 0.90, 0.95, 0.95, 0.90, 0.90)),
+    'porte_acier': ((18, 22, 26, 29, 31, 33, 35, 36),
+                    (0.05, 0.05, 0.04, 0.03, 0.03, 0.03, 0.03, 0.03)),
+    'vitrage_isolant': ((20, 24, 22, 28, 37, 38, 36, 42),
+                        (0.18, 0.18, 0.06, 0.04, 0.03, 0.02, 0.02, 0.02)),
+    'grille_pare_pluie': ((0, 1, 2, 3, 4, 5, 5, 5),
+                          (1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)),
+    'grille_acoustique': ((4, 5, 7, 11, 16, 18, 15, 13),
+                          (0.70, 0.80, 0.90, 0.95, 0.95, 0.95, 0.95, 0.95)),
+    'ouverture_libre': ((0, 0, 0, 0, 0, 0, 0, 0),
+                        (1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0)),
+}
+
+
+def spectre_depuis_global(lw, spectre=SPECTRE_VENTILATEUR):
+    """Répartit un Lw global dB(A) sur les bandes d'octave selon un spectre relatif"""
+    spectre = np.asarray(spectre, dtype=float)
+    return np.asarray(lw, dtype=float)[..., np.newaxis] + spectre - en_niveau(en_energie(spectre).sum())
+
+
+def niveau_global(niveaux_bandes):
+    """Somme énergétique des bandes d'octave (dernier axe) en dB(A)"""
+    return en_niveau(en_energie(niveaux_bandes).sum(axis=-1))
+
+
+class TableMateriaux:
+    """Table des matériaux de construction : R et alpha empilés par bande
+
+    Chaque matériau reçoit un indice ; les ouvertures ne conservent que cet
+    indice, de sorte qu'un bâtiment à nombreuses ouvertures est évalué par une
+    seule lecture indexée de la table au lieu d'une recherche par ouverture.
+    """
+
+    def __init__(self, materiaux=MATERIAUX_TYPE):
+        self.noms = []
+        self.index = {}
+        self.affaiblissement = np.zeros((0, len(BANDES_OCTAVE)))
+        self.absorption = np.zeros((0, len(BANDES_OCTAVE)))
+        for nom, (affaiblissement, absorption) in materiaux.items():
+            self.ajouter_materiau(nom, affaiblissement, absorption)
+
+    def ajouter_materiau(self, nom, affaiblissement, absorption):
+        """Ajoute (ou remplace) un matériau : R (dB) et alpha par bande d'octave"""
+        affaiblissement = np.broadcast_to(np.asarray(affaiblissement, dtype=float), (len(BANDES_OCTAVE),))
+        absorption = np.broadcast_to(np.asarray(absorption, dtype=float), (len(BANDES_OCTAVE),))
+        if np.any((absorption < 0) | (absorption > 1)):
+            raise ValueError(f"Matériau '{nom}' : coefficients d'absorption hors de [0, 1]")
+
+        if nom in self.index:
+            self.affaiblissement[self.index[nom]] = affaiblissement
+            self.absorption[self.index[nom]] = absorption
+        else:
+            self.index[nom] = len(self.noms)
+            self.noms.append(nom)
+            self.affaiblissement = np.vstack([self.affaiblissement, affaiblissement])
+            self.absorption = np.vstack([self.absorption, absorption])
+        return self.index[nom]
+
+    def indice(self, nom):
+        try:
+            return self.index[nom]
+        except KeyError:
+            raise KeyError(f"Matériau inconnu : {nom}")
+
+
+TABLE_MATERIAUX = TableMateriaux()
+
+
+class LocalTechnique:
+    """Local technique (chaufferie, salle des machines) rayonnant par ses ouvertures
+
+    Les parois intérieures et les ouvertures sont des couples (indice de
+    matériau, surface) ; les ouvertures portent en plus une position et une
+    normale sortante. Le champ est supposé diffus dans le local.
+    """
+
+    def __init__(self, table=TABLE_MATERIAUX):
+        self.table = table
+        self.parois = []
+        self.materiaux_ouvertures = []
+        self.surfaces_ouvertures = []
+        self.positions = []
+        self.normales = []
+
+    @classmethod
+    def parallelepipede(cls, longueur, largeur, hauteur, materiau_murs='beton_20cm',
+                        materiau_sol='beton_20cm', materiau_plafond=None, table=TABLE_MATERIAUX):
+        """Local rectangulaire : murs, sol et plafond (par défaut du matériau des murs)"""
+        if min(longueur, largeur, hauteur) <= 0:
+            raise ValueError("Les dimensions du local doivent être positives")
+        local = cls(table)
+        local.ajouter_paroi(materiau_murs, 2 * (longueur + largeur) * hauteur)
+        local.ajouter_paroi(materiau_sol, longueur * largeur)
+        local.ajouter_paroi(materiau_plafond or materiau_murs, longueur * largeur)
+        return local
+
+    def ajouter_paroi(self, materiau, surface):
+        """Surface intérieure absorbante (m²)"""
+        if surface <= 0:
+            raise ValueError("La surface d'une paroi doit être positive")
+        self.parois.append((self.table.indice(materiau), float(surface)))
+
+    def ajouter_ouverture(self, materiau, surface, position=(0.0, 0.0, 0.0), normale=(1.0, 0.0, 0.0)):
+        """Ouverture ou élément de façade rayonnant vers l'extérieur"""
+        if surface <= 0:
+            raise ValueError("La surface d'une ouverture doit être positive")
+        normale = np.asarray(normale, dtype=float)
+        if not np.linalg.norm(normale):
+            raise ValueError("La normale d'une ouverture ne peut pas être nulle")
+        position = np.asarray(position, dtype=float)
+        self.materiaux_ouvertures.append(self.table.indice(materiau))
+        self.surfaces_ouvertures.append(float(surface))
+        self.positions.append(np.append(position, 0.0) if position.size == 2 else position)
+        self.normales.append(normale / np.linalg.norm(normale))
+        return len(self.surfaces_ouvertures) - 1
+
+    def aire_absorption(self):
+        """Aire d'absorption équivalente A (m²) par bande, ouvertures comprises"""
+        aire = np.zeros(len(BANDES_OCTAVE))
+        if self.parois:
+            indices, surfaces = (np.array(colonne) for colonne in zip(*self.parois))
+            aire += surfaces @ self.table.absorption[indices]
+        if self.surfaces_ouvertures:
+            aire += np.array(self.surfaces_ouvertures) @ self.table.absorption[self.materiaux_ouvertures]
+        if np.any(aire <= 0):
+            raise ValueError("Local sans absorption : aire d'absorption nulle")
+        return aire
+
+    def niveau_reverbere(self, lw_bandes):
+        """Lp réverbéré par bande pour une ou plusieurs machines (lw_bandes : (..., bandes))"""
+        lw_bandes = np.atleast_2d(lw_bandes)
+        return en_niveau(en_energie(lw_bandes).sum(axis=0)) + 10 * np.log10(4 / self.aire_absorption())
+
+    def puissances_rayonnees(self, lw_bandes):
+        """Lw rayonné par bande pour chaque ouverture : tableau (ouvertures, bandes)"""
+        if not self.surfaces_ouvertures:
+            raise ValueError("Aucune ouverture définie pour le local")
+        return (self.niveau_reverbere(lw_bandes)[np.newaxis, :]
+                - self.table.affaiblissement[self.materiaux_ouvertures]
+                + 10 * np.log10(np.array(self.surfaces_ouvertures))[:, np.newaxis]
+                + CORRECTION_CHAMP_DIFFUS)
+
+    def sources(self, lw_bandes):
+        """Sources extérieures équivalentes (une SourcePuissance hémisphérique par ouverture)"""
+        lw = niveau_global(self.puissances_rayonnees(lw_bandes))
+        return [SourcePuissance(position, float(niveau), facteur_q=2.0, axe=normale)
+                for position, niveau, normale in zip(self.positions, lw, self.normales)]
+
+
+def lw_exterieur(lw_machine, longueur, largeur, hauteur, materiau_ouverture, surface_ouverture,
+                 materiau_murs='beton_20cm', spectre=SPECTRE_VENTILATEUR, table=TABLE_MATERIAUX):
+    """Lw global dB(A) rayonné par une ouverture d'un local rectangulaire
+
+    Raccourci de saisie : la machine est décrite par son Lw global et un
+    spectre type. Retourne (Lw extérieur, Lp réverbéré global dans le local).
+    """
+    local = LocalTechnique.parallelepipede(longueur, largeur, hauteur, materiau_murs, table=table)
+    local.ajouter_ouverture(materiau_ouverture, surface_ouverture)
+    lw_bandes = spectre_depuis_global(lw_machine, spectre)
+    return (float(niveau_global(local.puissances_rayonnees(lw_bandes))[0]),
+            float(niveau_global(local.niveau_reverbere(lw_bandes))))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Plan de zones des degrés de sensibilité (DS I à IV) et limites par récepteur
+Index en grille régulière : les points des cellules intérieures sont résolus
+directement, les autres par les seules arêtes de polygone de leur cellule
+"""
+
+import json
+import numpy as np
+
+from limites_reglementaires import HORS_ZONAGE, JEU_DEFAUT, TABLE_LIMITES, degre_depuis_texte
+
+# Nombre visé de cellules de la grille par arête de polygone
+CELLULES_PAR_ARETE = 4
+CELLULES_MAX = 4_000_000
+
+# Taille des lots de points traités en une passe (limite mémoire)
+TAILLE_BLOC = 262144
+
+
+def _orientation(ax, ay, bx, by, px, py):
+    return (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+
+
+class IndexZonage:
+    """Index spatial d'un plan de zones : degré de sensibilité de millions de points
+
+    zones : itérable de (degré, anneaux), anneaux étant un polygone [(x, y), ...]
+    ou une liste de polygones (contour puis trous, règle pair-impair). Lorsque
+    des zones se chevauchent, le degré le plus exigeant (le plus petit) l'emporte.
+
+    Chaque cellule de la grille mémorise le degré des zones qui la recouvrent
+    entièrement ; pour les zones dont une arête traverse la cellule, l'état du
+    centre de la cellule est précalculé et un point est résolu en comptant les
+    arêtes de la cellule coupées par le segment centre -> point.
+    """
+
+    def __init__(self, zones, taille_cellule=None):
+        degres, aretes, polygones = [], [], []
+        for numero, (degre, anneaux) in enumerate(zones):
+            anneaux = [np.asarray(a, dtype=float) for a in
+                       ([anneaux] if np.ndim(anneaux[0][0]) == 0 else anneaux)]
+            for anneau in anneaux:
+                if len(anneau) < 3:
+                    raise ValueError(f"Zone {numero + 1} : polygone de moins de 3 sommets")
+            degres.append(degre_depuis_texte(degre))
+            polygones.append(anneaux)
+            aretes.append(np.vstack([np.hstack([a, np.roll(a, -1, axis=0)]) for a in anneaux]))
+        if not polygones:
+            raise ValueError("Plan de zones vide")
+        self.degres_zones = np.array(degres, dtype=np.int8)
+        self.polygones = polygones
+
+        tous = np.vstack([a for anneaux in polygones for a in anneaux])
+        self.minimum = tous.min(axis=0)
+        etendue = np.maximum(tous.max(axis=0) - self.minimum, 1e-9)
+        nombre_aretes = sum(len(a) for a in aretes)
+        if taille_cellule is None:
+            cellules = min(CELLULES_MAX, CELLULES_PAR_ARETE * nombre_aretes)
+            taille_cellule = float(np.sqrt(etendue[0] * etendue[1] / cellules)) or float(etendue.max())
+        self.taille = max(taille_cellule, float(etendue.max()) / np.sqrt(CELLULES_MAX))
+        self.nx, self.ny = (np.floor(etendue / self.taille).astype(int) + 1)
+        self._construire(aretes)
+
+    def _cellules(self, points):
+        indices = np.floor((points - self.minimum) / self.taille).astype(np.int64)
+        dedans = (indices[:, 0] >= 0) & (indices[:, 0] < self.nx) & (indices[:, 1] >= 0) & (indices[:, 1] < self.ny)
+        return indices[:, 1] * self.nx + indices[:, 0], dedans
+
+    def _centres(self, cellules):
+        return self.minimum + (np.column_stack([cellules % self.nx, cellules // self.nx]) + 0.5) * self.taille
+
+    def _construire(self, aretes):
+        """Degré des cellules pleines et couples (cellule, zone) à arêtes, triés par cellule"""
+        self.degre_cellule = np.full(self.nx * self.ny, 127, dtype=np.int8)
+        paires_cellules, paires_zones, paires_etats = [], [], []
+        aretes_paires, aretes_coordonnees = [], []
+        nombre_paires = 0
+
+        for zone, segments in enumerate(aretes):
+            # Arêtes découpées en tronçons plus courts qu'une cellule : chaque tronçon touche au plus 2 x 2 cellules
+            longueurs = np.hypot(segments[:, 2] - segments[:, 0], segments[:, 3] - segments[:, 1])
+            morceaux = np.maximum(np.ceil(longueurs / self.taille).astype(np.int64), 1)
+            origine = np.repeat(np.arange(len(segments)), morceaux)
+            rang = np.arange(len(origine)) - np.repeat(np.cumsum(morceaux) - morceaux, morceaux)
+            t0, t1 = rang / morceaux[origine], (rang + 1) / morceaux[origine]
+            debut = segments[origine, :2] + t0[:, np.newaxis] * (segments[origine, 2:] - segments[origine, :2])
+            fin = segments[origine, :2] + t1[:, np.newaxis] * (segments[origine, 2:] - segments[origine, :2])
+            bas = np.floor((np.minimum(debut, fin) - self.minimum) / self.taille).astype(np.int64)
+            haut = np.floor((np.maximum(debut, fin) - self.minimum) / self.taille).astype(np.int64)
+            touchees = []
+            for dx in (0, 1):
+                for dy in (0, 1):
+                    cx, cy = np.minimum(bas[:, 0] + dx, haut[:, 0]), np.minimum(bas[:, 1] + dy, haut[:, 1])
+                    cx, cy = np.clip(cx, 0, self.nx - 1), np.clip(cy, 0, self.ny - 1)
+                    touchees.append(np.column_stack([cy * self.nx + cx, origine]))
+            touchees = np.unique(np.vstack(touchees), axis=0)
+
+            # État de tous les centres de cellules de l'emprise de la zone
+            bas_zone = np.clip(np.floor((segments[:, :2].min(axis=0) - self.minimum) / self.taille).astype(int), 0, None)
+            haut_zone = np.minimum(np.floor((segments[:, :2].max(axis=0) - self.minimum) / self.taille).astype(int),
+                                   [self.nx - 1, self.ny - 1])
+            gx, gy = np.meshgrid(np.arange(bas_zone[0], haut_zone[0] + 1), np.arange(bas_zone[1], haut_zone[1] + 1))
+            emprise = (gy * self.nx + gx).ravel()
+            etats = self._etats_centres(segments, bas_zone, haut_zone)
+
+            a_aretes = np.isin(emprise, touchees[:, 0])
+            pleines = emprise[etats & ~a_aretes]
+            self.degre_cellule[pleines] = np.minimum(self.degre_cellule[pleines], self.degres_zones[zone])
+
+            cellules_paires = np.unique(touchees[:, 0])
+            paires_cellules.append(cellules_paires)
+            paires_zones.append(np.full(len(cellules_paires), zone))
+            paires_etats.append(etats[np.searchsorted(emprise, cellules_paires)])
+            aretes_paires.append(nombre_paires + np.searchsorted(cellules_paires, touchees[:, 0]))
+            aretes_coordonnees.append(segments[touchees[:, 1]])
+            nombre_paires += len(cellules_paires)
+
+        # Couples (cellule, zone) triés par cellule, arêtes triées par couple (structure CSR)
+        cellules = np.concatenate(paires_cellules)
+        ordre = np.argsort(cellules, kind='stable')
+        rang = np.empty_like(ordre)
+        rang[ordre] = np.arange(len(ordre))
+        self.paires_zone = np.concatenate(paires_zones)[ordre]
+        self.paires_etat = np.concatenate(paires_etats)[ordre]
+        self.debut_paires = np.searchsorted(cellules[ordre], np.arange(self.nx * self.ny + 1))
+
+        paires = rang[np.concatenate(aretes_paires)]
+        ordre_aretes = np.argsort(paires, kind='stable')
+        self.aretes = np.concatenate(aretes_coordonnees)[ordre_aretes]
+        self.debut_aretes = np.searchsorted(paires[ordre_aretes], np.arange(len(ordre) + 1))
+
+    def _etats_centres(self, segments, bas, haut):
+        """Centres des cellules [bas, haut] intérieurs à une zone, balayage ligne par ligne
+
+        Même règle que optimisation_placement.dans_polygone (rayon vers +x,
+        arête comptée si min(y) <= y < max(y)), mais le coût ne dépend que du
+        nombre d'intersections arêtes / lignes de centres et du nombre de cellules.
+        """
+        lignes, colonnes = haut[1] - bas[1] + 1, haut[0] - bas[0] + 1
+        xa, ya, xb, yb = segments.T
+        y_bas, y_haut = np.minimum(ya, yb), np.maximum(ya, yb)
+        premiere = np.ceil((y_bas - self.minimum[1]) / self.taille - 0.5).astype(np.int64) - bas[1]
+        derniere = np.ceil((y_haut - self.minimum[1]) / self.taille - 0.5).astype(np.int64) - 1 - bas[1]
+        premiere, derniere = np.maximum(premiere, 0), np.minimum(derniere, lignes - 1)
+        nombre = np.maximum(derniere - premiere + 1, 0)
+
+        arete = np.repeat(np.arange(len(segments)), nombre)
+        ligne = premiere[arete] + np.arange(len(arete)) - np.repeat(np.cumsum(nombre) - nombre, nombre)
+        y = self.minimum[1] + (ligne + bas[1] + 0.5) * self.taille
+        x = xa[arete] + (y - ya[arete]) * (xb[arete] - xa[arete]) / (yb[arete] - ya[arete])
+        # Clé triable (ligne, x) : une ligne occupe un intervalle de longueur > largeur de la grille
+        largeur = (self.nx + 2) * self.taille
+        cles = np.sort(ligne * largeur + np.clip(x - self.minimum[0], -self.taille, largeur - self.taille))
+
+        lignes_centres = np.repeat(np.arange(lignes), colonnes)
+        x_centres = (np.tile(np.arange(bas[0], haut[0] + 1), lignes) + 0.5) * self.taille
+        fins_lignes = np.searchsorted(cles, (np.arange(lignes) + 1) * largeur - self.taille)
+        a_droite = fins_lignes[lignes_centres] - np.searchsorted(cles, lignes_centres * largeur + x_centres, side='right')
+        return a_droite % 2 == 1
+
+    @classmethod
+    def depuis_geojson(cls, chemin, propriete='ds', taille_cellule=None):
+        """Plan de zones GeoJSON (Polygon / MultiPolygon, coordonnées en mètres)"""
+        with open(chemin, 'r', encoding='utf-8') as f:
+            collection = json.load(f)
+        zones = []
+        for numero, entite in enumerate(collection.get('features', [collection])):
+            geometrie = entite.get('geometry') or {}
+            proprietes = entite.get('properties') or {}
+            cles = {cle.lower(): valeur for cle, valeur in proprietes.items()}
+            if propriete.lower() not in cles:
+                raise KeyError(f"Zone {numero + 1} : propriété '{propriete}' absente")
+            degre = degre_depuis_texte(cles[propriete.lower()])
+            if geometrie.get('type') == 'Polygon':
+                zones.append((degre, geometrie['coordinates']))
+            elif geometrie.get('type') == 'MultiPolygon':
+                zones.extend((degre, partie) for partie in geometrie['coordinates'])
+            else:
+                raise ValueError(f"Zone {numero + 1} : géométrie {geometrie.get('type')} non prise en charge")
+        return cls(zones, taille_cellule)
+
+    def degres(self, points):
+        """Degré de sensibilité (1-4) de chaque point (n, 2 ou 3), HORS_ZONAGE hors du plan"""
+        points = np.atleast_2d(np.asarray(points, dtype=float))[:, :2]
+        resultat = np.empty(len(points), dtype=np.int8)
+        for debut in range(0, len(points), TAILLE_BLOC):
+            resultat[debut:debut + TAILLE_BLOC] = self._degres_bloc(points[debut:debut + TAILLE_BLOC])
+        return resultat
+
+    def _degres_bloc(self, points):
+        cellules, dedans = self._cellules(points)
+        cellules = np.where(dedans, cellules, 0)
+        degres = np.where(dedans, self.degre_cellule[cellules], 127)
+
+        # Points des cellules traversées par des arêtes : un couple (point, zone) par zone concernée
+        nombre = np.where(dedans, self.debut_paires[cellules + 1] - self.debut_paires[cellules], 0)
+        points_paires = np.repeat(np.arange(len(points)), nombre)
+        paires = np.arange(len(points_paires)) - np.repeat(np.cumsum(nombre) - nombre, nombre) \
+            + np.repeat(self.debut_paires[cellules], nombre)
+        if len(paires):
+            # Segments centre -> point confrontés aux arêtes de la zone dans la cellule
+            nombre_aretes = self.debut_aretes[paires + 1] - self.debut_aretes[paires]
+            test_paires = np.repeat(np.arange(len(paires)), nombre_aretes)
+            aretes = self.aretes[np.arange(len(test_paires)) - np.repeat(np.cumsum(nombre_aretes) - nombre_aretes,
+                                                                        nombre_aretes)
+                                 + np.repeat(self.debut_aretes[paires], nombre_aretes)]
+            p = points[points_paires[test_paires]]
+            c = self._centres(cellules[points_paires[test_paires]])
+            ax, ay, bx, by = aretes.T
+            coupe = ((_orientation(c[:, 0], c[:, 1], p[:, 0], p[:, 1], ax, ay) > 0)
+                     != (_orientation(c[:, 0], c[:, 1], p[:, 0], p[:, 1], bx, by) > 0)) \
+                & ((_orientation(ax, ay, bx, by, c[:, 0], c[:, 1]) > 0)
+                   != (_orientation(ax, ay, bx, by, p[:, 0], p[:, 1]) > 0))
+            croisements = np.bincount(test_paires, weights=coupe, minlength=len(paires)).astype(np.int64)
+            dans_zone = self.paires_etat[paires] ^ (croisements % 2 == 1)
+            candidats = np.where(dans_zone, self.degres_zones[self.paires_zone[paires]], 127)
+            np.minimum.at(degres, points_paires, candidats)
+        return np.where(degres == 127, HORS_ZONAGE, degres).astype(np.int8)
+
+    def limites(self, points, jeu=JEU_DEFAUT, table=TABLE_LIMITES):
+        """Limites (jour, nuit) dB(A) par point selon un jeu de limites, NaN hors zonage"""
+        return table.limites(self.degres(points), jeu)
+
+    def degres_grille(self, origine, resolution, nx, ny):
+        """Degrés des cellules d'une carte de bruit (ny, nx), centres des cellules, par lignes"""
+        resultat = np.empty((ny, nx), dtype=np.int8)
+        xs = origine[0] + (np.arange(nx) + 0.5) * resolution
+        lignes = max(1, TAILLE_BLOC // max(nx, 1))
+        for y0 in range(0, ny, lignes):
+            ys = origine[1] + (np.arange(y0, min(ny, y0 + lignes)) + 0.5) * resolution
+            gx, gy = np.meshgrid(xs, ys)
+            resultat[y0:y0 + len(ys)] = self.degres(np.column_stack([gx.ravel(), gy.ravel()])).reshape(len(ys), nx)
+        return resultat
+